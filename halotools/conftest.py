@@ -4,6 +4,17 @@
 
 from astropy.tests.pytest_plugins import *
 import os
+import atexit
+import shutil
+import tempfile
+
+# Keep the random-random pair counts cached by the test suite out of the
+# user's cache directory, see halotools.mock_observables.two_point_clustering.rr_cache
+if 'HALOTOOLS_RR_CACHE_DIR' not in os.environ:
+    _rr_cache_dirname = tempfile.mkdtemp(prefix='halotools_rr_counts_')
+    os.environ['HALOTOOLS_RR_CACHE_DIR'] = _rr_cache_dirname
+    atexit.register(shutil.rmtree, _rr_cache_dirname, True)
+
 from . import version
 
 # Uncomment the following line to treat all DeprecationWarnings as
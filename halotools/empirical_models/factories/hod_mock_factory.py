@@ -17,7 +17,7 @@ from .mock_factory_template import MockFactory
 
 from .. import model_helpers
 
-from ...sim_manager import sim_defaults
+from ...sim_manager import sim_defaults, LazyHaloTable
 from ...utils.table_utils import SampleSelector
 from ...custom_exceptions import HalotoolsError
 
@@ -99,6 +99,10 @@ class HodMockFactory(MockFactory):
         building lookup tables associated with the halo profile,
         and possibly creating new halo properties.
 
+        If the halo table of a `~halotools.sim_manager.CachedHaloCatalog` has not yet
+        been loaded into memory, the pre-processing reads from disk only the columns
+        that are accessed by the model, see `~halotools.sim_manager.LazyHaloTable`.
+
         Parameters
         ----------
         logrmin : float, optional
@@ -114,15 +118,20 @@ class HodMockFactory(MockFactory):
             Default is set in `~halotools.empirical_models.model_defaults`.
 
         """
+        if getattr(halocat, 'halo_table_is_loaded', True):
+            full_halo_table = halocat.halo_table
+        else:
+            full_halo_table = halocat.lazy_halo_table
+
         try:
-            assert 'halo_upid' in list(halocat.halo_table.keys())
+            assert 'halo_upid' in list(full_halo_table.keys())
         except AssertionError:
             raise HalotoolsError(missing_halo_upid_msg)
 
         # Make cuts on halo catalog #
         # Select host halos only, since this is an HOD-style model
         halo_table, subhalo_table = SampleSelector.host_halo_selection(
-            table=halocat.halo_table, return_subhalos=True)
+            table=full_halo_table, return_subhalos=True)
 
         # make a (possibly trivial) completeness cut
         cutoff_mvir = self.Num_ptcl_requirement*self.particle_mass
@@ -151,7 +160,11 @@ class HodMockFactory(MockFactory):
         for component_model in self.model.model_dictionary.values():
             try:
                 f = getattr(component_model, 'preprocess_subhalo_table')
-                halo_table, self.subhalo_table = f(halo_table, subhalo_table)
+                if isinstance(halo_table, LazyHaloTable):
+                    halo_table, self.subhalo_table = self._preprocess_lazy_subhalo_table(
+                        f, halo_table, subhalo_table)
+                else:
+                    halo_table, self.subhalo_table = f(halo_table, subhalo_table)
             except AttributeError:
                 pass
 
@@ -175,6 +188,35 @@ class HodMockFactory(MockFactory):
 
         self.model.build_lookup_tables()
 
+    def _preprocess_lazy_subhalo_table(self, f, halo_table, subhalo_table):
+        """ Call the ``preprocess_subhalo_table`` function ``f`` of a component model
+        on `~halotools.sim_manager.LazyHaloTable` proxies of the host halo and subhalo tables.
+
+        Only the ``additional_haloprops`` columns, which include the ``list_of_haloprops_needed``
+        of each component model, are read to build the tables passed to ``f``.
+        The tables returned by ``f`` are mapped back to row selections of the proxies,
+        storing the columns created or modified by ``f``, so that all other columns
+        are still only read from disk when they are accessed.
+        """
+        row_key = '_lazy_halo_table_row'
+        tables = []
+        for proxy in (halo_table, subhalo_table):
+            table = proxy.to_table(
+                columns=[key for key in self.additional_haloprops if key in proxy.keys()])
+            table[row_key] = np.arange(len(proxy))
+            tables.append(table)
+
+        proxies = []
+        for proxy, table in zip((halo_table, subhalo_table), f(*tables)):
+            selection = proxy[table[row_key].data]
+            for key in table.keys():
+                if key == row_key:
+                    continue
+                elif (key not in selection.keys()) or np.any(selection[key] != table[key]):
+                    selection[key] = table[key].data
+            proxies.append(selection)
+        return proxies
+
     def populate(self, seed=None, **kwargs):
         """
         Method populating host halos with mock galaxies.
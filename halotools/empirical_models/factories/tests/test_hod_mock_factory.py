@@ -15,8 +15,9 @@ from ....empirical_models import TrivialPhaseSpace
 from ....empirical_models import AssembiasZheng07Sats
 from ....empirical_models import NFWPhaseSpace
 from ....empirical_models import HodModelFactory
+from ....empirical_models import SubhaloPhaseSpace
 
-from ....sim_manager import FakeSim, CachedHaloCatalog
+from ....sim_manager import FakeSim, CachedHaloCatalog, LazyHaloTable
 from ....sim_manager.fake_sim import FakeSimHalosNearBoundaries
 from ..prebuilt_model_factory import PrebuiltHodModelFactory
 from ....custom_exceptions import HalotoolsError
@@ -288,3 +289,74 @@ def test_one_two_halo_decomposition_on_mock():
     xi_1h, xi_2h = tpcf_one_two_halo_decomp(pos, halo_hostid, rbins,
         period=model.mock.Lbox, num_threads='max')
     assert xi_1h[-1] == -1
+
+
+def test_populate_mock_reads_only_needed_columns(tmpdir):
+    """ Verify that pre-processing a catalog whose halo table is not loaded into memory
+    only reads the columns used by the model, and produces the same mock.
+    """
+    pytest.importorskip('h5py')
+    halocat = FakeSim()
+    fname = str(tmpdir.join('halos.hdf5'))
+    halocat.halo_table.write(fname, path='data')
+
+    class LazyFakeSim(FakeSim):
+        halo_table_is_loaded = False
+
+        @property
+        def lazy_halo_table(self):
+            self.last_lazy_halo_table = LazyHaloTable(fname)
+            return self.last_lazy_halo_table
+
+    lazy_halocat = LazyFakeSim()
+
+    model = PrebuiltHodModelFactory('zheng07')
+    model.populate_mock(halocat, seed=fixed_seed)
+    model2 = PrebuiltHodModelFactory('zheng07')
+    model2.populate_mock(lazy_halocat, seed=fixed_seed)
+
+    gals, gals2 = model.mock.galaxy_table, model2.mock.galaxy_table
+    assert len(gals) == len(gals2)
+    for key in gals.keys():
+        assert np.all(gals[key] == gals2[key])
+
+    columns_read = set(lazy_halocat.last_lazy_halo_table._column_cache.keys())
+    assert columns_read < set(halocat.halo_table.keys())
+    assert 'halo_vmax' not in columns_read
+
+
+def test_populate_mock_subhalo_model_reads_only_needed_columns(tmpdir):
+    """ Verify that pre-processing the subhalos of a catalog whose halo table is not loaded
+    into memory only reads the columns used by the model, and produces the same mock.
+    """
+    pytest.importorskip('h5py')
+    halocat = FakeSim()
+    fname = str(tmpdir.join('halos.hdf5'))
+    halocat.halo_table.write(fname, path='data')
+
+    class LazyFakeSim(FakeSim):
+        halo_table_is_loaded = False
+
+        @property
+        def lazy_halo_table(self):
+            self.last_lazy_halo_table = LazyHaloTable(fname)
+            return self.last_lazy_halo_table
+
+    lazy_halocat = LazyFakeSim()
+
+    model_dictionary = deepcopy(PrebuiltHodModelFactory('zheng07').model_dictionary)
+    model_dictionary['satellites_profile'] = SubhaloPhaseSpace(
+        'satellites', np.logspace(9.5, 16.5, 4))
+    model = HodModelFactory(**deepcopy(model_dictionary))
+    model.populate_mock(halocat, seed=fixed_seed)
+    model2 = HodModelFactory(**deepcopy(model_dictionary))
+    model2.populate_mock(lazy_halocat, seed=fixed_seed)
+
+    gals, gals2 = model.mock.galaxy_table, model2.mock.galaxy_table
+    assert len(gals) == len(gals2)
+    for key in gals.keys():
+        assert np.all(gals[key] == gals2[key])
+
+    columns_read = set(lazy_halocat.last_lazy_halo_table._column_cache.keys())
+    assert 'halo_mpeak' in columns_read
+    assert 'halo_vmax' not in columns_read
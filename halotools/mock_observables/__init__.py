@@ -12,7 +12,8 @@ from .isolation_functions import *
 from .void_statistics import *
 from .catalog_analysis_helpers import *
 from .pair_counters import (npairs_3d, npairs_projected, npairs_xy_z,
-    marked_npairs_3d, marked_npairs_xy_z)
+    marked_npairs_3d, marked_npairs_xy_z, knn_3d, knn_xy_z,
+    register_marking_function, register_conditional_function)
 from .radial_profiles import *
 from .two_point_clustering import *
 from .large_scale_density import *
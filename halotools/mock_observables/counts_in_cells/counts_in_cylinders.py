@@ -3,15 +3,16 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import numpy as np
-import multiprocessing
 from functools import partial
 
 from .engines import counts_in_cylinders_engine
 
 from ..mock_observables_helpers import get_num_threads, get_period
 from ..pair_counters.rectangular_mesh import RectangularDoubleMesh
+from ..pair_counters.cell_size_autotuner import _is_auto
 from ..pair_counters.mesh_helpers import (_set_approximate_cell_sizes,
-    _cell1_parallelization_indices, _enclose_in_box, _enforce_maximum_search_length)
+    _cell1_parallelization_indices, _parallel_engine_map, _enclose_in_box,
+    _enforce_maximum_search_length)
 
 from ...utils.array_utils import array_is_monotonic, custom_len
 
@@ -163,13 +164,13 @@ def counts_in_cylinders(sample1, sample2, proj_search_radius, cylinder_half_leng
 
     # Calculate the cell1 indices that will be looped over by the engine
     num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
+        double_mesh.mesh1.ncells, num_threads, double_mesh=double_mesh)
 
     if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = pool.map(engine, cell1_tuples)
-        counts = np.vstack(result)
-        pool.close()
+        result = _parallel_engine_map(engine, cell1_tuples, num_threads)
+        # Each chunk of cells returns the counts of all points in sample1,
+        # which are zero for the points outside the chunk
+        counts = np.sum(result, axis=0)
     else:
         result = engine(cell1_tuples[0])
         counts = np.vstack(result)
@@ -244,7 +245,7 @@ def _counts_in_cylinders_process_args(sample1, sample2, proj_search_radius, cyli
     elif custom_len(approx_cell1_size) == 1:
         approx_cell1_size = [approx_cell1_size, approx_cell1_size, approx_cell1_size]
     if approx_cell2_size is None:
-        approx_cell2_size = [max_rp_max, max_rp_max, max_pi_max]
+        approx_cell2_size = 'auto' if _is_auto(approx_cell1_size) else [max_rp_max, max_rp_max, max_pi_max]
     elif custom_len(approx_cell2_size) == 1:
         approx_cell2_size = [approx_cell2_size, approx_cell2_size, approx_cell2_size]
 
@@ -12,7 +12,8 @@ from ..counts_in_cylinders import counts_in_cylinders
 
 from ...tests.cf_helpers import generate_locus_of_3d_points, generate_3d_regular_mesh
 
-__all__ = ('test_counts_in_cylinders0', 'test_counts_in_cylinders1', 'test_counts_in_cylinders2')
+__all__ = ('test_counts_in_cylinders0', 'test_counts_in_cylinders1', 'test_counts_in_cylinders2',
+    'test_counts_in_cylinders_parallel')
 
 fixed_seed = 43
 seed_list = np.arange(5).astype(int)
@@ -209,3 +210,23 @@ def test_cic_pbc():
         result_pbc = counts_in_cylinders(sample1, sample2, rp_max, pi_max, period=1)
         result_nopbc = counts_in_cylinders(sample1, sample2, rp_max, pi_max, period=None)
         assert np.allclose(result_pbc, result_nopbc)
+
+
+def test_counts_in_cylinders_parallel():
+    """ Verify that the parallel calculation returns one count per point in ``sample1``,
+    in agreement with the serial calculation, for any number of threads.
+    """
+    npts1, npts2 = 1000, 2000
+
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((npts1, 3))
+        sample2 = np.random.random((npts2, 3))
+        rp_max = np.random.uniform(0, 0.1, npts1)
+        pi_max = np.random.uniform(0, 0.1, npts1)
+
+    serial_result = counts_in_cylinders(sample1, sample2, rp_max, pi_max, period=1)
+    for num_threads in (2, 3):
+        parallel_result = counts_in_cylinders(sample1, sample2, rp_max, pi_max, period=1,
+            num_threads=num_threads)
+        assert np.shape(parallel_result) == (npts1, )
+        assert np.all(parallel_result == serial_result)
@@ -0,0 +1,7 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from .fof_union_find_engine import fof_union_find_engine
+
+__all__ = ('fof_union_find_engine', )
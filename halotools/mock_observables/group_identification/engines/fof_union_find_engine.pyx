@@ -0,0 +1,265 @@
+"""
+"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import numpy as np
+cimport numpy as cnp
+cimport cython
+from cython.parallel cimport prange, threadid
+from libcpp.vector cimport vector
+from ...pair_counters.cpairs.wall_clock cimport wall_time
+from ...pair_counters.cpairs.cell_stencil cimport cell_offset_sign
+
+__author__ = ('Andrew Hearin', 'Duncan Campbell')
+__all__ = ('fof_union_find_engine', )
+
+
+cdef inline cnp.int64_t find_root(cnp.int64_t* parent, cnp.int64_t i) nogil:
+    """ Return the root of the tree of point i, halving the path to the root.
+    """
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+cdef inline cnp.int64_t read_root(cnp.int64_t* parent, cnp.int64_t i) nogil:
+    """ Return the root of the tree of point i without modifying the forest.
+    """
+    while parent[i] != i:
+        i = parent[i]
+    return i
+
+
+cdef inline int link(cnp.int64_t* parent, cnp.int64_t i, cnp.int64_t j) nogil:
+    """ Merge the trees of points i and j, attaching the larger root to the smaller.
+    Return 1 if the two trees were distinct, and 0 otherwise.
+    """
+    cdef cnp.int64_t root_i = find_root(parent, i)
+    cdef cnp.int64_t root_j = find_root(parent, j)
+    if root_i < root_j:
+        parent[root_j] = root_i
+    elif root_j < root_i:
+        parent[root_i] = root_j
+    else:
+        return 0
+    return 1
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+def fof_union_find_engine(double_mesh, x1in, y1in, z1in, d_perp, d_para,
+    cell1_ranges, parent, int crossing, int num_threads=1, busy_time=None):
+    """ Cython engine merging the friends-of-friends groups of points in a
+    union-find forest while the mesh is traversed, without storing the pairs.
+
+    The cells of double_mesh.mesh1 are divided into contiguous ranges.
+    With ``crossing`` set to 0, each OpenMP thread links the pairs of points
+    that both lie in the cells of one range. The trees of a range then only hold
+    points of that range, so the threads never modify the same entries of ``parent``.
+    With ``crossing`` set to 1, the pairs between cells of different ranges
+    are found concurrently, merging the groups across the boundaries of the ranges.
+    The forest is only read while the threads search the pairs, and each range
+    stores the pairs of roots of the trees it finds to be linked, skipping repeats
+    of the previous pair. The stored pairs are then linked serially.
+
+    Parameters
+    ------------
+    double_mesh : object
+        Instance of `~halotools.mock_observables.RectangularDoubleMesh`
+        built in auto-correlation mode.
+
+    x1in, y1in, z1in : arrays
+        Numpy arrays storing Cartesian coordinates of the points
+
+    d_perp : float
+        Linking length in the xy-plane.
+
+    d_para : float
+        Linking length in the z-dimension.
+
+    cell1_ranges : array
+        Integer array of shape (num_ranges, 2) storing the first and last cell
+        of each range of cells of double_mesh.mesh1.
+
+    parent : array
+        Integer array of length Npts storing the parent of each point
+        in the union-find forest, where points are indexed in the order of
+        double_mesh.mesh1.idx_sorted. Updated in place.
+
+    crossing : int
+        Set to 0 to link the pairs within each range of cells,
+        and to 1 to link the pairs between different ranges, after the pairs
+        within each range have been linked.
+
+    num_threads : int, optional
+        Number of OpenMP threads sharing the ranges of cells. Default is 1.
+
+    busy_time : array, optional
+        Array of length num_threads. Entry i is incremented by the time in seconds
+        that thread i spent on its ranges. Default is None.
+
+    """
+    cdef cnp.float64_t d_perp_squared = d_perp*d_perp
+    cdef cnp.float64_t d_para_squared = d_para*d_para
+    cdef cnp.float64_t xperiod = double_mesh.xperiod
+    cdef cnp.float64_t yperiod = double_mesh.yperiod
+    cdef cnp.float64_t zperiod = double_mesh.zperiod
+    cdef int PBCs = double_mesh._PBCs
+
+    cdef cnp.int64_t[:, :] ranges = np.ascontiguousarray(cell1_ranges, dtype=np.int64)
+    cdef cnp.int64_t num_ranges = ranges.shape[0]
+    cdef cnp.int64_t[:] parent_view = parent
+    cdef cnp.int64_t* forest = &parent_view[0]
+
+    cdef cnp.float64_t[:] x1 = np.ascontiguousarray(x1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
+    cdef cnp.float64_t[:] y1 = np.ascontiguousarray(y1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
+    cdef cnp.float64_t[:] z1 = np.ascontiguousarray(z1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
+
+    cdef cnp.int64_t irange, icell1, icell2, first_cell, last_cell
+    cdef cnp.int64_t[:] cell1_indices = np.ascontiguousarray(double_mesh.mesh1.cell_id_indices, dtype=np.int64)
+
+    cdef cnp.int64_t ifirst1, ilast1, ifirst2, ilast2
+
+    cdef int ix2, iy2, iz2, ix1, iy1, iz1
+    cdef int nonPBC_ix2, nonPBC_iy2, nonPBC_iz2
+
+    cdef int num_x2_covering_steps = int(np.ceil(
+        double_mesh.search_xlength / double_mesh.mesh1.xcell_size))
+    cdef int num_y2_covering_steps = int(np.ceil(
+        double_mesh.search_ylength / double_mesh.mesh1.ycell_size))
+    cdef int num_z2_covering_steps = int(np.ceil(
+        double_mesh.search_zlength / double_mesh.mesh1.zcell_size))
+
+    cdef int leftmost_ix2, rightmost_ix2
+    cdef int leftmost_iy2, rightmost_iy2
+    cdef int leftmost_iz2, rightmost_iz2
+
+    cdef int num_xdivs = double_mesh.mesh1.num_xdivs
+    cdef int num_ydivs = double_mesh.mesh1.num_ydivs
+    cdef int num_zdivs = double_mesh.mesh1.num_zdivs
+
+    cdef cnp.float64_t x2shift, y2shift, z2shift, dx, dy, dz
+    cdef cnp.float64_t x1tmp, y1tmp, z1tmp
+    cdef int Ni, Nj, i, j, jstart, offset_sign, in_range
+
+    # Pairs of roots of the groups linked across the boundaries of each range
+    cdef vector[vector[cnp.int64_t]] range_edges
+    range_edges.resize(num_ranges)
+    cdef cnp.int64_t root1, root2, last_root1, last_root2, iedge
+
+    cdef int tid
+    cdef cnp.float64_t range_start_time
+    if busy_time is None:
+        busy_time = np.zeros(num_threads, dtype=np.float64)
+    cdef cnp.float64_t[:] thread_busy_time = busy_time
+
+    for irange in prange(num_ranges, nogil=True, num_threads=num_threads,
+            schedule='dynamic'):
+        tid = threadid()
+        range_start_time = wall_time()
+        first_cell = ranges[irange, 0]
+        last_cell = ranges[irange, 1]
+        last_root1 = -1
+        last_root2 = -1
+
+        for icell1 in range(first_cell, last_cell):
+            ifirst1 = cell1_indices[icell1]
+            ilast1 = cell1_indices[icell1+1]
+
+            Ni = ilast1 - ifirst1
+            if Ni > 0:
+
+                ix1 = icell1 // (num_ydivs*num_zdivs)
+                iy1 = (icell1 - ix1*num_ydivs*num_zdivs) // num_zdivs
+                iz1 = icell1 - (ix1*num_ydivs*num_zdivs) - (iy1*num_zdivs)
+
+                leftmost_ix2 = ix1 - num_x2_covering_steps
+                leftmost_iy2 = iy1 - num_y2_covering_steps
+                leftmost_iz2 = iz1 - num_z2_covering_steps
+
+                rightmost_ix2 = ix1 + 1 + num_x2_covering_steps
+                rightmost_iy2 = iy1 + 1 + num_y2_covering_steps
+                rightmost_iz2 = iz1 + 1 + num_z2_covering_steps
+
+                for nonPBC_ix2 in range(leftmost_ix2, rightmost_ix2):
+                    if nonPBC_ix2 < 0:
+                        x2shift = -xperiod*PBCs
+                    elif nonPBC_ix2 >= num_xdivs:
+                        x2shift = +xperiod*PBCs
+                    else:
+                        x2shift = 0.
+                    # Now apply the PBCs
+                    ix2 = nonPBC_ix2 % num_xdivs
+
+                    for nonPBC_iy2 in range(leftmost_iy2, rightmost_iy2):
+                        if nonPBC_iy2 < 0:
+                            y2shift = -yperiod*PBCs
+                        elif nonPBC_iy2 >= num_ydivs:
+                            y2shift = +yperiod*PBCs
+                        else:
+                            y2shift = 0.
+                        # Now apply the PBCs
+                        iy2 = nonPBC_iy2 % num_ydivs
+
+                        for nonPBC_iz2 in range(leftmost_iz2, rightmost_iz2):
+                            if nonPBC_iz2 < 0:
+                                z2shift = -zperiod*PBCs
+                            elif nonPBC_iz2 >= num_zdivs:
+                                z2shift = +zperiod*PBCs
+                            else:
+                                z2shift = 0.
+                            # Now apply the PBCs
+                            iz2 = nonPBC_iz2 % num_zdivs
+
+                            # Each pair of cells is only visited from one of its two members
+                            offset_sign = cell_offset_sign(nonPBC_ix2 - ix1,
+                                nonPBC_iy2 - iy1, nonPBC_iz2 - iz1)
+                            if offset_sign < 0:
+                                continue
+
+                            icell2 = ix2*(num_ydivs*num_zdivs) + iy2*num_zdivs + iz2
+                            in_range = (icell2 >= first_cell) & (icell2 < last_cell)
+                            if in_range == crossing:
+                                continue
+
+                            ifirst2 = cell1_indices[icell2]
+                            ilast2 = cell1_indices[icell2+1]
+
+                            Nj = ilast2 - ifirst2
+                            #loop over points in cell1 points
+                            if Nj > 0:
+                                for i in range(0,Ni):
+                                    x1tmp = x1[ifirst1+i] - x2shift
+                                    y1tmp = y1[ifirst1+i] - y2shift
+                                    z1tmp = z1[ifirst1+i] - z2shift
+                                    # Pairs within a cell are visited once
+                                    if offset_sign == 0:
+                                        jstart = i + 1
+                                    else:
+                                        jstart = 0
+                                    #loop over points in cell2 points
+                                    for j in range(jstart,Nj):
+                                        dx = x1tmp - x1[ifirst2+j]
+                                        dy = y1tmp - y1[ifirst2+j]
+                                        dz = z1tmp - z1[ifirst2+j]
+
+                                        if ((dx*dx + dy*dy <= d_perp_squared) &
+                                                (dz*dz <= d_para_squared)):
+                                            if crossing == 0:
+                                                link(forest, ifirst1+i, ifirst2+j)
+                                            else:
+                                                root1 = read_root(forest, ifirst1+i)
+                                                root2 = read_root(forest, ifirst2+j)
+                                                if (root1 != last_root1) | (root2 != last_root2):
+                                                    range_edges[irange].push_back(root1)
+                                                    range_edges[irange].push_back(root2)
+                                                    last_root1 = root1
+                                                    last_root2 = root2
+
+        thread_busy_time[tid] += wall_time() - range_start_time
+
+    for irange in range(num_ranges):
+        for iedge in range(0, range_edges[irange].size(), 2):
+            link(forest, range_edges[irange][iedge], range_edges[irange][iedge+1])
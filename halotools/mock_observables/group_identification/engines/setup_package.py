@@ -0,0 +1,35 @@
+from distutils.extension import Extension
+import os
+import sys
+
+PATH_TO_PKG = os.path.relpath(os.path.dirname(__file__))
+SOURCES = ("fof_union_find_engine.pyx", )
+THIS_PKG_NAME = '.'.join(__name__.split('.')[:-1])
+
+
+def get_extensions():
+
+    names = [THIS_PKG_NAME + "." + src.replace('.pyx', '') for src in SOURCES]
+    sources = [os.path.join(PATH_TO_PKG, srcfn) for srcfn in SOURCES]
+    include_dirs = ['numpy']
+    libraries = []
+    language = 'c++'
+    extra_compile_args = ['-Ofast']
+    extra_link_args = []
+    # The linking engine parallelizes with OpenMP. Apple's default clang
+    # does not support it, in which case the prange loop simply runs serially
+    if sys.platform != 'darwin':
+        extra_compile_args.append('-fopenmp')
+        extra_link_args.append('-fopenmp')
+
+    extensions = []
+    for name, source in zip(names, sources):
+        extensions.append(Extension(name=name,
+            sources=[source],
+            include_dirs=include_dirs,
+            libraries=libraries,
+            language=language,
+            extra_compile_args=extra_compile_args,
+            extra_link_args=extra_link_args))
+
+    return extensions
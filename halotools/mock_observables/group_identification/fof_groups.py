@@ -5,9 +5,14 @@ identify friends-of-friends groups of points.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import numpy as np
-from scipy.sparse import csgraph, csr_matrix
+import multiprocessing
+from scipy.sparse import csr_matrix
 
+from .engines import fof_union_find_engine
 from ..pair_counters.pairwise_distance_xy_z import pairwise_distance_xy_z
+from ..pair_counters.rectangular_mesh import RectangularDoubleMesh
+from ..pair_counters.mesh_helpers import (_cell1_parallelization_indices,
+    _record_worker_busy_times)
 
 from ...custom_exceptions import HalotoolsError
 
@@ -38,6 +43,12 @@ class FoFGroups(object):
         The first two dimensions (x, y) define the plane for perpendicular distances.
         The third dimension (z) is used for line-of-sight distances.
 
+        Groups are merged in a union-find forest while the pairs of points are found,
+        so the pairs themselves are never stored. The sparse matrices of
+        distances used by the igraph-based methods are only computed
+        when one of these methods, or one of the ``m_perp``, ``m_para`` and ``m``
+        attributes, is first accessed.
+
         See the :ref:`mock_obs_pos_formatting` documentation page for
         instructions on how to transform your coordinate position arrays into the
         format accepted by the ``positions`` argument.
@@ -69,10 +80,10 @@ class FoFGroups(object):
 
         num_threads : int, optional
             Number of threads to use in calculation, where parallelization is performed
-            using the python ``multiprocessing`` module. Default is 1 for a purely serial
-            calculation, in which case a multiprocessing Pool object will
-            never be instantiated. A string 'max' may be used to indicate that
-            the pair counters should use all available cores on the machine.
+            with OpenMP threads that each link the points of one slab of the box,
+            after which the groups are merged across the boundaries of the slabs.
+            Default is 1 for a purely serial calculation. A string 'max' may be used
+            to indicate that all available cores on the machine should be used.
 
         Examples
         --------
@@ -162,12 +173,49 @@ class FoFGroups(object):
         self.n_gal = len(positions)/self.volume
         self.d_perp = self.b_perp/(self.n_gal**(1.0/3.0))
         self.d_para = self.b_para/(self.n_gal**(1.0/3.0))
-        self.m_perp, self.m_para = pairwise_distance_xy_z(
-            self.positions, self.positions, self.d_perp, self.d_para,
-            period=self.period, num_threads=num_threads)
 
-        self.m = self.m_perp.multiply(self.m_perp)+self.m_para.multiply(self.m_para)
-        self.m = self.m.sqrt()
+        if num_threads == 'max':
+            num_threads = multiprocessing.cpu_count()
+        if not isinstance(num_threads, int):
+            msg = "Input ``num_threads`` argument must be an integer or the string 'max'"
+            raise ValueError(msg)
+        self.num_threads = num_threads
+
+        self._n_groups, self._group_ids = _fof_group_ids(self.positions,
+            self.d_perp, self.d_para, self.Lbox, self.num_threads)
+
+    @property
+    def m_perp(self):
+        r"""
+        Sparse matrix of the perpendicular distances between linked galaxies,
+        computed when first accessed.
+        """
+        if getattr(self, '_m_perp', None) is None:
+            self._m_perp, self._m_para = pairwise_distance_xy_z(
+                self.positions, self.positions, self.d_perp, self.d_para,
+                period=self.period, num_threads=self.num_threads)
+        return self._m_perp
+
+    @property
+    def m_para(self):
+        r"""
+        Sparse matrix of the parallel distances between linked galaxies,
+        computed when first accessed.
+        """
+        if getattr(self, '_m_para', None) is None:
+            __ = self.m_perp
+        return self._m_para
+
+    @property
+    def m(self):
+        r"""
+        Sparse matrix of the distances between linked galaxies,
+        computed when first accessed.
+        """
+        if getattr(self, '_m', None) is None:
+            m = self.m_perp.multiply(self.m_perp)+self.m_para.multiply(self.m_para)
+            self._m = m.sqrt()
+        return self._m
 
     @property
     def group_ids(self):
@@ -183,9 +231,6 @@ class FoFGroups(object):
             array of group IDs for each galaxy
 
         """
-        if getattr(self, '_group_ids', None) is None:
-            self._n_groups, self._group_ids = csgraph.connected_components(
-                self.m_perp, directed=False, return_labels=True)
         return self._group_ids
 
     @property
@@ -199,9 +244,6 @@ class FoFGroups(object):
             number of distinct groups
 
         """
-        if getattr(self, '_n_groups', None) is None:
-            self._n_groups = csgraph.connected_components(self.m_perp,
-                directed=False, return_labels=False)
         return self._n_groups
 
     def create_graph(self):
@@ -322,6 +364,65 @@ class FoFGroups(object):
             raise HalotoolsError(no_igraph_msg)
 
 
+def _fof_group_ids(positions, d_perp, d_para, period, num_threads):
+    r"""
+    Link the points closer than ``d_perp`` in the xy-plane and ``d_para`` along z
+    into friends-of-friends groups, without storing the pairs of points.
+
+    Groups are numbered in the order of the first point of each group, as in
+    `scipy.sparse.csgraph.connected_components`.
+
+    Returns
+    -------
+    n_groups : int
+        number of distinct groups, including 1-member groups
+
+    group_ids : np.array
+        array of group IDs for each point
+    """
+    npts = len(positions)
+    if npts == 0:
+        return 0, np.zeros(0, dtype=np.int64)
+
+    x, y, z = positions[:, 0], positions[:, 1], positions[:, 2]
+    xperiod, yperiod, zperiod = np.asarray(period, dtype=np.float64)
+    double_mesh = RectangularDoubleMesh(x, y, z, x, y, z,
+        d_perp, d_perp, d_para, d_perp, d_perp, d_para,
+        d_perp, d_perp, d_para, xperiod, yperiod, zperiod, PBCs=True, autocorr=True)
+
+    # Each thread links the points within its own range of cells,
+    # after which the threads find the pairs between different ranges
+    num_threads, cell1_tuples = _cell1_parallelization_indices(
+        double_mesh.mesh1.ncells, num_threads, double_mesh=double_mesh,
+        chunks_per_thread=1)
+    cell1_ranges = np.array(cell1_tuples, dtype=np.int64)
+    parent = np.arange(npts, dtype=np.int64)
+    busy_time = np.zeros(num_threads)
+    fof_union_find_engine(double_mesh, x, y, z, d_perp, d_para,
+        cell1_ranges, parent, 0, num_threads, busy_time)
+    if len(cell1_ranges) > 1:
+        fof_union_find_engine(double_mesh, x, y, z, d_perp, d_para,
+            cell1_ranges, parent, 1, num_threads, busy_time)
+    _record_worker_busy_times(busy_time)
+
+    # Point every point of the forest directly at the root of its tree
+    while True:
+        grandparent = parent[parent]
+        if np.all(grandparent == parent):
+            break
+        parent = grandparent
+
+    # The forest is indexed in the order of the sorted mesh
+    idx_sorted = double_mesh.mesh1.idx_sorted
+    root = np.empty(npts, dtype=np.int64)
+    root[idx_sorted] = idx_sorted[parent]
+
+    __, first_member, group_ids = np.unique(root, return_index=True, return_inverse=True)
+    group_rank = np.empty(len(first_member), dtype=np.int64)
+    group_rank[np.argsort(first_member)] = np.arange(len(first_member))
+    return len(first_member), group_rank[group_ids]
+
+
 def _scipy_to_igraph(matrix, coords, directed=False):
     r"""
     Convert a scipy sparse matrix to an igraph graph object (requires igraph package).
@@ -3,11 +3,12 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import numpy as np
-from scipy.sparse import coo_matrix
+from scipy.sparse import coo_matrix, csgraph
 import pytest
 from astropy.utils.misc import NumpyRNGContext
 
 from ..fof_groups import FoFGroups
+from ...pair_counters import pairwise_distance_xy_z
 
 igraph_available = True
 try:
@@ -61,6 +62,29 @@ def test_fof_group_IDs():
     assert N_groups == fof_group.n_groups, "number of groups is incorrect"
 
 
+@pytest.mark.parametrize('num_threads', (1, 3, 16))
+def test_fof_group_IDs_connected_components(num_threads):
+    """ The groups linked by the union-find engine are the connected components
+    of the matrix of all linked pairs, with the same numbering.
+    """
+    with NumpyRNGContext(fixed_seed):
+        points = np.random.random((2000, 3))
+    points[:100] = 0.5 + 0.01*points[:100]
+
+    fof_group = FoFGroups(points, 0.3, 0.9, period=period, num_threads=num_threads)
+
+    m_perp, m_para = pairwise_distance_xy_z(points, points,
+        fof_group.d_perp, fof_group.d_para, period=period)
+    n_groups, group_ids = csgraph.connected_components(m_perp, directed=False)
+
+    assert fof_group.n_groups == n_groups
+    assert np.all(fof_group.group_ids == group_ids)
+
+    # The distance matrices are only computed on request
+    assert getattr(fof_group, '_m_perp', None) is None
+    assert fof_group.m_perp.nnz == m_perp.nnz
+
+
 @pytest.mark.slow
 def test_igraph_functionality():
     """
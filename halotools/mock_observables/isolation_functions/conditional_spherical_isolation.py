@@ -6,14 +6,15 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import numpy as np
 from functools import partial
-import multiprocessing
 
 from .spherical_isolation import _spherical_isolation_process_args
 from .isolation_functions_helpers import _conditional_isolation_process_marks
+from ..pair_counters.marking_function_registry import _conditional_function_address
 from .engines import marked_spherical_isolation_engine
 
 from ..pair_counters.rectangular_mesh import RectangularDoubleMesh
-from ..pair_counters.mesh_helpers import _set_approximate_cell_sizes, _cell1_parallelization_indices
+from ..pair_counters.mesh_helpers import (_set_approximate_cell_sizes,
+    _cell1_parallelization_indices, _parallel_engine_map)
 
 __all__ = ('conditional_spherical_isolation', )
 
@@ -83,6 +84,8 @@ def conditional_spherical_isolation(sample1, sample2, r_max,
         points will be considered neighbor candidates regardless of the
         value of their marks.
         See Notes for a list of options for the conditional functions.
+        A compiled conditional function can also be used by passing the ID returned by
+        `~halotools.mock_observables.register_conditional_function`.
 
     period : array_like, optional
         Length-3 sequence defining the periodic boundary conditions
@@ -106,6 +109,8 @@ def conditional_spherical_isolation(sample1, sample2, r_max,
         Performance can vary sensitively with this parameter, so it is highly
         recommended that you experiment with this parameter when carrying out
         performance-critical calculations.
+        Set to the string 'auto' to choose the cell sizes by timing a few candidates;
+        the choice is remembered for similar samples on the same machine.
 
     approx_cell2_size : array_like, optional
         Analogous to ``approx_cell1_size``, but for ``sample2``.  See comments for
@@ -283,17 +288,16 @@ def conditional_spherical_isolation(sample1, sample2, r_max,
     # Create a function object that has a single argument, for parallelization purposes
     engine = partial(marked_spherical_isolation_engine,
         double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
-        marks1, marks2, cond_func, r_max)
+        marks1, marks2, cond_func, r_max,
+        registered_func_address=_conditional_function_address(cond_func))
 
     # Calculate the cell1 indices that will be looped over by the engine
     num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
+        double_mesh.mesh1.ncells, num_threads, double_mesh=double_mesh)
 
     if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = pool.map(engine, cell1_tuples)
+        result = _parallel_engine_map(engine, cell1_tuples, num_threads)
         counts = np.sum(np.array(result), axis=0)
-        pool.close()
     else:
         counts = engine(cell1_tuples[0])
 
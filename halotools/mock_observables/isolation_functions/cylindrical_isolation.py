@@ -6,7 +6,6 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import numpy as np
 from functools import partial
-import multiprocessing
 
 from .isolation_functions_helpers import _get_r_max, _set_isolation_approx_cell_sizes
 from .engines import cylindrical_isolation_engine
@@ -15,8 +14,8 @@ from ..mock_observables_helpers import enforce_sample_respects_pbcs, get_num_thr
 
 from ..pair_counters.rectangular_mesh import RectangularDoubleMesh
 from ..pair_counters.mesh_helpers import (
-    _set_approximate_cell_sizes, _cell1_parallelization_indices, _enclose_in_box,
-    _enforce_maximum_search_length)
+    _set_approximate_cell_sizes, _cell1_parallelization_indices, _parallel_engine_map,
+    _enclose_in_box, _enforce_maximum_search_length)
 
 __all__ = ('cylindrical_isolation', )
 
@@ -90,6 +89,8 @@ def cylindrical_isolation(sample1, sample2, rp_max, pi_max, period=None,
         Performance can vary sensitively with this parameter, so it is highly
         recommended that you experiment with this parameter when carrying out
         performance-critical calculations.
+        Set to the string 'auto' to choose the cell sizes by timing a few candidates;
+        the choice is remembered for similar samples on the same machine.
 
     approx_cell2_size : array_like, optional
         Analogous to ``approx_cell1_size``, but for ``sample2``.  See comments for
@@ -186,13 +187,11 @@ def cylindrical_isolation(sample1, sample2, rp_max, pi_max, period=None,
 
     # Calculate the cell1 indices that will be looped over by the engine
     num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
+        double_mesh.mesh1.ncells, num_threads, double_mesh=double_mesh)
 
     if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = pool.map(engine, cell1_tuples)
+        result = _parallel_engine_map(engine, cell1_tuples, num_threads)
         counts = np.sum(np.array(result), axis=0)
-        pool.close()
     else:
         counts = engine(cell1_tuples[0])
 
@@ -1,12 +1,121 @@
+"""
+Inline definitions of the conditional functions of the marked isolation engines.
+
+Each conditional function has an empty tag type, and the fused type
+``condition_tag`` ranges over all of them, so that an engine written as a cdef
+function of a ``condition_tag*`` argument is compiled into one specialization
+per conditional function, with the function inlined into its loop.
+
+Conditional functions compiled outside of Halotools and registered with
+`~halotools.mock_observables.register_conditional_function` have the tag type
+``registered_cond_tag``, which stores the pointer to the function.
+"""
 cimport numpy as cnp
 
-cdef bint trivial(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef bint gt_cond(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef bint lt_cond(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef bint eq_cond(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef bint neq_cond(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef bint tg_cond(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef bint lg_cond(cnp.float64_t* w1, cnp.float64_t* w2)
+# Pointer to a registered conditional function. Declaring the type as external
+# tells Cython that the function cannot raise a Python exception,
+# so that no error check follows each call
+cdef extern from *:
+    """
+    typedef int (*registered_conditional_func)(double *, double *);
+    """
+    ctypedef int (*registered_conditional_func)(double* w1, double* w2) nogil
+
+cdef inline bint trivial(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    0
+    """
+    return 1
+
+cdef inline bint gt_cond(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    1
+    """
+    return (w1[0]>w2[0])
+
+cdef inline bint lt_cond(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    2
+    """
+    return (w1[0]<w2[0])
+
+cdef inline bint eq_cond(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    3
+    """
+    return (w1[0]==w2[0])
+
+cdef inline bint neq_cond(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    4
+    """
+    return (w1[0]!=w2[0])
+
+cdef inline bint tg_cond(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    5
+    """
+    return (w1[0]>(w2[0]+w1[1]))
+
+cdef inline bint lg_cond(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    6
+    """
+    return (w1[0]<(w2[0]+w1[1]))
+
+
+##### tag types of the conditional functions ####
+
+ctypedef struct trivial_tag:
+    char unused
+ctypedef struct gt_cond_tag:
+    char unused
+ctypedef struct lt_cond_tag:
+    char unused
+ctypedef struct eq_cond_tag:
+    char unused
+ctypedef struct neq_cond_tag:
+    char unused
+ctypedef struct tg_cond_tag:
+    char unused
+ctypedef struct lg_cond_tag:
+    char unused
+ctypedef struct registered_cond_tag:
+    registered_conditional_func func
 
+ctypedef fused condition_tag:
+    trivial_tag
+    gt_cond_tag
+    lt_cond_tag
+    eq_cond_tag
+    neq_cond_tag
+    tg_cond_tag
+    lg_cond_tag
+    registered_cond_tag
 
 
+cdef inline bint conditional_function(condition_tag* tag,
+        cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """ Evaluate the conditional function selected by the type of ``tag``
+    on the weights w1 and w2 of a pair of points. Only ``registered_cond_tag``
+    is dereferenced, to read the pointer to the registered function,
+    so NULL pointers of the other tag types are passed.
+    """
+    if condition_tag is trivial_tag:
+        return trivial(w1, w2)
+    elif condition_tag is gt_cond_tag:
+        return gt_cond(w1, w2)
+    elif condition_tag is lt_cond_tag:
+        return lt_cond(w1, w2)
+    elif condition_tag is eq_cond_tag:
+        return eq_cond(w1, w2)
+    elif condition_tag is neq_cond_tag:
+        return neq_cond(w1, w2)
+    elif condition_tag is tg_cond_tag:
+        return tg_cond(w1, w2)
+    elif condition_tag is lg_cond_tag:
+        return lg_cond(w1, w2)
+    elif condition_tag is registered_cond_tag:
+        return tag.func(w1, w2) != 0
+    else:
+        return 0
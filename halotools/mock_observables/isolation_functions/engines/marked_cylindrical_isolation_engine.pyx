@@ -7,19 +7,18 @@ import numpy as np
 cimport numpy as cnp
 cimport cython
 from libc.math cimport ceil
-from .isolation_criteria_marking_functions cimport (trivial, gt_cond, lt_cond,
-    eq_cond, neq_cond, lg_cond, tg_cond)
+from libc.stdint cimport uintptr_t
+from .isolation_criteria_marking_functions cimport *
 
 __author__ = ('Andrew Hearin', 'Duncan Campbell')
 __all__ = ('marked_cylindrical_isolation_engine', )
 
-ctypedef bint (*f_type)(cnp.float64_t* w1, cnp.float64_t* w2)
-
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.nonecheck(False)
 def marked_cylindrical_isolation_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
-    weights1in, weights2in, weight_func_idin, rp_max, pi_max, cell1_tuple):
+    weights1in, weights2in, weight_func_idin, rp_max, pi_max, cell1_tuple,
+    registered_func_address=0):
     """
     Cython engine for determining if points in 'sample 1' are isolated, meaning no
     neighbors within a cylindrical volume, with respect to points in 'sample 2', where
@@ -71,16 +70,51 @@ def marked_cylindrical_isolation_engine(double_mesh, x1in, y1in, z1in, x2in, y2i
         double_mesh.mesh1 that will be looped over. Intended for use with
         python multiprocessing.
 
+    registered_func_address : int, optional
+        Memory address of a conditional function registered with
+        `~halotools.mock_observables.register_conditional_function`.
+        If nonzero, this function is used instead of the one with ID
+        ``weight_func_idin``. Default is 0.
+
     Returns
     -------
     is_isolated : numpy.array
         boolean array indicating if each point in 'sample 1' is isolated
     """
-
     cdef int weight_func_id = weight_func_idin
+    cdef registered_cond_tag registered_func
+    engine_args = (double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, weights1in,
+        weights2in, weight_func_idin, rp_max, pi_max, cell1_tuple)
+    if registered_func_address != 0:
+        registered_func.func = <registered_conditional_func> <uintptr_t> registered_func_address
+        return _marked_cylindrical_isolation_kernel(&registered_func, engine_args)
+    elif weight_func_id == 0:
+        return _marked_cylindrical_isolation_kernel(<trivial_tag*> NULL, engine_args)
+    elif weight_func_id == 1:
+        return _marked_cylindrical_isolation_kernel(<gt_cond_tag*> NULL, engine_args)
+    elif weight_func_id == 2:
+        return _marked_cylindrical_isolation_kernel(<lt_cond_tag*> NULL, engine_args)
+    elif weight_func_id == 3:
+        return _marked_cylindrical_isolation_kernel(<eq_cond_tag*> NULL, engine_args)
+    elif weight_func_id == 4:
+        return _marked_cylindrical_isolation_kernel(<neq_cond_tag*> NULL, engine_args)
+    elif weight_func_id == 5:
+        return _marked_cylindrical_isolation_kernel(<tg_cond_tag*> NULL, engine_args)
+    elif weight_func_id == 6:
+        return _marked_cylindrical_isolation_kernel(<lg_cond_tag*> NULL, engine_args)
+    else:
+        raise ValueError('conditional function does not exist!')
 
-    cdef f_type wfunc
-    wfunc = return_conditional_function(weight_func_id)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+cdef _marked_cylindrical_isolation_kernel(condition_tag* tag, tuple engine_args):
+    """ Loop of `marked_cylindrical_isolation_engine` specialized to the
+    conditional function selected by the type of ``tag``.
+    """
+    (double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, weights1in, weights2in,
+        weight_func_idin, rp_max, pi_max, cell1_tuple) = engine_args
 
     rp_max_squared_tmp = rp_max*rp_max
     cdef cnp.float64_t[:] rp_max_squared = np.ascontiguousarray(rp_max_squared_tmp[double_mesh.mesh1.idx_sorted])
@@ -235,7 +269,7 @@ def marked_cylindrical_isolation_engine(double_mesh, x1in, y1in, z1in, x2in, y2i
                                     dxy_sq = dx*dx + dy*dy
                                     dz_sq = dz*dz
 
-                                    weight = wfunc(&w_icell1[i,0], &w_icell2[j,0])
+                                    weight = conditional_function(tag, &w_icell1[i,0], &w_icell2[j,0])
 
                                     if (dxy_sq < rp_max_squaredtmp) & (dz_sq < pi_max_squaredtmp) & (weight == 1) & ((dz_sq + dxy_sq)>0.0):
                                         has_neighbor[ifirst1+i] = 1
@@ -254,27 +288,3 @@ def marked_cylindrical_isolation_engine(double_mesh, x1in, y1in, z1in, x2in, y2i
     new_is_isolated[is_isolated] = 1
 
     return new_is_isolated
-
-
-cdef f_type return_conditional_function(cond_func_id):
-    """
-    returns a pointer to the user-specified conditional function.
-    """
-
-    if cond_func_id==0:
-        return trivial
-    elif cond_func_id==1:
-        return gt_cond
-    if cond_func_id==2:
-        return lt_cond
-    if cond_func_id==3:
-        return eq_cond
-    if cond_func_id==4:
-        return neq_cond
-    if cond_func_id==5:
-        return tg_cond
-    if cond_func_id==6:
-        return lg_cond
-    else:
-        raise ValueError('conditonal function does not exist!')
-
@@ -3,8 +3,7 @@ import os
 
 PATH_TO_PKG = os.path.relpath(os.path.dirname(__file__))
 SOURCES = ("spherical_isolation_engine.pyx", "cylindrical_isolation_engine.pyx",
-    "marked_spherical_isolation_engine.pyx", "marked_cylindrical_isolation_engine.pyx",
-    "isolation_criteria_marking_functions.pyx")
+    "marked_spherical_isolation_engine.pyx", "marked_cylindrical_isolation_engine.pyx")
 THIS_PKG_NAME = '.'.join(__name__.split('.')[:-1])
 
 
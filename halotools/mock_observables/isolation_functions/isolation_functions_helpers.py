@@ -4,6 +4,8 @@ the isolation_functions sub-package.
 import numpy as np
 
 from ...custom_exceptions import HalotoolsError
+from ..pair_counters.marking_function_registry import _registered_conditional_function
+from ..pair_counters.cell_size_autotuner import _is_auto
 
 __all__ = ('_get_r_max', '_set_isolation_approx_cell_sizes')
 
@@ -41,31 +43,36 @@ def _set_isolation_approx_cell_sizes(approx_cell1_size, approx_cell2_size,
     """
     if approx_cell1_size is None:
         approx_cell1_size = np.array([xsearch_length, ysearch_length, zsearch_length]).astype(float)
+    elif _is_auto(approx_cell1_size):
+        if approx_cell2_size is None:
+            approx_cell2_size = 'auto'
     else:
         approx_cell1_size = np.atleast_1d(approx_cell1_size)
         if len(approx_cell1_size) == 1:
             approx_cell1_size = np.array(
                 [approx_cell1_size[0], approx_cell1_size[0], approx_cell1_size[0]]).astype(float)
 
-    try:
-        assert approx_cell1_size.shape == (3, )
-    except:
-        msg = ("Input ``approx_cell1_size`` must be a scalar or length-3 sequence.\n")
-        raise ValueError(msg)
+        try:
+            assert approx_cell1_size.shape == (3, )
+        except:
+            msg = ("Input ``approx_cell1_size`` must be a scalar or length-3 sequence.\n")
+            raise ValueError(msg)
 
     if approx_cell2_size is None:
         approx_cell2_size = np.array([xsearch_length, ysearch_length, zsearch_length]).astype(float)
+    elif _is_auto(approx_cell2_size):
+        pass
     else:
         approx_cell2_size = np.atleast_1d(approx_cell2_size)
         if len(approx_cell2_size) == 1:
             approx_cell2_size = np.array(
                 [approx_cell2_size[0], approx_cell2_size[0], approx_cell2_size[0]]).astype(float)
 
-    try:
-        assert approx_cell2_size.shape == (3, )
-    except:
-        msg = ("Input ``approx_cell2_size`` must be a scalar or length-3 sequence.\n")
-        raise ValueError(msg)
+        try:
+            assert approx_cell2_size.shape == (3, )
+        except:
+            msg = ("Input ``approx_cell2_size`` must be a scalar or length-3 sequence.\n")
+            raise ValueError(msg)
 
     return approx_cell1_size, approx_cell2_size
 
@@ -85,6 +92,10 @@ def _func_signature_int_from_cond_func(cond_func):
         "or `~halotools.mock_observables.conditional_spherical_isolation` for a list of available options.\n")
         raise ValueError(msg)
 
+    registered = _registered_conditional_function(cond_func)
+    if registered is not None:
+        return registered[1]
+
     if cond_func == 0:
         return 1
     elif cond_func == 1:
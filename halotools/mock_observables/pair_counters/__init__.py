@@ -1,6 +1,7 @@
 from __future__ import (absolute_import, division, print_function, unicode_literals)
 
-from .rectangular_mesh import RectangularDoubleMesh
+from .rectangular_mesh import RectangularDoubleMesh, clear_mesh_cache
+from .cell_size_autotuner import clear_cell_size_cache
 from .rectangular_mesh_2d import RectangularDoubleMesh2D
 from .npairs_3d import npairs_3d
 from .npairs_projected import npairs_projected
@@ -12,5 +13,14 @@ from .npairs_jackknife_xy_z import npairs_jackknife_xy_z
 from .npairs_s_mu import npairs_s_mu
 from .weighted_npairs_s_mu import weighted_npairs_s_mu
 from .npairs_per_object_3d import npairs_per_object_3d
+from .npairs_labeled_3d import npairs_labeled_3d
+from .npairs_labeled_xy_z import npairs_labeled_xy_z
+from .npairs_labeled_s_mu import npairs_labeled_s_mu
+from .npairs_labeled_jackknife_3d import npairs_labeled_jackknife_3d
 from .pairwise_distance_3d import pairwise_distance_3d
 from .pairwise_distance_xy_z import pairwise_distance_xy_z
+from .knn_3d import knn_3d
+from .knn_xy_z import knn_xy_z
+from .mesh_helpers import worker_busy_times
+from .marking_function_registry import (register_marking_function,
+    register_conditional_function)
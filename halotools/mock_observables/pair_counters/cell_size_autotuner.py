@@ -0,0 +1,255 @@
+"""
+Module providing the autotuner of the cell sizes of
+`~halotools.mock_observables.RectangularDoubleMesh`, used whenever the
+``approx_cell1_size`` or ``approx_cell2_size`` argument of a pair-counting function
+is set to the string 'auto'.
+
+The cell sizes trade the number of pairs of points whose separation is computed
+against the overhead of looping over the cells, and the best compromise depends on
+the density of the samples, on the search length relative to the period, and on the machine.
+The autotuner only considers cell sizes that leave at least one point of sample 2
+per cell on average, times the pair-counting engine on a subset of sample 1
+for each candidate, and keeps the fastest. The choice is stored in
+``$HOME/.astropy/cache/halotools/cell_sizes.json``, keyed on the machine and on a coarse
+signature of the workload, so that later calculations on similar samples skip the benchmark.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import json
+import platform
+import multiprocessing
+from time import time
+import numpy as np
+
+from .rectangular_mesh import (RectangularDoubleMesh, sample1_cell_size,
+    default_max_cells_per_dimension_cell1, default_max_cells_per_dimension_cell2)
+
+from ...sim_manager import halotools_cache_dirname
+
+__all__ = ('clear_cell_size_cache', )
+__author__ = ('Andrew Hearin', )
+
+_cell_size_cache_version = 1
+cell_size_cache_fname = os.path.join(halotools_cache_dirname, 'cell_sizes.json')
+
+# Candidate sizes of the cells of mesh1 in units of the search length
+candidate_cell1_factors = (1, 2)
+# Candidate numbers of mesh2 cells per mesh1 cell in each dimension
+candidate_cell2_subdivisions = (1, 2, 3, 4)
+
+# Workloads with fewer candidate pairs of points are fast enough
+# with the default cell sizes that benchmarking is not worth it
+min_num_pairs_to_autotune = int(1e8)
+num_benchmark_points = 2000
+num_benchmark_repeats = 2
+
+
+def clear_cell_size_cache():
+    """ Delete the cell sizes chosen by the autotuner for all previous workloads,
+    so that the next calculation with ``approx_cell1_size='auto'`` benchmarks
+    the candidate cell sizes again, e.g., after a hardware upgrade.
+
+    Examples
+    --------
+    >>> clear_cell_size_cache()
+    """
+    try:
+        os.remove(cell_size_cache_fname)
+    except OSError:
+        pass
+
+
+def _is_auto(approx_cell_size):
+    """ Return True if the input cell size requests the autotuner.
+    """
+    return isinstance(approx_cell_size, str) and (approx_cell_size == 'auto')
+
+
+def _autotuned_cell_sizes(x1, y1, z1, x2, y2, z2, approx_cell1_size, approx_cell2_size,
+        search_length, period, PBCs=True, autocorr=False,
+        max_cells_per_dimension_cell1=default_max_cells_per_dimension_cell1,
+        max_cells_per_dimension_cell2=default_max_cells_per_dimension_cell2):
+    """ Choose the approximate cell sizes of the two meshes of
+    `~halotools.mock_observables.RectangularDoubleMesh`.
+
+    Parameters
+    ----------
+    x1, y1, z1, x2, y2, z2 : arrays
+        Positions of the points of the two samples.
+
+    approx_cell1_size, approx_cell2_size : sequences
+        Length-3 sequences of the approximate cell sizes of mesh1 and mesh2.
+        Sequences of 'auto' strings are tuned, numerical sizes are kept.
+
+    search_length, period : sequences
+        Length-3 sequences of the search lengths and of the periods of the box.
+
+    PBCs, autocorr : bool, optional
+        Arguments of `~halotools.mock_observables.RectangularDoubleMesh`.
+        When ``autocorr`` is True, mesh2 is mesh1 and only mesh1 is tuned.
+
+    Returns
+    -------
+    approx_cell1_size, approx_cell2_size : ndarrays
+        Length-3 arrays of the approximate cell sizes.
+    """
+    search_length = np.array(search_length, dtype=float)
+    period = np.array(period, dtype=float)
+    if autocorr:
+        x2, y2, z2 = x1, y1, z1
+    tune_cell1 = _is_auto(approx_cell1_size[0])
+    tune_cell2 = _is_auto(approx_cell2_size[0]) and not autocorr
+
+    fixed_cell1_size = None if tune_cell1 else np.array(approx_cell1_size, dtype=float)
+    fixed_cell2_size = None if _is_auto(approx_cell2_size[0]) else np.array(
+        approx_cell2_size, dtype=float)
+
+    def cell_sizes(candidate):
+        cell1_factor, cell2_subdivision = candidate
+        if cell1_factor is None:
+            cell1_size = fixed_cell1_size
+        else:
+            cell1_size = cell1_factor*search_length
+        if cell2_subdivision is None:
+            cell2_size = fixed_cell2_size
+        else:
+            actual_cell1_size = np.array([sample1_cell_size(p, s, c, max_cells_per_dimension_cell1)
+                for p, s, c in zip(period, search_length, cell1_size)])
+            cell2_size = actual_cell1_size/float(cell2_subdivision)
+        return cell1_size, cell2_size
+
+    # With the default cell sizes, each point is paired with the points in the
+    # 3x3x3 cells of mesh1 around it, which is where the time goes for large samples
+    npts1, npts2 = len(x1), len(x2)
+    default_cell1_size = np.array([sample1_cell_size(p, s, s, max_cells_per_dimension_cell1)
+        for p, s in zip(period, search_length)])
+    num_candidate_pairs = npts1*float(npts2)*np.prod(
+        np.minimum(3*default_cell1_size, period)/period)
+    candidates = _candidate_cell_sizes(npts2, search_length, period, tune_cell1, tune_cell2,
+        fixed_cell1_size, fixed_cell2_size is not None, max_cells_per_dimension_cell1)
+    if (num_candidate_pairs < min_num_pairs_to_autotune) | (len(candidates) == 1):
+        return cell_sizes(candidates[0])
+
+    key = _workload_signature(npts1, npts2, search_length, period,
+        PBCs, autocorr, tune_cell1, tune_cell2)
+    cached_choices = _read_cell_size_cache()
+    try:
+        best_candidate = tuple(cached_choices[key])
+        assert best_candidate in candidates
+    except (KeyError, TypeError, AssertionError):
+        best_candidate = _fastest_candidate(candidates, cell_sizes,
+            x1, y1, z1, x2, y2, z2, search_length, period, PBCs,
+            max_cells_per_dimension_cell1, max_cells_per_dimension_cell2)
+        cached_choices[key] = best_candidate
+        _write_cell_size_cache(cached_choices)
+
+    return cell_sizes(best_candidate)
+
+
+def _candidate_cell_sizes(npts2, search_length, period, tune_cell1, tune_cell2,
+        fixed_cell1_size, cell2_is_fixed, max_cells_per_dimension_cell1):
+    """ Return the list of candidates (cell1_factor, cell2_subdivision),
+    where None stands for the cell size passed by the user.
+    The first candidate is the default choice of cell sizes equal to the search length.
+    Subdivisions of mesh2 leaving less than one point of sample 2 per cell
+    on average only add overhead, and are skipped.
+    """
+    cell1_factors = candidate_cell1_factors if tune_cell1 else (None, )
+    if not tune_cell2:
+        cell2_subdivision = None if cell2_is_fixed else 1
+        return [(f, cell2_subdivision) for f in cell1_factors]
+
+    mean_spacing2 = (np.prod(period)/max(npts2, 1))**(1/3.)
+    candidates = []
+    for cell1_factor in cell1_factors:
+        if cell1_factor is None:
+            approx_cell1_size = fixed_cell1_size
+        else:
+            approx_cell1_size = cell1_factor*search_length
+        smallest_cell1_size = np.min([sample1_cell_size(p, s, c, max_cells_per_dimension_cell1)
+            for p, s, c in zip(period, search_length, approx_cell1_size)])
+        for cell2_subdivision in candidate_cell2_subdivisions:
+            if (cell2_subdivision == 1) | (smallest_cell1_size/cell2_subdivision >= mean_spacing2):
+                candidates.append((cell1_factor, cell2_subdivision))
+    return candidates
+
+
+def _fastest_candidate(candidates, cell_sizes, x1, y1, z1, x2, y2, z2,
+        search_length, period, PBCs, max_cells_per_dimension_cell1, max_cells_per_dimension_cell2):
+    """ Time the pair-counting engine on a random subset of sample 1 for each candidate
+    choice of cell sizes, and return the fastest candidate.
+    """
+    from .cpairs import npairs_3d_engine
+
+    if len(x1) > num_benchmark_points:
+        idx = np.random.RandomState(43).choice(len(x1), num_benchmark_points, replace=False)
+        x1, y1, z1 = x1[idx], y1[idx], z1[idx]
+    rbins = np.array([0.5, 1.])*np.min(search_length)
+    busy_time = np.zeros(1)
+
+    best_time, best_candidate = np.inf, candidates[0]
+    for candidate in candidates:
+        cell1_size, cell2_size = cell_sizes(candidate)
+        double_mesh = RectangularDoubleMesh(x1, y1, z1, x2, y2, z2,
+            cell1_size[0], cell1_size[1], cell1_size[2],
+            cell2_size[0], cell2_size[1], cell2_size[2],
+            search_length[0], search_length[1], search_length[2],
+            period[0], period[1], period[2], PBCs,
+            max_cells_per_dimension_cell1=max_cells_per_dimension_cell1,
+            max_cells_per_dimension_cell2=max_cells_per_dimension_cell2,
+            use_cache=False)
+        cell1_tuple = (0, double_mesh.mesh1.ncells)
+        for __ in range(num_benchmark_repeats):
+            start = time()
+            npairs_3d_engine(double_mesh, x1, y1, z1, x2, y2, z2,
+                rbins, cell1_tuple, 1, busy_time)
+            runtime = time() - start
+            if runtime < best_time:
+                best_time, best_candidate = runtime, candidate
+    return best_candidate
+
+
+def _workload_signature(npts1, npts2, search_length, period, PBCs, autocorr,
+        tune_cell1, tune_cell2):
+    """ Return a string identifying the machine and the workload, coarse enough that
+    samples of similar size and search lengths share the same choice of cell sizes.
+    """
+    log_npts = [int(np.round(np.log2(max(npts, 1)))) for npts in (npts1, npts2)]
+    log_num_searches = [float(np.round(2*np.log2(p/s))/2.) for p, s in zip(period, search_length)]
+    machine = '{0}-{1}'.format(platform.node(), multiprocessing.cpu_count())
+    return json.dumps([_cell_size_cache_version, machine, log_npts, log_num_searches,
+        bool(PBCs), bool(autocorr), bool(tune_cell1), bool(tune_cell2)])
+
+
+def _read_cell_size_cache():
+    """ Return the dictionary of the cell sizes chosen for previous workloads.
+    """
+    try:
+        with open(cell_size_cache_fname, 'r') as f:
+            cached_choices = json.load(f)
+        assert isinstance(cached_choices, dict)
+    except (IOError, OSError, ValueError, AssertionError):
+        return {}
+    return cached_choices
+
+
+def _write_cell_size_cache(cached_choices):
+    """ Store the dictionary of chosen cell sizes. Failing to write to the cache directory,
+    e.g., on a read-only file system, is harmless and only means the benchmark
+    will be run again.
+    """
+    tmp_fname = cell_size_cache_fname + '.{0}.tmp'.format(os.getpid())
+    try:
+        try:
+            os.makedirs(os.path.dirname(cell_size_cache_fname))
+        except OSError:
+            pass
+        with open(tmp_fname, 'w') as f:
+            json.dump(cached_choices, f)
+        os.rename(tmp_fname, cell_size_cache_fname)
+    except (IOError, OSError):
+        try:
+            os.remove(tmp_fname)
+        except OSError:
+            pass
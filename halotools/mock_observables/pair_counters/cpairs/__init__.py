@@ -13,3 +13,9 @@ from .npairs_per_object_3d_engine import npairs_per_object_3d_engine
 from .pairwise_distance_3d_engine import pairwise_distance_3d_engine
 from .pairwise_distance_xy_z_engine import pairwise_distance_xy_z_engine
 from .npairs_jackknife_xy_z_engine import npairs_jackknife_xy_z_engine
+from .npairs_labeled_3d_engine import npairs_labeled_3d_engine
+from .npairs_labeled_xy_z_engine import npairs_labeled_xy_z_engine
+from .npairs_labeled_s_mu_engine import npairs_labeled_s_mu_engine
+from .npairs_labeled_jackknife_3d_engine import npairs_labeled_jackknife_3d_engine
+from .knn_3d_engine import knn_3d_engine
+from .knn_xy_z_engine import knn_xy_z_engine
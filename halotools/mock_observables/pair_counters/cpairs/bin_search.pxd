@@ -0,0 +1,25 @@
+"""
+Inline helper used by the pair-counting engines to locate the bin of a pair
+in a single O(log Nbins) step. The engines increment a differential histogram
+with the returned index and convert to cumulative counts once at the end.
+"""
+cimport numpy as cnp
+
+
+cdef inline int bisect_bin_index(cnp.float64_t dsq,
+        cnp.float64_t* bins_squared, int num_bins) nogil:
+    """ Return the smallest index k such that dsq <= bins_squared[k],
+    or num_bins if dsq exceeds every entry of the monotonically increasing
+    ``bins_squared`` array.
+    """
+    cdef int lo = 0
+    cdef int hi = num_bins
+    cdef int mid
+
+    while lo < hi:
+        mid = (lo + hi) >> 1
+        if dsq <= bins_squared[mid]:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
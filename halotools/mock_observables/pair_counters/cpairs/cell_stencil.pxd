@@ -0,0 +1,20 @@
+"""
+Inline helper used by the pair-counting engines in auto-correlation mode,
+when sample 1 and sample 2 share the same mesh. Each pair of neighbouring cells
+is then visited only once, from the cell for which the offset to its neighbour
+is lexicographically positive.
+"""
+
+
+cdef inline int cell_offset_sign(int dix, int diy, int diz) nogil:
+    """ Return +1 if the integer offset (dix, diy, diz) between two cells
+    is lexicographically positive, -1 if it is negative, and 0 if the two cells
+    are the same.
+    """
+    if dix != 0:
+        return 1 if dix > 0 else -1
+    if diy != 0:
+        return 1 if diy > 0 else -1
+    if diz != 0:
+        return 1 if diz > 0 else -1
+    return 0
@@ -0,0 +1,265 @@
+"""
+"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import numpy as np
+cimport numpy as cnp
+cimport cython
+from cython.parallel cimport prange, threadid
+from libc.math cimport sqrt, INFINITY
+from .wall_clock cimport wall_time
+from .mark_conditions cimport mark_condition
+
+__author__ = ('Andrew Hearin', 'Duncan Campbell')
+__all__ = ('knn_3d_engine', )
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+def knn_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
+    ix1in, iy1in, iz1in, marks1in, marks2in, int cond_func,
+    r_max, k_ranks, cell1_tuple, int num_threads=1, busy_time=None):
+    """ Cython engine for finding the k-th nearest neighbors in sample 2
+    of each point in sample 1, out to a maximum three-dimensional separation.
+
+    The cells of double_mesh.mesh2 are searched in shells of increasing size around
+    the cell of each point, while the nearest neighbors found so far are kept
+    sorted in a buffer of length max(k_ranks). The search of a point stops
+    as soon as its buffer is full and the farthest neighbor in the buffer is closer
+    than any point in the shells that remain to be searched.
+
+    Parameters
+    ------------
+    double_mesh : object
+        Instance of `~halotools.mock_observables.RectangularDoubleMesh`
+
+    x1in, y1in, z1in : arrays
+        Numpy arrays storing Cartesian coordinates of points in sample 1
+
+    x2in, y2in, z2in : arrays
+        Numpy arrays storing Cartesian coordinates of points in sample 2
+
+    ix1in, iy1in, iz1in : arrays
+        Integer arrays storing the indices of the cell of double_mesh.mesh2
+        in which each point in sample 1 lies, in each dimension.
+
+    marks1in, marks2in : arrays
+        Float arrays of shape (Npts, N_marks) storing the marks of the points
+        in sample 1 and sample 2.
+
+    cond_func : int
+        Integer ID of the marking function a point in sample 2 must satisfy
+        to be a candidate neighbor, with the same conventions as
+        `~halotools.mock_observables.conditional_spherical_isolation`.
+        Set to 0 to ignore the marks.
+
+    r_max : float
+        Maximum separation of the neighbors.
+
+    k_ranks : array
+        Monotonically increasing array of the ranks k >= 1 of the neighbors to return,
+        e.g., [1, 3] for the nearest and third-nearest neighbors.
+
+    cell1_tuple : tuple
+        Two-element tuple defining the first and last cells in
+        double_mesh.mesh1 that will be looped over.
+
+    num_threads : int, optional
+        Number of OpenMP threads sharing the loop over the cells of
+        double_mesh.mesh1. Default is 1.
+
+    busy_time : array, optional
+        Array of length num_threads. Entry i is incremented by the time in seconds
+        that thread i spent on its cells. Default is None.
+
+    Returns
+    --------
+    distances : array
+        Float array of shape (Npts1, len(k_ranks)) storing the distance between each
+        point in sample 1 and its k-th nearest neighbor in sample 2,
+        or infinity if fewer than k points of sample 2 are within ``r_max``.
+
+    indices : array
+        Integer array of shape (Npts1, len(k_ranks)) storing the 0-indexed index
+        in sample 2 of the k-th nearest neighbor, or -1 if there is none.
+
+    """
+    cdef cnp.float64_t xperiod = double_mesh.xperiod
+    cdef cnp.float64_t yperiod = double_mesh.yperiod
+    cdef cnp.float64_t zperiod = double_mesh.zperiod
+    cdef cnp.int64_t first_cell1_element = cell1_tuple[0]
+    cdef cnp.int64_t last_cell1_element = cell1_tuple[1]
+    cdef int PBCs = double_mesh._PBCs
+
+    cdef cnp.float64_t r_max_squared = r_max*r_max
+    cdef cnp.int64_t[:] ranks = np.ascontiguousarray(k_ranks, dtype=np.int64)
+    cdef int num_ranks = len(k_ranks)
+    cdef int kmax = ranks[num_ranks-1]
+
+    cdef cnp.int64_t[:] idx_sorted1 = np.ascontiguousarray(double_mesh.mesh1.idx_sorted, dtype=np.int64)
+    cdef cnp.int64_t[:] idx_sorted2 = np.ascontiguousarray(double_mesh.mesh2.idx_sorted, dtype=np.int64)
+    cdef cnp.float64_t[:] x1 = np.ascontiguousarray(x1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
+    cdef cnp.float64_t[:] y1 = np.ascontiguousarray(y1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
+    cdef cnp.float64_t[:] z1 = np.ascontiguousarray(z1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
+    cdef cnp.int64_t[:] ix1 = np.ascontiguousarray(ix1in[double_mesh.mesh1.idx_sorted], dtype=np.int64)
+    cdef cnp.int64_t[:] iy1 = np.ascontiguousarray(iy1in[double_mesh.mesh1.idx_sorted], dtype=np.int64)
+    cdef cnp.int64_t[:] iz1 = np.ascontiguousarray(iz1in[double_mesh.mesh1.idx_sorted], dtype=np.int64)
+    cdef cnp.float64_t[:] x2 = np.ascontiguousarray(x2in[double_mesh.mesh2.idx_sorted], dtype=np.float64)
+    cdef cnp.float64_t[:] y2 = np.ascontiguousarray(y2in[double_mesh.mesh2.idx_sorted], dtype=np.float64)
+    cdef cnp.float64_t[:] z2 = np.ascontiguousarray(z2in[double_mesh.mesh2.idx_sorted], dtype=np.float64)
+    cdef cnp.float64_t[:, ::1] marks1 = np.ascontiguousarray(marks1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
+    cdef cnp.float64_t[:, ::1] marks2 = np.ascontiguousarray(marks2in[double_mesh.mesh2.idx_sorted], dtype=np.float64)
+
+    cdef cnp.int64_t npts1 = len(x1in)
+    distances = np.empty((npts1, num_ranks), dtype=np.float64)
+    indices = np.empty((npts1, num_ranks), dtype=np.int64)
+    cdef cnp.float64_t[:, :] sorted_distances = distances
+    cdef cnp.int64_t[:, :] sorted_indices = indices
+
+    # Buffers of the nearest neighbors found so far, one per thread
+    cdef cnp.float64_t[:, :] buffer_dsq = np.zeros((num_threads, kmax), dtype=np.float64)
+    cdef cnp.int64_t[:, :] buffer_j = np.zeros((num_threads, kmax), dtype=np.int64)
+
+    cdef cnp.int64_t icell1, icell2
+    cdef cnp.int64_t[:] cell1_indices = np.ascontiguousarray(double_mesh.mesh1.cell_id_indices, dtype=np.int64)
+    cdef cnp.int64_t[:] cell2_indices = np.ascontiguousarray(double_mesh.mesh2.cell_id_indices, dtype=np.int64)
+
+    cdef cnp.int64_t ifirst1, ilast1, ifirst2, ilast2, i, j, ipt
+
+    cdef int num_x2_covering_steps = int(np.ceil(
+        double_mesh.search_xlength / double_mesh.mesh2.xcell_size))
+    cdef int num_y2_covering_steps = int(np.ceil(
+        double_mesh.search_ylength / double_mesh.mesh2.ycell_size))
+    cdef int num_z2_covering_steps = int(np.ceil(
+        double_mesh.search_zlength / double_mesh.mesh2.zcell_size))
+    cdef int max_shell = max(num_x2_covering_steps, num_y2_covering_steps, num_z2_covering_steps)
+
+    # Every point in a shell s+1 cells away is at least s cells away along some dimension
+    cdef cnp.float64_t min_cell_size = min(double_mesh.mesh2.xcell_size,
+        double_mesh.mesh2.ycell_size, double_mesh.mesh2.zcell_size)
+
+    cdef int num_x2divs = double_mesh.mesh2.num_xdivs
+    cdef int num_y2divs = double_mesh.mesh2.num_ydivs
+    cdef int num_z2divs = double_mesh.mesh2.num_zdivs
+
+    cdef int shell, dix, diy, diz, diz_step, ix2, iy2, iz2, nonPBC_ix2, nonPBC_iy2, nonPBC_iz2
+    cdef int num_found, pos, m, rank
+    cdef cnp.float64_t x2shift, y2shift, z2shift, dx, dy, dz, dsq, shell_distance
+    cdef cnp.float64_t x1tmp, y1tmp, z1tmp
+
+    cdef int tid
+    cdef cnp.float64_t cell1_start_time
+    if busy_time is None:
+        busy_time = np.zeros(num_threads, dtype=np.float64)
+    cdef cnp.float64_t[:] thread_busy_time = busy_time
+
+    for icell1 in prange(first_cell1_element, last_cell1_element, nogil=True,
+            num_threads=num_threads, schedule='dynamic'):
+        tid = threadid()
+        cell1_start_time = wall_time()
+        ifirst1 = cell1_indices[icell1]
+        ilast1 = cell1_indices[icell1+1]
+
+        for i in range(ifirst1, ilast1):
+            num_found = 0
+
+            for shell in range(0, max_shell+1):
+                for dix in range(-shell, shell+1):
+                    if (dix < -num_x2_covering_steps) | (dix > num_x2_covering_steps):
+                        continue
+                    nonPBC_ix2 = ix1[i] + dix
+                    if nonPBC_ix2 < 0:
+                        x2shift = -xperiod*PBCs
+                    elif nonPBC_ix2 >= num_x2divs:
+                        x2shift = +xperiod*PBCs
+                    else:
+                        x2shift = 0.
+                    # Now apply the PBCs
+                    ix2 = nonPBC_ix2 % num_x2divs
+
+                    for diy in range(-shell, shell+1):
+                        if (diy < -num_y2_covering_steps) | (diy > num_y2_covering_steps):
+                            continue
+                        nonPBC_iy2 = iy1[i] + diy
+                        if nonPBC_iy2 < 0:
+                            y2shift = -yperiod*PBCs
+                        elif nonPBC_iy2 >= num_y2divs:
+                            y2shift = +yperiod*PBCs
+                        else:
+                            y2shift = 0.
+                        # Now apply the PBCs
+                        iy2 = nonPBC_iy2 % num_y2divs
+
+                        # Only the cells on the surface of the shell are searched
+                        if (dix == -shell) | (dix == shell) | (diy == -shell) | (diy == shell):
+                            diz_step = 1
+                        else:
+                            diz_step = 2*shell
+
+                        diz = -shell
+                        while diz <= shell:
+                            if (diz >= -num_z2_covering_steps) & (diz <= num_z2_covering_steps):
+                                nonPBC_iz2 = iz1[i] + diz
+                                if nonPBC_iz2 < 0:
+                                    z2shift = -zperiod*PBCs
+                                elif nonPBC_iz2 >= num_z2divs:
+                                    z2shift = +zperiod*PBCs
+                                else:
+                                    z2shift = 0.
+                                # Now apply the PBCs
+                                iz2 = nonPBC_iz2 % num_z2divs
+
+                                icell2 = ix2*(num_y2divs*num_z2divs) + iy2*num_z2divs + iz2
+                                ifirst2 = cell2_indices[icell2]
+                                ilast2 = cell2_indices[icell2+1]
+
+                                x1tmp = x1[i] - x2shift
+                                y1tmp = y1[i] - y2shift
+                                z1tmp = z1[i] - z2shift
+                                for j in range(ifirst2, ilast2):
+                                    dx = x1tmp - x2[j]
+                                    dy = y1tmp - y2[j]
+                                    dz = z1tmp - z2[j]
+                                    dsq = dx*dx + dy*dy + dz*dz
+                                    if dsq > r_max_squared:
+                                        continue
+                                    if not mark_condition(cond_func, &marks1[i, 0], &marks2[j, 0]):
+                                        continue
+
+                                    # Insert the neighbor into the sorted buffer
+                                    if num_found < kmax:
+                                        pos = num_found
+                                        num_found = num_found + 1
+                                    elif dsq < buffer_dsq[tid, kmax-1]:
+                                        pos = kmax - 1
+                                    else:
+                                        continue
+                                    while (pos > 0) and (buffer_dsq[tid, pos-1] > dsq):
+                                        buffer_dsq[tid, pos] = buffer_dsq[tid, pos-1]
+                                        buffer_j[tid, pos] = buffer_j[tid, pos-1]
+                                        pos = pos - 1
+                                    buffer_dsq[tid, pos] = dsq
+                                    buffer_j[tid, pos] = j
+                            diz = diz + diz_step
+
+                # Stop once the remaining shells cannot hold a closer neighbor
+                shell_distance = shell*min_cell_size
+                if (num_found == kmax) and (buffer_dsq[tid, kmax-1] <= shell_distance*shell_distance):
+                    break
+
+            for m in range(num_ranks):
+                rank = ranks[m]
+                if rank <= num_found:
+                    sorted_distances[i, m] = sqrt(buffer_dsq[tid, rank-1])
+                    sorted_indices[i, m] = idx_sorted2[buffer_j[tid, rank-1]]
+                else:
+                    sorted_distances[i, m] = INFINITY
+                    sorted_indices[i, m] = -1
+
+        thread_busy_time[tid] += wall_time() - cell1_start_time
+
+    # Undo the sorting of sample 1
+    distances[idx_sorted1] = distances.copy()
+    indices[idx_sorted1] = indices.copy()
+    return distances, indices
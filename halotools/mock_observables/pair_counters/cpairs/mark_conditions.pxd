@@ -0,0 +1,27 @@
+"""
+Inline helper used by the nearest-neighbor engines to apply the conditional
+marking functions of `~halotools.mock_observables.conditional_spherical_isolation`
+to each candidate neighbor, without holding the GIL.
+"""
+cimport numpy as cnp
+
+
+cdef inline bint mark_condition(int cond_func,
+        cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """ Return True if the point in sample 2 with marks w2 is a candidate neighbor
+    of the point in sample 1 with marks w1, for the marking function
+    with integer ID cond_func.
+    """
+    if cond_func == 1:
+        return w1[0] > w2[0]
+    elif cond_func == 2:
+        return w1[0] < w2[0]
+    elif cond_func == 3:
+        return w1[0] == w2[0]
+    elif cond_func == 4:
+        return w1[0] != w2[0]
+    elif cond_func == 5:
+        return w1[0] > (w2[0] + w1[1])
+    elif cond_func == 6:
+        return w1[0] < (w2[0] + w1[1])
+    return 1
@@ -5,7 +5,11 @@ from __future__ import (absolute_import, division, print_function, unicode_liter
 import numpy as np
 cimport numpy as cnp
 cimport cython 
+from cython.parallel cimport prange, threadid
 from libc.math cimport ceil 
+from .bin_search cimport bisect_bin_index
+from .wall_clock cimport wall_time
+from .cell_stencil cimport cell_offset_sign
 
 __author__ = ('Andrew Hearin', 'Duncan Campbell')
 __all__ = ('npairs_jackknife_3d_engine', )
@@ -14,7 +18,8 @@ __all__ = ('npairs_jackknife_3d_engine', )
 @cython.wraparound(False)
 @cython.nonecheck(False)
 def npairs_jackknife_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, 
-    weights1in, weights2in, jtags1in, jtags2in, cnp.int64_t N_samples, rbins, cell1_tuple):
+    weights1in, weights2in, jtags1in, jtags2in, cnp.int64_t N_samples, rbins, cell1_tuple,
+    int num_threads=1, busy_time=None):
     """ Cython engine for counting pairs of points as a function of three-dimensional separation. 
 
     Parameters 
@@ -48,14 +53,34 @@ def npairs_jackknife_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
 
     cell1_tuple : tuple
         Two-element tuple defining the first and last cells in 
-        double_mesh.mesh1 that will be looped over. Intended for use with 
-        python multiprocessing. 
+        double_mesh.mesh1 that will be looped over.
+
+    num_threads : int, optional
+        Number of OpenMP threads sharing the loop over the cells of
+        double_mesh.mesh1. Default is 1.
+
+    busy_time : array, optional
+        Array of length num_threads. Entry i is incremented by the time in seconds
+        that thread i spent on its cells. Default is None.
 
     Returns 
     --------
     counts : array 
-        Integer array of length len(rbins) giving the number of pairs 
-        separated by a distance less than the corresponding entry of ``rbins``. 
+        Float array of shape (N_samples, N_samples, len(rbins)).
+        Entry [s1-1, s2-1, k] gives the weighted number of pairs separated by a distance
+        less than rbins[k] formed by a point of sample 1 in subvolume s1
+        and a point of sample 2 in subvolume s2. Each pair is added to a single entry,
+        and the jackknife counts are derived from this matrix by
+        `~halotools.mock_observables.pair_counters.mesh_helpers._jackknife_counts_from_subvolume_counts`.
+
+    Notes
+    ------
+    The points of each cell of double_mesh.mesh1 are processed in runs of points
+    in the same subvolume s1. Each thread accumulates the counts of a run
+    in its own buffer of shape (N_samples, len(rbins)), storing row s1-1 of the matrix,
+    and adds the buffer to the matrix shared by all threads when the run is done.
+    The memory used by the histograms is therefore bounded by
+    (N_samples + num_threads)*N_samples*len(rbins) floats.
 
     """    
     cdef cnp.float64_t[:] rbins_squared = rbins*rbins
@@ -65,22 +90,44 @@ def npairs_jackknife_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
     cdef cnp.int64_t first_cell1_element = cell1_tuple[0]
     cdef cnp.int64_t last_cell1_element = cell1_tuple[1]
     cdef int PBCs = double_mesh._PBCs
+    cdef int autocorr = double_mesh._autocorr
+    cdef int offset_sign = 1
 
     cdef int Ncell1 = double_mesh.mesh1.ncells
     cdef int num_rbins = len(rbins)
-    cdef cnp.float64_t[:,:] counts = np.zeros((N_samples+1, num_rbins), dtype=np.float64)
-
-    cdef cnp.float64_t[:] x1 = np.ascontiguousarray(x1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
-    cdef cnp.float64_t[:] y1 = np.ascontiguousarray(y1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
-    cdef cnp.float64_t[:] z1 = np.ascontiguousarray(z1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
-    cdef cnp.float64_t[:] x2 = np.ascontiguousarray(x2in[double_mesh.mesh2.idx_sorted], dtype=np.float64)
-    cdef cnp.float64_t[:] y2 = np.ascontiguousarray(y2in[double_mesh.mesh2.idx_sorted], dtype=np.float64)
-    cdef cnp.float64_t[:] z2 = np.ascontiguousarray(z2in[double_mesh.mesh2.idx_sorted], dtype=np.float64)
-
-    cdef cnp.float64_t[:] weights1 = np.ascontiguousarray(weights1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
-    cdef cnp.float64_t[:] weights2 = np.ascontiguousarray(weights2in[double_mesh.mesh2.idx_sorted], dtype=np.float64)
-    cdef cnp.int64_t[:] jtags1 = np.ascontiguousarray(jtags1in[double_mesh.mesh1.idx_sorted], dtype=np.int64)
-    cdef cnp.int64_t[:] jtags2 = np.ascontiguousarray(jtags2in[double_mesh.mesh2.idx_sorted], dtype=np.int64)
+    counts_array = np.zeros((N_samples, N_samples, num_rbins), dtype=np.float64)
+    cdef cnp.float64_t[:, :, :] counts = counts_array
+    # Per-thread buffer storing the counts of the current run of points of cell1,
+    # together with the list of subvolumes of sample 2 with nonzero counts
+    cdef cnp.float64_t[:, :, :] row_counts = np.zeros(
+        (num_threads, N_samples, num_rbins), dtype=np.float64)
+    cdef cnp.int64_t[:, :] row_touched = np.zeros((num_threads, N_samples), dtype=np.int64)
+    cdef cnp.int64_t[:, :] touched_jtags = np.zeros((num_threads, N_samples), dtype=np.int64)
+    cdef cnp.int64_t[:] num_touched = np.zeros(num_threads, dtype=np.int64)
+
+    # Within each cell of mesh1, order the points by subvolume,
+    # so that each cell is processed in runs of points sharing a row of counts
+    cell1_ids = np.repeat(np.arange(Ncell1), np.diff(double_mesh.mesh1.cell_id_indices))
+    idx_sorted1 = double_mesh.mesh1.idx_sorted[np.lexsort(
+        (np.asarray(jtags1in)[double_mesh.mesh1.idx_sorted], cell1_ids))]
+    # In auto-correlation mode mesh2 is mesh1, and the points keep the same order
+    if autocorr:
+        idx_sorted2 = idx_sorted1
+    else:
+        idx_sorted2 = double_mesh.mesh2.idx_sorted
+
+    cdef cnp.float64_t[:] x1 = np.ascontiguousarray(x1in[idx_sorted1], dtype=np.float64)
+    cdef cnp.float64_t[:] y1 = np.ascontiguousarray(y1in[idx_sorted1], dtype=np.float64)
+    cdef cnp.float64_t[:] z1 = np.ascontiguousarray(z1in[idx_sorted1], dtype=np.float64)
+    cdef cnp.float64_t[:] x2 = np.ascontiguousarray(x2in[idx_sorted2], dtype=np.float64)
+    cdef cnp.float64_t[:] y2 = np.ascontiguousarray(y2in[idx_sorted2], dtype=np.float64)
+    cdef cnp.float64_t[:] z2 = np.ascontiguousarray(z2in[idx_sorted2], dtype=np.float64)
+
+    cdef cnp.float64_t[:] weights1 = np.ascontiguousarray(weights1in[idx_sorted1], dtype=np.float64)
+    cdef cnp.float64_t[:] weights2 = np.ascontiguousarray(weights2in[idx_sorted2], dtype=np.float64)
+    # Subvolume tags start at 1, so that subtracting 1 gives the index into counts
+    cdef cnp.int64_t[:] jtags1 = np.ascontiguousarray(jtags1in[idx_sorted1]-1, dtype=np.int64)
+    cdef cnp.int64_t[:] jtags2 = np.ascontiguousarray(jtags2in[idx_sorted2]-1, dtype=np.int64)
 
     cdef cnp.int64_t icell1, icell2
     cdef cnp.int64_t[:] cell1_indices = np.ascontiguousarray(double_mesh.mesh1.cell_id_indices, dtype=np.int64)
@@ -118,44 +165,59 @@ def npairs_jackknife_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
     cdef cnp.int64_t j1, j2
     cdef cnp.float64_t w1, w2
 
-    cdef int Ni, Nj, i, j, k, l
-    cdef cnp.int64_t s 
-
-    cdef cnp.float64_t[:] x_icell1, x_icell2
-    cdef cnp.float64_t[:] y_icell1, y_icell2
-    cdef cnp.float64_t[:] z_icell1, z_icell2
-    cdef cnp.float64_t[:] w_icell1, w_icell2
-    cdef cnp.int64_t[:] j_icell1, j_icell2
-
-    for icell1 in range(first_cell1_element, last_cell1_element):
+    cdef int Ni, Nj, i, j, jstart, k, l, m
+    cdef cnp.int64_t irun, irun_end
+    cdef cnp.float64_t *x_icell1
+    cdef cnp.float64_t *x_icell2
+    cdef cnp.float64_t *y_icell1
+    cdef cnp.float64_t *y_icell2
+    cdef cnp.float64_t *z_icell1
+    cdef cnp.float64_t *z_icell2
+    cdef cnp.float64_t *w_icell1
+    cdef cnp.float64_t *w_icell2
+    cdef cnp.int64_t *j_icell2
+    cdef int tid
+    cdef cnp.float64_t cell1_start_time
+    if busy_time is None:
+        busy_time = np.zeros(num_threads, dtype=np.float64)
+    cdef cnp.float64_t[:] thread_busy_time = busy_time
+
+    for icell1 in prange(first_cell1_element, last_cell1_element, nogil=True,
+            num_threads=num_threads, schedule='dynamic'):
+        tid = threadid()
+        cell1_start_time = wall_time()
         ifirst1 = cell1_indices[icell1]
         ilast1 = cell1_indices[icell1+1]
 
-        #extract the points in cell1
-        x_icell1 = x1[ifirst1:ilast1]
-        y_icell1 = y1[ifirst1:ilast1]
-        z_icell1 = z1[ifirst1:ilast1]
+        ix1 = icell1 // (num_y1divs*num_z1divs)
+        iy1 = (icell1 - ix1*num_y1divs*num_z1divs) // num_z1divs
+        iz1 = icell1 - (ix1*num_y1divs*num_z1divs) - (iy1*num_z1divs)
 
-        #extract the weights in cell1
-        w_icell1 = weights1[ifirst1:ilast1]
+        leftmost_ix2 = ix1*num_x2_per_x1 - num_x2_covering_steps
+        leftmost_iy2 = iy1*num_y2_per_y1 - num_y2_covering_steps
+        leftmost_iz2 = iz1*num_z2_per_z1 - num_z2_covering_steps
 
-        #extract the subvolume tags in cell1
-        j_icell1 = jtags1[ifirst1:ilast1]
+        rightmost_ix2 = (ix1+1)*num_x2_per_x1 + num_x2_covering_steps 
+        rightmost_iy2 = (iy1+1)*num_y2_per_y1 + num_y2_covering_steps 
+        rightmost_iz2 = (iz1+1)*num_z2_per_z1 + num_z2_covering_steps 
 
-        Ni = ilast1 - ifirst1
-        if Ni > 0:
+        # Loop over the runs of points of cell1 in the same subvolume
+        irun = ifirst1
+        while irun < ilast1:
+            j1 = jtags1[irun]
+            irun_end = irun + 1
+            while irun_end < ilast1 and jtags1[irun_end] == j1:
+                irun_end = irun_end + 1
 
-            ix1 = icell1 // (num_y1divs*num_z1divs)
-            iy1 = (icell1 - ix1*num_y1divs*num_z1divs) // num_z1divs
-            iz1 = icell1 - (ix1*num_y1divs*num_z1divs) - (iy1*num_z1divs)
+            #extract the points in the run
+            x_icell1 = &x1[irun]
+            y_icell1 = &y1[irun]
+            z_icell1 = &z1[irun]
 
-            leftmost_ix2 = ix1*num_x2_per_x1 - num_x2_covering_steps
-            leftmost_iy2 = iy1*num_y2_per_y1 - num_y2_covering_steps
-            leftmost_iz2 = iz1*num_z2_per_z1 - num_z2_covering_steps
+            #extract the weights in the run
+            w_icell1 = &weights1[irun]
 
-            rightmost_ix2 = (ix1+1)*num_x2_per_x1 + num_x2_covering_steps 
-            rightmost_iy2 = (iy1+1)*num_y2_per_y1 + num_y2_covering_steps 
-            rightmost_iz2 = (iz1+1)*num_z2_per_z1 + num_z2_covering_steps 
+            Ni = irun_end - irun
 
             for nonPBC_ix2 in range(leftmost_ix2, rightmost_ix2):
                 if nonPBC_ix2 < 0:
@@ -188,22 +250,31 @@ def npairs_jackknife_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
                         iz2 = nonPBC_iz2 % num_z2divs
 
                         icell2 = ix2*(num_y2divs*num_z2divs) + iy2*num_z2divs + iz2
+
+                        # In auto-correlation mode mesh2 is mesh1, and each pair
+                        # of cells is only visited from one of its two members
+                        if autocorr:
+                            offset_sign = cell_offset_sign(nonPBC_ix2 - ix1,
+                                nonPBC_iy2 - iy1, nonPBC_iz2 - iz1)
+                            if offset_sign < 0:
+                                continue
+
                         ifirst2 = cell2_indices[icell2]
                         ilast2 = cell2_indices[icell2+1]
 
                         #extract the points in cell2
-                        x_icell2 = x2[ifirst2:ilast2]
-                        y_icell2 = y2[ifirst2:ilast2]
-                        z_icell2 = z2[ifirst2:ilast2]
+                        x_icell2 = &x2[ifirst2]
+                        y_icell2 = &y2[ifirst2]
+                        z_icell2 = &z2[ifirst2]
 
                         #extract the weights in cell1
-                        w_icell2 = weights2[ifirst2:ilast2]
+                        w_icell2 = &weights2[ifirst2]
 
                         #extract the subvolume tags in cell1
-                        j_icell2 = jtags2[ifirst2:ilast2]
+                        j_icell2 = &jtags2[ifirst2]
 
                         Nj = ilast2 - ifirst2
-                        #loop over points in cell1
+                        #loop over points in the run
                         if Nj > 0:
                             for i in range(0,Ni):
                                 x1tmp = x_icell1[i] - x2shift
@@ -211,80 +282,43 @@ def npairs_jackknife_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
                                 z1tmp = z_icell1[i] - z2shift
 
                                 w1 = w_icell1[i]
-                                j1 = j_icell1[i]
                                 #loop over points in cell2
-                                for j in range(0,Nj):
+                                # Within a single cell, only count pairs with j > i
+                                if autocorr and offset_sign == 0:
+                                    jstart = (irun - ifirst1) + i + 1
+                                else:
+                                    jstart = 0
+                                for j in range(jstart,Nj):
                                     #calculate the square distance
                                     dx = x1tmp - x_icell2[j]
                                     dy = y1tmp - y_icell2[j]
                                     dz = z1tmp - z_icell2[j]
                                     dsq = dx*dx + dy*dy + dz*dz
 
-                                    w2 = w_icell2[j]
-                                    j2 = j_icell2[j]
-
-                                    for s in range(N_samples+1):
-                                        k = num_rbins-1
-                                        while dsq<=rbins_squared[k]:
-                                            counts[s,k] += jweight(s, j1, j2, w1, w2)
-                                            k=k-1
-                                            if k<0: break                                        
-                                        
-                                        
-    return np.array(counts)
-
-
-cdef inline cnp.float64_t jweight(cnp.int64_t j, cnp.int64_t j1, cnp.int64_t j2,
-    cnp.float64_t w1, cnp.float64_t w2):
-    """
-    Return the jackknife weighted count.
-    
-    parameters
-    ----------
-    j : int
-        subsample being removed
-    
-    j1 : int
-        integer label indicating which subsample point 1 occupies
-    
-    j2 : int
-        integer label indicating which subsample point 2 occupies
-    
-    w1 : float
-        weight associated with point 1
-    
-    w2 : float
-        weight associated with point 2
-    
-    Returns
-    -------
-    w : double
-        0.0, w1*w2*0.5, or w1*w2
-    
-    Notes
-    -----
-    We use the tag '0' to indicated we want to use the entire sample, i.e. no subsample
-    should be labeled with a '0'.
-    
-    jackknife wiehgt is caclulated as follows:
-    if both points are inside the sample, return w1*w2
-    if both points are outside the sample, return 0.0
-    if one point is within and one point is outside the sample, return 0.5*w1*w2
-    """
-    cdef cnp.float64_t result
-    if j==0: 
-        result = w1 * w2
-    # both outside the sub-sample
-    elif (j1 == j2) & (j1 == j): 
-        result = 0.0
-    # both inside the sub-sample
-    elif (j1 != j) & (j2 != j): 
-        result = (w1 * w2)
-    # only one inside the sub-sample
-    elif (j1 != j2) & ((j1 == j) | (j2 == j)): 
-        result = 0.5*(w1 * w2)
-
-    return result
-
-
-
+                                    k = bisect_bin_index(dsq, &rbins_squared[0], num_rbins)
+                                    if k < num_rbins:
+                                        w2 = w_icell2[j]
+                                        j2 = j_icell2[j]
+                                        row_counts[tid, j2, k] += w1*w2
+                                        if row_touched[tid, j2] == 0:
+                                            row_touched[tid, j2] = 1
+                                            touched_jtags[tid, num_touched[tid]] = j2
+                                            num_touched[tid] += 1
+
+            # Add the row of counts of the run to the shared matrix,
+            # holding the GIL so that only one thread writes at a time
+            with gil:
+                for m in range(num_touched[tid]):
+                    j2 = touched_jtags[tid, m]
+                    for k in range(num_rbins):
+                        counts[j1, j2, k] += row_counts[tid, j2, k]
+                        row_counts[tid, j2, k] = 0.
+                    row_touched[tid, j2] = 0
+                num_touched[tid] = 0
+
+            irun = irun_end
+
+        thread_busy_time[tid] += wall_time() - cell1_start_time
+
+    # Convert the histogram into cumulative counts
+    return np.cumsum(counts_array, axis=2, out=counts_array)
@@ -5,7 +5,10 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 import numpy as np
 cimport numpy as cnp
 cimport cython
+from cython.parallel cimport prange, threadid
 from libc.math cimport ceil
+from .bin_search cimport bisect_bin_index
+from .wall_clock cimport wall_time
 
 from ....utils import unsorting_indices
 
@@ -15,7 +18,8 @@ __all__ = ('npairs_per_object_3d_engine', )
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.nonecheck(False)
-def npairs_per_object_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, rbins, cell1_tuple):
+def npairs_per_object_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, rbins, cell1_tuple,
+    int num_threads=1, busy_time=None):
     """ Cython engine for counting pairs of points as a function of three-dimensional separation.
 
     Parameters
@@ -34,8 +38,16 @@ def npairs_per_object_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
 
     cell1_tuple : tuple
         Two-element tuple defining the first and last cells in
-        double_mesh.mesh1 that will be looped over. Intended for use with
-        python multiprocessing.
+        double_mesh.mesh1 that will be looped over.
+
+    num_threads : int, optional
+        Number of OpenMP threads sharing the loop over the cells of
+        double_mesh.mesh1. Each thread fills its own histogram, and the
+        histograms are summed when the loop is done. Default is 1.
+
+    busy_time : array, optional
+        Array of length num_threads. Entry i is incremented by the time in seconds
+        that thread i spent on its cells. Default is None.
 
     Returns
     --------
@@ -69,7 +81,7 @@ def npairs_per_object_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
     cdef cnp.float64_t[:] z2_sorted = np.ascontiguousarray(
         z2in[double_mesh.mesh2.idx_sorted], dtype=np.float64)
 
-    cdef cnp.int64_t[:] inner_counts = np.zeros((num_rbins,), dtype=np.int64)
+    cdef cnp.int64_t[:, :] inner_counts = np.zeros((num_threads, num_rbins), dtype=np.int64)
     cdef cnp.int64_t[:, :] outer_counts = np.zeros(
         (len(x1_sorted), num_rbins), dtype=np.int64)
 
@@ -107,16 +119,27 @@ def npairs_per_object_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
     cdef cnp.float64_t x1tmp, y1tmp, z1tmp
     cdef int Ni, Nj, i, j, k, l
 
-    cdef cnp.float64_t[:] x_icell1, x_icell2
-    cdef cnp.float64_t[:] y_icell1, y_icell2
-    cdef cnp.float64_t[:] z_icell1, z_icell2
-
-    for icell1 in range(first_cell1_element, last_cell1_element):
+    cdef cnp.float64_t *x_icell1
+    cdef cnp.float64_t *x_icell2
+    cdef cnp.float64_t *y_icell1
+    cdef cnp.float64_t *y_icell2
+    cdef cnp.float64_t *z_icell1
+    cdef cnp.float64_t *z_icell2
+    cdef int tid
+    cdef cnp.float64_t cell1_start_time
+    if busy_time is None:
+        busy_time = np.zeros(num_threads, dtype=np.float64)
+    cdef cnp.float64_t[:] thread_busy_time = busy_time
+
+    for icell1 in prange(first_cell1_element, last_cell1_element, nogil=True,
+            num_threads=num_threads, schedule='dynamic'):
+        tid = threadid()
+        cell1_start_time = wall_time()
         ifirst1 = cell1_indices[icell1]
         ilast1 = cell1_indices[icell1+1]
-        x_icell1 = x1_sorted[ifirst1:ilast1]
-        y_icell1 = y1_sorted[ifirst1:ilast1]
-        z_icell1 = z1_sorted[ifirst1:ilast1]
+        x_icell1 = &x1_sorted[ifirst1]
+        y_icell1 = &y1_sorted[ifirst1]
+        z_icell1 = &z1_sorted[ifirst1]
 
         Ni = ilast1 - ifirst1
         if Ni > 0:
@@ -167,9 +190,9 @@ def npairs_per_object_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
                         ifirst2 = cell2_indices[icell2]
                         ilast2 = cell2_indices[icell2+1]
 
-                        x_icell2 = x2_sorted[ifirst2:ilast2]
-                        y_icell2 = y2_sorted[ifirst2:ilast2]
-                        z_icell2 = z2_sorted[ifirst2:ilast2]
+                        x_icell2 = &x2_sorted[ifirst2]
+                        y_icell2 = &y2_sorted[ifirst2]
+                        z_icell2 = &z2_sorted[ifirst2]
 
                         Nj = ilast2 - ifirst2
                         #loop over points in cell1 points
@@ -186,20 +209,21 @@ def npairs_per_object_3d_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
                                     dz = z1tmp - z_icell2[j]
                                     dsq = dx*dx + dy*dy + dz*dz
 
-                                    k = num_rbins-1
-                                    while dsq <= rbins_squared[k]:
-                                        inner_counts[k] += 1
-                                        k=k-1
-                                        if k<0: break
+                                    k = bisect_bin_index(dsq, &rbins_squared[0], num_rbins)
+                                    if k < num_rbins:
+                                        inner_counts[tid, k] += 1
 
                                 # update the outer counts
                                 for k in range(0, num_rbins):
-                                    outer_counts[ifirst1 + i, k] += inner_counts[k]
-                                    inner_counts[k] = 0 #re-zero the inner counts
+                                    outer_counts[ifirst1 + i, k] += inner_counts[tid, k]
+                                    inner_counts[tid, k] = 0 #re-zero the inner counts
+
+        thread_busy_time[tid] += wall_time() - cell1_start_time
 
     # At this point, we have calculated our counts on the input arrays *after* sorting
     # Since the order of counts matters in this calculation, we need to undo the sorting
-    sorted_counts = np.array(outer_counts)
+    # Convert the differential histogram into cumulative counts
+    sorted_counts = np.cumsum(outer_counts, axis=1)
     idx_unsorted = unsorting_indices(double_mesh.mesh1.idx_sorted)
     return sorted_counts[idx_unsorted, :]
 
@@ -5,7 +5,11 @@ from __future__ import (absolute_import, division, print_function, unicode_liter
 import numpy as np
 cimport numpy as cnp
 cimport cython
+from cython.parallel cimport prange, threadid
 from libc.math cimport ceil
+from .bin_search cimport bisect_bin_index
+from .wall_clock cimport wall_time
+from .cell_stencil cimport cell_offset_sign
 
 __author__ = ('Andrew Hearin', 'Duncan Campbell')
 __all__ = ('npairs_projected_engine', )
@@ -14,7 +18,8 @@ __all__ = ('npairs_projected_engine', )
 @cython.wraparound(False)
 @cython.nonecheck(False)
 def npairs_projected_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
-    rp_bins, pi_max, cell1_tuple):
+    rp_bins, pi_max, cell1_tuple,
+    int num_threads=1, busy_time=None):
     r""" Cython engine for counting pairs of points as a function of projected separation.
 
     Parameters
@@ -37,8 +42,16 @@ def npairs_projected_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
 
     cell1_tuple : tuple
         Two-element tuple defining the first and last cells in
-        double_mesh.mesh1 that will be looped over. Intended for use with
-        python multiprocessing.
+        double_mesh.mesh1 that will be looped over.
+
+    num_threads : int, optional
+        Number of OpenMP threads sharing the loop over the cells of
+        double_mesh.mesh1. Each thread fills its own histogram, and the
+        histograms are summed when the loop is done. Default is 1.
+
+    busy_time : array, optional
+        Array of length num_threads. Entry i is incremented by the time in seconds
+        that thread i spent on its cells. Default is None.
 
     Returns
     --------
@@ -55,10 +68,12 @@ def npairs_projected_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
     cdef cnp.int64_t first_cell1_element = cell1_tuple[0]
     cdef cnp.int64_t last_cell1_element = cell1_tuple[1]
     cdef int PBCs = double_mesh._PBCs
+    cdef int autocorr = double_mesh._autocorr
+    cdef int offset_sign = 1
 
     cdef int Ncell1 = double_mesh.mesh1.ncells
     cdef int num_rp_bins = len(rp_bins)
-    cdef cnp.int64_t[:] counts = np.zeros(num_rp_bins, dtype=np.int64)
+    cdef cnp.int64_t[:, :] counts = np.zeros((num_threads, num_rp_bins), dtype=np.int64)
 
     cdef cnp.float64_t[:] x1 = np.ascontiguousarray(x1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
     cdef cnp.float64_t[:] y1 = np.ascontiguousarray(y1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
@@ -99,18 +114,29 @@ def npairs_projected_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
 
     cdef cnp.float64_t x2shift, y2shift, z2shift, dx, dy, dz, dxy_sq, dz_sq
     cdef cnp.float64_t x1tmp, y1tmp, z1tmp
-    cdef int Ni, Nj, i, j, k, l
-
-    cdef cnp.float64_t[:] x_icell1, x_icell2
-    cdef cnp.float64_t[:] y_icell1, y_icell2
-    cdef cnp.float64_t[:] z_icell1, z_icell2
-
-    for icell1 in range(first_cell1_element, last_cell1_element):
+    cdef int Ni, Nj, i, j, jstart, k, l
+
+    cdef cnp.float64_t *x_icell1
+    cdef cnp.float64_t *x_icell2
+    cdef cnp.float64_t *y_icell1
+    cdef cnp.float64_t *y_icell2
+    cdef cnp.float64_t *z_icell1
+    cdef cnp.float64_t *z_icell2
+    cdef int tid
+    cdef cnp.float64_t cell1_start_time
+    if busy_time is None:
+        busy_time = np.zeros(num_threads, dtype=np.float64)
+    cdef cnp.float64_t[:] thread_busy_time = busy_time
+
+    for icell1 in prange(first_cell1_element, last_cell1_element, nogil=True,
+            num_threads=num_threads, schedule='dynamic'):
+        tid = threadid()
+        cell1_start_time = wall_time()
         ifirst1 = cell1_indices[icell1]
         ilast1 = cell1_indices[icell1+1]
-        x_icell1 = x1[ifirst1:ilast1]
-        y_icell1 = y1[ifirst1:ilast1]
-        z_icell1 = z1[ifirst1:ilast1]
+        x_icell1 = &x1[ifirst1]
+        y_icell1 = &y1[ifirst1]
+        z_icell1 = &z1[ifirst1]
 
         Ni = ilast1 - ifirst1
         if Ni > 0:
@@ -158,12 +184,21 @@ def npairs_projected_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
                         iz2 = nonPBC_iz2 % num_z2divs
 
                         icell2 = ix2*(num_y2divs*num_z2divs) + iy2*num_z2divs + iz2
+
+                        # In auto-correlation mode mesh2 is mesh1, and each pair
+                        # of cells is only visited from one of its two members
+                        if autocorr:
+                            offset_sign = cell_offset_sign(nonPBC_ix2 - ix1,
+                                nonPBC_iy2 - iy1, nonPBC_iz2 - iz1)
+                            if offset_sign < 0:
+                                continue
+
                         ifirst2 = cell2_indices[icell2]
                         ilast2 = cell2_indices[icell2+1]
 
-                        x_icell2 = x2[ifirst2:ilast2]
-                        y_icell2 = y2[ifirst2:ilast2]
-                        z_icell2 = z2[ifirst2:ilast2]
+                        x_icell2 = &x2[ifirst2]
+                        y_icell2 = &y2[ifirst2]
+                        z_icell2 = &z2[ifirst2]
 
                         Nj = ilast2 - ifirst2
                         #loop over points in cell1 points
@@ -173,7 +208,12 @@ def npairs_projected_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
                                 y1tmp = y_icell1[i] - y2shift
                                 z1tmp = z_icell1[i] - z2shift
                                 #loop over points in cell2 points
-                                for j in range(0,Nj):
+                                # Within a single cell, only count pairs with j > i
+                                if autocorr and offset_sign == 0:
+                                    jstart = i+1
+                                else:
+                                    jstart = 0
+                                for j in range(jstart,Nj):
                                     #calculate the square distance
                                     dx = x1tmp - x_icell2[j]
                                     dy = y1tmp - y_icell2[j]
@@ -181,14 +221,15 @@ def npairs_projected_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
                                     dxy_sq = dx*dx + dy*dy
                                     dz_sq = dz*dz
 
-                                    k = num_rp_bins-1
-                                    while dxy_sq <= rp_bins_squared[k]:
-                                        if dz_sq <= pi_max_squared:
-                                            counts[k] += 1
-                                        k=k-1
-                                        if k<0: break
+                                    if dz_sq <= pi_max_squared:
+                                        k = bisect_bin_index(dxy_sq, &rp_bins_squared[0], num_rp_bins)
+                                        if k < num_rp_bins:
+                                            counts[tid, k] += 1
+
+        thread_busy_time[tid] += wall_time() - cell1_start_time
 
-    return np.array(counts)
+    # Sum the per-thread histograms and convert into cumulative counts
+    return np.cumsum(np.sum(counts, axis=0))
 
 
 
@@ -5,18 +5,37 @@ from __future__ import (absolute_import, division, print_function, unicode_liter
 import numpy as np
 cimport numpy as cnp
 cimport cython 
+from cython.parallel cimport prange, threadid
 from libc.math cimport ceil, sqrt
-from libcpp.vector cimport vector
+from .wall_clock cimport wall_time
 
 __author__ = ('Andrew Hearin', 'Duncan Campbell')
 __all__ = ('pairwise_distance_xy_z_engine', )
 
+ctypedef fused index_t:
+    cnp.int32_t
+    cnp.int64_t
+
+ctypedef fused distance_t:
+    cnp.float32_t
+    cnp.float64_t
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.nonecheck(False)
-def pairwise_distance_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, rp_max, pi_max, cell1_tuple):
+def pairwise_distance_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, rp_max, pi_max,
+    cell1_tuple, cnp.int64_t[:] cursor, index_t[:] j_out,
+    distance_t[:] distance_perp_out, distance_t[:] distance_para_out, int fill,
+    int num_threads=1, busy_time=None):
     """ 
     Cython engine for returning pairs of points and xy-projected and z separation. 
+
+    The engine is called twice. With ``fill`` set to 0 it only counts the pairs
+    of each point in sample 1, so that the caller can allocate the output arrays
+    once with their final size. With ``fill`` set to 1 it writes each pair into
+    these arrays. Points are visited in the order of double_mesh.mesh1.idx_sorted,
+    and all the pairs of a point are found by the thread that owns its cell, so the
+    threads never write to the same entries of the outputs.
     
     Parameters 
     ------------
@@ -37,22 +56,36 @@ def pairwise_distance_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2i
     
     cell1_tuple : tuple
         Two-element tuple defining the first and last cells in 
-        double_mesh.mesh1 that will be looped over. Intended for use with 
-        python multiprocessing. 
-    
-    Returns 
-    --------
-    distance_perp : numpy.array
-        array of pairwise separation xy-projected distances
-    
-    distance_para : numpy.array
-        array of pairwise separation z distances
-    
-    i : numpy.array
-        array of 0-indexed indices in sample 1
-    
-    j : numpy.array
-        array of 0-indexed indices in sample2
+        double_mesh.mesh1 that will be looped over.
+
+    cursor : array
+        Integer array of length Npts1, indexed in the order of
+        double_mesh.mesh1.idx_sorted. Entry i is incremented by one for each
+        pair of the i-th sorted point. When ``fill`` is 1, entry i must
+        be the position in ``j_out`` of the first pair of the i-th sorted point.
+
+    j_out : array
+        Integer array of 0-indexed indices in sample 2, written when ``fill`` is 1.
+
+    distance_perp_out : array
+        Float array of pairwise xy-projected separation distances,
+        written when ``fill`` is 1.
+
+    distance_para_out : array
+        Float array of pairwise z separation distances, written when ``fill`` is 1.
+
+    fill : int
+        Set to 1 to write the pairs into ``j_out``, ``distance_perp_out``
+        and ``distance_para_out``,
+        and to 0 to only count them in ``cursor``.
+
+    num_threads : int, optional
+        Number of OpenMP threads sharing the loop over the cells of
+        double_mesh.mesh1. Default is 1.
+
+    busy_time : array, optional
+        Array of length num_threads. Entry i is incremented by the time in seconds
+        that thread i spent on its cells. Default is None.
     
     """
     
@@ -76,17 +109,13 @@ def pairwise_distance_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2i
     cdef cnp.float64_t[:] x2 = np.ascontiguousarray(x2in[double_mesh.mesh2.idx_sorted], dtype=np.float64)
     cdef cnp.float64_t[:] y2 = np.ascontiguousarray(y2in[double_mesh.mesh2.idx_sorted], dtype=np.float64)
     cdef cnp.float64_t[:] z2 = np.ascontiguousarray(z2in[double_mesh.mesh2.idx_sorted], dtype=np.float64)
-    
-    cdef vector[cnp.int_t] i_ind
-    cdef vector[cnp.int_t] j_ind
-    cdef vector[cnp.float64_t] rp_distances
-    cdef vector[cnp.float64_t] pi_distances
+    cdef cnp.int64_t[:] idx_sorted2 = np.ascontiguousarray(double_mesh.mesh2.idx_sorted, dtype=np.int64)
     
     cdef cnp.int64_t icell1, icell2
     cdef cnp.int64_t[:] cell1_indices = np.ascontiguousarray(double_mesh.mesh1.cell_id_indices, dtype=np.int64)
     cdef cnp.int64_t[:] cell2_indices = np.ascontiguousarray(double_mesh.mesh2.cell_id_indices, dtype=np.int64)
     
-    cdef cnp.int64_t ifirst1, ilast1, ifirst2, ilast2
+    cdef cnp.int64_t ifirst1, ilast1, ifirst2, ilast2, ipair
     
     cdef int ix2, iy2, iz2, ix1, iy1, iz1
     cdef int nonPBC_ix2, nonPBC_iy2, nonPBC_iz2
@@ -114,18 +143,29 @@ def pairwise_distance_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2i
     
     cdef cnp.float64_t x2shift, y2shift, z2shift, dx, dy, dz, dxy_sq, dz_sq
     cdef cnp.float64_t x1tmp, y1tmp, z1tmp 
-    cdef int Ni, Nj, i, j, k, l
-    
-    cdef cnp.float64_t[:] x_icell1, x_icell2
-    cdef cnp.float64_t[:] y_icell1, y_icell2
-    cdef cnp.float64_t[:] z_icell1, z_icell2
-    
-    for icell1 in range(first_cell1_element, last_cell1_element):
+    cdef int Ni, Nj, i, j
+    
+    cdef cnp.float64_t *x_icell1
+    cdef cnp.float64_t *x_icell2
+    cdef cnp.float64_t *y_icell1
+    cdef cnp.float64_t *y_icell2
+    cdef cnp.float64_t *z_icell1
+    cdef cnp.float64_t *z_icell2
+    cdef int tid
+    cdef cnp.float64_t cell1_start_time
+    if busy_time is None:
+        busy_time = np.zeros(num_threads, dtype=np.float64)
+    cdef cnp.float64_t[:] thread_busy_time = busy_time
+    
+    for icell1 in prange(first_cell1_element, last_cell1_element, nogil=True,
+            num_threads=num_threads, schedule='dynamic'):
+        tid = threadid()
+        cell1_start_time = wall_time()
         ifirst1 = cell1_indices[icell1]
         ilast1 = cell1_indices[icell1+1]
-        x_icell1 = x1[ifirst1:ilast1]
-        y_icell1 = y1[ifirst1:ilast1]
-        z_icell1 = z1[ifirst1:ilast1]
+        x_icell1 = &x1[ifirst1]
+        y_icell1 = &y1[ifirst1]
+        z_icell1 = &z1[ifirst1]
         
         Ni = ilast1 - ifirst1
         if Ni > 0:
@@ -176,9 +216,9 @@ def pairwise_distance_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2i
                         ifirst2 = cell2_indices[icell2]
                         ilast2 = cell2_indices[icell2+1]
                         
-                        x_icell2 = x2[ifirst2:ilast2]
-                        y_icell2 = y2[ifirst2:ilast2]
-                        z_icell2 = z2[ifirst2:ilast2]
+                        x_icell2 = &x2[ifirst2]
+                        y_icell2 = &y2[ifirst2]
+                        z_icell2 = &z2[ifirst2]
                         
                         Nj = ilast2 - ifirst2
                         #loop over points in cell1 points
@@ -197,15 +237,12 @@ def pairwise_distance_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2i
                                     dz_sq = dz*dz
                                     
                                     if (dxy_sq <= rp_max_squared[ifirst1+i]) & (dz_sq <= pi_max_squared[ifirst1+i]):
-                                        rp_distances.push_back(dxy_sq)
-                                        pi_distances.push_back(dz_sq)
-                                        i_ind.push_back(ifirst1 + i)
-                                        j_ind.push_back(ifirst2 + j)
-    
-    #input points were sorted.  return the indices of the unsorted arrays
-    i_ind = np.array(i_ind).astype(int)
-    i_ind = double_mesh.mesh1.idx_sorted[i_ind]
-    j_ind = np.array(j_ind).astype(int)
-    j_ind = double_mesh.mesh2.idx_sorted[j_ind]
-    
-    return (np.sqrt(rp_distances).astype(float), np.sqrt(pi_distances).astype(float), i_ind, j_ind)
+                                        ipair = cursor[ifirst1+i]
+                                        if fill:
+                                            #return the index of the unsorted array
+                                            j_out[ipair] = <index_t>idx_sorted2[ifirst2+j]
+                                            distance_perp_out[ipair] = <distance_t>sqrt(dxy_sq)
+                                            distance_para_out[ipair] = <distance_t>sqrt(dz_sq)
+                                        cursor[ifirst1+i] = ipair + 1
+
+        thread_busy_time[tid] += wall_time() - cell1_start_time
@@ -1,12 +1,17 @@
 from distutils.extension import Extension
 import os
+import sys
 
 PATH_TO_PKG = os.path.relpath(os.path.dirname(__file__))
 SOURCES = ("distances.pyx", "pairwise_distances.pyx",
     "npairs_3d_engine.pyx", "npairs_projected_engine.pyx",
     "npairs_xy_z_engine.pyx", "npairs_jackknife_3d_engine.pyx", "npairs_s_mu_engine.pyx",
     "pairwise_distance_3d_engine.pyx", "pairwise_distance_xy_z_engine.pyx",
-    "weighted_npairs_s_mu_engine.pyx", "npairs_jackknife_xy_z_engine.pyx")
+    "weighted_npairs_s_mu_engine.pyx", "npairs_jackknife_xy_z_engine.pyx",
+    "npairs_per_object_3d_engine.pyx", "npairs_labeled_3d_engine.pyx",
+    "npairs_labeled_xy_z_engine.pyx", "npairs_labeled_s_mu_engine.pyx",
+    "npairs_labeled_jackknife_3d_engine.pyx", "knn_3d_engine.pyx",
+    "knn_xy_z_engine.pyx")
 THIS_PKG_NAME = '.'.join(__name__.split('.')[:-1])
 
 
@@ -18,6 +23,12 @@ def get_extensions():
     libraries = []
     language = 'c++'
     extra_compile_args = ['-Ofast']
+    extra_link_args = []
+    # The pair-counting engines parallelize with OpenMP. Apple's default clang
+    # does not support it, in which case the prange loops simply run serially
+    if sys.platform != 'darwin':
+        extra_compile_args.append('-fopenmp')
+        extra_link_args.append('-fopenmp')
 
     extensions = []
     for name, source in zip(names, sources):
@@ -26,6 +37,7 @@ def get_extensions():
             include_dirs=include_dirs,
             libraries=libraries,
             language=language,
-            extra_compile_args=extra_compile_args))
+            extra_compile_args=extra_compile_args,
+            extra_link_args=extra_link_args))
 
     return extensions
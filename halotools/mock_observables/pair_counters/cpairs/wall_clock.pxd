@@ -0,0 +1,13 @@
+"""
+Inline timer used by the pair-counting engines to record the time
+each thread spends working on its cells.
+"""
+from posix.time cimport clock_gettime, timespec, CLOCK_MONOTONIC
+
+
+cdef inline double wall_time() nogil:
+    """ Return the time in seconds of a monotonic clock.
+    """
+    cdef timespec ts
+    clock_gettime(CLOCK_MONOTONIC, &ts)
+    return ts.tv_sec + 1e-9*ts.tv_nsec
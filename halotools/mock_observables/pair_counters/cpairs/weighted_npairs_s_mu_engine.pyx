@@ -5,8 +5,12 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 import numpy as np
 cimport numpy as cnp
 cimport cython
+from cython.parallel cimport prange, threadid
 from libc.math cimport ceil
 from libc.math cimport sqrt
+from .bin_search cimport bisect_bin_index
+from .wall_clock cimport wall_time
+from .cell_stencil cimport cell_offset_sign
 
 __author__ = ('Andrew Hearin', 'Duncan Campbell', 'Manodeep Sinha')
 __all__ = ('weighted_npairs_s_mu_engine', )
@@ -15,7 +19,8 @@ __all__ = ('weighted_npairs_s_mu_engine', )
 @cython.wraparound(False)
 @cython.nonecheck(False)
 def weighted_npairs_s_mu_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, w1in, w2in,
-    s_bins_in, mu_bins_in, cell1_tuple):
+    s_bins_in, mu_bins_in, cell1_tuple,
+    int num_threads=1, busy_time=None):
     r""" Cython engine for counting pairs of points as a function of radial separation, s,
     and the angle between the line-of-sight (LOS) and s.
 
@@ -47,8 +52,16 @@ def weighted_npairs_s_mu_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
 
     cell1_tuple : tuple
         Two-element tuple defining the first and last cells in
-        double_mesh.mesh1 that will be looped over. Intended for use with
-        python multiprocessing.
+        double_mesh.mesh1 that will be looped over.
+
+    num_threads : int, optional
+        Number of OpenMP threads sharing the loop over the cells of
+        double_mesh.mesh1. Each thread fills its own histogram, and the
+        histograms are summed when the loop is done. Default is 1.
+
+    busy_time : array, optional
+        Array of length num_threads. Entry i is incremented by the time in seconds
+        that thread i spent on its cells. Default is None.
 
     Returns
     --------
@@ -70,14 +83,14 @@ def weighted_npairs_s_mu_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
     cdef cnp.int64_t first_cell1_element = cell1_tuple[0]
     cdef cnp.int64_t last_cell1_element = cell1_tuple[1]
     cdef int PBCs = double_mesh._PBCs
+    cdef int autocorr = double_mesh._autocorr
+    cdef int offset_sign = 1
 
     cdef int Ncell1 = double_mesh.mesh1.ncells
     cdef int num_s_bins = len(sqr_s_bins)
     cdef int num_mu_bins = len(sqr_mu_bins)
-    cdef cnp.int64_t[:,:] counts = np.zeros((num_s_bins, num_mu_bins), dtype=np.int64)
-    cdef cnp.int64_t[:,:] counts_sum = np.zeros((num_s_bins, num_mu_bins), dtype=np.int64)
-    cdef cnp.float64_t[:,:] weighted_counts = np.zeros((num_s_bins, num_mu_bins), dtype=np.float64)
-    cdef cnp.float64_t[:,:] weighted_counts_sum = np.zeros((num_s_bins, num_mu_bins), dtype=np.float64)
+    cdef cnp.int64_t[:, :, :] counts = np.zeros((num_threads, num_s_bins, num_mu_bins), dtype=np.int64)
+    cdef cnp.float64_t[:, :, :] weighted_counts = np.zeros((num_threads, num_s_bins, num_mu_bins), dtype=np.float64)
 
     cdef cnp.float64_t[:] x1 = np.ascontiguousarray(x1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
     cdef cnp.float64_t[:] y1 = np.ascontiguousarray(y1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
@@ -122,24 +135,36 @@ def weighted_npairs_s_mu_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
     cdef cnp.float64_t x2shift, y2shift, z2shift, dx, dy, dz, dxy_sq, dz_sq
     cdef cnp.float64_t x1tmp, y1tmp, z1tmp, s, mu
     cdef cnp.float64_t w1tmp, w2tmp
-    cdef int Ni, Nj, i, j, k, l, g, max_k
+    cdef int Ni, Nj, i, j, jstart, k, l, g, max_k
     cdef cnp.float64_t sqr_s_max = np.max(sqr_s_bins)
     cdef cnp.float64_t sqr_mu_max = np.max(sqr_mu_bins)
     cdef cnp.float64_t sqr_s, sqr_mu
 
-    cdef cnp.float64_t[:] x_icell1, x_icell2
-    cdef cnp.float64_t[:] y_icell1, y_icell2
-    cdef cnp.float64_t[:] z_icell1, z_icell2
-    cdef cnp.float64_t[:] w_icell1, w_icell2
-
-    for icell1 in range(first_cell1_element, last_cell1_element):
+    cdef cnp.float64_t *x_icell1
+    cdef cnp.float64_t *x_icell2
+    cdef cnp.float64_t *y_icell1
+    cdef cnp.float64_t *y_icell2
+    cdef cnp.float64_t *z_icell1
+    cdef cnp.float64_t *z_icell2
+    cdef cnp.float64_t *w_icell1
+    cdef cnp.float64_t *w_icell2
+    cdef int tid
+    cdef cnp.float64_t cell1_start_time
+    if busy_time is None:
+        busy_time = np.zeros(num_threads, dtype=np.float64)
+    cdef cnp.float64_t[:] thread_busy_time = busy_time
+
+    for icell1 in prange(first_cell1_element, last_cell1_element, nogil=True,
+            num_threads=num_threads, schedule='dynamic'):
+        tid = threadid()
+        cell1_start_time = wall_time()
         ifirst1 = cell1_indices[icell1]
         ilast1 = cell1_indices[icell1+1]
-        x_icell1 = x1[ifirst1:ilast1]
-        y_icell1 = y1[ifirst1:ilast1]
-        z_icell1 = z1[ifirst1:ilast1]
+        x_icell1 = &x1[ifirst1]
+        y_icell1 = &y1[ifirst1]
+        z_icell1 = &z1[ifirst1]
 
-        w_icell1 = w1[ifirst1:ilast1]
+        w_icell1 = &w1[ifirst1]
 
         Ni = ilast1 - ifirst1
         if Ni > 0:
@@ -187,14 +212,23 @@ def weighted_npairs_s_mu_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
                         iz2 = nonPBC_iz2 % num_z2divs
 
                         icell2 = ix2*(num_y2divs*num_z2divs) + iy2*num_z2divs + iz2
+
+                        # In auto-correlation mode mesh2 is mesh1, and each pair
+                        # of cells is only visited from one of its two members
+                        if autocorr:
+                            offset_sign = cell_offset_sign(nonPBC_ix2 - ix1,
+                                nonPBC_iy2 - iy1, nonPBC_iz2 - iz1)
+                            if offset_sign < 0:
+                                continue
+
                         ifirst2 = cell2_indices[icell2]
                         ilast2 = cell2_indices[icell2+1]
 
-                        x_icell2 = x2[ifirst2:ilast2]
-                        y_icell2 = y2[ifirst2:ilast2]
-                        z_icell2 = z2[ifirst2:ilast2]
+                        x_icell2 = &x2[ifirst2]
+                        y_icell2 = &y2[ifirst2]
+                        z_icell2 = &z2[ifirst2]
 
-                        w_icell2 = w2[ifirst2:ilast2]
+                        w_icell2 = &w2[ifirst2]
 
                         Nj = ilast2 - ifirst2
                         # loop over points in cell1 points
@@ -205,7 +239,12 @@ def weighted_npairs_s_mu_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
                                 z1tmp = z_icell1[i] - z2shift
                                 w1tmp = w_icell1[i]
                                 # loop over points in cell2 points
-                                for j in range(0,Nj):
+                                # Within a single cell, only count pairs with j > i
+                                if autocorr and offset_sign == 0:
+                                    jstart = i+1
+                                else:
+                                    jstart = 0
+                                for j in range(jstart,Nj):
                                     w2tmp = w_icell2[j]
                                     # calculate the square distance
                                     dx = x1tmp - x_icell2[j]
@@ -228,32 +267,22 @@ def weighted_npairs_s_mu_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
                                     if sqr_mu > sqr_mu_max:
                                         continue
 
-                                    # The loop has been intentionally split up
-                                    # Since division is slow,
-                                    # computing mu is a bottle-neck.
-                                    # Computing the 's' bin however can proceed
-                                    # in the meantime.
-                                    k = num_s_bins-2
-                                    while k!=-1:
-                                        if sqr_s > sqr_s_bins[k]: break
-                                        k=k-1
-
-                                    g = num_mu_bins-2
-                                    while g!=-1:
-                                        if sqr_mu > sqr_mu_bins[g]: break
-                                        g=g-1
+                                    # Pairs beyond the last inner edge of either
+                                    # binning land in the outermost bin
+                                    k = bisect_bin_index(sqr_s, &sqr_s_bins[0], num_s_bins-1)
+                                    g = bisect_bin_index(sqr_mu, &sqr_mu_bins[0], num_mu_bins-1)
 
                                     # Only counts pairs in that bin.
-                                    counts[k+1,g+1] += 1
-                                    weighted_counts[k+1,g+1] += w1tmp*w2tmp
+                                    counts[tid, k, g] += 1
+                                    weighted_counts[tid, k, g] += w1tmp*w2tmp
+
+        thread_busy_time[tid] += wall_time() - cell1_start_time
 
     # Adds counts for all bins where s < s_bin and mu < mu_bin.
-    for k in range(num_s_bins):
-        for g in range(num_mu_bins):
-            counts_sum[k,g] = np.sum(counts[:k+1,:g+1])
-            weighted_counts_sum[k,g] = np.sum(weighted_counts[:k+1,:g+1])
+    counts_sum = np.cumsum(np.cumsum(np.sum(counts, axis=0), axis=0), axis=1)
+    weighted_counts_sum = np.cumsum(np.cumsum(np.sum(weighted_counts, axis=0), axis=0), axis=1)
 
-    return np.array(counts_sum), np.array(weighted_counts_sum)
+    return counts_sum, weighted_counts_sum
 
 
 
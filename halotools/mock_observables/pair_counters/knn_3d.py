@@ -0,0 +1,411 @@
+""" Module containing the `~halotools.mock_observables.knn_3d` function
+used to find the k nearest neighbors of each point.
+"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+import numpy as np
+import multiprocessing
+
+from .rectangular_mesh import RectangularDoubleMesh, digitized_position
+from .cell_size_autotuner import _is_auto
+from .mesh_helpers import (_set_approximate_cell_sizes, _enclose_in_box,
+    _record_worker_busy_times)
+from .cpairs import knn_3d_engine
+
+from ..mock_observables_helpers import (enforce_sample_has_correct_shape,
+    enforce_sample_respects_pbcs, get_period)
+from .marking_function_registry import _registered_conditional_function
+from ..isolation_functions.isolation_functions_helpers import _conditional_isolation_process_marks
+from ...utils.array_utils import custom_len
+
+__author__ = ('Andrew Hearin', 'Duncan Campbell')
+
+__all__ = ('knn_3d', )
+
+
+def knn_3d(sample1, sample2, k, r_max=None, period=None,
+        marks1=None, marks2=None, cond_func=0, num_threads=1,
+        approx_cell1_size=None, approx_cell2_size=None):
+    r"""
+    Function returns the distances to and the indices of the ``k`` nearest neighbors
+    in ``sample2`` of each point in ``sample1``.
+
+    The neighbors are found on the same rectangular mesh as the pair counters,
+    so that periodic boundary conditions are handled exactly
+    and no tree needs to be built. If ``r_max`` is not specified,
+    the search radius starts from the typical distance to the k-th neighbor
+    implied by the number density of ``sample2``, and is doubled for the points
+    with fewer than ``k`` neighbors until all points are resolved.
+
+    Parameters
+    ----------
+    sample1 : array_like
+        Numpy array of shape (Npts1, 3) containing 3-D positions of points.
+        See the :ref:`mock_obs_pos_formatting` documentation page, or the
+        Examples section below, for instructions on how to transform
+        your coordinate position arrays into the
+        format accepted by the ``sample1`` and ``sample2`` arguments.
+        Length units are comoving and assumed to be in Mpc/h, here and throughout Halotools.
+
+    sample2 : array_like
+        Numpy array of shape (Npts2, 3) containing 3-D positions of points.
+
+    k : int
+        Number of nearest neighbors to find.
+
+    r_max : float, optional
+        Maximum separation of the neighbors. If set to None (the default option),
+        the search radius is expanded until ``k`` neighbors are found,
+        up to a third of the smallest dimension of ``period``,
+        or up to the diagonal of the box enclosing the two samples
+        if ``period`` is None.
+
+    period : array_like, optional
+        Length-3 sequence defining the periodic boundary conditions
+        in each dimension. If you instead provide a single scalar, Lbox,
+        period is assumed to be the same in all Cartesian directions.
+        If set to None (the default option), PBCs are set to infinity.
+
+    marks1 : array_like, optional
+        *Npts1 x N_marks* array of marks.  The supplied marks array must have the
+        appropriate shape for the chosen ``cond_func``.
+        If this parameter is not specified, all marks will be set to unity.
+
+    marks2 : array_like, optional
+        *Npts2 x N_marks* array of marks.
+
+    cond_func : int, optional
+        Integer ID indicating which function should be used to apply an additional
+        condition on whether a point in ``sample2`` should be considered as a
+        candidate neighbor, e.g., to find the nearest *more massive* neighbor
+        of each galaxy. The available functions and the number of marks they require
+        are listed in the Notes of
+        `~halotools.mock_observables.conditional_spherical_isolation`.
+        Default is 0, in which case the marks are ignored.
+
+    num_threads : int, optional
+        Number of OpenMP threads to use in calculation. Default is 1.
+        A string 'max' may be used to indicate that all available cores
+        on the machine should be used.
+
+    approx_cell1_size : array_like, optional
+        Length-3 array serving as a guess for the optimal manner by how points
+        will be apportioned into subvolumes of the simulation box.
+        Default choice is to use the search radius in each dimension.
+
+    approx_cell2_size : array_like, optional
+        Analogous to ``approx_cell1_size``, but for ``sample2``.
+
+    Returns
+    -------
+    distances : numpy.array
+        Array of shape (Npts1, k) whose column k-1 stores the distance between
+        each point in ``sample1`` and its k-th nearest neighbor in ``sample2``,
+        or infinity if there is no such neighbor within the search radius.
+
+    indices : numpy.array
+        Integer array of shape (Npts1, k) storing the indices in ``sample2``
+        of the neighbors, or -1 where there is no such neighbor.
+
+    Notes
+    -----
+    When ``sample1`` and ``sample2`` are the same sample,
+    each point is its own nearest neighbor at zero distance.
+    In this case, call the function with ``k+1`` and discard the first column.
+
+    Examples
+    --------
+    For demonstration purposes we create randomly distributed sets of points within a
+    periodic cube.
+
+    >>> Npts1, Npts2, Lbox = 1000, 1000, 250.
+    >>> x1 = np.random.uniform(0, Lbox, Npts1)
+    >>> y1 = np.random.uniform(0, Lbox, Npts1)
+    >>> z1 = np.random.uniform(0, Lbox, Npts1)
+    >>> x2 = np.random.uniform(0, Lbox, Npts2)
+    >>> y2 = np.random.uniform(0, Lbox, Npts2)
+    >>> z2 = np.random.uniform(0, Lbox, Npts2)
+
+    We transform our *x, y, z* points into the array shape used by the pair-counter by
+    taking the transpose of the result of `numpy.vstack`. This boilerplate transformation
+    is used throughout the `~halotools.mock_observables` sub-package:
+
+    >>> sample1 = np.vstack([x1, y1, z1]).T
+    >>> sample2 = np.vstack([x2, y2, z2]).T
+
+    >>> distances, indices = knn_3d(sample1, sample2, 5, period=Lbox)
+
+    The distance to the nearest more massive neighbor of each point in ``sample1``
+    is found by passing masses as marks with ``cond_func`` = 2:
+
+    >>> mass1 = np.random.uniform(1e10, 1e12, Npts1)
+    >>> mass2 = np.random.uniform(1e10, 1e12, Npts2)
+    >>> distances, indices = knn_3d(sample1, sample2, 1, period=Lbox,
+    ...     marks1=mass1, marks2=mass2, cond_func=2)
+
+    """
+    sample1 = enforce_sample_has_correct_shape(sample1)
+    sample2 = enforce_sample_has_correct_shape(sample2)
+    k = _knn_process_k(k)
+    cond_func = _knn_process_cond_func(cond_func)
+    marks1, marks2 = _conditional_isolation_process_marks(
+        sample1, sample2, marks1, marks2, cond_func)
+
+    period, PBCs = get_period(period)
+    if PBCs:
+        enforce_sample_respects_pbcs(sample1[:, 0], sample1[:, 1], sample1[:, 2], period)
+        enforce_sample_respects_pbcs(sample2[:, 0], sample2[:, 1], sample2[:, 2], period)
+
+    def query(idx1, r):
+        return _kth_neighbor_distances_3d(sample1[idx1], sample2, np.arange(1, k+1), r,
+            period=period, marks1=marks1[idx1], marks2=marks2, cond_func=cond_func,
+            num_threads=num_threads, approx_cell1_size=approx_cell1_size,
+            approx_cell2_size=approx_cell2_size)
+
+    if r_max is not None:
+        return query(np.arange(len(sample1)), r_max)
+
+    # Choose the radius enclosing 2k points of sample2 on average as the first guess
+    if PBCs:
+        volume = np.prod(period)
+        r_cap = np.min(period)/3.
+    else:
+        # All pairs of points are closer than the diagonal of their enclosing box
+        xyz = np.concatenate((sample1, sample2))
+        extent = np.max(xyz, axis=0) - np.min(xyz, axis=0)
+        volume = np.prod(extent)
+        r_cap = max(np.sqrt(np.sum(extent**2)), 1e-10)
+    r_start = (3*2*k*volume/(4*np.pi*max(len(sample2), 1)))**(1/3.)
+
+    return _knn_expanding_search(query, len(sample1), k, r_start, r_cap)
+
+
+def _knn_process_k(k):
+    """ Require that the input number of nearest neighbors is a positive integer.
+    """
+    try:
+        assert int(k) == k
+        assert k >= 1
+    except (AssertionError, TypeError, ValueError):
+        msg = "Input ``k`` must be a positive integer"
+        raise ValueError(msg)
+    return int(k)
+
+
+def _knn_process_cond_func(cond_func):
+    """ Require that the input ``cond_func`` is one of the built-in conditional functions,
+    since the nearest-neighbor engines do not call registered conditional functions.
+    """
+    if _registered_conditional_function(cond_func) is not None:
+        msg = ("The nearest-neighbor searches only support the built-in conditional functions.\n"
+            "Input ``cond_func`` = {0} is the ID of a registered conditional function, "
+            "which can only be used by `~halotools.mock_observables.conditional_spherical_isolation` "
+            "and `~halotools.mock_observables.conditional_cylindrical_isolation`".format(cond_func))
+        raise ValueError(msg)
+    return cond_func
+
+
+def _knn_expanding_search(query, npts1, k, r_start, r_cap):
+    """ Call ``query(idx1, r)`` with a search radius ``r`` starting from ``r_start``
+    and doubled at each iteration, for the indices ``idx1`` of the points
+    with fewer than ``k`` neighbors within the previous radius,
+    until all points are resolved or ``r`` reaches ``r_cap``.
+    """
+    distances = np.full((npts1, k), np.inf)
+    indices = np.full((npts1, k), -1, dtype=np.int64)
+
+    if not r_start > 0:
+        r_start = r_cap
+    r = r_start
+    unresolved = np.arange(npts1)
+    while len(unresolved) > 0:
+        r = min(r, r_cap)
+        d, idx = query(unresolved, r)
+        distances[unresolved] = d
+        indices[unresolved] = idx
+        if r >= r_cap:
+            break
+        unresolved = unresolved[np.isinf(d[:, -1])]
+        r *= 2
+
+    return distances, indices
+
+
+def _kth_neighbor_distances_3d(sample1, sample2, k_ranks, r_max, period=None,
+        marks1=None, marks2=None, cond_func=0,
+        num_threads=1, approx_cell1_size=None, approx_cell2_size=None):
+    """
+    Function returns the distance between each point in ``sample1`` and its
+    k-th nearest neighbor in ``sample2``, for each of the input ranks k.
+
+    The neighbors of each point are searched in shells of cells of increasing size,
+    and the search stops as soon as the k-th nearest neighbor is known,
+    so that points in dense regions never visit most of the cells
+    within ``r_max``. Only the neighbors are stored,
+    using memory proportional to ``len(sample1)*len(k_ranks)``.
+
+    Parameters
+    ----------
+    sample1 : array_like
+        Npts1 x 3 numpy array containing 3-D positions of points.
+
+    sample2 : array_like
+        Npts2 x 3 numpy array containing 3-D positions of points.
+
+    k_ranks : array_like
+        Ranks k >= 1 of the neighbors, e.g., [1, 3] for the nearest
+        and third-nearest neighbors.
+
+    r_max : float
+        Maximum separation of the neighbors. Length units assumed to be in Mpc/h,
+        here and throughout Halotools.
+
+    period : array_like, optional
+        Length-3 sequence defining the periodic boundary conditions
+        in each dimension. If you instead provide a single scalar, Lbox,
+        period is assumed to be the same in all Cartesian directions.
+        If set to None (the default option), PBCs are set to infinity.
+
+    marks1, marks2 : array_like, optional
+        Arrays of shape (Npts, N_marks) storing the marks of the points
+        in ``sample1`` and ``sample2``, used by the marking function ``cond_func``.
+        Default is None, in which case the marks are ignored.
+
+    cond_func : int, optional
+        Integer ID of the marking function of
+        `~halotools.mock_observables.conditional_spherical_isolation`
+        a point in ``sample2`` must satisfy to be a candidate neighbor. Default is 0.
+
+    num_threads : int, optional
+        Number of OpenMP threads to use in calculation. Default is 1.
+        A string 'max' may be used to indicate that all available cores
+        on the machine should be used.
+
+    approx_cell1_size : array_like, optional
+        Length-3 array serving as a guess for the optimal manner by how points
+        will be apportioned into subvolumes of the simulation box.
+        Default choice is to use ``r_max`` in each dimension.
+
+    approx_cell2_size : array_like, optional
+        Analogous to ``approx_cell1_size``, but for sample2.
+
+    Returns
+    -------
+    distances : numpy.array
+        Array of shape (Npts1, len(k_ranks)) storing the distance between each
+        point in ``sample1`` and its k-th nearest neighbor in ``sample2``,
+        or infinity if fewer than k points in ``sample2`` are within ``r_max``.
+
+    indices : numpy.array
+        Integer array of shape (Npts1, len(k_ranks)) storing the index in ``sample2``
+        of the k-th nearest neighbor, or -1 if there is none.
+    """
+    num_threads = _knn_process_num_threads(num_threads)
+    k_ranks = _knn_process_k_ranks(k_ranks)
+
+    r_max = float(r_max)
+    if not 0 < r_max < np.inf:
+        msg = "Input ``r_max`` must be a bounded positive number"
+        raise ValueError(msg)
+
+    x1, y1, z1 = sample1[:, 0], sample1[:, 1], sample1[:, 2]
+    x2, y2, z2 = sample2[:, 0], sample2[:, 1], sample2[:, 2]
+    marks1, marks2 = _knn_process_marks(len(sample1), len(sample2), marks1, marks2)
+
+    if period is None:
+        PBCs = False
+        # Pad the box so that round-off never makes r_max exceed Lbox/3
+        min_size = r_max*3.0*(1 + 1e-6)
+        x1, y1, z1, x2, y2, z2, period = (
+            _enclose_in_box(x1, y1, z1, x2, y2, z2,
+                min_size=[min_size, min_size, min_size]))
+    else:
+        PBCs = True
+        period = np.atleast_1d(period).astype(float)
+        if len(period) == 1:
+            period = np.array([period[0]]*3)
+        try:
+            assert np.all(period < np.inf)
+            assert np.all(period > 0)
+        except AssertionError:
+            msg = "Input ``period`` must be a bounded positive number in all dimensions"
+            raise ValueError(msg)
+    xperiod, yperiod, zperiod = period
+
+    if approx_cell1_size is None:
+        approx_cell1_size = [r_max, r_max, r_max]
+    elif custom_len(approx_cell1_size) == 1:
+        approx_cell1_size = [approx_cell1_size, approx_cell1_size, approx_cell1_size]
+    if approx_cell2_size is None:
+        approx_cell2_size = 'auto' if _is_auto(approx_cell1_size) else [r_max, r_max, r_max]
+    elif custom_len(approx_cell2_size) == 1:
+        approx_cell2_size = [approx_cell2_size, approx_cell2_size, approx_cell2_size]
+
+    # Compute the estimates for the cell sizes
+    approx_cell1_size, approx_cell2_size = (
+        _set_approximate_cell_sizes(approx_cell1_size, approx_cell2_size, period)
+        )
+    approx_x1cell_size, approx_y1cell_size, approx_z1cell_size = approx_cell1_size
+    approx_x2cell_size, approx_y2cell_size, approx_z2cell_size = approx_cell2_size
+
+    # Build the rectangular mesh
+    double_mesh = RectangularDoubleMesh(x1, y1, z1, x2, y2, z2,
+        approx_x1cell_size, approx_y1cell_size, approx_z1cell_size,
+        approx_x2cell_size, approx_y2cell_size, approx_z2cell_size,
+        r_max, r_max, r_max, xperiod, yperiod, zperiod, PBCs)
+
+    # The search around each point starts from the cell of mesh2 containing it
+    mesh2 = double_mesh.mesh2
+    ix1 = digitized_position(x1, mesh2.xcell_size, mesh2.num_xdivs)
+    iy1 = digitized_position(y1, mesh2.ycell_size, mesh2.num_ydivs)
+    iz1 = digitized_position(z1, mesh2.zcell_size, mesh2.num_zdivs)
+
+    cell1_tuple = (0, double_mesh.mesh1.ncells)
+    busy_time = np.zeros(num_threads)
+    distances, indices = knn_3d_engine(double_mesh, x1, y1, z1, x2, y2, z2,
+        ix1, iy1, iz1, marks1, marks2, cond_func, r_max, k_ranks,
+        cell1_tuple, num_threads, busy_time)
+    _record_worker_busy_times(busy_time)
+
+    return distances, indices
+
+
+def _knn_process_num_threads(num_threads):
+    """
+    """
+    if num_threads == 'max':
+        num_threads = multiprocessing.cpu_count()
+    if not isinstance(num_threads, int):
+        msg = "Input ``num_threads`` argument must be an integer or the string 'max'"
+        raise ValueError(msg)
+    return num_threads
+
+
+def _knn_process_k_ranks(k_ranks):
+    """
+    """
+    k_ranks = np.atleast_1d(k_ranks)
+    try:
+        assert k_ranks.ndim == 1
+        assert np.all(k_ranks == k_ranks.astype(int))
+        assert np.all(k_ranks >= 1)
+        assert np.all(np.diff(k_ranks) > 0)
+    except AssertionError:
+        msg = "Input ``k_ranks`` must be a strictly increasing 1D array of integers >= 1"
+        raise ValueError(msg)
+    return k_ranks.astype(np.int64)
+
+
+def _knn_process_marks(npts1, npts2, marks1, marks2):
+    """ Replace missing marks by the unit marks of the trivial marking function.
+    """
+    if marks1 is None:
+        marks1 = np.ones((npts1, 1))
+    if marks2 is None:
+        marks2 = np.ones((npts2, 1))
+    marks1 = np.atleast_1d(marks1).astype(np.float64)
+    marks2 = np.atleast_1d(marks2).astype(np.float64)
+    if marks1.ndim == 1:
+        marks1 = marks1.reshape((npts1, 1))
+    if marks2.ndim == 1:
+        marks2 = marks2.reshape((npts2, 1))
+    return marks1, marks2
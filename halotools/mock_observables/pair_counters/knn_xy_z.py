@@ -0,0 +1,316 @@
+""" Module containing the `~halotools.mock_observables.knn_xy_z` function
+used to find the k nearest neighbors of each point in projection.
+"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+import numpy as np
+
+from .rectangular_mesh import RectangularDoubleMesh, digitized_position
+from .cell_size_autotuner import _is_auto
+from .mesh_helpers import (_set_approximate_cell_sizes, _enclose_in_box,
+    _record_worker_busy_times)
+from .knn_3d import (_knn_process_k, _knn_process_cond_func, _knn_expanding_search,
+    _knn_process_num_threads, _knn_process_k_ranks, _knn_process_marks)
+from .cpairs import knn_xy_z_engine
+
+from ..mock_observables_helpers import (enforce_sample_has_correct_shape,
+    enforce_sample_respects_pbcs, get_period)
+from ..isolation_functions.isolation_functions_helpers import _conditional_isolation_process_marks
+from ...utils.array_utils import custom_len
+
+__author__ = ('Andrew Hearin', 'Duncan Campbell')
+
+__all__ = ('knn_xy_z', )
+
+
+def knn_xy_z(sample1, sample2, k, pi_max, rp_max=None, period=None,
+        marks1=None, marks2=None, cond_func=0, num_threads=1,
+        approx_cell1_size=None, approx_cell2_size=None):
+    r"""
+    Function returns the separations perpendicular to the z-axis and the indices
+    of the ``k`` nearest neighbors in ``sample2`` of each point in ``sample1``,
+    among the points of ``sample2`` within a separation ``pi_max`` along the z-axis.
+
+    The neighbors are ranked by their projected separation, as for the neighbors
+    of galaxies in redshift space. The search is carried out on the same
+    rectangular mesh as the pair counters, so that different periodic
+    boundary conditions along the line-of-sight and in the plane of the sky
+    are handled exactly. If ``rp_max`` is not specified,
+    the search radius starts from the typical projected distance to the k-th neighbor
+    implied by the number density of ``sample2``, and is doubled for the points
+    with fewer than ``k`` neighbors until all points are resolved.
+
+    Parameters
+    ----------
+    sample1 : array_like
+        Numpy array of shape (Npts1, 3) containing 3-D positions of points.
+        See the :ref:`mock_obs_pos_formatting` documentation page, or the
+        Examples section below, for instructions on how to transform
+        your coordinate position arrays into the
+        format accepted by the ``sample1`` and ``sample2`` arguments.
+        Length units are comoving and assumed to be in Mpc/h, here and throughout Halotools.
+
+    sample2 : array_like
+        Numpy array of shape (Npts2, 3) containing 3-D positions of points.
+
+    k : int
+        Number of nearest neighbors to find.
+
+    pi_max : float
+        Maximum separation of the neighbors along the z-axis.
+
+    rp_max : float, optional
+        Maximum separation of the neighbors perpendicular to the z-axis.
+        If set to None (the default option),
+        the search radius is expanded until ``k`` neighbors are found,
+        up to a third of the smallest xy-dimension of ``period``,
+        or up to the diagonal in the xy-plane of the box enclosing the two samples
+        if ``period`` is None.
+
+    period : array_like, optional
+        Length-3 sequence defining the periodic boundary conditions
+        in each dimension. If you instead provide a single scalar, Lbox,
+        period is assumed to be the same in all Cartesian directions.
+        If set to None (the default option), PBCs are set to infinity.
+
+    marks1 : array_like, optional
+        *Npts1 x N_marks* array of marks.  The supplied marks array must have the
+        appropriate shape for the chosen ``cond_func``.
+        If this parameter is not specified, all marks will be set to unity.
+
+    marks2 : array_like, optional
+        *Npts2 x N_marks* array of marks.
+
+    cond_func : int, optional
+        Integer ID indicating which function should be used to apply an additional
+        condition on whether a point in ``sample2`` should be considered as a
+        candidate neighbor. The available functions and the number of marks they require
+        are listed in the Notes of
+        `~halotools.mock_observables.conditional_cylindrical_isolation`.
+        Default is 0, in which case the marks are ignored.
+
+    num_threads : int, optional
+        Number of OpenMP threads to use in calculation. Default is 1.
+        A string 'max' may be used to indicate that all available cores
+        on the machine should be used.
+
+    approx_cell1_size : array_like, optional
+        Length-3 array serving as a guess for the optimal manner by how points
+        will be apportioned into subvolumes of the simulation box.
+        Default choice is to use the search radius in the x- and y-dimensions
+        and ``pi_max`` in the z-dimension.
+
+    approx_cell2_size : array_like, optional
+        Analogous to ``approx_cell1_size``, but for ``sample2``.
+
+    Returns
+    -------
+    distances : numpy.array
+        Array of shape (Npts1, k) whose column k-1 stores the separation perpendicular
+        to the z-axis between each point in ``sample1`` and its k-th nearest neighbor
+        in ``sample2``, or infinity if there is no such neighbor within the search radius.
+
+    indices : numpy.array
+        Integer array of shape (Npts1, k) storing the indices in ``sample2``
+        of the neighbors, or -1 where there is no such neighbor.
+
+    Examples
+    --------
+    For demonstration purposes we create randomly distributed sets of points within a
+    periodic cube.
+
+    >>> Npts1, Npts2, Lbox = 1000, 1000, 250.
+    >>> x1 = np.random.uniform(0, Lbox, Npts1)
+    >>> y1 = np.random.uniform(0, Lbox, Npts1)
+    >>> z1 = np.random.uniform(0, Lbox, Npts1)
+    >>> x2 = np.random.uniform(0, Lbox, Npts2)
+    >>> y2 = np.random.uniform(0, Lbox, Npts2)
+    >>> z2 = np.random.uniform(0, Lbox, Npts2)
+
+    We transform our *x, y, z* points into the array shape used by the pair-counter by
+    taking the transpose of the result of `numpy.vstack`. This boilerplate transformation
+    is used throughout the `~halotools.mock_observables` sub-package:
+
+    >>> sample1 = np.vstack([x1, y1, z1]).T
+    >>> sample2 = np.vstack([x2, y2, z2]).T
+
+    >>> distances, indices = knn_xy_z(sample1, sample2, 5, 40., period=Lbox)
+
+    """
+    sample1 = enforce_sample_has_correct_shape(sample1)
+    sample2 = enforce_sample_has_correct_shape(sample2)
+    k = _knn_process_k(k)
+    cond_func = _knn_process_cond_func(cond_func)
+    marks1, marks2 = _conditional_isolation_process_marks(
+        sample1, sample2, marks1, marks2, cond_func)
+
+    period, PBCs = get_period(period)
+    if PBCs:
+        enforce_sample_respects_pbcs(sample1[:, 0], sample1[:, 1], sample1[:, 2], period)
+        enforce_sample_respects_pbcs(sample2[:, 0], sample2[:, 1], sample2[:, 2], period)
+
+    def query(idx1, r):
+        return _kth_neighbor_distances_xy_z(sample1[idx1], sample2, np.arange(1, k+1),
+            r, pi_max, period=period, marks1=marks1[idx1], marks2=marks2,
+            cond_func=cond_func, num_threads=num_threads,
+            approx_cell1_size=approx_cell1_size, approx_cell2_size=approx_cell2_size)
+
+    if rp_max is not None:
+        return query(np.arange(len(sample1)), rp_max)
+
+    # Choose the radius enclosing 2k points of sample2 on average as the first guess
+    if PBCs:
+        extent = period
+        r_cap = np.min(period[0:2])/3.
+    else:
+        # All pairs of points are closer than the xy-diagonal of their enclosing box
+        xyz = np.concatenate((sample1, sample2))
+        extent = np.max(xyz, axis=0) - np.min(xyz, axis=0)
+        r_cap = max(np.sqrt(np.sum(extent[0:2]**2)), 1e-10)
+    volume = np.prod(extent)
+    if (volume > 0) & (len(sample2) > 0):
+        surface_density = len(sample2)*min(2*pi_max, extent[2])/volume
+        r_start = np.sqrt(2*k/(np.pi*surface_density))
+    else:
+        r_start = r_cap
+
+    return _knn_expanding_search(query, len(sample1), k, r_start, r_cap)
+
+
+def _kth_neighbor_distances_xy_z(sample1, sample2, k_ranks, rp_max, pi_max, period=None,
+        marks1=None, marks2=None, cond_func=0,
+        num_threads=1, approx_cell1_size=None, approx_cell2_size=None):
+    """
+    Function returns the separation perpendicular to the z-axis between each point
+    in ``sample1`` and its k-th nearest neighbor in ``sample2``
+    within a separation ``pi_max`` along the z-axis, for each of the input ranks k.
+
+    Parameters
+    ----------
+    sample1 : array_like
+        Npts1 x 3 numpy array containing 3-D positions of points.
+
+    sample2 : array_like
+        Npts2 x 3 numpy array containing 3-D positions of points.
+
+    k_ranks : array_like
+        Ranks k >= 1 of the neighbors, e.g., [1, 3] for the nearest
+        and third-nearest neighbors.
+
+    rp_max : float
+        Maximum separation of the neighbors perpendicular to the z-axis.
+
+    pi_max : float
+        Maximum separation of the neighbors along the z-axis.
+
+    period : array_like, optional
+        Length-3 sequence defining the periodic boundary conditions
+        in each dimension. If you instead provide a single scalar, Lbox,
+        period is assumed to be the same in all Cartesian directions.
+        If set to None (the default option), PBCs are set to infinity.
+
+    marks1, marks2 : array_like, optional
+        Arrays of shape (Npts, N_marks) storing the marks of the points
+        in ``sample1`` and ``sample2``, used by the marking function ``cond_func``.
+        Default is None, in which case the marks are ignored.
+
+    cond_func : int, optional
+        Integer ID of the marking function of
+        `~halotools.mock_observables.conditional_cylindrical_isolation`
+        a point in ``sample2`` must satisfy to be a candidate neighbor. Default is 0.
+
+    num_threads : int, optional
+        Number of OpenMP threads to use in calculation. Default is 1.
+        A string 'max' may be used to indicate that all available cores
+        on the machine should be used.
+
+    approx_cell1_size : array_like, optional
+        Length-3 array serving as a guess for the optimal manner by how points
+        will be apportioned into subvolumes of the simulation box.
+        Default choice is to use ``rp_max`` in the x- and y-dimensions
+        and ``pi_max`` in the z-dimension.
+
+    approx_cell2_size : array_like, optional
+        Analogous to ``approx_cell1_size``, but for sample2.
+
+    Returns
+    -------
+    distances : numpy.array
+        Array of shape (Npts1, len(k_ranks)) storing the perpendicular separation
+        between each point in ``sample1`` and its k-th nearest neighbor in ``sample2``,
+        or infinity if there are fewer than k points in ``sample2`` within the cylinder.
+
+    indices : numpy.array
+        Integer array of shape (Npts1, len(k_ranks)) storing the index in ``sample2``
+        of the k-th nearest neighbor, or -1 if there is none.
+    """
+    num_threads = _knn_process_num_threads(num_threads)
+    k_ranks = _knn_process_k_ranks(k_ranks)
+
+    rp_max = float(rp_max)
+    if not 0 < rp_max < np.inf:
+        msg = "Input ``rp_max`` must be a bounded positive number"
+        raise ValueError(msg)
+    pi_max = float(pi_max)
+    if not 0 < pi_max < np.inf:
+        msg = "Input ``pi_max`` must be a bounded positive number"
+        raise ValueError(msg)
+
+    x1, y1, z1 = sample1[:, 0], sample1[:, 1], sample1[:, 2]
+    x2, y2, z2 = sample2[:, 0], sample2[:, 1], sample2[:, 2]
+    marks1, marks2 = _knn_process_marks(len(sample1), len(sample2), marks1, marks2)
+
+    if period is None:
+        PBCs = False
+        # Pad the box so that round-off never makes rp_max or pi_max exceed Lbox/3
+        x1, y1, z1, x2, y2, z2, period = (
+            _enclose_in_box(x1, y1, z1, x2, y2, z2,
+                min_size=np.array([rp_max, rp_max, pi_max])*3.0*(1 + 1e-6)))
+    else:
+        PBCs = True
+        period = np.atleast_1d(period).astype(float)
+        if len(period) == 1:
+            period = np.array([period[0]]*3)
+        try:
+            assert np.all(period < np.inf)
+            assert np.all(period > 0)
+        except AssertionError:
+            msg = "Input ``period`` must be a bounded positive number in all dimensions"
+            raise ValueError(msg)
+    xperiod, yperiod, zperiod = period
+
+    if approx_cell1_size is None:
+        approx_cell1_size = [rp_max, rp_max, pi_max]
+    elif custom_len(approx_cell1_size) == 1:
+        approx_cell1_size = [approx_cell1_size, approx_cell1_size, approx_cell1_size]
+    if approx_cell2_size is None:
+        approx_cell2_size = 'auto' if _is_auto(approx_cell1_size) else [rp_max, rp_max, pi_max]
+    elif custom_len(approx_cell2_size) == 1:
+        approx_cell2_size = [approx_cell2_size, approx_cell2_size, approx_cell2_size]
+
+    # Compute the estimates for the cell sizes
+    approx_cell1_size, approx_cell2_size = (
+        _set_approximate_cell_sizes(approx_cell1_size, approx_cell2_size, period)
+        )
+    approx_x1cell_size, approx_y1cell_size, approx_z1cell_size = approx_cell1_size
+    approx_x2cell_size, approx_y2cell_size, approx_z2cell_size = approx_cell2_size
+
+    # Build the rectangular mesh
+    double_mesh = RectangularDoubleMesh(x1, y1, z1, x2, y2, z2,
+        approx_x1cell_size, approx_y1cell_size, approx_z1cell_size,
+        approx_x2cell_size, approx_y2cell_size, approx_z2cell_size,
+        rp_max, rp_max, pi_max, xperiod, yperiod, zperiod, PBCs)
+
+    # The search around each point starts from the cell of mesh2 containing it
+    mesh2 = double_mesh.mesh2
+    ix1 = digitized_position(x1, mesh2.xcell_size, mesh2.num_xdivs)
+    iy1 = digitized_position(y1, mesh2.ycell_size, mesh2.num_ydivs)
+    iz1 = digitized_position(z1, mesh2.zcell_size, mesh2.num_zdivs)
+
+    cell1_tuple = (0, double_mesh.mesh1.ncells)
+    busy_time = np.zeros(num_threads)
+    distances, indices = knn_xy_z_engine(double_mesh, x1, y1, z1, x2, y2, z2,
+        ix1, iy1, iz1, marks1, marks2, cond_func, rp_max, pi_max, k_ranks,
+        cell1_tuple, num_threads, busy_time)
+    _record_worker_busy_times(busy_time)
+
+    return distances, indices
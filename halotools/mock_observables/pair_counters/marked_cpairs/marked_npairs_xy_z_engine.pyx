@@ -5,21 +5,24 @@ from __future__ import (absolute_import, division, print_function, unicode_liter
 import numpy as np
 cimport numpy as cnp
 cimport cython
+from cython.parallel cimport prange, threadid
 from libc.math cimport ceil
+from libc.stdint cimport uintptr_t
 
 from .marking_functions cimport *
-from .custom_marking_func cimport custom_func
+from ..cpairs.bin_search cimport bisect_bin_index
+from ..cpairs.wall_clock cimport wall_time
+from ..cpairs.cell_stencil cimport cell_offset_sign
 
 __author__ = ('Andrew Hearin', 'Duncan Campbell')
 __all__ = ('marked_npairs_xy_z_engine', )
 
-ctypedef double (*f_type)(cnp.float64_t* w1, cnp.float64_t* w2)
-
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.nonecheck(False)
 def marked_npairs_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
-    weights1in, weights2in, weight_func_idin, rp_bins, pi_bins, cell1_tuple):
+    weights1in, weights2in, weight_func_idin, rp_bins, pi_bins, cell1_tuple,
+    int num_threads=1, busy_time=None, registered_func_address=0):
     r""" Cython engine for counting pairs of points
     as a function of three-dimensional separation.
 
@@ -50,8 +53,22 @@ def marked_npairs_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
 
     cell1_tuple : tuple
         Two-element tuple defining the first and last cells in
-        double_mesh.mesh1 that will be looped over. Intended for use with
-        python multiprocessing.
+        double_mesh.mesh1 that will be looped over.
+
+    num_threads : int, optional
+        Number of OpenMP threads sharing the loop over the cells of
+        double_mesh.mesh1. Each thread fills its own histogram, and the
+        histograms are summed when the loop is done. Default is 1.
+
+    busy_time : array, optional
+        Array of length num_threads. Entry i is incremented by the time in seconds
+        that thread i spent on its cells. Default is None.
+
+    registered_func_address : int, optional
+        Memory address of a marking function registered with
+        `~halotools.mock_observables.register_marking_function`.
+        If nonzero, this function is used instead of the one with ID
+        ``weight_func_idin``. Default is 0.
 
     Returns
     --------
@@ -61,9 +78,52 @@ def marked_npairs_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
 
     """
     cdef int weight_func_id = weight_func_idin
+    cdef registered_func_tag registered_func
+    engine_args = (double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, weights1in,
+        weights2in, weight_func_idin, rp_bins, pi_bins, cell1_tuple, num_threads,
+        busy_time)
+    if registered_func_address != 0:
+        registered_func.func = <registered_marking_func> <uintptr_t> registered_func_address
+        return _marked_npairs_xy_z_kernel(&registered_func, engine_args)
+    elif weight_func_id == 0:
+        return _marked_npairs_xy_z_kernel(<custom_func_tag*> NULL, engine_args)
+    elif weight_func_id == 1:
+        return _marked_npairs_xy_z_kernel(<mweights_tag*> NULL, engine_args)
+    elif weight_func_id == 2:
+        return _marked_npairs_xy_z_kernel(<sweights_tag*> NULL, engine_args)
+    elif weight_func_id == 3:
+        return _marked_npairs_xy_z_kernel(<eqweights_tag*> NULL, engine_args)
+    elif weight_func_id == 4:
+        return _marked_npairs_xy_z_kernel(<ineqweights_tag*> NULL, engine_args)
+    elif weight_func_id == 5:
+        return _marked_npairs_xy_z_kernel(<gweights_tag*> NULL, engine_args)
+    elif weight_func_id == 6:
+        return _marked_npairs_xy_z_kernel(<lweights_tag*> NULL, engine_args)
+    elif weight_func_id == 7:
+        return _marked_npairs_xy_z_kernel(<tgweights_tag*> NULL, engine_args)
+    elif weight_func_id == 8:
+        return _marked_npairs_xy_z_kernel(<tlweights_tag*> NULL, engine_args)
+    elif weight_func_id == 9:
+        return _marked_npairs_xy_z_kernel(<tweights_tag*> NULL, engine_args)
+    elif weight_func_id == 10:
+        return _marked_npairs_xy_z_kernel(<exweights_tag*> NULL, engine_args)
+    elif weight_func_id == 11:
+        return _marked_npairs_xy_z_kernel(<ratio_weights_tag*> NULL, engine_args)
+    else:
+        raise ValueError('marking function does not exist')
 
-    cdef f_type wfunc
-    wfunc = return_weighting_function(weight_func_id)
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+cdef _marked_npairs_xy_z_kernel(weighting_tag* tag, tuple engine_args):
+    """ Loop of `marked_npairs_xy_z_engine` specialized to the marking function
+    selected by the type of ``tag``.
+    """
+    (double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, weights1in, weights2in,
+        weight_func_idin, rp_bins, pi_bins, cell1_tuple, num_threads_in,
+        busy_time) = engine_args
+    cdef int num_threads = num_threads_in
 
     cdef cnp.float64_t[:] rp_bins_squared = rp_bins*rp_bins
     cdef cnp.float64_t[:] pi_bins_squared = pi_bins*pi_bins
@@ -73,11 +133,13 @@ def marked_npairs_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
     cdef cnp.int64_t first_cell1_element = cell1_tuple[0]
     cdef cnp.int64_t last_cell1_element = cell1_tuple[1]
     cdef int PBCs = double_mesh._PBCs
+    cdef int autocorr = double_mesh._autocorr
+    cdef int offset_sign = 1
 
     cdef int Ncell1 = double_mesh.mesh1.ncells
     cdef int num_rp_bins = len(rp_bins)
     cdef int num_pi_bins = len(pi_bins)
-    cdef cnp.float64_t[:,:] counts = np.zeros((num_rp_bins, num_pi_bins), dtype=np.float64)
+    cdef cnp.float64_t[:, :, :] counts = np.zeros((num_threads, num_rp_bins, num_pi_bins), dtype=np.float64)
 
     cdef cnp.float64_t[:] x1 = np.ascontiguousarray(x1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
     cdef cnp.float64_t[:] y1 = np.ascontiguousarray(y1in[double_mesh.mesh1.idx_sorted], dtype=np.float64)
@@ -120,25 +182,32 @@ def marked_npairs_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
 
     cdef cnp.float64_t x2shift, y2shift, z2shift, dx, dy, dz, dxy_sq, dz_sq, weight
     cdef cnp.float64_t x1tmp, y1tmp, z1tmp
-    cdef int Ni, Nj, i, j, k, l, g
-
-    cdef cnp.float64_t[:] x_icell1, x_icell2
-    cdef cnp.float64_t[:] y_icell1, y_icell2
-    cdef cnp.float64_t[:] z_icell1, z_icell2
-    cdef cnp.float64_t[:,:] w_icell1, w_icell2
-
-    for icell1 in range(first_cell1_element, last_cell1_element):
+    cdef int Ni, Nj, i, j, jstart, k, l, g
+
+    cdef cnp.float64_t *x_icell1
+    cdef cnp.float64_t *x_icell2
+    cdef cnp.float64_t *y_icell1
+    cdef cnp.float64_t *y_icell2
+    cdef cnp.float64_t *z_icell1
+    cdef cnp.float64_t *z_icell2
+    cdef int tid
+    cdef cnp.float64_t cell1_start_time
+    if busy_time is None:
+        busy_time = np.zeros(num_threads, dtype=np.float64)
+    cdef cnp.float64_t[:] thread_busy_time = busy_time
+
+    for icell1 in prange(first_cell1_element, last_cell1_element, nogil=True,
+            num_threads=num_threads, schedule='dynamic'):
+        tid = threadid()
+        cell1_start_time = wall_time()
 
         ifirst1 = cell1_indices[icell1]
         ilast1 = cell1_indices[icell1+1]
 
         #extract the points in cell1
-        x_icell1 = x1[ifirst1:ilast1]
-        y_icell1 = y1[ifirst1:ilast1]
-        z_icell1 = z1[ifirst1:ilast1]
-
-        #extract the weights in cell1
-        w_icell1 = weights1[ifirst1:ilast1,:]
+        x_icell1 = &x1[ifirst1]
+        y_icell1 = &y1[ifirst1]
+        z_icell1 = &z1[ifirst1]
 
         Ni = ilast1 - ifirst1
         if Ni > 0:
@@ -186,16 +255,22 @@ def marked_npairs_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
                         iz2 = nonPBC_iz2 % num_z2divs
 
                         icell2 = ix2*(num_y2divs*num_z2divs) + iy2*num_z2divs + iz2
+
+                        # In auto-correlation mode mesh2 is mesh1, and each pair
+                        # of cells is only visited from one of its two members
+                        if autocorr:
+                            offset_sign = cell_offset_sign(nonPBC_ix2 - ix1,
+                                nonPBC_iy2 - iy1, nonPBC_iz2 - iz1)
+                            if offset_sign < 0:
+                                continue
+
                         ifirst2 = cell2_indices[icell2]
                         ilast2 = cell2_indices[icell2+1]
 
                         #extract the points in cell2
-                        x_icell2 = x2[ifirst2:ilast2]
-                        y_icell2 = y2[ifirst2:ilast2]
-                        z_icell2 = z2[ifirst2:ilast2]
-
-                        #extract the weights in cell2
-                        w_icell2 = weights2[ifirst2:ilast2,:]
+                        x_icell2 = &x2[ifirst2]
+                        y_icell2 = &y2[ifirst2]
+                        z_icell2 = &z2[ifirst2]
 
                         Nj = ilast2 - ifirst2
                         #loop over points in cell1 points
@@ -205,7 +280,12 @@ def marked_npairs_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
                                 y1tmp = y_icell1[i] - y2shift
                                 z1tmp = z_icell1[i] - z2shift
                                 #loop over points in cell2 points
-                                for j in range(0,Nj):
+                                # Within a single cell, only count pairs with j > i
+                                if autocorr and offset_sign == 0:
+                                    jstart = i+1
+                                else:
+                                    jstart = 0
+                                for j in range(jstart,Nj):
                                     #calculate the square distance
                                     dx = x1tmp - x_icell2[j]
                                     dy = y1tmp - y_icell2[j]
@@ -213,48 +293,21 @@ def marked_npairs_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
                                     dxy_sq = dx*dx + dy*dy
                                     dz_sq = dz*dz
 
-                                    weight = wfunc(&w_icell1[i,0], &w_icell2[j,0])
-                                    k = num_rp_bins-1
-                                    while dxy_sq<=rp_bins_squared[k]:
-                                        g = num_pi_bins-1
-                                        while dz_sq<=pi_bins_squared[g]:
-                                            counts[k,g] += weight
-                                            g=g-1
-                                            if g<0: break
-                                        k=k-1
-                                        if k<0: break
-
-    return np.array(counts)
-
-
-cdef f_type return_weighting_function(weight_func_id):
-    """
-    returns a pointer to the user-specified weighting function.
-    """
-
-    if weight_func_id==0:
-        return custom_func
-    elif weight_func_id==1:
-        return mweights
-    elif weight_func_id==2:
-        return sweights
-    elif weight_func_id==3:
-        return eqweights
-    elif weight_func_id==4:
-        return ineqweights
-    elif weight_func_id==5:
-        return gweights
-    elif weight_func_id==6:
-        return lweights
-    elif weight_func_id==7:
-        return tgweights
-    elif weight_func_id==8:
-        return tlweights
-    elif weight_func_id==9:
-        return tweights
-    elif weight_func_id==10:
-        return exweights
-    elif weight_func_id==11:
-        return ratio_weights
-    else:
-        raise ValueError('marking function does not exist')
+                                    k = bisect_bin_index(dxy_sq, &rp_bins_squared[0], num_rp_bins)
+                                    if k < num_rp_bins:
+                                        g = bisect_bin_index(dz_sq, &pi_bins_squared[0], num_pi_bins)
+                                        if g < num_pi_bins:
+                                            # Marking functions need not be symmetric, so in auto-correlation mode
+                                            # each pair contributes the mean of both orderings
+                                            if autocorr:
+                                                counts[tid, k, g] += 0.5*(
+                                                    weighting_function(tag, &weights1[ifirst1+i, 0], &weights2[ifirst2+j, 0]) +
+                                                    weighting_function(tag, &weights2[ifirst2+j, 0], &weights1[ifirst1+i, 0]))
+                                            else:
+                                                counts[tid, k, g] += weighting_function(tag,
+                                                    &weights1[ifirst1+i, 0], &weights2[ifirst2+j, 0])
+
+        thread_busy_time[tid] += wall_time() - cell1_start_time
+
+    # Sum the per-thread histograms and convert into cumulative counts
+    return np.cumsum(np.cumsum(np.sum(counts, axis=0), axis=0), axis=1)
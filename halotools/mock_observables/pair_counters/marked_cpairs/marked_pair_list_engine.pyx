@@ -0,0 +1,150 @@
+"""
+"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import numpy as np
+cimport numpy as cnp
+cimport cython
+from cython.parallel cimport prange
+from libc.stdint cimport uintptr_t
+
+from .marking_functions cimport *
+
+__author__ = ('Andrew Hearin', 'Duncan Campbell')
+__all__ = ('marked_pair_list_engine', )
+
+ctypedef fused index_t:
+    cnp.int32_t
+    cnp.int64_t
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+def marked_pair_list_engine(index_t[:] i_pairs, index_t[:] j_pairs, bin_offsets,
+    weights1in, weights2in, weight_func_idin, int num_threads=1,
+    registered_func_address=0):
+    """ Cython engine for summing the weights of a stored list of pairs of points
+    in each separation bin.
+
+    Finding the pairs is the expensive part of a weighted pair count, so when
+    the same pairs are weighted by many sets of marks, e.g., by random
+    permutations of the marks, the pairs are found once and only
+    the weights are evaluated again for each set of marks.
+
+    Parameters
+    ------------
+    i_pairs, j_pairs : arrays
+        Integer arrays storing the index in sample 1 and in sample 2
+        of the points of each pair, with the pairs sorted by separation bin.
+
+    bin_offsets : array
+        Integer array of length num_bins+1. The pairs in bin k are the pairs
+        bin_offsets[k] <= ipair < bin_offsets[k+1].
+
+    weights1in : array
+        Array storing the weights of the points in sample 1,
+        of shape (Npts1, N_weights).
+
+    weights2in : array
+        Array storing the weights of the points in sample 2,
+        of shape (Npts2, N_weights).
+
+    weight_func_idin : int
+        Integer ID of the weighting function,
+        with the same conventions as `~halotools.mock_observables.marked_npairs_3d`.
+
+    num_threads : int, optional
+        Number of OpenMP threads sharing the loop over the pairs of each bin.
+        Default is 1.
+
+    registered_func_address : int, optional
+        Memory address of a marking function registered with
+        `~halotools.mock_observables.register_marking_function`.
+        If nonzero, this function is used instead of the one with ID
+        ``weight_func_idin``. Default is 0.
+
+    Returns
+    --------
+    counts : array
+        Float array of length num_bins storing the sum of the weights
+        of the pairs in each bin.
+
+    """
+    cdef int weight_func_id = weight_func_idin
+    cdef cnp.int64_t[:] offsets = np.ascontiguousarray(bin_offsets, dtype=np.int64)
+    cdef cnp.float64_t[:, ::1] weights1 = np.ascontiguousarray(weights1in, dtype=np.float64)
+    cdef cnp.float64_t[:, ::1] weights2 = np.ascontiguousarray(weights2in, dtype=np.float64)
+    cdef registered_func_tag registered_func
+
+    if registered_func_address != 0:
+        registered_func.func = <registered_marking_func> <uintptr_t> registered_func_address
+        return _pair_list_kernel(&registered_func, i_pairs, j_pairs,
+            offsets, weights1, weights2, num_threads)
+    elif weight_func_id == 0:
+        return _pair_list_kernel(<custom_func_tag*> NULL, i_pairs, j_pairs,
+            offsets, weights1, weights2, num_threads)
+    elif weight_func_id == 1:
+        return _pair_list_kernel(<mweights_tag*> NULL, i_pairs, j_pairs,
+            offsets, weights1, weights2, num_threads)
+    elif weight_func_id == 2:
+        return _pair_list_kernel(<sweights_tag*> NULL, i_pairs, j_pairs,
+            offsets, weights1, weights2, num_threads)
+    elif weight_func_id == 3:
+        return _pair_list_kernel(<eqweights_tag*> NULL, i_pairs, j_pairs,
+            offsets, weights1, weights2, num_threads)
+    elif weight_func_id == 4:
+        return _pair_list_kernel(<ineqweights_tag*> NULL, i_pairs, j_pairs,
+            offsets, weights1, weights2, num_threads)
+    elif weight_func_id == 5:
+        return _pair_list_kernel(<gweights_tag*> NULL, i_pairs, j_pairs,
+            offsets, weights1, weights2, num_threads)
+    elif weight_func_id == 6:
+        return _pair_list_kernel(<lweights_tag*> NULL, i_pairs, j_pairs,
+            offsets, weights1, weights2, num_threads)
+    elif weight_func_id == 7:
+        return _pair_list_kernel(<tgweights_tag*> NULL, i_pairs, j_pairs,
+            offsets, weights1, weights2, num_threads)
+    elif weight_func_id == 8:
+        return _pair_list_kernel(<tlweights_tag*> NULL, i_pairs, j_pairs,
+            offsets, weights1, weights2, num_threads)
+    elif weight_func_id == 9:
+        return _pair_list_kernel(<tweights_tag*> NULL, i_pairs, j_pairs,
+            offsets, weights1, weights2, num_threads)
+    elif weight_func_id == 10:
+        return _pair_list_kernel(<exweights_tag*> NULL, i_pairs, j_pairs,
+            offsets, weights1, weights2, num_threads)
+    elif weight_func_id == 11:
+        return _pair_list_kernel(<ratio_weights_tag*> NULL, i_pairs, j_pairs,
+            offsets, weights1, weights2, num_threads)
+    else:
+        raise ValueError('marking function does not exist')
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+cdef _pair_list_kernel(weighting_tag* tag, index_t[:] i_pairs, index_t[:] j_pairs,
+        cnp.int64_t[:] offsets, cnp.float64_t[:, ::1] weights1,
+        cnp.float64_t[:, ::1] weights2, int num_threads):
+    """ Loop of `marked_pair_list_engine` specialized to the marking function
+    selected by the type of ``tag``.
+    """
+    cdef int num_bins = offsets.shape[0] - 1
+    counts = np.zeros(num_bins, dtype=np.float64)
+    cdef cnp.float64_t[:] bin_counts = counts
+    cdef cnp.float64_t total
+    cdef cnp.int64_t ipair, first_pair, last_pair
+    cdef int k
+
+    for k in range(num_bins):
+        total = 0.
+        first_pair = offsets[k]
+        last_pair = offsets[k+1]
+        for ipair in prange(first_pair, last_pair, nogil=True,
+                num_threads=num_threads, schedule='static'):
+            total += weighting_function(tag,
+                &weights1[i_pairs[ipair], 0], &weights2[j_pairs[ipair], 0])
+        bin_counts[k] = total
+
+    return counts
@@ -1,15 +1,246 @@
+"""
+Inline definitions of the built-in marking functions of the marked pair counters.
+
+Each marking function has an empty tag type, and the fused type ``weighting_tag``
+ranges over all of them. An engine written as a cdef function of a
+``weighting_tag*`` argument is compiled into one specialization per marking
+function, in which `weighting_function` resolves at compile time into a direct,
+inlinable call, rather than into a call through a function pointer for every pair.
+
+Marking functions compiled outside of Halotools and registered with
+`~halotools.mock_observables.register_marking_function` have the tag type
+``registered_func_tag``, which stores the pointer to the function.
+"""
 cimport numpy as cnp
+from libc.math cimport fabs as c_fabs
+
+from .custom_marking_func cimport custom_func
+
+# Pointer to a registered marking function. Declaring the type as external
+# tells Cython that the function cannot raise a Python exception,
+# so that no error check follows each call
+cdef extern from *:
+    """
+    typedef double (*registered_marking_func)(double *, double *);
+    """
+    ctypedef double (*registered_marking_func)(double* w1, double* w2) nogil
 
 ##### built-in weighting functions####
 
-cdef cnp.float64_t mweights(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef cnp.float64_t sweights(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef cnp.float64_t eqweights(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef cnp.float64_t ineqweights(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef cnp.float64_t gweights(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef cnp.float64_t lweights(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef cnp.float64_t tgweights(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef cnp.float64_t tlweights(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef cnp.float64_t tweights(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef cnp.float64_t exweights(cnp.float64_t* w1, cnp.float64_t* w2)
-cdef cnp.float64_t ratio_weights(cnp.float64_t* w1, cnp.float64_t* w2)
+cdef inline cnp.float64_t mweights(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    multiplicative weights
+    return w1[0]*w2[0]
+    id: 1
+    expects length 1 arrays
+    """
+    return w1[0]*w2[0]
+
+
+cdef inline cnp.float64_t sweights(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    summed weights
+    return w1[0]+w2[0]
+    id: 2
+    expects length 1 arrays
+    """
+    return w1[0]+w2[0]
+
+
+cdef inline cnp.float64_t eqweights(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    equality weights
+    return w1[1]*w2[1] if w1[0]==w2[0]
+    id: 3
+    expects length 2 arrays
+    """
+    if w1[0]==w2[0]:
+        return w1[1]*w2[1]
+    else:
+        return 0.0
+
+
+cdef inline cnp.float64_t ineqweights(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    equality weights
+    return w1[1]*w2[1] if w1[0]!=w2[0]
+    id: 4
+    expects length 2 arrays
+    """
+    if w1[0]!=w2[0]:
+        return w1[1]*w2[1]
+    else:
+        return 0.0
+
+
+cdef inline cnp.float64_t gweights(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    greater than weights
+    return w1[1]*w2[1] if w2[0]>w1[0]
+    id: 5
+    expects length 2 arrays
+    """
+    if w2[0]>w1[0]:
+        return w1[1]*w2[1]
+    else:
+        return 0.0
+
+
+cdef inline cnp.float64_t lweights(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    less than weights
+    return w1[1]*w2[1] if w2[0]<w1[0]
+    id: 6
+    expects length 2 arrays
+    """
+    if w2[0]<w1[0]:
+        return w1[1]*w2[1]
+    else:
+        return 0.0
+
+
+cdef inline cnp.float64_t tgweights(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    greater than tolerance weights
+    return w2[1] if w2[0]>(w1[0]+w1[1])
+    id: 7
+    expects length 2 arrays
+    """
+    if w2[0]>(w1[0]+w1[1]):
+        return w2[1]
+    else:
+        return 0.0
+
+
+cdef inline cnp.float64_t tlweights(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    less than tolerance weights
+    return w2[1] if w2[0]<(w1[0]-w1[1])
+    id: 8
+    expects length 2 arrays
+    """
+    if w2[0]<(w1[0]+w1[1]):
+        return w2[1]
+    else:
+        return 0.0
+
+
+cdef inline cnp.float64_t tweights(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    tolerance weights
+    return w2[1] if |w1[0]-w2[0]|<w1[1]
+    id: 9
+    expects length 2 arrays
+    """
+    if c_fabs(w1[0]-w2[0])<w1[1]:
+        return w2[1]
+    else:
+        return 0.0
+
+
+cdef inline cnp.float64_t exweights(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    exclusion weights
+    return w2[1] if |w1[0]-w2[0]|>w1[1]
+    id: 10
+    expects length 2 arrays
+    """
+    if c_fabs(w1[0]-w2[0])>w1[1]:
+        return w2[1]
+    else:
+        return 0.0
+
+
+cdef inline cnp.float64_t ratio_weights(cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """
+    ratio weights
+    return w2[1] if w2[0]>w1[1]*w1[0], 0 otherwise
+    id: 11
+    expects length 2 arrays
+    """
+    if w2[0] > w1[0]*w1[1]:
+        return w2[1]
+    else:
+        return 0.0
+
+
+##### tag types of the marking functions ####
+
+ctypedef struct custom_func_tag:
+    char unused
+ctypedef struct mweights_tag:
+    char unused
+ctypedef struct sweights_tag:
+    char unused
+ctypedef struct eqweights_tag:
+    char unused
+ctypedef struct ineqweights_tag:
+    char unused
+ctypedef struct gweights_tag:
+    char unused
+ctypedef struct lweights_tag:
+    char unused
+ctypedef struct tgweights_tag:
+    char unused
+ctypedef struct tlweights_tag:
+    char unused
+ctypedef struct tweights_tag:
+    char unused
+ctypedef struct exweights_tag:
+    char unused
+ctypedef struct ratio_weights_tag:
+    char unused
+ctypedef struct registered_func_tag:
+    registered_marking_func func
+
+ctypedef fused weighting_tag:
+    custom_func_tag
+    mweights_tag
+    sweights_tag
+    eqweights_tag
+    ineqweights_tag
+    gweights_tag
+    lweights_tag
+    tgweights_tag
+    tlweights_tag
+    tweights_tag
+    exweights_tag
+    ratio_weights_tag
+    registered_func_tag
+
+
+cdef inline cnp.float64_t weighting_function(weighting_tag* tag,
+        cnp.float64_t* w1, cnp.float64_t* w2) nogil:
+    """ Evaluate the marking function selected by the type of ``tag`` on the
+    weights w1 and w2 of a pair of points. Only ``registered_func_tag`` is
+    dereferenced, to read the pointer to the registered function,
+    so NULL pointers of the other tag types are passed.
+    """
+    if weighting_tag is custom_func_tag:
+        return custom_func(w1, w2)
+    elif weighting_tag is mweights_tag:
+        return mweights(w1, w2)
+    elif weighting_tag is sweights_tag:
+        return sweights(w1, w2)
+    elif weighting_tag is eqweights_tag:
+        return eqweights(w1, w2)
+    elif weighting_tag is ineqweights_tag:
+        return ineqweights(w1, w2)
+    elif weighting_tag is gweights_tag:
+        return gweights(w1, w2)
+    elif weighting_tag is lweights_tag:
+        return lweights(w1, w2)
+    elif weighting_tag is tgweights_tag:
+        return tgweights(w1, w2)
+    elif weighting_tag is tlweights_tag:
+        return tlweights(w1, w2)
+    elif weighting_tag is tweights_tag:
+        return tweights(w1, w2)
+    elif weighting_tag is exweights_tag:
+        return exweights(w1, w2)
+    elif weighting_tag is ratio_weights_tag:
+        return ratio_weights(w1, w2)
+    elif weighting_tag is registered_func_tag:
+        return tag.func(w1, w2)
+    else:
+        return 0.0
@@ -1,10 +1,12 @@
 from distutils.extension import Extension
 import os
+import sys
 
 PATH_TO_PKG = os.path.relpath(os.path.dirname(__file__))
 SOURCES = ("custom_weighting_func.pyx",
     "distances.pyx",
-    "conditional_pairwise_distances.pyx", "marked_npairs_3d_engine.pyx")
+    "conditional_pairwise_distances.pyx", "marked_npairs_3d_engine.pyx",
+    "marked_npairs_xy_z_engine.pyx", "marked_pair_list_engine.pyx")
 
 THIS_PKG_NAME = '.'.join(__name__.split('.')[:-1])
 
@@ -17,6 +19,12 @@ def get_extensions():
     libraries = []
     language = 'c++'
     extra_compile_args = ['-Ofast']
+    extra_link_args = []
+    # The pair-counting engines parallelize with OpenMP. Apple's default clang
+    # does not support it, in which case the prange loops simply run serially
+    if sys.platform != 'darwin':
+        extra_compile_args.append('-fopenmp')
+        extra_link_args.append('-fopenmp')
 
     extensions = []
     for name, source in zip(names, sources):
@@ -25,6 +33,7 @@ def get_extensions():
             include_dirs=include_dirs,
             libraries=libraries,
             language=language,
-            extra_compile_args=extra_compile_args))
+            extra_compile_args=extra_compile_args,
+            extra_link_args=extra_link_args))
 
     return extensions
@@ -3,13 +3,13 @@ used to count pairs as a function of separation.
 """
 from __future__ import (absolute_import, division, print_function, unicode_literals)
 import numpy as np
-import multiprocessing
-from functools import partial
 
 from .marked_npairs_3d import _marked_npairs_process_weights
 from .npairs_xy_z import _npairs_xy_z_process_args
-from .mesh_helpers import _set_approximate_cell_sizes, _cell1_parallelization_indices
+from .mesh_helpers import (_set_approximate_cell_sizes, _verify_autocorr_inputs,
+    _record_worker_busy_times)
 from .rectangular_mesh import RectangularDoubleMesh
+from .marking_function_registry import _marking_function_address
 
 from .marked_cpairs import marked_npairs_xy_z_engine
 
@@ -22,7 +22,8 @@ __all__ = ('marked_npairs_xy_z', )
 def marked_npairs_xy_z(sample1, sample2, rp_bins, pi_bins,
                   period=None, weights1=None, weights2=None,
                   weight_func_id=0, verbose=False, num_threads=1,
-                  approx_cell1_size=None, approx_cell2_size=None):
+                  approx_cell1_size=None, approx_cell2_size=None,
+                  autocorr=False):
     r"""
     Calculate the number of weighted pairs with separations greater than
     or equal to :math:`r_{\perp}` and :math:`r_{\parallel}`, :math:`W(>r_{\perp},>r_{\parallel})`.
@@ -82,10 +83,10 @@ def marked_npairs_xy_z(sample1, sample2, rp_bins, pi_bins,
 
     num_threads : int, optional
         Number of threads to use in calculation, where parallelization is performed
-        using the python ``multiprocessing`` module. Default is 1 for a purely serial
-        calculation, in which case a multiprocessing Pool object will
-        never be instantiated. A string 'max' may be used to indicate that
+        with OpenMP threads that share the input arrays in memory. Default is 1
+        for a purely serial calculation. A string 'max' may be used to indicate that
         the pair counters should use all available cores on the machine.
+        If Halotools was built without OpenMP support the calculation is serial.
 
     approx_cell1_size : array_like, optional
         Length-3 array serving as a guess for the optimal manner by how points
@@ -96,11 +97,19 @@ def marked_npairs_xy_z(sample1, sample2, rp_bins, pi_bins,
         Performance can vary sensitively with this parameter, so it is highly
         recommended that you experiment with this parameter when carrying out
         performance-critical calculations.
+        Set to the string 'auto' to choose the cell sizes by timing a few candidates;
+        the choice is remembered for similar samples on the same machine.
 
     approx_cell2_size : array_like, optional
         Analogous to ``approx_cell1_size``, but for sample2.  See comments for
         ``approx_cell1_size`` for details.
 
+    autocorr : bool, optional
+        If True, ``sample2`` must be identical to ``sample1`` and ``weights2`` to
+        ``weights1``, and each pair of points is counted only once rather than twice,
+        halving the work of the calculation. Pairs formed by a point with itself are not
+        counted. Default is False.
+
     Returns
     -------
     wN_pairs : numpy.ndarray
@@ -112,6 +121,9 @@ def marked_npairs_xy_z(sample1, sample2, rp_bins, pi_bins,
     See the docstring of the `~halotools.mock_observables.marked_tpcf` function
     for a description of the available marking functions that can be passed in
     via the ``wfunc`` optional argument.
+
+    A marking function compiled outside of Halotools can be used by passing the
+    ``weight_func_id`` returned by `~halotools.mock_observables.register_marking_function`.
     """
 
     # Process the inputs with the helper function
@@ -129,6 +141,8 @@ def marked_npairs_xy_z(sample1, sample2, rp_bins, pi_bins,
     weights1, weights2 = _marked_npairs_process_weights(sample1, sample2,
             weights1, weights2, weight_func_id)
 
+    _verify_autocorr_inputs(autocorr, (sample1, sample2), (weights1, weights2))
+
     # Compute the estimates for the cell sizes
     approx_cell1_size, approx_cell2_size = (
         _set_approximate_cell_sizes(approx_cell1_size, approx_cell2_size, period)
@@ -140,23 +154,17 @@ def marked_npairs_xy_z(sample1, sample2, rp_bins, pi_bins,
     double_mesh = RectangularDoubleMesh(x1in, y1in, z1in, x2in, y2in, z2in,
         approx_x1cell_size, approx_y1cell_size, approx_z1cell_size,
         approx_x2cell_size, approx_y2cell_size, approx_z2cell_size,
-        search_xlength, search_ylength, search_zlength, xperiod, yperiod, zperiod, PBCs)
-
-    # Create a function object that has a single argument, for parallelization purposes
-    engine = partial(marked_npairs_xy_z_engine, double_mesh,
-        x1in, y1in, z1in, x2in, y2in, z2in,
-        weights1, weights2, weight_func_id, rp_bins, pi_bins)
-
-    # Calculate the cell1 indices that will be looped over by the engine
-    num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
-
-    if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = pool.map(engine, cell1_tuples)
-        counts = np.sum(np.array(result), axis=0)
-        pool.close()
-    else:
-        counts = engine(cell1_tuples[0])
+        search_xlength, search_ylength, search_zlength, xperiod, yperiod, zperiod, PBCs,
+        autocorr=autocorr)
+
+    # The engine loops over every cell of mesh1 in a single call, sharing the cells
+    # between ``num_threads`` OpenMP threads that all read the same input arrays
+    cell1_tuple = (0, double_mesh.mesh1.ncells)
+    busy_time = np.zeros(num_threads)
+    counts = marked_npairs_xy_z_engine(double_mesh,
+        x1in, y1in, z1in, x2in, y2in, z2in, weights1, weights2, weight_func_id,
+        rp_bins, pi_bins, cell1_tuple, num_threads, busy_time,
+        registered_func_address=_marking_function_address(weight_func_id))
+    _record_worker_busy_times(busy_time)
 
     return np.array(counts)
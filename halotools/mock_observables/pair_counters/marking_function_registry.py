@@ -0,0 +1,247 @@
+""" Module containing the `~halotools.mock_observables.register_marking_function`
+and `~halotools.mock_observables.register_conditional_function` functions
+used to pass compiled, user-defined marking functions to the marked pair counters
+and to the conditional isolation functions without recompiling Halotools.
+"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+import ctypes
+from numbers import Integral
+
+__author__ = ('Andrew Hearin', 'Duncan Campbell')
+
+__all__ = ('register_marking_function', 'register_conditional_function')
+
+# IDs of the registered functions start well above the IDs of the built-in functions
+FIRST_REGISTERED_FUNC_ID = 100
+
+# Registered functions, keyed by ID. Each value is a tuple (address, num_marks, func),
+# where func is kept so that the compiled function is not garbage collected.
+_registered_marking_functions = {}
+_registered_conditional_functions = {}
+
+
+def register_marking_function(func, num_weights):
+    r""" Register a compiled weighting function for use by
+    `~halotools.mock_observables.marked_npairs_3d`,
+    `~halotools.mock_observables.marked_npairs_xy_z` and
+    `~halotools.mock_observables.marked_tpcf`.
+
+    The function is called for every pair of points from inside the compiled loops
+    of the pair counters, without holding the GIL,
+    with the same C signature as the built-in weighting functions:
+
+    .. code:: c
+
+        double func(double* w1, double* w2)
+
+    where ``w1`` and ``w2`` point to the ``num_weights`` weights of the two points
+    of the pair. The returned value is the weight of the pair.
+
+    Parameters
+    ----------
+    func : object
+        Compiled function with the above signature. May be any of:
+
+        * a Numba ``cfunc`` compiled with the signature ``float64(CPointer(float64), CPointer(float64))``
+        * a ctypes function pointer
+        * a ``PyCapsule`` storing the pointer to the function, for example the entry of the ``__pyx_capi__`` dictionary of a Cython module in which the function is declared as ``cdef api double func(double* w1, double* w2) nogil``
+        * the memory address of the function, as an integer
+
+        The function must not call into the Python interpreter.
+
+    num_weights : int
+        Number of weights per point expected by the function.
+
+    Returns
+    -------
+    weight_func_id : int
+        Integer ID to pass as the ``weight_func_id`` argument of the marked pair counters.
+        Registering the same function again returns the same ID.
+
+    Examples
+    --------
+    With Numba, a function returning the product of the masses of the pairs
+    of points with the same color, stored as the first and second weight,
+    could be registered and used as follows:
+
+    >>> from numba import cfunc, types  # doctest: +SKIP
+    >>> sig = types.float64(types.CPointer(types.float64), types.CPointer(types.float64))  # doctest: +SKIP
+    >>> @cfunc(sig, nopython=True)  # doctest: +SKIP
+    ... def same_color_mass_product(w1, w2):
+    ...     return w1[0]*w2[0] if w1[1] == w2[1] else 0.
+    >>> weight_func_id = register_marking_function(same_color_mass_product, 2)  # doctest: +SKIP
+    >>> from halotools.mock_observables import marked_npairs_3d
+    >>> result = marked_npairs_3d(sample1, sample2, rbins, weights1=weights1, weights2=weights2, weight_func_id=weight_func_id)  # doctest: +SKIP
+
+    """
+    num_weights = _process_num_marks(num_weights, 'num_weights')
+    address = _compiled_function_address(func, ctypes.c_double)
+    return _register(_registered_marking_functions, address, num_weights, func)
+
+
+def register_conditional_function(func, num_marks):
+    r""" Register a compiled conditional function for use by
+    `~halotools.mock_observables.conditional_spherical_isolation` and
+    `~halotools.mock_observables.conditional_cylindrical_isolation`.
+
+    The function is called for every candidate neighbor from inside the compiled
+    loops of the isolation functions, with the C signature
+
+    .. code:: c
+
+        int func(double* w1, double* w2)
+
+    where ``w1`` points to the ``num_marks`` marks of the point in ``sample1``
+    and ``w2`` to the marks of the point in ``sample2``.
+    The point in ``sample2`` counts as a neighbor if the returned value is nonzero.
+
+    Parameters
+    ----------
+    func : object
+        Compiled function with the above signature. May be any of the objects
+        accepted by `~halotools.mock_observables.register_marking_function`,
+        e.g., a Numba ``cfunc`` compiled with the signature
+        ``int32(CPointer(float64), CPointer(float64))``.
+        The function must not call into the Python interpreter.
+
+    num_marks : int
+        Number of marks per point expected by the function.
+
+    Returns
+    -------
+    cond_func : int
+        Integer ID to pass as the ``cond_func`` argument of the conditional isolation functions.
+        Registering the same function again returns the same ID.
+
+    Examples
+    --------
+    >>> from numba import cfunc, types  # doctest: +SKIP
+    >>> sig = types.int32(types.CPointer(types.float64), types.CPointer(types.float64))  # doctest: +SKIP
+    >>> @cfunc(sig, nopython=True)  # doctest: +SKIP
+    ... def twice_as_massive(w1, w2):
+    ...     return w2[0] > 2*w1[0]
+    >>> cond_func = register_conditional_function(twice_as_massive, 1)  # doctest: +SKIP
+
+    """
+    num_marks = _process_num_marks(num_marks, 'num_marks')
+    address = _compiled_function_address(func, ctypes.c_int)
+    return _register(_registered_conditional_functions, address, num_marks, func)
+
+
+def _register(registry, address, num_marks, func):
+    """ Store the function in the input registry and return its ID.
+    """
+    for func_id, (registered_address, registered_num_marks, __) in registry.items():
+        if (registered_address == address) & (registered_num_marks == num_marks):
+            return func_id
+
+    func_id = FIRST_REGISTERED_FUNC_ID + len(registry)
+    registry[func_id] = (address, num_marks, func)
+    return func_id
+
+
+def _process_num_marks(num_marks, name):
+    """
+    """
+    try:
+        assert int(num_marks) == num_marks
+        assert num_marks > 0
+    except (AssertionError, TypeError, ValueError):
+        msg = "Input ``{0}`` must be a positive integer.".format(name)
+        raise ValueError(msg)
+    return int(num_marks)
+
+
+def _compiled_function_address(func, restype):
+    """ Return the memory address of the compiled function ``func``.
+    ``restype`` is the ctypes type of the return value of the expected signature,
+    which is checked whenever ``func`` carries its own ctypes signature.
+    """
+    # Numba cfunc objects carry both the address and a ctypes wrapper
+    if hasattr(func, 'address') and hasattr(func, 'ctypes'):
+        _check_ctypes_signature(func.ctypes, restype)
+        address = func.address
+    elif isinstance(func, ctypes._CFuncPtr):
+        _check_ctypes_signature(func, restype)
+        address = ctypes.cast(func, ctypes.c_void_p).value
+    elif type(func).__name__ == 'PyCapsule':
+        address = _capsule_pointer(func)
+    elif isinstance(func, Integral) and not isinstance(func, bool):
+        address = func
+    else:
+        msg = ("Input ``func`` must be a Numba cfunc, a ctypes function pointer, "
+            "a PyCapsule or an integer memory address.\n"
+            "Got an object of type {0}".format(type(func)))
+        raise ValueError(msg)
+
+    if not address:
+        msg = "Input ``func`` points to a NULL address."
+        raise ValueError(msg)
+    return int(address)
+
+
+def _check_ctypes_signature(cfunc, restype):
+    """ Verify that a ctypes function with a declared signature takes two
+    pointers to doubles and returns the input ``restype``.
+    """
+    argtypes = getattr(cfunc, 'argtypes', None)
+    if argtypes is None:
+        return
+
+    double_pointer = ctypes.POINTER(ctypes.c_double)
+    correct_args = ((len(argtypes) == 2) &
+        all(argtype in (double_pointer, ctypes.c_void_p) for argtype in argtypes))
+    if (not correct_args) | (cfunc.restype != restype):
+        msg = ("Input ``func`` must take two pointers to doubles and return a {0}.\n"
+            "The ctypes signature of the input function has argtypes = {1} "
+            "and restype = {2}".format(restype.__name__, argtypes, cfunc.restype))
+        raise ValueError(msg)
+
+
+def _capsule_pointer(capsule):
+    """ Return the pointer stored in a PyCapsule, such as the
+    entries of the ``__pyx_capi__`` dictionary of a Cython module.
+    """
+    get_name = ctypes.PYFUNCTYPE(ctypes.c_char_p, ctypes.py_object)(
+        ('PyCapsule_GetName', ctypes.pythonapi))
+    get_pointer = ctypes.PYFUNCTYPE(ctypes.c_void_p, ctypes.py_object, ctypes.c_char_p)(
+        ('PyCapsule_GetPointer', ctypes.pythonapi))
+    return get_pointer(capsule, get_name(capsule))
+
+
+def _registered_marking_function(weight_func_id):
+    """ Return the tuple (address, num_weights) of the registered marking function
+    with the input ID, or None if no marking function is registered with this ID.
+    """
+    try:
+        address, num_weights, __ = _registered_marking_functions[weight_func_id]
+    except (KeyError, TypeError):
+        return None
+    return address, num_weights
+
+
+def _registered_conditional_function(cond_func):
+    """ Return the tuple (address, num_marks) of the registered conditional function
+    with the input ID, or None if no conditional function is registered with this ID.
+    """
+    try:
+        address, num_marks, __ = _registered_conditional_functions[cond_func]
+    except (KeyError, TypeError):
+        return None
+    return address, num_marks
+
+
+def _marking_function_address(weight_func_id):
+    """ Return the address of the registered marking function with the input ID,
+    or 0 for the IDs of the built-in marking functions.
+    """
+    registered = _registered_marking_function(weight_func_id)
+    return 0 if registered is None else registered[0]
+
+
+def _conditional_function_address(cond_func):
+    """ Return the address of the registered conditional function with the input ID,
+    or 0 for the IDs of the built-in conditional functions.
+    """
+    registered = _registered_conditional_function(cond_func)
+    return 0 if registered is None else registered[0]
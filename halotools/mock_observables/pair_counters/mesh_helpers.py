@@ -7,11 +7,23 @@ control flow on function arguments, bounds-checking and exception-handling.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import numpy as np
+import multiprocessing
+import os
 from copy import copy
+from functools import partial
+from time import time
+
+from .cell_size_autotuner import _is_auto
 
 __author__ = ['Duncan Campbell', 'Andrew Hearin']
 
-__all__ = ('_set_approximate_cell_sizes', '_cell1_parallelization_indices')
+__all__ = ('_set_approximate_cell_sizes', '_cell1_parallelization_indices',
+    '_verify_autocorr_inputs', '_cell1_work_estimate', '_parallel_engine_map',
+    '_record_worker_busy_times', 'worker_busy_times', '_process_sample_labels',
+    '_jackknife_counts_from_subvolume_counts')
+
+# Busy time of each worker during the most recent calculation, see worker_busy_times
+_latest_worker_busy_times = {'busy_time': np.zeros(0)}
 
 
 def _enclose_in_box(x1, y1, z1, x2, y2, z2, min_size=None):
@@ -114,12 +126,16 @@ def _set_approximate_cell_sizes(approx_cell1_size, approx_cell2_size, period):
     """
     process the approximate cell size parameters.
     If either is set to None, apply default settings.
+    If either is set to 'auto', the cell sizes are left for
+    `~halotools.mock_observables.RectangularDoubleMesh` to autotune.
     """
 
     #################################################
     # Set the approximate cell sizes of the trees
     if approx_cell1_size is None:
         approx_cell1_size = period/10.0
+    elif _is_auto(approx_cell1_size):
+        approx_cell1_size = ['auto', 'auto', 'auto']
     else:
         approx_cell1_size = np.atleast_1d(approx_cell1_size)
         try:
@@ -132,6 +148,8 @@ def _set_approximate_cell_sizes(approx_cell1_size, approx_cell2_size, period):
 
     if approx_cell2_size is None:
         approx_cell2_size = copy(approx_cell1_size)
+    elif _is_auto(approx_cell2_size):
+        approx_cell2_size = ['auto', 'auto', 'auto']
     else:
         approx_cell2_size = np.atleast_1d(approx_cell2_size)
         try:
@@ -180,7 +198,8 @@ def _set_approximate_2d_cell_sizes(approx_cell1_size, approx_cell2_size, period)
     return approx_cell1_size, approx_cell2_size
 
 
-def _cell1_parallelization_indices(ncells, num_threads):
+def _cell1_parallelization_indices(ncells, num_threads, double_mesh=None,
+        chunks_per_thread=4):
     """ Return a list of tuples that will be passed to multiprocessing.pool.map
     to count pairs in parallel. Each tuple has two entries storing the first and last
     cell_id that will be looped over in the outermost loop in the pair-counting engine.
@@ -193,6 +212,16 @@ def _cell1_parallelization_indices(ncells, num_threads):
     num_threads : int
         Number of cores requested to perform the pair-counting in parallel
 
+    double_mesh : object, optional
+        Mesh whose cells are being divided between the workers. If provided, the
+        cells are divided into chunks of equal estimated work rather than equal
+        numbers of cells, see `_cell1_work_estimate`. Default is None.
+
+    chunks_per_thread : int, optional
+        Number of chunks created per thread when ``double_mesh`` is provided.
+        Chunks are handed out one at a time to whichever worker is free, so that
+        errors in the work estimate are evened out. Default is 4.
+
     Returns
     -------
     num_threads : int
@@ -212,7 +241,18 @@ def _cell1_parallelization_indices(ncells, num_threads):
     """
     if num_threads == 1:
         return 1, [(0, ncells)]
-    elif num_threads > ncells:
+
+    if double_mesh is not None:
+        cumulative_work = np.cumsum(_cell1_work_estimate(double_mesh))
+        if cumulative_work[-1] > 0:
+            num_chunks = min(num_threads*chunks_per_thread, ncells)
+            work_targets = cumulative_work[-1]*np.arange(1, num_chunks)/float(num_chunks)
+            boundaries = np.searchsorted(cumulative_work, work_targets) + 1
+            boundaries = np.unique(np.concatenate(([0], boundaries, [ncells])))
+            list_of_tuples = list(zip(boundaries[:-1], boundaries[1:]))
+            return min(num_threads, len(list_of_tuples)), list_of_tuples
+
+    if num_threads > ncells:
         return ncells, [(a, a+1) for a in np.arange(ncells)]
     else:
         list_with_possibly_empty_arrays = np.array_split(np.arange(ncells), num_threads)
@@ -221,6 +261,121 @@ def _cell1_parallelization_indices(ncells, num_threads):
         return num_threads, list_of_tuples
 
 
+def _cell1_work_estimate(double_mesh):
+    """ Estimate the work done by the engines for each cell of ``double_mesh.mesh1``,
+    given by the number of points in the cell times the number of points in the
+    cells of ``double_mesh.mesh2`` that are searched for its neighbors.
+
+    Parameters
+    -----------
+    double_mesh : object
+        Instance of `~halotools.mock_observables.RectangularDoubleMesh` or
+        `~halotools.mock_observables.pair_counters.RectangularDoubleMesh2D`
+
+    Returns
+    -------
+    cell1_work : array
+        Array of length ``double_mesh.mesh1.ncells`` storing the estimated number
+        of distance evaluations for each cell of mesh1.
+    """
+    mesh1, mesh2 = double_mesh.mesh1, double_mesh.mesh2
+    if hasattr(mesh1, 'num_zdivs'):
+        dims = ('x', 'y', 'z')
+    else:
+        dims = ('x', 'y')
+    shape1 = [getattr(mesh1, 'num_' + dim + 'divs') for dim in dims]
+    shape2 = [getattr(mesh2, 'num_' + dim + 'divs') for dim in dims]
+
+    npts1 = np.diff(mesh1.cell_id_indices).reshape(shape1)
+    neighbor_npts = np.diff(mesh2.cell_id_indices).reshape(shape2)
+
+    # Along each dimension, sum the occupations of the (periodically wrapped)
+    # range of mesh2 cells that the engines loop over for each cell of mesh1
+    for axis, dim in enumerate(dims):
+        search_length = getattr(double_mesh, 'search_' + dim + 'length')
+        num_covering_steps = int(np.ceil(search_length / getattr(mesh2, dim + 'cell_size')))
+        num2_per_1 = shape2[axis] // shape1[axis]
+        offsets = range(-num_covering_steps, num2_per_1 + num_covering_steps)
+        window_sum = sum(np.roll(neighbor_npts, -offset, axis=axis) for offset in offsets)
+        neighbor_npts = np.take(window_sum, np.arange(shape1[axis])*num2_per_1, axis=axis)
+
+    return (npts1*neighbor_npts).astype(float).flatten()
+
+
+def _timed_engine_call(engine, cell1_tuple):
+    """ Call the engine on the input cells, returning its result together with
+    the id of the calling process and the time spent.
+    """
+    start = time()
+    result = engine(cell1_tuple)
+    return result, os.getpid(), time() - start
+
+
+def _parallel_engine_map(engine, cell1_tuples, num_threads):
+    """ Map the engine over the chunks of cells with a pool of ``num_threads``
+    processes, handing out the chunks one at a time to whichever process is free.
+    The busy time of each process is recorded, see `worker_busy_times`.
+
+    Parameters
+    -----------
+    engine : function
+        Function of a single two-element tuple of cell ids
+
+    cell1_tuples : list
+        List of two-element tuples returned by `_cell1_parallelization_indices`
+
+    num_threads : int
+        Number of processes in the pool
+
+    Returns
+    -------
+    result : list
+        List of the engine results, in the same order as ``cell1_tuples``
+    """
+    pool = multiprocessing.Pool(num_threads)
+    timed_results = pool.map(partial(_timed_engine_call, engine), cell1_tuples, chunksize=1)
+    pool.close()
+
+    busy_time = {}
+    for __, pid, elapsed in timed_results:
+        busy_time[pid] = busy_time.get(pid, 0.) + elapsed
+    _record_worker_busy_times(list(busy_time.values()))
+
+    return [result for result, __, __ in timed_results]
+
+
+def _record_worker_busy_times(busy_time):
+    """ Store the busy time of each worker of the calculation that just finished.
+    """
+    _latest_worker_busy_times['busy_time'] = np.array(busy_time, dtype=float)
+
+
+def worker_busy_times():
+    """ Return the time in seconds that each worker spent on its share of the cells
+    during the most recent parallelized calculation.
+
+    Workers that finish long before the others indicate that the work was
+    poorly balanced, e.g., because of a few heavily occupied cells.
+
+    Returns
+    -------
+    busy_time : array
+        Array with one entry per thread or process used in the calculation.
+        Empty if no calculation has been run.
+
+    Examples
+    --------
+    >>> from halotools.mock_observables import npairs_3d
+    >>> Npts, Lbox = 1000, 250.
+    >>> sample = np.random.uniform(0, Lbox, Npts*3).reshape((Npts, 3))
+    >>> rbins = np.logspace(-1, 1, 10)
+    >>> counts = npairs_3d(sample, sample, rbins, period=Lbox, num_threads=2)
+    >>> busy_time = worker_busy_times()
+    >>> imbalance = busy_time.max()/busy_time.mean()
+    """
+    return np.copy(_latest_worker_busy_times['busy_time'])
+
+
 def _enforce_maximum_search_length(search_length, period=None):
     """ The `~halotools.mock_observables.pair_counters.RectangularDoubleMesh`
     algorithm requires that the search length cannot exceed period/3 in any dimension.
@@ -251,3 +406,109 @@ def _enforce_maximum_search_length(search_length, period=None):
             "Your function call would require searching for pairs separated by a distance of {0:.2f}*Lbox.\n"
             "Either decrease your search length or use a larger simulation.")
         raise ValueError(msg.format(max_search_fraction))
+
+
+def _verify_autocorr_inputs(autocorr, *array_pairs):
+    """
+    Verify that ``autocorr`` is boolean-valued and, if True, that the
+    sample 1 and sample 2 versions of each input array are identical,
+    since in auto-correlation mode the pair-counting engines only use sample 1.
+
+    Parameters
+    ----------
+    autocorr : bool
+        Boolean specifying whether pairs are to be counted in auto-correlation mode.
+
+    array_pairs : sequence of tuples
+        Each tuple stores an array of sample 1, e.g., its positions or weights,
+        followed by the corresponding array of sample 2.
+    """
+    try:
+        assert autocorr == bool(autocorr)
+    except AssertionError:
+        msg = "Input ``autocorr`` must be boolean-valued"
+        raise ValueError(msg)
+
+    if autocorr is True:
+        for arr1, arr2 in array_pairs:
+            if (arr1 is not arr2) and (not np.array_equal(arr1, arr2)):
+                msg = ("When ``autocorr`` is True, sample2 and its associated inputs \n"
+                    "must be identical to sample1 and its associated inputs")
+                raise ValueError(msg)
+
+
+def _process_sample_labels(sample, labels):
+    """
+    Verify that ``labels`` stores one non-negative integer label for each point
+    of ``sample``, as used by the labeled pair counters.
+
+    Parameters
+    ----------
+    sample : array_like
+        Numpy array of shape (Npts, ndim) storing the stacked points of all samples.
+
+    labels : array_like
+        Integer array of shape (Npts, ) storing the sample label of each point.
+
+    Returns
+    -------
+    labels : ndarray
+        Numpy array of dtype int64 storing the sample labels.
+
+    num_labels : int
+        Number of labels, given by the largest label plus one.
+    """
+    labels = np.atleast_1d(labels)
+    try:
+        assert labels.ndim == 1
+        assert len(labels) == len(sample)
+        assert np.issubdtype(labels.dtype, np.integer)
+        assert (len(labels) == 0) or (np.min(labels) >= 0)
+    except AssertionError:
+        msg = ("Input ``labels`` must be a 1D array of non-negative integers \n"
+            "with one entry per point of the input ``sample``")
+        raise ValueError(msg)
+
+    labels = labels.astype('i8')
+    num_labels = int(np.max(labels)) + 1 if len(labels) > 0 else 0
+    return labels, num_labels
+
+
+def _jackknife_counts_from_subvolume_counts(subvol_counts, subvol_axis=0):
+    r"""
+    Derive the pair counts of the full sample and of every jackknife sample
+    from the counts of pairs between each pair of subvolumes.
+
+    Each pair with both points in the removed subvolume has weight 0,
+    each pair with exactly one point in the removed subvolume has weight 1/2,
+    and all other pairs have weight 1. The count with subvolume s removed is therefore
+    the full count minus half the sum of row s and column s of the subvolume matrix,
+    where the diagonal entry is included in both sums.
+
+    Parameters
+    ----------
+    subvol_counts : array_like
+        Numpy array storing the pair counts of each pair of subvolumes
+        along the two axes ``subvol_axis`` and ``subvol_axis+1``, each of length N_samples.
+        Entry [s1-1, s2-1] along these axes stores the counts of pairs formed by a point
+        of sample 1 in subvolume s1 and a point of sample 2 in subvolume s2.
+
+    subvol_axis : int, optional
+        Axis of ``subvol_counts`` storing the subvolume of sample 1. Default is 0.
+
+    Returns
+    -------
+    counts : ndarray
+        Numpy array in which the two subvolume axes are replaced by a single axis
+        of length N_samples+1. Entry 0 along this axis stores the counts of the full sample,
+        and entry s stores the counts with subvolume s removed.
+    """
+    subvol_counts = np.moveaxis(np.asarray(subvol_counts), (subvol_axis, subvol_axis+1), (0, 1))
+
+    row_counts = np.sum(subvol_counts, axis=1)
+    column_counts = np.sum(subvol_counts, axis=0)
+    full_counts = np.sum(row_counts, axis=0)
+
+    jackknife_counts = full_counts - 0.5*(row_counts + column_counts)
+    counts = np.concatenate((full_counts[np.newaxis], jackknife_counts))
+    return np.moveaxis(counts, 0, subvol_axis)
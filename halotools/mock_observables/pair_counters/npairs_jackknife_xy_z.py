@@ -4,12 +4,11 @@ used to estimate errors in the `~halotools.mock_observables.tpcf` function.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import numpy as np
-import multiprocessing
-from functools import partial
 from warnings import warn
 
 from .rectangular_mesh import RectangularDoubleMesh
-from .mesh_helpers import _set_approximate_cell_sizes, _cell1_parallelization_indices
+from .mesh_helpers import (_set_approximate_cell_sizes, _verify_autocorr_inputs,
+    _record_worker_busy_times, _jackknife_counts_from_subvolume_counts)
 from .cpairs import npairs_jackknife_xy_z_engine
 from .npairs_xy_z import _npairs_xy_z_process_args
 
@@ -23,7 +22,8 @@ __all__ = ('npairs_jackknife_xy_z', )
 def npairs_jackknife_xy_z(sample1, sample2, rp_bins, pi_bins,
         period=None, weights1=None, weights2=None,
         jtags1=None, jtags2=None, N_samples=0, verbose=False, num_threads=1,
-        approx_cell1_size=None, approx_cell2_size=None):
+        approx_cell1_size=None, approx_cell2_size=None,
+        autocorr=False):
     r"""
     Pair counter used to make jackknife error estimates of redshift-space pair counter
     `~halotools.mock_observables.pair_counters.npairs_xy_z`.
@@ -82,10 +82,10 @@ def npairs_jackknife_xy_z(sample1, sample2, rp_bins, pi_bins,
 
     num_threads : int, optional
         Number of threads to use in calculation, where parallelization is performed
-        using the python ``multiprocessing`` module. Default is 1 for a purely serial
-        calculation, in which case a multiprocessing Pool object will
-        never be instantiated. A string 'max' may be used to indicate that
+        with OpenMP threads that share the input arrays in memory. Default is 1
+        for a purely serial calculation. A string 'max' may be used to indicate that
         the pair counters should use all available cores on the machine.
+        If Halotools was built without OpenMP support the calculation is serial.
 
     approx_cell1_size : array_like, optional
         Length-3 array serving as a guess for the optimal manner by how points
@@ -96,11 +96,19 @@ def npairs_jackknife_xy_z(sample1, sample2, rp_bins, pi_bins,
         Performance can vary sensitively with this parameter, so it is highly
         recommended that you experiment with this parameter when carrying out
         performance-critical calculations.
+        Set to the string 'auto' to choose the cell sizes by timing a few candidates;
+        the choice is remembered for similar samples on the same machine.
 
     approx_cell2_size : array_like, optional
         Analogous to ``approx_cell1_size``, but for sample2.  See comments for
         ``approx_cell1_size`` for details.
 
+    autocorr : bool, optional
+        If True, ``sample2`` must be identical to ``sample1`` and likewise for the
+        weights and jackknife tags, and each pair of points is counted only once rather
+        than twice, halving the work of the calculation. Pairs formed by a point with
+        itself are not counted. Default is False.
+
     Returns
     -------
     N_pairs : array_like
@@ -118,6 +126,11 @@ def npairs_jackknife_xy_z(sample1, sample2, rp_bins, pi_bins,
     If both points are inside the sample, the weighting function returns (w1 * w2)
     If one point is inside, and the other is outside, the weighting function returns (w1 * w2)/2
 
+    Each pair is counted only once, into a matrix of the counts between every pair of
+    subvolumes, from which the counts of the full sample and of all
+    jackknife samples are derived. The cost of the calculation is therefore
+    nearly independent of ``N_samples``.
+
     Examples
     --------
     For demonstration purposes we create randomly distributed sets of points within a
@@ -169,6 +182,8 @@ def npairs_jackknife_xy_z(sample1, sample2, rp_bins, pi_bins,
         _npairs_jackknife_xy_z_process_weights_jtags(sample1, sample2,
             weights1, weights2, jtags1, jtags2, N_samples))
 
+    _verify_autocorr_inputs(autocorr, (sample1, sample2), (weights1, weights2), (jtags1, jtags2))
+
     # Compute the estimates for the cell sizes
     approx_cell1_size, approx_cell2_size = (
         _set_approximate_cell_sizes(approx_cell1_size, approx_cell2_size, period)
@@ -180,26 +195,21 @@ def npairs_jackknife_xy_z(sample1, sample2, rp_bins, pi_bins,
     double_mesh = RectangularDoubleMesh(x1in, y1in, z1in, x2in, y2in, z2in,
         approx_x1cell_size, approx_y1cell_size, approx_z1cell_size,
         approx_x2cell_size, approx_y2cell_size, approx_z2cell_size,
-        search_xlength, search_ylength, search_zlength, xperiod, yperiod, zperiod, PBCs)
-
-    # Create a function object that has a single argument, for parallelization purposes
-    engine = partial(npairs_jackknife_xy_z_engine,
-        double_mesh, x1in, y1in, z1in, x2in, y2in, z2in,
-        weights1, weights2, jtags1, jtags2, N_samples, rp_bins, pi_bins)
-
-    # Calculate the cell1 indices that will be looped over by the engine
-    num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
-
-    if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = pool.map(engine, cell1_tuples)
-        counts = np.sum(np.array(result), axis=0)
-        pool.close()
-    else:
-        counts = engine(cell1_tuples[0])
-
-    return np.array(counts)
+        search_xlength, search_ylength, search_zlength, xperiod, yperiod, zperiod, PBCs,
+        autocorr=autocorr)
+
+    # The engine loops over every cell of mesh1 in a single call, sharing the cells
+    # between ``num_threads`` OpenMP threads that all read the same input arrays
+    cell1_tuple = (0, double_mesh.mesh1.ncells)
+    busy_time = np.zeros(num_threads)
+    subvol_counts = npairs_jackknife_xy_z_engine(double_mesh,
+        x1in, y1in, z1in, x2in, y2in, z2in, weights1, weights2, jtags1, jtags2,
+        N_samples, rp_bins, pi_bins, cell1_tuple, num_threads, busy_time)
+    _record_worker_busy_times(busy_time)
+
+    # Each pair was counted once in the matrix of subvolume pairs,
+    # from which the full and jackknife counts are derived
+    return _jackknife_counts_from_subvolume_counts(subvol_counts)
 
 
 def _npairs_jackknife_xy_z_process_weights_jtags(sample1, sample2,
@@ -0,0 +1,134 @@
+""" Module containing the `~halotools.mock_observables.npairs_labeled_3d` function
+used to count pairs between several samples in a single pass.
+"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+import numpy as np
+
+from .rectangular_mesh import RectangularDoubleMesh
+from .mesh_helpers import (_set_approximate_cell_sizes, _record_worker_busy_times,
+    _process_sample_labels)
+from .cpairs import npairs_labeled_3d_engine
+from .npairs_3d import _npairs_3d_process_args
+
+__author__ = ('Andrew Hearin', 'Duncan Campbell')
+
+__all__ = ('npairs_labeled_3d', )
+
+
+def npairs_labeled_3d(sample, labels, rbins, period=None,
+        verbose=False, num_threads=1, approx_cell_size=None):
+    """
+    Function counts the number of pairs of points separated by
+    a three-dimensional distance smaller than the input ``rbins``,
+    for every combination of the samples stacked in the input ``sample``.
+
+    The points of all samples are stored in one array, and ``labels`` stores the
+    sample each point belongs to. The mesh is traversed once, and each pair of points
+    is found once and added to the histogram of its pair of labels. This gives
+    all the auto- and cross-sample pair counts of e.g. data and random points
+    for the cost of a single auto-correlation pair count of the stacked sample.
+
+    Parameters
+    ----------
+    sample : array_like
+        Numpy array of shape (Npts, 3) containing 3-D positions of the points
+        of all samples.
+        See the :ref:`mock_obs_pos_formatting` documentation page, or the
+        Examples section below, for instructions on how to transform
+        your coordinate position arrays into the
+        format accepted by the ``sample`` argument.
+        Length units are comoving and assumed to be in Mpc/h, here and throughout Halotools.
+
+    labels : array_like
+        Integer array of shape (Npts, ) storing the sample label of each point,
+        an integer between 0 and Nlabels-1.
+
+    rbins : array_like
+        Boundaries defining the bins in which pairs are counted.
+
+    period : array_like, optional
+        Length-3 sequence defining the periodic boundary conditions
+        in each dimension. If you instead provide a single scalar, Lbox,
+        period is assumed to be the same in all Cartesian directions.
+
+    verbose : Boolean, optional
+        If True, print out information and progress.
+
+    num_threads : int, optional
+        Number of threads to use in calculation, where parallelization is performed
+        with OpenMP threads that share the input arrays in memory. Default is 1
+        for a purely serial calculation. A string 'max' may be used to indicate that
+        the pair counters should use all available cores on the machine.
+        If Halotools was built without OpenMP support the calculation is serial.
+
+    approx_cell_size : array_like, optional
+        Length-3 array serving as a guess for the optimal manner by how points
+        will be apportioned into subvolumes of the simulation box.
+        See the ``approx_cell1_size`` argument of
+        `~halotools.mock_observables.npairs_3d` for details.
+
+    Returns
+    -------
+    num_pairs : array_like
+        Numpy array of shape (Nlabels, Nlabels, len(rbins)).
+        The entry [a, b] stores the numbers of pairs in the input bins
+        of points with label a and points with label b, and is identical to
+        the result of `~halotools.mock_observables.npairs_3d` called with these
+        two samples, except that pairs formed by a point with itself are not counted.
+
+    Examples
+    --------
+    For demonstration purposes we create randomly distributed sets of points within a
+    periodic unit cube.
+
+    >>> Npts1, Npts2, Lbox = 1000, 1000, 250.
+    >>> period = [Lbox, Lbox, Lbox]
+    >>> rbins = np.logspace(-1, 1.5, 15)
+
+    >>> sample1 = np.random.uniform(0, Lbox, Npts1*3).reshape((Npts1, 3))
+    >>> sample2 = np.random.uniform(0, Lbox, Npts2*3).reshape((Npts2, 3))
+
+    We stack the two samples and label the points of each sample:
+
+    >>> sample = np.concatenate((sample1, sample2))
+    >>> labels = np.repeat([0, 1], [Npts1, Npts2])
+
+    >>> result = npairs_labeled_3d(sample, labels, rbins, period=period)
+    >>> cross_counts = result[0, 1]
+
+    """
+    labels, num_labels = _process_sample_labels(sample, labels)
+
+    # Process the inputs with the helper function
+    result = _npairs_3d_process_args(sample, sample, rbins, period,
+            verbose, num_threads, approx_cell_size, approx_cell_size)
+    xin, yin, zin = result[0:3]
+    rbins, period, num_threads, PBCs, approx_cell1_size, approx_cell2_size = result[6:]
+    xperiod, yperiod, zperiod = period
+
+    rmax = np.max(rbins)
+    search_xlength, search_ylength, search_zlength = rmax, rmax, rmax
+
+    # Compute the estimates for the cell sizes
+    approx_cell1_size, approx_cell2_size = (
+        _set_approximate_cell_sizes(approx_cell1_size, approx_cell2_size, period)
+        )
+    approx_x1cell_size, approx_y1cell_size, approx_z1cell_size = approx_cell1_size
+
+    # Build the rectangular mesh of the stacked samples in auto-correlation mode
+    double_mesh = RectangularDoubleMesh(xin, yin, zin, xin, yin, zin,
+        approx_x1cell_size, approx_y1cell_size, approx_z1cell_size,
+        approx_x1cell_size, approx_y1cell_size, approx_z1cell_size,
+        search_xlength, search_ylength, search_zlength, xperiod, yperiod, zperiod, PBCs,
+        autocorr=True)
+
+    # The engine loops over every cell of mesh1 in a single call, sharing the cells
+    # between ``num_threads`` OpenMP threads that all read the same input arrays
+    cell1_tuple = (0, double_mesh.mesh1.ncells)
+    busy_time = np.zeros(num_threads)
+    counts = npairs_labeled_3d_engine(double_mesh,
+        xin, yin, zin, labels, num_labels, rbins, cell1_tuple, num_threads,
+        busy_time)
+    _record_worker_busy_times(busy_time)
+
+    return np.array(counts)
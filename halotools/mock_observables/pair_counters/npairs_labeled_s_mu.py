@@ -0,0 +1,151 @@
+r""" Module containing the `~halotools.mock_observables.npairs_labeled_s_mu` function
+used to count pairs between several samples in a single pass.
+"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+import numpy as np
+
+from .rectangular_mesh import RectangularDoubleMesh
+from .mesh_helpers import (_set_approximate_cell_sizes, _record_worker_busy_times,
+    _process_sample_labels)
+from .cpairs import npairs_labeled_s_mu_engine
+from .npairs_3d import _npairs_3d_process_args
+from ...utils.array_utils import array_is_monotonic
+
+__author__ = ('Andrew Hearin', 'Duncan Campbell')
+
+__all__ = ('npairs_labeled_s_mu', )
+
+
+def npairs_labeled_s_mu(sample, labels, s_bins, mu_bins, period=None,
+        verbose=False, num_threads=1, approx_cell_size=None):
+    r"""
+    Function counts the number of pairs of points separated by less than
+    radial separation, :math:`s`, given by ``s_bins`` and
+    angular distance, :math:`\mu\equiv\cos(\theta_{\rm los})`, given by ``mu_bins``,
+    for every combination of the samples stacked in the input ``sample``.
+
+    The points of all samples are stored in one array, and ``labels`` stores the
+    sample each point belongs to. The mesh is traversed once, and each pair of points
+    is found once and added to the histogram of its pair of labels.
+    See `~halotools.mock_observables.npairs_labeled_3d` for details.
+
+    Parameters
+    ----------
+    sample : array_like
+        Numpy array of shape (Npts, 3) containing 3-D positions of the points
+        of all samples.
+        See the :ref:`mock_obs_pos_formatting` documentation page for
+        instructions on how to transform your coordinate position arrays into the
+        format accepted by the ``sample`` argument.
+        Length units are comoving and assumed to be in Mpc/h, here and throughout Halotools.
+
+    labels : array_like
+        Integer array of shape (Npts, ) storing the sample label of each point,
+        an integer between 0 and Nlabels-1.
+
+    s_bins : array_like
+        numpy array of shape (num_s_bin_edges, ) storing the :math:`s`
+        boundaries defining the bins in which pairs are counted.
+
+    mu_bins : array_like
+        numpy array of shape (num_mu_bin_edges, ) storing the
+        :math:`\cos(\theta_{\rm LOS})` boundaries defining the bins in
+        which pairs are counted. All values must be between [0,1].
+
+    period : array_like, optional
+        Length-3 sequence defining the periodic boundary conditions
+        in each dimension. If you instead provide a single scalar, Lbox,
+        period is assumed to be the same in all Cartesian directions.
+        Length units are comoving and assumed to be in Mpc/h, here and throughout Halotools.
+
+    verbose : Boolean, optional
+        If True, print out information and progress.
+
+    num_threads : int, optional
+        Number of threads to use in calculation, where parallelization is performed
+        with OpenMP threads that share the input arrays in memory. Default is 1
+        for a purely serial calculation. A string 'max' may be used to indicate that
+        the pair counters should use all available cores on the machine.
+        If Halotools was built without OpenMP support the calculation is serial.
+
+    approx_cell_size : array_like, optional
+        Length-3 array serving as a guess for the optimal manner by how points
+        will be apportioned into subvolumes of the simulation box.
+        See the ``approx_cell1_size`` argument of
+        `~halotools.mock_observables.npairs_s_mu` for details.
+
+    Returns
+    -------
+    num_pairs : array of shape (Nlabels, Nlabels, num_s_bin_edges, num_mu_bin_edges)
+        The entry [a, b] stores the number of pairs separated by less than (s, mu)
+        of points with label a and points with label b, and is identical to
+        the result of `~halotools.mock_observables.npairs_s_mu` called with these
+        two samples, except that pairs formed by a point with itself are not counted.
+
+    Examples
+    --------
+    >>> Npts1, Npts2, Lbox = 1000, 1000, 250.
+    >>> period = [Lbox, Lbox, Lbox]
+    >>> s_bins = np.logspace(-1, 1.5, 15)
+    >>> mu_bins = np.linspace(0, 1)
+
+    >>> sample1 = np.random.uniform(0, Lbox, Npts1*3).reshape((Npts1, 3))
+    >>> sample2 = np.random.uniform(0, Lbox, Npts2*3).reshape((Npts2, 3))
+    >>> sample = np.concatenate((sample1, sample2))
+    >>> labels = np.repeat([0, 1], [Npts1, Npts2])
+
+    >>> result = npairs_labeled_s_mu(sample, labels, s_bins, mu_bins, period=period)
+
+    """
+    labels, num_labels = _process_sample_labels(sample, labels)
+
+    # Process the inputs with the helper function
+    result = _npairs_3d_process_args(sample, sample, s_bins, period,
+            verbose, num_threads, approx_cell_size, approx_cell_size)
+    xin, yin, zin = result[0:3]
+    s_bins, period, num_threads, PBCs, approx_cell1_size, approx_cell2_size = result[6:]
+    xperiod, yperiod, zperiod = period
+
+    rmax = np.max(s_bins)
+
+    # process mu_bins parameter separately
+    mu_bins = np.atleast_1d(mu_bins)
+    try:
+        assert mu_bins.ndim == 1
+        assert len(mu_bins) > 1
+        if len(mu_bins) > 2:
+            assert array_is_monotonic(mu_bins, strict=True) == 1
+    except AssertionError:
+        msg = ("\n Input `mu_bins` must be a monotonically increasing \n"
+               "1D array with at least two entries")
+        raise ValueError(msg)
+    # convert to mu=sin(theta_los) binning used by the cython engine.
+    mu_bins_prime = np.sin(np.arccos(mu_bins))
+    mu_bins_prime = np.sort(mu_bins_prime)
+    # increasing mu_prime now corresponds to increasing theta_LOS
+
+    search_xlength, search_ylength, search_zlength = rmax, rmax, rmax
+
+    # Compute the estimates for the cell sizes
+    approx_cell1_size, approx_cell2_size = (
+        _set_approximate_cell_sizes(approx_cell1_size, approx_cell2_size, period)
+        )
+    approx_x1cell_size, approx_y1cell_size, approx_z1cell_size = approx_cell1_size
+
+    # Build the rectangular mesh of the stacked samples in auto-correlation mode
+    double_mesh = RectangularDoubleMesh(xin, yin, zin, xin, yin, zin,
+        approx_x1cell_size, approx_y1cell_size, approx_z1cell_size,
+        approx_x1cell_size, approx_y1cell_size, approx_z1cell_size,
+        search_xlength, search_ylength, search_zlength, xperiod, yperiod, zperiod, PBCs,
+        autocorr=True)
+
+    # The engine loops over every cell of mesh1 in a single call, sharing the cells
+    # between ``num_threads`` OpenMP threads that all read the same input arrays
+    cell1_tuple = (0, double_mesh.mesh1.ncells)
+    busy_time = np.zeros(num_threads)
+    counts = npairs_labeled_s_mu_engine(double_mesh,
+        xin, yin, zin, labels, num_labels, s_bins, mu_bins_prime, cell1_tuple,
+        num_threads, busy_time)
+    _record_worker_busy_times(busy_time)
+
+    return np.array(counts)
@@ -3,11 +3,9 @@ used to count pairs as a function of separation.
 """
 from __future__ import (absolute_import, division, print_function, unicode_literals)
 import numpy as np
-import multiprocessing
-from functools import partial
 
 from .rectangular_mesh import RectangularDoubleMesh
-from .mesh_helpers import _set_approximate_cell_sizes, _cell1_parallelization_indices
+from .mesh_helpers import _set_approximate_cell_sizes, _record_worker_busy_times
 from .cpairs import npairs_per_object_3d_engine
 from .npairs_3d import _npairs_3d_process_args
 
@@ -53,10 +51,10 @@ def npairs_per_object_3d(sample1, sample2, rbins, period=None,
 
     num_threads : int, optional
         Number of threads to use in calculation, where parallelization is performed
-        using the python ``multiprocessing`` module. Default is 1 for a purely serial
-        calculation, in which case a multiprocessing Pool object will
-        never be instantiated. A string 'max' may be used to indicate that
+        with OpenMP threads that share the input arrays in memory. Default is 1
+        for a purely serial calculation. A string 'max' may be used to indicate that
         the pair counters should use all available cores on the machine.
+        If Halotools was built without OpenMP support the calculation is serial.
 
     approx_cell1_size : array_like, optional
         Length-3 array serving as a guess for the optimal manner by how points
@@ -67,6 +65,8 @@ def npairs_per_object_3d(sample1, sample2, rbins, period=None,
         Performance can vary sensitively with this parameter, so it is highly
         recommended that you experiment with this parameter when carrying out
         performance-critical calculations.
+        Set to the string 'auto' to choose the cell sizes by timing a few candidates;
+        the choice is remembered for similar samples on the same machine.
 
     approx_cell2_size : array_like, optional
         Analogous to ``approx_cell1_size``, but for sample2.  See comments for
@@ -126,21 +126,13 @@ def npairs_per_object_3d(sample1, sample2, rbins, period=None,
         approx_x2cell_size, approx_y2cell_size, approx_z2cell_size,
         search_xlength, search_ylength, search_zlength, xperiod, yperiod, zperiod, PBCs)
 
-    # Create a function object that has a single argument, for parallelization purposes
-    engine = partial(npairs_per_object_3d_engine,
-        double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, rbins)
-
-    # Calculate the cell1 indices that will be looped over by the engine
-    num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
-
-    if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = pool.map(engine, cell1_tuples)
-        counts = np.sum(np.array(result), axis=0)
-        pool.close()
-    else:
-        result = engine(cell1_tuples[0])
-        counts = np.vstack(result)
+    # The engine loops over every cell of mesh1 in a single call, sharing the cells
+    # between ``num_threads`` OpenMP threads that all read the same input arrays
+    cell1_tuple = (0, double_mesh.mesh1.ncells)
+    busy_time = np.zeros(num_threads)
+    counts = npairs_per_object_3d_engine(double_mesh,
+        x1in, y1in, z1in, x2in, y2in, z2in, rbins, cell1_tuple, num_threads,
+        busy_time)
+    _record_worker_busy_times(busy_time)
 
     return np.array(counts)
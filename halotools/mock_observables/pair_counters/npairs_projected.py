@@ -4,11 +4,11 @@ used to count pairs as a function of separation.
 from __future__ import (absolute_import, division, print_function, unicode_literals)
 import numpy as np
 import multiprocessing
-from functools import partial
 
 from .rectangular_mesh import RectangularDoubleMesh
+from .cell_size_autotuner import _is_auto
 from .mesh_helpers import (_set_approximate_cell_sizes, _enclose_in_box,
-    _cell1_parallelization_indices)
+    _verify_autocorr_inputs, _record_worker_busy_times)
 from .cpairs import npairs_projected_engine
 from ...utils.array_utils import array_is_monotonic, custom_len
 
@@ -19,7 +19,8 @@ __all__ = ('npairs_projected', )
 
 def npairs_projected(sample1, sample2, rp_bins, pi_max, period=None,
         verbose=False, num_threads=1,
-        approx_cell1_size=None, approx_cell2_size=None):
+        approx_cell1_size=None, approx_cell2_size=None,
+        autocorr=False):
     """
     Function counts the number of pairs of points with separation in the xy-plane
     less than the input ``rp_bins`` and separation in the z-dimension less than
@@ -67,10 +68,10 @@ def npairs_projected(sample1, sample2, rp_bins, pi_max, period=None,
 
     num_threads : int, optional
         Number of threads to use in calculation, where parallelization is performed
-        using the python ``multiprocessing`` module. Default is 1 for a purely serial
-        calculation, in which case a multiprocessing Pool object will
-        never be instantiated. A string 'max' may be used to indicate that
+        with OpenMP threads that share the input arrays in memory. Default is 1
+        for a purely serial calculation. A string 'max' may be used to indicate that
         the pair counters should use all available cores on the machine.
+        If Halotools was built without OpenMP support the calculation is serial.
 
     approx_cell1_size : array_like, optional
         Length-3 array serving as a guess for the optimal manner by how points
@@ -81,11 +82,18 @@ def npairs_projected(sample1, sample2, rp_bins, pi_max, period=None,
         Performance can vary sensitively with this parameter, so it is highly
         recommended that you experiment with this parameter when carrying out
         performance-critical calculations.
+        Set to the string 'auto' to choose the cell sizes by timing a few candidates;
+        the choice is remembered for similar samples on the same machine.
 
     approx_cell2_size : array_like, optional
         Analogous to ``approx_cell1_size``, but for sample2.  See comments for
         ``approx_cell1_size`` for details.
 
+    autocorr : bool, optional
+        If True, ``sample2`` must be identical to ``sample1``, and each pair of points
+        is counted only once rather than twice, halving the work of the calculation.
+        Pairs formed by a point with itself are not counted. Default is False.
+
     Returns
     -------
     num_pairs : array_like
@@ -129,6 +137,8 @@ def npairs_projected(sample1, sample2, rp_bins, pi_max, period=None,
     rp_max = np.max(rp_bins)
     search_xlength, search_ylength, search_zlength = rp_max, rp_max, pi_max
 
+    _verify_autocorr_inputs(autocorr, (sample1, sample2))
+
     # Compute the estimates for the cell sizes
     approx_cell1_size, approx_cell2_size = (
         _set_approximate_cell_sizes(approx_cell1_size, approx_cell2_size, period)
@@ -140,23 +150,17 @@ def npairs_projected(sample1, sample2, rp_bins, pi_max, period=None,
     double_mesh = RectangularDoubleMesh(x1in, y1in, z1in, x2in, y2in, z2in,
         approx_x1cell_size, approx_y1cell_size, approx_z1cell_size,
         approx_x2cell_size, approx_y2cell_size, approx_z2cell_size,
-        search_xlength, search_ylength, search_zlength, xperiod, yperiod, zperiod, PBCs)
-
-    # # Create a function object that has a single argument, for parallelization purposes
-    engine = partial(npairs_projected_engine,
-        double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, rp_bins, pi_max)
-
-    # # Calculate the cell1 indices that will be looped over by the engine
-    num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
-
-    if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = pool.map(engine, cell1_tuples)
-        counts = np.sum(np.array(result), axis=0)
-        pool.close()
-    else:
-        counts = engine(cell1_tuples[0])
+        search_xlength, search_ylength, search_zlength, xperiod, yperiod, zperiod, PBCs,
+        autocorr=autocorr)
+
+    # The engine loops over every cell of mesh1 in a single call, sharing the cells
+    # between ``num_threads`` OpenMP threads that all read the same input arrays
+    cell1_tuple = (0, double_mesh.mesh1.ncells)
+    busy_time = np.zeros(num_threads)
+    counts = npairs_projected_engine(double_mesh,
+        x1in, y1in, z1in, x2in, y2in, z2in, rp_bins, pi_max, cell1_tuple,
+        num_threads, busy_time)
+    _record_worker_busy_times(busy_time)
 
     return np.array(counts)
 
@@ -222,7 +226,7 @@ def _npairs_projected_process_args(sample1, sample2, rp_bins, pi_max, period,
     elif custom_len(approx_cell1_size) == 1:
         approx_cell1_size = [approx_cell1_size, approx_cell1_size, approx_cell1_size]
     if approx_cell2_size is None:
-        approx_cell2_size = [rp_max, rp_max, rp_max]
+        approx_cell2_size = 'auto' if _is_auto(approx_cell1_size) else [rp_max, rp_max, rp_max]
     elif custom_len(approx_cell2_size) == 1:
         approx_cell2_size = [approx_cell2_size, approx_cell2_size, approx_cell2_size]
 
@@ -6,11 +6,13 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 import numpy as np
 import multiprocessing
 from functools import partial
-from scipy.sparse import coo_matrix
+from scipy.sparse import coo_matrix, csr_matrix
 
 
 from .rectangular_mesh import RectangularDoubleMesh
-from .mesh_helpers import _set_approximate_cell_sizes, _enclose_in_box, _cell1_parallelization_indices
+from .cell_size_autotuner import _is_auto
+from .mesh_helpers import (_set_approximate_cell_sizes, _enclose_in_box,
+    _record_worker_busy_times)
 from .cpairs import pairwise_distance_3d_engine
 
 from ...utils.array_utils import custom_len
@@ -22,7 +24,9 @@ __all__ = ('pairwise_distance_3d', )
 
 def pairwise_distance_3d(data1, data2, r_max, period=None,
         verbose=False, num_threads=1,
-        approx_cell1_size=None, approx_cell2_size=None):
+        approx_cell1_size=None, approx_cell2_size=None,
+        output_format='coo', distance_dtype='f8',
+        pair_block_callback=None, max_pairs_per_block=int(1e7)):
     """
     Function returns pairs of points separated by
     a three-dimensional distance smaller than or eqaul to the input ``r_max``.
@@ -30,6 +34,12 @@ def pairwise_distance_3d(data1, data2, r_max, period=None,
     Note that if data1 == data2 that the
     `~halotools.mock_observables.pairwise_distance_3d` function double-counts pairs.
 
+    The pairs are found in two passes over the mesh: the first pass counts the pairs
+    of each point in ``data1``, and the second pass writes the pairs directly into
+    arrays allocated with their final size, so that the memory used by the
+    calculation is the memory of the output. If the pairs do not fit in memory,
+    use ``pair_block_callback`` to process them in blocks.
+
     Parameters
     ----------
     data1 : array_like
@@ -61,10 +71,11 @@ def pairwise_distance_3d(data1, data2, r_max, period=None,
         If True, print out information and progress.
 
     num_threads : int, optional
-        Number of CPU cores to use in the pair counting.
-        If ``num_threads`` is set to the string 'max', use all available cores.
-        Default is 1 thread for a serial calculation that
-        does not open a multiprocessing pool.
+        Number of threads to use in calculation, where parallelization is performed
+        with OpenMP threads that share the input arrays in memory. Default is 1
+        for a purely serial calculation. A string 'max' may be used to indicate that
+        the pair counters should use all available cores on the machine.
+        If Halotools was built without OpenMP support the calculation is serial.
 
     approx_cell1_size : array_like, optional
         Length-3 array serving as a guess for the optimal manner by which
@@ -76,15 +87,41 @@ def pairwise_distance_3d(data1, data2, r_max, period=None,
         Performance can vary sensitively with this parameter, so it is highly
         recommended that you experiment with this parameter when carrying out
         performance-critical calculations.
+        Set to the string 'auto' to choose the cell sizes by timing a few candidates;
+        the choice is remembered for similar samples on the same machine.
 
     approx_cell2_size : array_like, optional
         See comments for ``approx_cell1_size``.
 
+    output_format : string, optional
+        Sparse matrix format of the returned distances, either 'coo' or 'csr'.
+        The pairs are found row by row, so the 'csr' format is built without
+        any sorting or copying. Default is 'coo'.
+
+    distance_dtype : string, optional
+        Data type of the returned distances, either 'f4' or 'f8'.
+        Single precision halves the memory used by the distances. Default is 'f8'.
+
+    pair_block_callback : callable, optional
+        Function called as ``pair_block_callback(i, j, distance)`` with the pairs
+        of one block of the cells of the mesh of ``data1``, where ``i`` and ``j``
+        are integer arrays of indices in ``data1`` and ``data2``, and ``distance``
+        are their separations. When this argument is passed, only one block of pairs
+        is held in memory at a time, and the function returns None.
+        To write the pairs to disk, append each block to an open file or to
+        a resizable dataset of an hdf5 file. Default is None.
+
+    max_pairs_per_block : int, optional
+        Maximum number of pairs passed to each call of ``pair_block_callback``.
+        A block always holds all the pairs of a cell, so a block
+        exceeds this size if a single cell does. Default is 1e7.
+
     Returns
     -------
-     distance : `~scipy.sparse.coo_matrix`
-        sparse matrix in COO format containing distances
-        between the ith entry in ``data1`` and jth in ``data2``.
+     distance : `~scipy.sparse.coo_matrix` or `~scipy.sparse.csr_matrix`
+        sparse matrix containing distances
+        between the ith entry in ``data1`` and jth in ``data2``,
+        or None if ``pair_block_callback`` is passed.
 
     Examples
     --------
@@ -111,11 +148,22 @@ def pairwise_distance_3d(data1, data2, r_max, period=None,
 
     >>> dist_matrix = pairwise_distance_3d(data1, data2, r_max, period = period)
 
+    The pairs can also be streamed in blocks, e.g., to accumulate
+    the number of neighbors of each point in ``data1``:
+
+    >>> num_neighbors = np.zeros(Npts1, dtype=int)
+    >>> def count_neighbors(i, j, distance):
+    ...     num_neighbors[:] += np.bincount(i, minlength=Npts1)
+    >>> pairwise_distance_3d(data1, data2, r_max, period=period,
+    ...     pair_block_callback=count_neighbors, max_pairs_per_block=1000)
+
     """
 
     # Process the inputs with the helper function
     result = _pairwise_distance_3d_process_args(data1, data2, r_max, period,
             verbose, num_threads, approx_cell1_size, approx_cell2_size)
+    distance_dtype = _pair_list_output_process_args(output_format, distance_dtype,
+        pair_block_callback, max_pairs_per_block)
     x1in, y1in, z1in, x2in, y2in, z2in = result[0:6]
     r_max, max_r_max, period, num_threads, PBCs, approx_cell1_size, approx_cell2_size = result[6:]
     xperiod, yperiod, zperiod = period
@@ -135,33 +183,15 @@ def pairwise_distance_3d(data1, data2, r_max, period=None,
         approx_x2cell_size, approx_y2cell_size, approx_z2cell_size,
         search_xlength, search_ylength, search_zlength, xperiod, yperiod, zperiod, PBCs)
 
-    # Create a function object that has a single argument, for parallelization purposes
+    # Create a function object that only needs the arguments of the two passes
     engine = partial(pairwise_distance_3d_engine,
         double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, r_max)
 
-    # Calculate the cell1 indices that will be looped over by the engine
-    num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
-
-    if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = pool.map(engine, cell1_tuples)
-        pool.close()
-    else:
-        result = [engine(cell1_tuples[0])]
-
-    # unpack result
-    d = np.zeros((0,), dtype='float')
-    i_inds = np.zeros((0,), dtype='int')
-    j_inds = np.zeros((0,), dtype='int')
-
-    # unpack the results
-    for i in range(len(result)):
-        d = np.append(d, result[i][0])
-        i_inds = np.append(i_inds, result[i][1])
-        j_inds = np.append(j_inds, result[i][2])
-
-    return coo_matrix((d, (i_inds, j_inds)), shape=(len(data1), len(data2)))
+    result = _pair_list_output(engine, double_mesh, (len(data1), len(data2)), 1,
+        num_threads, output_format, distance_dtype,
+        pair_block_callback, max_pairs_per_block)
+    if result is not None:
+        return result[0]
 
 
 def _pairwise_distance_3d_process_args(data1, data2, r_max, period,
@@ -210,7 +240,7 @@ def _pairwise_distance_3d_process_args(data1, data2, r_max, period,
     elif custom_len(approx_cell1_size) == 1:
         approx_cell1_size = [approx_cell1_size, approx_cell1_size, approx_cell1_size]
     if approx_cell2_size is None:
-        approx_cell2_size = [max_r_max, max_r_max, max_r_max]
+        approx_cell2_size = 'auto' if _is_auto(approx_cell1_size) else [max_r_max, max_r_max, max_r_max]
     elif custom_len(approx_cell2_size) == 1:
         approx_cell2_size = [approx_cell2_size, approx_cell2_size, approx_cell2_size]
 
@@ -244,3 +274,105 @@ def _get_r_max(sample1, r_max):
         raise ValueError(msg)
 
     return r_max
+
+
+def _pair_list_output_process_args(output_format, distance_dtype,
+        pair_block_callback, max_pairs_per_block):
+    """ Helper function to process the arguments controlling the output of
+    `~halotools.mock_observables.pairwise_distance_3d` and
+    `~halotools.mock_observables.pairwise_distance_xy_z`.
+    """
+    if output_format not in ('coo', 'csr'):
+        msg = "Input ``output_format`` must be either 'coo' or 'csr'"
+        raise ValueError(msg)
+
+    try:
+        distance_dtype = np.dtype(distance_dtype)
+        assert distance_dtype in (np.dtype('f4'), np.dtype('f8'))
+    except (TypeError, AssertionError):
+        msg = "Input ``distance_dtype`` must be either 'f4' or 'f8'"
+        raise ValueError(msg)
+
+    if pair_block_callback is not None:
+        if not callable(pair_block_callback):
+            msg = "Input ``pair_block_callback`` must be a callable function"
+            raise ValueError(msg)
+        try:
+            assert int(max_pairs_per_block) == max_pairs_per_block
+            assert max_pairs_per_block > 0
+        except (TypeError, ValueError, AssertionError):
+            msg = "Input ``max_pairs_per_block`` must be a positive integer"
+            raise ValueError(msg)
+
+    return distance_dtype
+
+
+def _pair_list_output(engine, double_mesh, shape, num_distances, num_threads,
+        output_format, distance_dtype, pair_block_callback, max_pairs_per_block):
+    """ Run the counting and filling passes of a pairwise distance engine.
+
+    ``engine`` is called as ``engine(cell1_tuple, cursor, j_out, *distance_outs,
+    fill, num_threads, busy_time)``, where ``distance_outs`` holds ``num_distances``
+    arrays. Returns a tuple of ``num_distances`` sparse matrices,
+    or None if the pairs are passed to ``pair_block_callback``.
+    """
+    num_threads = max(num_threads, 1)
+    busy_time = np.zeros(num_threads)
+    index_dtype = np.int32 if max(shape) < np.iinfo(np.int32).max else np.int64
+
+    def run_engine(cell1_tuple, cursor, j_out, distance_outs, fill):
+        args = (cell1_tuple, cursor, j_out) + tuple(distance_outs)
+        engine(*(args + (fill, num_threads, busy_time)))
+
+    # First pass: count the pairs of each point, in the order of the sorted mesh
+    idx_sorted1 = double_mesh.mesh1.idx_sorted
+    ncells1 = double_mesh.mesh1.ncells
+    counts_sorted = np.zeros(shape[0], dtype=np.int64)
+    run_engine((0, ncells1), counts_sorted, np.zeros(0, dtype=index_dtype),
+        [np.zeros(0, dtype=distance_dtype)]*num_distances, 0)
+    first_pair_sorted = np.append(0, np.cumsum(counts_sorted))
+
+    if pair_block_callback is None:
+        # Second pass: each point writes its pairs starting at its row of the CSR matrix
+        counts = np.empty(shape[0], dtype=np.int64)
+        counts[idx_sorted1] = counts_sorted
+        indptr = np.append(0, np.cumsum(counts))
+        num_pairs = indptr[-1]
+
+        cursor = np.ascontiguousarray(indptr[:-1][idx_sorted1])
+        j_inds = np.empty(num_pairs, dtype=index_dtype)
+        distances = [np.empty(num_pairs, dtype=distance_dtype) for __ in range(num_distances)]
+        run_engine((0, ncells1), cursor, j_inds, distances, 1)
+        _record_worker_busy_times(busy_time)
+
+        if output_format == 'csr':
+            return tuple(csr_matrix((d, j_inds, indptr), shape=shape) for d in distances)
+        else:
+            i_inds = np.repeat(np.arange(shape[0], dtype=index_dtype), counts)
+            return tuple(coo_matrix((d, (i_inds, j_inds)), shape=shape) for d in distances)
+
+    # Second pass in blocks of consecutive cells holding at most
+    # max_pairs_per_block pairs, unless a single cell holds more
+    first_pair_cell = first_pair_sorted[double_mesh.mesh1.cell_id_indices]
+    cursor = np.zeros(shape[0], dtype=np.int64)
+    first_cell = 0
+    while first_cell < ncells1:
+        last_cell = np.searchsorted(first_pair_cell,
+            first_pair_cell[first_cell] + max_pairs_per_block, side='right') - 1
+        last_cell = min(max(last_cell, first_cell + 1), ncells1)
+
+        ifirst = double_mesh.mesh1.cell_id_indices[first_cell]
+        ilast = double_mesh.mesh1.cell_id_indices[last_cell]
+        num_pairs = first_pair_sorted[ilast] - first_pair_sorted[ifirst]
+        if num_pairs > 0:
+            cursor[ifirst:ilast] = first_pair_sorted[ifirst:ilast] - first_pair_sorted[ifirst]
+            j_inds = np.empty(num_pairs, dtype=index_dtype)
+            distances = [np.empty(num_pairs, dtype=distance_dtype) for __ in range(num_distances)]
+            run_engine((first_cell, last_cell), cursor, j_inds, distances, 1)
+
+            i_inds = np.repeat(idx_sorted1[ifirst:ilast].astype(index_dtype),
+                counts_sorted[ifirst:ilast])
+            pair_block_callback(i_inds, j_inds, *distances)
+        first_cell = last_cell
+
+    _record_worker_busy_times(busy_time)
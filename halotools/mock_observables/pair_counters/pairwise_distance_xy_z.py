@@ -6,11 +6,12 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 import numpy as np
 import multiprocessing
 from functools import partial
-from scipy.sparse import coo_matrix
 
-from .pairwise_distance_3d import _get_r_max
+from .pairwise_distance_3d import (_get_r_max, _pair_list_output_process_args,
+    _pair_list_output)
 from .rectangular_mesh import RectangularDoubleMesh
-from .mesh_helpers import _set_approximate_cell_sizes, _enclose_in_box, _cell1_parallelization_indices
+from .cell_size_autotuner import _is_auto
+from .mesh_helpers import _set_approximate_cell_sizes, _enclose_in_box
 from .cpairs import pairwise_distance_xy_z_engine
 
 from ...utils.array_utils import custom_len
@@ -21,7 +22,9 @@ __author__ = ('Andrew Hearin', 'Duncan Campbell')
 
 def pairwise_distance_xy_z(data1, data2, rp_max, pi_max, period=None,
         verbose=False, num_threads=1,
-        approx_cell1_size=None, approx_cell2_size=None):
+        approx_cell1_size=None, approx_cell2_size=None,
+        output_format='coo', distance_dtype='f8',
+        pair_block_callback=None, max_pairs_per_block=int(1e7)):
     """
     Function returns pairs of points separated by
     a xy-projected distance smaller than or eqaul to the input ``rp_max`` and z distance ``pi_max``.
@@ -29,6 +32,9 @@ def pairwise_distance_xy_z(data1, data2, rp_max, pi_max, period=None,
     Note that if data1 == data2 that the
     `~halotools.mock_observables.pairwise_distance_xy_z` function double-counts pairs.
 
+    As in `~halotools.mock_observables.pairwise_distance_3d`, the pairs of each point
+    are counted before they are written into arrays allocated with their final size.
+
     Parameters
     ----------
     data1 : array_like
@@ -68,10 +74,11 @@ def pairwise_distance_xy_z(data1, data2, rp_max, pi_max, period=None,
         If True, print out information and progress.
 
     num_threads : int, optional
-        Number of CPU cores to use in the pair counting.
-        If ``num_threads`` is set to the string 'max', use all available cores.
-        Default is 1 thread for a serial calculation that
-        does not open a multiprocessing pool.
+        Number of threads to use in calculation, where parallelization is performed
+        with OpenMP threads that share the input arrays in memory. Default is 1
+        for a purely serial calculation. A string 'max' may be used to indicate that
+        the pair counters should use all available cores on the machine.
+        If Halotools was built without OpenMP support the calculation is serial.
 
     approx_cell1_size : array_like, optional
         Length-3 array serving as a guess for the optimal manner by which
@@ -83,14 +90,37 @@ def pairwise_distance_xy_z(data1, data2, rp_max, pi_max, period=None,
         Performance can vary sensitively with this parameter, so it is highly
         recommended that you experiment with this parameter when carrying out
         performance-critical calculations.
+        Set to the string 'auto' to choose the cell sizes by timing a few candidates;
+        the choice is remembered for similar samples on the same machine.
 
     approx_cell2_size : array_like, optional
         See comments for ``approx_cell1_size``.
 
+    output_format : string, optional
+        Sparse matrix format of the returned distances, either 'coo' or 'csr'.
+        Default is 'coo'.
+
+    distance_dtype : string, optional
+        Data type of the returned distances, either 'f4' or 'f8'. Default is 'f8'.
+
+    pair_block_callback : callable, optional
+        Function called as ``pair_block_callback(i, j, perp_distance, para_distance)``
+        with the pairs of one block of the cells of the mesh of ``data1``.
+        When this argument is passed, only one block of pairs is held in memory
+        at a time, and the function returns None. Default is None.
+
+    max_pairs_per_block : int, optional
+        Maximum number of pairs passed to each call of ``pair_block_callback``,
+        unless a single cell holds more pairs. Default is 1e7.
+
     Returns
     -------
-     distance : `~scipy.sparse.coo_matrix`
-        sparse matrix in COO format containing distances
+     perp_distance : `~scipy.sparse.coo_matrix` or `~scipy.sparse.csr_matrix`
+        sparse matrix containing xy-projected distances
+        between the ith entry in ``data1`` and jth in ``data2``.
+
+     para_distance : `~scipy.sparse.coo_matrix` or `~scipy.sparse.csr_matrix`
+        sparse matrix containing z distances
         between the ith entry in ``data1`` and jth in ``data2``.
 
     Examples
@@ -124,6 +154,8 @@ def pairwise_distance_xy_z(data1, data2, rp_max, pi_max, period=None,
     # Process the inputs with the helper function
     result = _pairwise_distance_xy_z_process_args(data1, data2, rp_max, pi_max, period,
             verbose, num_threads, approx_cell1_size, approx_cell2_size)
+    distance_dtype = _pair_list_output_process_args(output_format, distance_dtype,
+        pair_block_callback, max_pairs_per_block)
     x1in, y1in, z1in, x2in, y2in, z2in = result[0:6]
     rp_max, max_rp_max, pi_max, max_pi_max, period, num_threads, PBCs, approx_cell1_size, approx_cell2_size = result[6:]
     xperiod, yperiod, zperiod = period
@@ -143,36 +175,13 @@ def pairwise_distance_xy_z(data1, data2, rp_max, pi_max, period=None,
         approx_x2cell_size, approx_y2cell_size, approx_z2cell_size,
         search_xlength, search_ylength, search_zlength, xperiod, yperiod, zperiod, PBCs)
 
-    # Create a function object that has a single argument, for parallelization purposes
+    # Create a function object that only needs the arguments of the two passes
     engine = partial(pairwise_distance_xy_z_engine,
         double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, rp_max, pi_max)
 
-    # Calculate the cell1 indices that will be looped over by the engine
-    num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
-
-    if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = pool.map(engine, cell1_tuples)
-        pool.close()
-    else:
-        result = [engine(cell1_tuples[0])]
-
-    # unpack result
-    d_perp = np.zeros((0,), dtype='float')
-    d_para = np.zeros((0,), dtype='float')
-    i_inds = np.zeros((0,), dtype='int')
-    j_inds = np.zeros((0,), dtype='int')
-
-    # unpack the results
-    for i in range(len(result)):
-        d_perp = np.append(d_perp, result[i][0])
-        d_para = np.append(d_para, result[i][1])
-        i_inds = np.append(i_inds, result[i][2])
-        j_inds = np.append(j_inds, result[i][3])
-
-    return (coo_matrix((d_perp, (i_inds, j_inds)), shape=(len(data1), len(data2))),
-        coo_matrix((d_para, (i_inds, j_inds)), shape=(len(data1), len(data2))))
+    return _pair_list_output(engine, double_mesh, (len(data1), len(data2)), 2,
+        num_threads, output_format, distance_dtype,
+        pair_block_callback, max_pairs_per_block)
 
 
 def _pairwise_distance_xy_z_process_args(data1, data2, rp_max, pi_max, period,
@@ -223,7 +232,7 @@ def _pairwise_distance_xy_z_process_args(data1, data2, rp_max, pi_max, period,
     elif custom_len(approx_cell1_size) == 1:
         approx_cell1_size = [approx_cell1_size, approx_cell1_size, approx_cell1_size]
     if approx_cell2_size is None:
-        approx_cell2_size = [max_rp_max, max_rp_max, max_pi_max]
+        approx_cell2_size = 'auto' if _is_auto(approx_cell1_size) else [max_rp_max, max_rp_max, max_pi_max]
     elif custom_len(approx_cell2_size) == 1:
         approx_cell2_size = [approx_cell2_size, approx_cell2_size, approx_cell2_size]
 
@@ -4,13 +4,18 @@ calculations throughout the `~halotools.mock_observables` sub-package.
 """
 import numpy as np
 from math import floor
+from collections import OrderedDict
+from hashlib import sha1
 
-__all__ = ('RectangularDoubleMesh', )
+__all__ = ('RectangularDoubleMesh', 'clear_mesh_cache')
 __author__ = ('Andrew Hearin', )
 
 default_max_cells_per_dimension_cell1 = 50
 default_max_cells_per_dimension_cell2 = 50
 
+default_mesh_cache_size = 8
+_mesh_cache = OrderedDict()
+
 
 def digitized_position(p, cell_size, num_divs):
     """ Function returns a discretized spatial position of input point(s).
@@ -180,6 +185,86 @@ class RectangularMesh(object):
         return ix*(self.num_ydivs*self.num_zdivs) + iy*self.num_zdivs + iz
 
 
+def _points_fingerprint(x, y, z):
+    """ Function returns a string that uniquely identifies the contents of
+    the input coordinate arrays. Hashing the coordinates is O(Npts) and
+    considerably cheaper than the argsort performed when building a mesh.
+    """
+    h = sha1()
+    for p in (x, y, z):
+        p = np.ascontiguousarray(p)
+        h.update(str((p.dtype.str, p.shape)).encode('ascii'))
+        h.update(p.view(np.uint8))
+    return h.hexdigest()
+
+
+def cached_rectangular_mesh(x1in, y1in, z1in, xperiod, yperiod, zperiod,
+        approx_xcell_size, approx_ycell_size, approx_zcell_size,
+        cache_size=default_mesh_cache_size):
+    """ Function returns an instance of
+    `~halotools.mock_observables.pair_counters.rectangular_mesh.RectangularMesh`,
+    re-using a previously built mesh if one exists for the same points
+    and the same cell structure.
+
+    Meshes are stored in a small least-recently-used cache keyed on a hash of the
+    coordinate arrays together with the period and cell sizes, so that repeated
+    pair counts on the same sample, e.g., a fixed set of randoms in an MCMC
+    likelihood, skip the mesh construction entirely.
+    The arguments are the same as those of
+    `~halotools.mock_observables.pair_counters.rectangular_mesh.RectangularMesh`.
+
+    Parameters
+    ----------
+    cache_size : int, optional
+        Maximum number of meshes that are stored. Default is 8.
+        Setting ``cache_size`` to zero disables the cache.
+
+    Returns
+    -------
+    mesh : object
+        Instance of `~halotools.mock_observables.pair_counters.rectangular_mesh.RectangularMesh`
+
+    Examples
+    --------
+    >>> Npts, Lbox = int(1e4), 1000.
+    >>> x, y, z = np.random.uniform(0, Lbox, 3*Npts).reshape(3, Npts)
+    >>> mesh = cached_rectangular_mesh(x, y, z, Lbox, Lbox, Lbox, 100., 100., 100.)
+    >>> mesh2 = cached_rectangular_mesh(x, y, z, Lbox, Lbox, Lbox, 100., 100., 100.)
+    >>> assert mesh is mesh2
+    """
+    if cache_size <= 0:
+        return RectangularMesh(x1in, y1in, z1in, xperiod, yperiod, zperiod,
+            approx_xcell_size, approx_ycell_size, approx_zcell_size)
+
+    key = (_points_fingerprint(x1in, y1in, z1in),
+        float(xperiod), float(yperiod), float(zperiod),
+        float(approx_xcell_size), float(approx_ycell_size), float(approx_zcell_size))
+
+    try:
+        mesh = _mesh_cache.pop(key)
+    except KeyError:
+        mesh = RectangularMesh(x1in, y1in, z1in, xperiod, yperiod, zperiod,
+            approx_xcell_size, approx_ycell_size, approx_zcell_size)
+    _mesh_cache[key] = mesh
+
+    while len(_mesh_cache) > cache_size:
+        _mesh_cache.popitem(last=False)
+    return mesh
+
+
+def clear_mesh_cache():
+    """ Function empties the cache of meshes used by
+    `~halotools.mock_observables.RectangularDoubleMesh`
+    to avoid rebuilding the mesh of the same sample in repeated calls
+    to the pair-counters.
+
+    Examples
+    --------
+    >>> clear_mesh_cache()
+    """
+    _mesh_cache.clear()
+
+
 class RectangularDoubleMesh(object):
     """ Fundamental data structure of the `~halotools.mock_observables` sub-package.
     `~halotools.mock_observables.RectangularDoubleMesh` is built up from two instances
@@ -192,7 +277,8 @@ class RectangularDoubleMesh(object):
             search_xlength, search_ylength, search_zlength,
             xperiod, yperiod, zperiod, PBCs=True,
             max_cells_per_dimension_cell1=default_max_cells_per_dimension_cell1,
-            max_cells_per_dimension_cell2=default_max_cells_per_dimension_cell2):
+            max_cells_per_dimension_cell2=default_max_cells_per_dimension_cell2,
+            use_cache=True, autocorr=False):
         """
         Parameters
         ----------
@@ -206,10 +292,13 @@ class RectangularDoubleMesh(object):
             approximate cell sizes into which the simulation box will be divided.
             These are only approximate because in each dimension,
             the actual cell size must be evenly divide the box size.
+            If set to the string 'auto', the cell sizes are chosen by benchmarking
+            a few candidates, see `~halotools.mock_observables.pair_counters.clear_cell_size_cache`.
 
         approx_x2cell_size, approx_y2cell_size, approx_z2cell_size : float
             An entirely separate tree is built for the *Npts2* points, the structure of
             which is dependent on the struture of the *Npts1* tree as described below.
+            May also be set to the string 'auto'.
 
         search_xlength, search_ylength, search_zlength, floats, optional
             Maximum length over which a pair of points will searched for.
@@ -236,6 +325,20 @@ class RectangularDoubleMesh(object):
         max_cells_per_dimension_cell2 : int, optional
             Maximum number of cells per dimension. Default is 50.
 
+        use_cache : bool, optional
+            If True, the meshes of sample 1 and sample 2 are retrieved from
+            a cache of previously built meshes whenever the same points are
+            placed on the same cells, so that repeated pair counts on an
+            unchanging sample do not rebuild the mesh. Default is True.
+            See `~halotools.mock_observables.pair_counters.clear_mesh_cache`.
+
+        autocorr : bool, optional
+            If True, sample 2 is taken to be identical to sample 1,
+            and mesh2 is the same object as mesh1 so that the pair-counting engines
+            can visit each pair of cells, and each pair of points, only once.
+            In this case the inputs ``x2, y2, z2`` and the cell sizes of sample 2
+            are ignored. Default is False.
+
         """
         self.xperiod = xperiod
         self.yperiod = yperiod
@@ -244,26 +347,47 @@ class RectangularDoubleMesh(object):
         self.search_ylength = search_ylength
         self.search_zlength = search_zlength
         self._PBCs = PBCs
+        self._autocorr = autocorr
 
         self._check_sensible_constructor_inputs()
 
+        approx_cell1_size = [approx_x1cell_size, approx_y1cell_size, approx_z1cell_size]
+        approx_cell2_size = [approx_x2cell_size, approx_y2cell_size, approx_z2cell_size]
+        if any(isinstance(s, str) for s in approx_cell1_size + approx_cell2_size):
+            from .cell_size_autotuner import _autotuned_cell_sizes
+            approx_cell1_size, approx_cell2_size = _autotuned_cell_sizes(
+                x1, y1, z1, x2, y2, z2, approx_cell1_size, approx_cell2_size,
+                [search_xlength, search_ylength, search_zlength], [xperiod, yperiod, zperiod],
+                PBCs=PBCs, autocorr=autocorr,
+                max_cells_per_dimension_cell1=max_cells_per_dimension_cell1,
+                max_cells_per_dimension_cell2=max_cells_per_dimension_cell2)
+            approx_x1cell_size, approx_y1cell_size, approx_z1cell_size = approx_cell1_size
+            approx_x2cell_size, approx_y2cell_size, approx_z2cell_size = approx_cell2_size
+
         approx_x1cell_size = sample1_cell_size(xperiod, search_xlength, approx_x1cell_size,
             max_cells_per_dimension=max_cells_per_dimension_cell1)
         approx_y1cell_size = sample1_cell_size(yperiod, search_ylength, approx_y1cell_size,
             max_cells_per_dimension=max_cells_per_dimension_cell1)
         approx_z1cell_size = sample1_cell_size(zperiod, search_zlength, approx_z1cell_size,
                 max_cells_per_dimension=max_cells_per_dimension_cell1)
-        self.mesh1 = RectangularMesh(x1, y1, z1, xperiod, yperiod, zperiod,
-            approx_x1cell_size, approx_y1cell_size, approx_z1cell_size)
-
-        approx_x2cell_size = sample2_cell_sizes(xperiod, self.mesh1.xcell_size, approx_x2cell_size,
-            max_cells_per_dimension=max_cells_per_dimension_cell2)
-        approx_y2cell_size = sample2_cell_sizes(yperiod, self.mesh1.ycell_size, approx_y2cell_size,
-            max_cells_per_dimension=max_cells_per_dimension_cell2)
-        approx_z2cell_size = sample2_cell_sizes(zperiod, self.mesh1.zcell_size, approx_z2cell_size,
-            max_cells_per_dimension=max_cells_per_dimension_cell2)
-        self.mesh2 = RectangularMesh(x2, y2, z2, xperiod, yperiod, zperiod,
-            approx_x2cell_size, approx_y2cell_size, approx_z2cell_size)
+        cache_size = default_mesh_cache_size if use_cache else 0
+
+        self.mesh1 = cached_rectangular_mesh(x1, y1, z1, xperiod, yperiod, zperiod,
+            approx_x1cell_size, approx_y1cell_size, approx_z1cell_size,
+            cache_size=cache_size)
+
+        if autocorr:
+            self.mesh2 = self.mesh1
+        else:
+            approx_x2cell_size = sample2_cell_sizes(xperiod, self.mesh1.xcell_size, approx_x2cell_size,
+                max_cells_per_dimension=max_cells_per_dimension_cell2)
+            approx_y2cell_size = sample2_cell_sizes(yperiod, self.mesh1.ycell_size, approx_y2cell_size,
+                max_cells_per_dimension=max_cells_per_dimension_cell2)
+            approx_z2cell_size = sample2_cell_sizes(zperiod, self.mesh1.zcell_size, approx_z2cell_size,
+                max_cells_per_dimension=max_cells_per_dimension_cell2)
+            self.mesh2 = cached_rectangular_mesh(x2, y2, z2, xperiod, yperiod, zperiod,
+                approx_x2cell_size, approx_y2cell_size, approx_z2cell_size,
+                cache_size=cache_size)
 
         self.num_xcell2_per_xcell1 = self.mesh2.num_xdivs // self.mesh1.num_xdivs
         self.num_ycell2_per_ycell1 = self.mesh2.num_ydivs // self.mesh1.num_ydivs
@@ -0,0 +1,153 @@
+"""
+test module for the autotuner of the cell sizes of the rectangular mesh
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import json
+import numpy as np
+import pytest
+from astropy.utils.misc import NumpyRNGContext
+
+from ..npairs_3d import npairs_3d
+from ..npairs_xy_z import npairs_xy_z
+from ..cell_size_autotuner import (clear_cell_size_cache, _autotuned_cell_sizes,
+    _candidate_cell_sizes)
+from ...isolation_functions import spherical_isolation
+
+__all__ = ('test_npairs_3d_auto_cell_sizes', )
+
+fixed_seed = 43
+
+autotuner_module = sys.modules['halotools.mock_observables.pair_counters.cell_size_autotuner']
+
+
+def test_npairs_3d_auto_cell_sizes(tmpdir, monkeypatch):
+    # Store the choices of the autotuner in a temporary file,
+    # and benchmark the candidates even for the small samples of these tests
+    cell_size_cache_fname = str(tmpdir.join('cell_sizes.json'))
+    monkeypatch.setattr(autotuner_module, 'cell_size_cache_fname', cell_size_cache_fname)
+    monkeypatch.setattr(autotuner_module, 'min_num_pairs_to_autotune', 0)
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((200, 3))
+        sample2 = np.random.random((2000, 3))
+    rbins = np.linspace(0.01, 0.1, 5)
+
+    result = npairs_3d(sample1, sample2, rbins, period=1, approx_cell1_size='auto')
+    correct_result = npairs_3d(sample1, sample2, rbins, period=1)
+    assert np.all(result == correct_result)
+
+    with open(cell_size_cache_fname) as f:
+        cached_choices = json.load(f)
+    assert len(cached_choices) == 1
+
+
+def test_npairs_3d_auto_cell_sizes_autocorr(tmpdir, monkeypatch):
+    cell_size_cache_fname = str(tmpdir.join('cell_sizes.json'))
+    monkeypatch.setattr(autotuner_module, 'cell_size_cache_fname', cell_size_cache_fname)
+    monkeypatch.setattr(autotuner_module, 'min_num_pairs_to_autotune', 0)
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((200, 3))
+    rbins = np.linspace(0.01, 0.1, 5)
+
+    result = npairs_3d(sample1, sample1, rbins, period=1,
+        approx_cell1_size='auto', autocorr=True)
+    correct_result = npairs_3d(sample1, sample1, rbins, period=1, autocorr=True)
+    assert np.all(result == correct_result)
+
+
+def test_npairs_xy_z_auto_cell_sizes(tmpdir, monkeypatch):
+    cell_size_cache_fname = str(tmpdir.join('cell_sizes.json'))
+    monkeypatch.setattr(autotuner_module, 'cell_size_cache_fname', cell_size_cache_fname)
+    monkeypatch.setattr(autotuner_module, 'min_num_pairs_to_autotune', 0)
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((200, 3))
+        sample2 = np.random.random((2000, 3))
+    rp_bins = np.linspace(0.01, 0.1, 5)
+    pi_bins = np.linspace(0, 0.3, 4)
+
+    result = npairs_xy_z(sample1, sample2, rp_bins, pi_bins,
+        approx_cell1_size='auto', approx_cell2_size='auto')
+    correct_result = npairs_xy_z(sample1, sample2, rp_bins, pi_bins)
+    assert np.all(result == correct_result)
+
+
+def test_spherical_isolation_auto_cell_sizes(tmpdir, monkeypatch):
+    cell_size_cache_fname = str(tmpdir.join('cell_sizes.json'))
+    monkeypatch.setattr(autotuner_module, 'cell_size_cache_fname', cell_size_cache_fname)
+    monkeypatch.setattr(autotuner_module, 'min_num_pairs_to_autotune', 0)
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((200, 3))
+        sample2 = np.random.random((2000, 3))
+
+    result = spherical_isolation(sample1, sample2, 0.05, period=1, approx_cell1_size='auto')
+    correct_result = spherical_isolation(sample1, sample2, 0.05, period=1)
+    assert np.all(result == correct_result)
+
+
+def test_cached_choice_is_reused(tmpdir, monkeypatch):
+    """ Overwrite the cached choice and verify the autotuner uses it
+    instead of benchmarking the candidates again.
+    """
+    cell_size_cache_fname = str(tmpdir.join('cell_sizes.json'))
+    monkeypatch.setattr(autotuner_module, 'cell_size_cache_fname', cell_size_cache_fname)
+    monkeypatch.setattr(autotuner_module, 'min_num_pairs_to_autotune', 0)
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((200, 3))
+        sample2 = np.random.random((2000, 3))
+    args = (sample1[:, 0], sample1[:, 1], sample1[:, 2],
+        sample2[:, 0], sample2[:, 1], sample2[:, 2], ['auto']*3, ['auto']*3,
+        [0.1, 0.1, 0.1], [1., 1., 1.])
+    __ = _autotuned_cell_sizes(*args)
+
+    with open(cell_size_cache_fname) as f:
+        cached_choices = json.load(f)
+    key = list(cached_choices.keys())[0]
+    cached_choices[key] = [2, 1]
+    with open(cell_size_cache_fname, 'w') as f:
+        json.dump(cached_choices, f)
+
+    cell1_size, cell2_size = _autotuned_cell_sizes(*args)
+    assert np.allclose(cell1_size, 0.2)
+    assert np.allclose(cell2_size, 0.2)
+
+    clear_cell_size_cache()
+    assert not os.path.exists(cell_size_cache_fname)
+
+
+def test_fixed_cell_sizes_are_kept(tmpdir, monkeypatch):
+    cell_size_cache_fname = str(tmpdir.join('cell_sizes.json'))
+    monkeypatch.setattr(autotuner_module, 'cell_size_cache_fname', cell_size_cache_fname)
+    monkeypatch.setattr(autotuner_module, 'min_num_pairs_to_autotune', 0)
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((200, 3))
+        sample2 = np.random.random((2000, 3))
+    cell1_size, cell2_size = _autotuned_cell_sizes(
+        sample1[:, 0], sample1[:, 1], sample1[:, 2],
+        sample2[:, 0], sample2[:, 1], sample2[:, 2], [0.25, 0.25, 0.25], ['auto']*3,
+        [0.1, 0.1, 0.1], [1., 1., 1.])
+    assert np.allclose(cell1_size, 0.25)
+
+
+def test_candidates_respect_density():
+    """ Subdividing mesh2 is only considered when it leaves
+    at least one point per cell on average.
+    """
+    search_length, period = np.array([0.1, 0.1, 0.1]), np.array([1., 1., 1.])
+    sparse_candidates = _candidate_cell_sizes(100, search_length, period,
+        True, True, None, False, 50)
+    assert sparse_candidates == [(1, 1), (2, 1)]
+
+    dense_candidates = _candidate_cell_sizes(int(1e6), search_length, period,
+        True, True, None, False, 50)
+    assert (1, 4) in dense_candidates
+
+
+def test_bad_cell_size_string():
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((200, 3))
+        sample2 = np.random.random((2000, 3))
+    rbins = np.linspace(0.01, 0.1, 5)
+    with pytest.raises(ValueError):
+        __ = npairs_3d(sample1, sample2, rbins, period=1, approx_cell1_size='fast')
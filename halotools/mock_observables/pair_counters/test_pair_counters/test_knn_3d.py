@@ -0,0 +1,133 @@
+""" Module providing unit-testing for the `~halotools.mock_observables.knn_3d` function.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import numpy as np
+import pytest
+from astropy.utils.misc import NumpyRNGContext
+
+from ..knn_3d import knn_3d, _kth_neighbor_distances_3d
+
+__all__ = ('test_kth_neighbor_distances_brute_force', 'test_knn_3d_brute_force')
+
+fixed_seed = 43
+
+
+def _brute_force_knn(sample1, sample2, k_ranks, r_max, period, is_candidate=None):
+    dxyz = np.abs(sample1[:, np.newaxis, :] - sample2[np.newaxis, :, :])
+    if period is not None:
+        dxyz = np.minimum(dxyz, period - dxyz)
+    d = np.sqrt(np.sum(dxyz**2, axis=-1))
+    d[d > r_max] = np.inf
+    if is_candidate is not None:
+        d[~is_candidate] = np.inf
+    order = np.argsort(d, axis=1, kind='mergesort')
+    kth = order[:, np.asarray(k_ranks) - 1]
+    distances = d[np.arange(len(sample1))[:, np.newaxis], kth]
+    return distances, np.where(np.isinf(distances), -1, kth)
+
+
+@pytest.mark.parametrize('period', (1., None))
+@pytest.mark.parametrize('r_max', (0.05, 0.25))
+def test_kth_neighbor_distances_brute_force(period, r_max):
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((300, 3))
+        sample2 = np.random.random((200, 3))
+    k_ranks = [1, 2, 7]
+
+    distances, indices = _kth_neighbor_distances_3d(sample1, sample2, k_ranks, r_max,
+        period=period, num_threads=2, approx_cell2_size=r_max/2.)
+    correct_distances, correct_indices = _brute_force_knn(
+        sample1, sample2, k_ranks, r_max, period)
+
+    assert np.allclose(distances, correct_distances)
+    assert np.all(indices == correct_indices)
+
+
+def test_kth_neighbor_distances_bad_ranks():
+    sample1 = np.random.random((10, 3))
+
+    with pytest.raises(ValueError) as err:
+        __ = _kth_neighbor_distances_3d(sample1, sample1, [2, 1], 0.1, period=1)
+    substr = "Input ``k_ranks`` must be a strictly increasing 1D array of integers >= 1"
+    assert substr in err.value.args[0]
+
+
+@pytest.mark.parametrize('period', (1., None))
+def test_knn_3d_brute_force(period):
+    """ Without ``r_max``, the search radius expands until all points have k neighbors,
+    up to a third of the period.
+    """
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((300, 3))
+        sample2 = np.random.random((50, 3))
+    k = 4
+
+    distances, indices = knn_3d(sample1, sample2, k, period=period, num_threads=2)
+    correct_distances, correct_indices = _brute_force_knn(
+        sample1, sample2, np.arange(1, k+1), np.inf if period is None else period/3., period)
+
+    assert distances.shape == indices.shape == (300, k)
+    assert np.allclose(distances, correct_distances)
+    assert np.all(indices == correct_indices)
+
+
+def test_knn_3d_expanding_search_reaches_sample_extent():
+    """ Regression test for a search radius expanding to a third of the extent
+    of the non-periodic samples, which used to fail the mesh check on round-off.
+    """
+    with NumpyRNGContext(1):
+        sample1 = np.random.uniform(0, 100, (500, 3))
+        sample2 = np.random.uniform(0, 100, (20, 3))
+    k = 10
+
+    distances, indices = knn_3d(sample1, sample2, k)
+    correct_distances, correct_indices = _brute_force_knn(
+        sample1, sample2, np.arange(1, k+1), np.inf, None)
+
+    assert np.allclose(distances, correct_distances)
+    assert np.all(indices == correct_indices)
+
+
+def test_knn_3d_marks():
+    """ Find the k nearest more massive neighbors of each point.
+    """
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((200, 3))
+        sample2 = np.random.random((200, 3))
+        marks1 = np.random.random(200)
+        marks2 = np.random.random(200)
+    k, r_max = 3, 0.3
+
+    distances, indices = knn_3d(sample1, sample2, k, r_max=r_max, period=1.,
+        marks1=marks1, marks2=marks2, cond_func=2)
+    is_candidate = marks1[:, np.newaxis] < marks2[np.newaxis, :]
+    correct_distances, correct_indices = _brute_force_knn(
+        sample1, sample2, np.arange(1, k+1), r_max, 1., is_candidate)
+
+    assert np.any(np.isinf(distances))
+    assert np.allclose(distances, correct_distances)
+    assert np.all(indices == correct_indices)
+
+
+def test_knn_3d_unresolved_neighbors():
+    """ Points with fewer than k candidate neighbors in the whole box
+    keep infinite distances once the search radius reaches its maximum.
+    """
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((20, 3))
+        sample2 = np.random.random((5, 3))
+
+    distances, indices = knn_3d(sample1, sample2, 7)
+    assert np.all(np.isfinite(distances[:, 0:5]))
+    assert np.all(np.isinf(distances[:, 5:]))
+    assert np.all(indices[:, 5:] == -1)
+
+
+def test_knn_3d_bad_k():
+    sample1 = np.random.random((10, 3))
+
+    with pytest.raises(ValueError) as err:
+        __ = knn_3d(sample1, sample1, 0, period=1)
+    substr = "Input ``k`` must be a positive integer"
+    assert substr in err.value.args[0]
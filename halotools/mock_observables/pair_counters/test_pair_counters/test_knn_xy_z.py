@@ -0,0 +1,82 @@
+""" Module providing unit-testing for the `~halotools.mock_observables.knn_xy_z` function.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import numpy as np
+import pytest
+from astropy.utils.misc import NumpyRNGContext
+
+from ..knn_xy_z import knn_xy_z
+
+__all__ = ('test_knn_xy_z_brute_force', )
+
+fixed_seed = 43
+
+
+def _brute_force_knn_xy_z(sample1, sample2, k, rp_max, pi_max, period, is_candidate=None):
+    dxyz = np.abs(sample1[:, np.newaxis, :] - sample2[np.newaxis, :, :])
+    if period is not None:
+        dxyz = np.minimum(dxyz, np.asarray(period) - dxyz)
+    d = np.sqrt(np.sum(dxyz[:, :, 0:2]**2, axis=-1))
+    d[(d > rp_max) | (dxyz[:, :, 2] > pi_max)] = np.inf
+    if is_candidate is not None:
+        d[~is_candidate] = np.inf
+    order = np.argsort(d, axis=1, kind='mergesort')[:, 0:k]
+    distances = d[np.arange(len(sample1))[:, np.newaxis], order]
+    return distances, np.where(np.isinf(distances), -1, order)
+
+
+@pytest.mark.parametrize('period', ([1., 1., 2.], None))
+@pytest.mark.parametrize('rp_max', (0.1, None))
+def test_knn_xy_z_brute_force(period, rp_max):
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((300, 3))
+        sample2 = np.random.random((200, 3))
+    if period is not None:
+        sample1[:, 2] *= 2
+        sample2[:, 2] *= 2
+    k, pi_max = 5, 0.15
+
+    distances, indices = knn_xy_z(sample1, sample2, k, pi_max, rp_max=rp_max,
+        period=period, num_threads=2)
+    correct_distances, correct_indices = _brute_force_knn_xy_z(sample1, sample2, k,
+        rp_max or (np.inf if period is None else 1./3), pi_max, period)
+
+    assert distances.shape == indices.shape == (300, k)
+    assert np.allclose(distances, correct_distances)
+    assert np.all(indices == correct_indices)
+
+
+def test_knn_xy_z_expanding_search_reaches_sample_extent():
+    """ Regression test for a search radius expanding to a third of the extent
+    of the non-periodic samples, which used to fail the mesh check on round-off.
+    """
+    with NumpyRNGContext(0):
+        sample1 = np.random.uniform(0, 100, (500, 3))
+        sample2 = np.random.uniform(0, 100, (20, 3))
+    k, pi_max = 10, 20.
+
+    distances, indices = knn_xy_z(sample1, sample2, k, pi_max)
+    correct_distances, correct_indices = _brute_force_knn_xy_z(sample1, sample2, k,
+        np.inf, pi_max, None)
+
+    assert np.allclose(distances, correct_distances)
+    assert np.all(indices == correct_indices)
+
+
+def test_knn_xy_z_marks():
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((200, 3))
+        sample2 = np.random.random((200, 3))
+        marks1 = np.random.random((200, 2))
+        marks2 = np.random.random((200, 2))
+    k, pi_max = 2, 0.2
+
+    distances, indices = knn_xy_z(sample1, sample2, k, pi_max, period=1.,
+        marks1=marks1, marks2=marks2, cond_func=5)
+    is_candidate = marks1[:, np.newaxis, 0] > (marks2[np.newaxis, :, 0] + marks1[:, np.newaxis, 1])
+    correct_distances, correct_indices = _brute_force_knn_xy_z(sample1, sample2, k,
+        1./3, pi_max, 1., is_candidate)
+
+    assert np.allclose(distances, correct_distances)
+    assert np.all(indices == correct_indices)
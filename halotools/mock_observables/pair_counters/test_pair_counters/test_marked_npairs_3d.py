@@ -412,3 +412,27 @@ def test_marked_npairs_behavior_weight_func_id10():
     result = marked_npairs_3d(grid_points, grid_points, rbins, period=period,
     weights1=weights, weights2=weights, weight_func_id=10, approx_cell1_size=[rmax, rmax, rmax])
     assert np.all(result == -3*test_result), error_msg
+
+
+def test_marked_npairs_3d_autocorr():
+    """ Verify that the ``autocorr`` option of `halotools.mock_observables.marked_npairs_3d`
+    counts each distinct pair once, including for a marking function that is not
+    symmetric in its two arguments.
+    """
+    Npts = 1000
+    with NumpyRNGContext(fixed_seed):
+        random_sample = np.random.random((Npts, 3))
+        ran_weights1 = np.random.random((Npts, 2))
+
+    period = np.array([1.0, 1.0, 1.0])
+    rbins = np.array([0.05, 0.1, 0.2, 0.3])
+
+    for weight_func_id, weights in ((1, ran_weights1[:, 0:1]), (5, ran_weights1)):
+        double_counted = marked_npairs_3d(random_sample, random_sample, rbins, period=period,
+            weights1=weights, weights2=weights, weight_func_id=weight_func_id)
+        single_counted = marked_npairs_3d(random_sample, random_sample, rbins, period=period,
+            weights1=weights, weights2=weights, weight_func_id=weight_func_id,
+            autocorr=True)
+        # Self-pairs are only included in the double-counted result, in every bin
+        self_pairs = double_counted[0] - 2*single_counted[0]
+        assert np.allclose(double_counted, 2*single_counted + self_pairs, rtol=1e-05)
@@ -0,0 +1,191 @@
+"""
+"""
+from __future__ import (absolute_import, division, print_function, unicode_literals)
+
+import ctypes
+import numpy as np
+import pytest
+from astropy.utils.misc import NumpyRNGContext
+
+from ..marking_function_registry import (register_marking_function,
+    register_conditional_function, FIRST_REGISTERED_FUNC_ID)
+from ..marked_npairs_3d import marked_npairs_3d, _func_signature_int_from_wfunc
+from ..marked_npairs_xy_z import marked_npairs_xy_z
+from ..knn_3d import knn_3d
+from ..marked_cpairs import custom_marking_func
+
+from ...isolation_functions import (conditional_spherical_isolation,
+    conditional_cylindrical_isolation)
+from ...two_point_clustering import marked_tpcf
+
+from ....custom_exceptions import HalotoolsError
+
+__all__ = ('test_registered_capsule_marked_npairs_3d', )
+
+fixed_seed = 43
+
+double_pointer = ctypes.POINTER(ctypes.c_double)
+marking_func_type = ctypes.CFUNCTYPE(ctypes.c_double, double_pointer, double_pointer)
+conditional_func_type = ctypes.CFUNCTYPE(ctypes.c_int, double_pointer, double_pointer)
+
+
+def _sum_of_products(w1, w2):
+    return w1[0]*w2[0] + w1[1]*w2[1]
+
+
+def _greater_than(w1, w2):
+    return int(w1[0] > w2[0])
+
+
+# Module-level references keep the ctypes callbacks alive
+sum_of_products = marking_func_type(_sum_of_products)
+greater_than = conditional_func_type(_greater_than)
+
+
+def random_samples(npts=100, num_marks=2, Lbox=1.):
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((npts, 3))*Lbox
+        sample2 = np.random.random((npts, 3))*Lbox
+        marks1 = np.random.random((npts, num_marks))
+        marks2 = np.random.random((npts, num_marks))
+    return sample1, sample2, marks1, marks2
+
+
+def test_registered_capsule_marked_npairs_3d():
+    """ The custom_func of the custom_marking_func module returns w1[0]*w2[0],
+    so that registering its capsule must reproduce weight_func_id = 1.
+    """
+    sample1, sample2, weights1, weights2 = random_samples(num_marks=1)
+    rbins = np.linspace(0.05, 0.3, 5)
+    weight_func_id = register_marking_function(
+        custom_marking_func.__pyx_capi__['custom_func'], 1)
+    assert weight_func_id >= FIRST_REGISTERED_FUNC_ID
+    assert _func_signature_int_from_wfunc(weight_func_id) == 1
+
+    result = marked_npairs_3d(sample1, sample2, rbins, period=1,
+        weights1=weights1, weights2=weights2, weight_func_id=weight_func_id)
+    correct_result = marked_npairs_3d(sample1, sample2, rbins, period=1,
+        weights1=weights1, weights2=weights2, weight_func_id=1)
+    assert np.allclose(result, correct_result)
+
+
+def test_registered_ctypes_marked_npairs_3d():
+    sample1, sample2, weights1, weights2 = random_samples()
+    rbins = np.linspace(0.05, 0.3, 5)
+    weight_func_id = register_marking_function(sum_of_products, 2)
+
+    result = marked_npairs_3d(sample1, sample2, rbins, period=1,
+        weights1=weights1, weights2=weights2, weight_func_id=weight_func_id)
+    result_first_weight = marked_npairs_3d(sample1, sample2, rbins, period=1,
+        weights1=weights1[:, 0], weights2=weights2[:, 0], weight_func_id=1)
+    result_second_weight = marked_npairs_3d(sample1, sample2, rbins, period=1,
+        weights1=weights1[:, 1], weights2=weights2[:, 1], weight_func_id=1)
+    assert np.allclose(result, result_first_weight + result_second_weight)
+
+
+def test_registered_ctypes_marked_npairs_xy_z():
+    sample1, sample2, weights1, weights2 = random_samples()
+    rp_bins = np.linspace(0.05, 0.3, 5)
+    pi_bins = np.linspace(0, 0.3, 4)
+    weight_func_id = register_marking_function(sum_of_products, 2)
+
+    result = marked_npairs_xy_z(sample1, sample2, rp_bins, pi_bins, period=1,
+        weights1=weights1, weights2=weights2, weight_func_id=weight_func_id)
+    result_first_weight = marked_npairs_xy_z(sample1, sample2, rp_bins, pi_bins, period=1,
+        weights1=weights1[:, 0], weights2=weights2[:, 0], weight_func_id=1)
+    result_second_weight = marked_npairs_xy_z(sample1, sample2, rp_bins, pi_bins, period=1,
+        weights1=weights1[:, 1], weights2=weights2[:, 1], weight_func_id=1)
+    assert np.allclose(result, result_first_weight + result_second_weight)
+
+
+def test_registered_marking_function_wrong_number_of_weights():
+    sample1, sample2, weights1, weights2 = random_samples(num_marks=1)
+    rbins = np.linspace(0.05, 0.3, 5)
+    weight_func_id = register_marking_function(sum_of_products, 2)
+
+    with pytest.raises(HalotoolsError):
+        marked_npairs_3d(sample1, sample2, rbins, period=1,
+            weights1=weights1, weights2=weights2, weight_func_id=weight_func_id)
+
+
+def test_registered_marking_function_marked_tpcf_reuse_pairs():
+    sample1, sample2, marks1, marks2 = random_samples(num_marks=1)
+    rbins = np.linspace(0.05, 0.3, 5)
+    weight_func_id = register_marking_function(
+        custom_marking_func.__pyx_capi__['custom_func'], 1)
+
+    result = marked_tpcf(sample1, rbins, sample2=sample2, marks1=marks1, marks2=marks2,
+        period=1, weight_func_id=weight_func_id, seed=fixed_seed, reuse_pairs=True)
+    correct_result = marked_tpcf(sample1, rbins, sample2=sample2, marks1=marks1, marks2=marks2,
+        period=1, weight_func_id=1, seed=fixed_seed, reuse_pairs=False)
+    assert np.allclose(result, correct_result)
+
+
+def test_registered_conditional_spherical_isolation():
+    sample1, sample2, marks1, marks2 = random_samples(num_marks=1)
+    cond_func = register_conditional_function(greater_than, 1)
+
+    result = conditional_spherical_isolation(sample1, sample2, 0.1,
+        marks1=marks1, marks2=marks2, cond_func=cond_func, period=1)
+    correct_result = conditional_spherical_isolation(sample1, sample2, 0.1,
+        marks1=marks1, marks2=marks2, cond_func=1, period=1)
+    assert np.all(result == correct_result)
+    assert not np.all(result)
+
+
+def test_registered_conditional_cylindrical_isolation():
+    sample1, sample2, marks1, marks2 = random_samples(num_marks=1)
+    cond_func = register_conditional_function(greater_than, 1)
+
+    result = conditional_cylindrical_isolation(sample1, sample2, 0.1, 0.2,
+        marks1=marks1, marks2=marks2, cond_func=cond_func, period=1)
+    correct_result = conditional_cylindrical_isolation(sample1, sample2, 0.1, 0.2,
+        marks1=marks1, marks2=marks2, cond_func=1, period=1)
+    assert np.all(result == correct_result)
+    assert not np.all(result)
+
+
+def test_registered_conditional_function_knn_3d():
+    sample1, sample2, marks1, marks2 = random_samples(num_marks=1)
+    cond_func = register_conditional_function(greater_than, 1)
+
+    with pytest.raises(ValueError) as err:
+        knn_3d(sample1, sample2, 1, period=1,
+            marks1=marks1, marks2=marks2, cond_func=cond_func)
+    substr = "only support the built-in conditional functions"
+    assert substr in err.value.args[0]
+
+
+def test_register_same_function_twice():
+    weight_func_id = register_marking_function(sum_of_products, 2)
+    assert register_marking_function(sum_of_products, 2) == weight_func_id
+    address = ctypes.cast(sum_of_products, ctypes.c_void_p).value
+    assert register_marking_function(address, 2) == weight_func_id
+
+
+def test_register_bad_func():
+    with pytest.raises(ValueError) as err:
+        register_marking_function(_sum_of_products, 2)
+    substr = "Input ``func`` must be a Numba cfunc, a ctypes function pointer"
+    assert substr in err.value.args[0]
+
+
+def test_register_null_address():
+    with pytest.raises(ValueError) as err:
+        register_marking_function(0, 2)
+    substr = "Input ``func`` points to a NULL address."
+    assert substr in err.value.args[0]
+
+
+def test_register_bad_num_weights():
+    with pytest.raises(ValueError) as err:
+        register_marking_function(sum_of_products, 0)
+    substr = "Input ``num_weights`` must be a positive integer."
+    assert substr in err.value.args[0]
+
+
+def test_register_bad_signature():
+    with pytest.raises(ValueError) as err:
+        register_conditional_function(sum_of_products, 1)
+    substr = "Input ``func`` must take two pointers to doubles and return a c_int."
+    assert substr in err.value.args[0]
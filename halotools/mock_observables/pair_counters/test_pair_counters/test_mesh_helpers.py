@@ -2,9 +2,18 @@
 """
 from __future__ import absolute_import, division, print_function
 
+import numpy as np
 import pytest
+from astropy.utils.misc import NumpyRNGContext
 
 from ..mesh_helpers import _set_approximate_cell_sizes, _enforce_maximum_search_length
+from ..mesh_helpers import (_cell1_parallelization_indices, _cell1_work_estimate,
+    worker_busy_times)
+from ..rectangular_mesh import RectangularDoubleMesh
+from ..npairs_3d import npairs_3d
+from ...tests.cf_helpers import generate_locus_of_3d_points
+
+fixed_seed = 43
 
 __all__ = ('test_set_approximate_cell_sizes', )
 
@@ -77,3 +86,77 @@ def test_enforce_maximum_search_length_case7():
 
     search_length, period = (1, 4, 2), (4, 100, 7)
     _enforce_maximum_search_length(search_length, period)
+
+
+def _clustered_sample():
+    with NumpyRNGContext(fixed_seed):
+        uniform_sample = np.random.random((400, 3))
+    cluster = generate_locus_of_3d_points(600, xc=0.7, yc=0.2, zc=0.5,
+        epsilon=0.02, seed=fixed_seed)
+    return np.concatenate((uniform_sample, cluster))
+
+
+def _clustered_double_mesh(search_length=0.1, approx_cell2_size=0.05):
+    sample = _clustered_sample()
+    x, y, z = sample[:, 0], sample[:, 1], sample[:, 2]
+    return RectangularDoubleMesh(x, y, z, x, y, z,
+        search_length, search_length, search_length,
+        approx_cell2_size, approx_cell2_size, approx_cell2_size,
+        search_length, search_length, search_length, 1., 1., 1., use_cache=False)
+
+
+def test_cell1_work_estimate():
+    """ Compare the work estimate to a direct count of the distance evaluations
+    made by the loops of the pair-counting engines.
+    """
+    double_mesh = _clustered_double_mesh()
+    mesh1, mesh2 = double_mesh.mesh1, double_mesh.mesh2
+    npts1 = np.diff(mesh1.cell_id_indices)
+    npts2 = np.diff(mesh2.cell_id_indices)
+    nx2, ny2, nz2 = mesh2.num_xdivs, mesh2.num_ydivs, mesh2.num_zdivs
+    nx_per, ny_per, nz_per = nx2 // mesh1.num_xdivs, ny2 // mesh1.num_ydivs, nz2 // mesh1.num_zdivs
+    xsteps = int(np.ceil(double_mesh.search_xlength / mesh2.xcell_size))
+    ysteps = int(np.ceil(double_mesh.search_ylength / mesh2.ycell_size))
+    zsteps = int(np.ceil(double_mesh.search_zlength / mesh2.zcell_size))
+
+    expected_work = np.zeros(mesh1.ncells)
+    for icell1 in range(mesh1.ncells):
+        ix1, iy1, iz1 = np.unravel_index(icell1, (mesh1.num_xdivs, mesh1.num_ydivs, mesh1.num_zdivs))
+        for ix2 in range(ix1*nx_per - xsteps, (ix1+1)*nx_per + xsteps):
+            for iy2 in range(iy1*ny_per - ysteps, (iy1+1)*ny_per + ysteps):
+                for iz2 in range(iz1*nz_per - zsteps, (iz1+1)*nz_per + zsteps):
+                    icell2 = (ix2 % nx2)*ny2*nz2 + (iy2 % ny2)*nz2 + (iz2 % nz2)
+                    expected_work[icell1] += npts1[icell1]*npts2[icell2]
+
+    assert np.all(_cell1_work_estimate(double_mesh) == expected_work)
+
+
+def test_cell1_parallelization_indices_balanced_chunks():
+    double_mesh = _clustered_double_mesh()
+    ncells = double_mesh.mesh1.ncells
+    cell1_work = _cell1_work_estimate(double_mesh)
+
+    num_threads, cell1_tuples = _cell1_parallelization_indices(
+        ncells, 3, double_mesh=double_mesh, chunks_per_thread=2)
+    assert num_threads == 3
+
+    # Chunks are contiguous and cover every cell once
+    first_cells, last_cells = np.array(cell1_tuples).T
+    assert first_cells[0] == 0
+    assert last_cells[-1] == ncells
+    assert np.all(first_cells[1:] == last_cells[:-1])
+    assert np.all(last_cells > first_cells)
+
+    # No chunk exceeds its share of the work by more than a single cell
+    chunk_work = np.array([cell1_work[a:b].sum() for a, b in cell1_tuples])
+    assert np.all(chunk_work <= cell1_work.sum()/6. + cell1_work.max())
+
+
+def test_worker_busy_times():
+    sample = _clustered_sample()
+    rbins = np.array((0.01, 0.05, 0.1))
+
+    __ = npairs_3d(sample, sample, rbins, period=1, num_threads=2)
+    busy_time = worker_busy_times()
+    assert busy_time.shape == (2, )
+    assert np.all(busy_time >= 0)
@@ -344,3 +344,50 @@ def test_pure_python_npairs_3d_argument_handling3():
         __ = pure_python_brute_force_npairs_3d(sample1, sample2, rbins, period=[1, 1, 1])
     substr = "period should have len == dimension of points"
     assert substr in err.value.args[0]
+
+
+@pytest.mark.parametrize('period', (1.0, None))
+def test_npairs_3d_autocorr(period):
+    """ Verify that the ``autocorr`` option of `halotools.mock_observables.npairs_3d`
+    counts each distinct pair once, excluding self-pairs.
+    """
+    Npts = 1000
+    with NumpyRNGContext(fixed_seed):
+        random_sample = np.random.random((Npts, 3))
+    rbins = np.array([0.001, 0.1, 0.2, 0.3])
+
+    double_counted = npairs_3d(random_sample, random_sample, rbins, period=period)
+    single_counted = npairs_3d(random_sample, random_sample, rbins, period=period,
+        autocorr=True)
+    assert np.all(double_counted == 2*single_counted + Npts)
+
+
+def test_npairs_3d_autocorr_requires_identical_samples():
+    npts1, npts2 = 100, 100
+    data1 = generate_locus_of_3d_points(npts1, xc=0.1, yc=0.1, zc=0.1, seed=fixed_seed)
+    data2 = generate_locus_of_3d_points(npts2, xc=0.1, yc=0.1, zc=0.2, seed=fixed_seed)
+    rbins = np.array((0.05, 0.15, 0.3))
+
+    with pytest.raises(ValueError) as err:
+        result = npairs_3d(data1, data2, rbins, period=1, autocorr=True)
+    substr = "When ``autocorr`` is True, sample2 and its associated inputs"
+    assert substr in err.value.args[0]
+
+
+def test_npairs_3d_parallel_clustered_autocorr():
+    """ Verify that the threaded engine gives the serial result for strongly
+    clustered points, where a few cells hold most of the work, also in ``autocorr`` mode.
+    """
+    npts = 500
+    with NumpyRNGContext(fixed_seed):
+        uniform_sample = np.random.random((npts, 3))
+    cluster = generate_locus_of_3d_points(npts, xc=0.3, yc=0.3, zc=0.3,
+        epsilon=0.01, seed=fixed_seed)
+    sample = np.concatenate((uniform_sample, cluster))
+    rbins = np.array((0.001, 0.05, 0.1, 0.2))
+
+    for autocorr in (False, True):
+        serial_result = npairs_3d(sample, sample, rbins, period=1, autocorr=autocorr)
+        parallel_result = npairs_3d(sample, sample, rbins, period=1,
+            num_threads=4, autocorr=autocorr)
+        assert np.all(serial_result == parallel_result)
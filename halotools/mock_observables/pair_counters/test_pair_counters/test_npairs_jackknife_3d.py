@@ -282,3 +282,42 @@ def test_process_weights9():
             weights1, weights2, jtags1, jtags2, N_samples)
     substr = "jtags2 must be <= N_samples"
     assert substr in err.value.args[0]
+
+
+@pytest.mark.parametrize('autocorr', (False, True))
+def test_npairs_jackknife_3d_brute_force(autocorr):
+    """ Compare the jackknife counts derived from the matrix of subvolume pairs
+    to a brute-force application of the jackknife weighting function to every pair.
+    """
+    Npts1, Npts2, N_jsamples = 200, 150, 8
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((Npts1, 3))
+        weights1 = np.random.random(Npts1)
+        jtags1 = np.random.randint(1, N_jsamples+1, size=Npts1)
+        sample2 = np.random.random((Npts2, 3))
+        weights2 = np.random.random(Npts2)
+        jtags2 = np.random.randint(1, N_jsamples+1, size=Npts2)
+    if autocorr:
+        sample2, weights2, jtags2 = sample1, weights1, jtags1
+    rbins = np.array([0.05, 0.1, 0.2, 0.3])
+
+    result = npairs_jackknife_3d(sample1, sample2, rbins, period=period,
+        jtags1=jtags1, jtags2=jtags2, N_samples=N_jsamples,
+        weights1=weights1, weights2=weights2, num_threads=num_threads, autocorr=autocorr)
+
+    dxyz = np.abs(sample1[:, np.newaxis, :] - sample2[np.newaxis, :, :])
+    dxyz = np.minimum(dxyz, period - dxyz)
+    dist = np.sqrt(np.sum(dxyz**2, axis=2))
+    w = weights1[:, np.newaxis]*weights2[np.newaxis, :]
+    if autocorr:
+        w = np.triu(w, k=1)
+    j1 = jtags1[:, np.newaxis]
+    j2 = jtags2[np.newaxis, :]
+
+    for s in range(N_jsamples+1):
+        if s == 0:
+            jweight = np.ones_like(w)
+        else:
+            jweight = 1. - 0.5*((j1 == s).astype(float) + (j2 == s).astype(float))
+        correct_counts = [np.sum((w*jweight)[dist < r]) for r in rbins]
+        assert np.allclose(result[s, :], correct_counts)
@@ -0,0 +1,121 @@
+"""
+test module for the labeled pair counters that count the pairs of several samples
+with a single pass over the stacked samples
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import numpy as np
+import pytest
+from astropy.utils.misc import NumpyRNGContext
+
+from ..npairs_3d import npairs_3d
+from ..npairs_xy_z import npairs_xy_z
+from ..npairs_s_mu import npairs_s_mu
+from ..npairs_jackknife_3d import npairs_jackknife_3d
+from ..npairs_labeled_3d import npairs_labeled_3d
+from ..npairs_labeled_xy_z import npairs_labeled_xy_z
+from ..npairs_labeled_s_mu import npairs_labeled_s_mu
+from ..npairs_labeled_jackknife_3d import npairs_labeled_jackknife_3d
+
+__all__ = ('test_npairs_labeled_3d_vs_npairs_3d', )
+
+fixed_seed = 43
+sample_sizes = (200, 100, 300)
+
+
+def _labeled_samples():
+    with NumpyRNGContext(fixed_seed):
+        samples = [np.random.random((npts, 3)) for npts in sample_sizes]
+    sample = np.concatenate(samples)
+    labels = np.repeat(np.arange(len(samples)), sample_sizes)
+    return samples, sample, labels
+
+
+@pytest.mark.parametrize('period', (1, None))
+def test_npairs_labeled_3d_vs_npairs_3d(period):
+    samples, sample, labels = _labeled_samples()
+    rbins = np.array((0.01, 0.05, 0.1, 0.2))
+
+    result = npairs_labeled_3d(sample, labels, rbins, period=period, num_threads=2)
+    assert result.shape == (3, 3, len(rbins))
+
+    for a, sample_a in enumerate(samples):
+        for b, sample_b in enumerate(samples):
+            correct_result = npairs_3d(sample_a, sample_b, rbins, period=period)
+            if a == b:
+                correct_result -= len(sample_a)
+            assert np.all(result[a, b] == correct_result)
+
+
+def test_npairs_labeled_xy_z_vs_npairs_xy_z():
+    samples, sample, labels = _labeled_samples()
+    rp_bins = np.array((0.01, 0.05, 0.1, 0.2))
+    pi_bins = np.array((0.05, 0.1, 0.2))
+
+    result = npairs_labeled_xy_z(sample, labels, rp_bins, pi_bins, period=1)
+    assert result.shape == (3, 3, len(rp_bins), len(pi_bins))
+
+    for a, sample_a in enumerate(samples):
+        for b, sample_b in enumerate(samples):
+            correct_result = npairs_xy_z(sample_a, sample_b, rp_bins, pi_bins, period=1)
+            if a == b:
+                correct_result -= len(sample_a)
+            assert np.all(result[a, b] == correct_result)
+
+
+def test_npairs_labeled_s_mu_vs_npairs_s_mu():
+    samples, sample, labels = _labeled_samples()
+    s_bins = np.array((0.01, 0.05, 0.1, 0.2))
+    mu_bins = np.linspace(0, 1, 5)
+
+    result = npairs_labeled_s_mu(sample, labels, s_bins, mu_bins, period=1)
+    assert result.shape == (3, 3, len(s_bins), len(mu_bins))
+
+    for a, sample_a in enumerate(samples):
+        for b, sample_b in enumerate(samples):
+            correct_result = npairs_s_mu(sample_a, sample_b, s_bins, mu_bins, period=1)
+            if a == b:
+                correct_result -= len(sample_a)
+            assert np.all(result[a, b] == correct_result)
+
+
+def test_npairs_labeled_jackknife_3d_vs_npairs_jackknife_3d():
+    samples, sample, labels = _labeled_samples()
+    rbins = np.array((0.01, 0.05, 0.1, 0.2))
+    N_samples = 5
+    with NumpyRNGContext(fixed_seed):
+        weights = np.random.random(len(sample))
+        jtags = np.random.randint(1, N_samples+1, len(sample))
+    edges = np.cumsum((0, ) + sample_sizes)
+
+    result = npairs_labeled_jackknife_3d(sample, labels, rbins, period=1,
+        weights=weights, jtags=jtags, N_samples=N_samples)
+    assert result.shape == (3, 3, N_samples+1, len(rbins))
+
+    for a in range(3):
+        mask_a = slice(edges[a], edges[a+1])
+        for b in range(3):
+            mask_b = slice(edges[b], edges[b+1])
+            correct_result = npairs_jackknife_3d(sample[mask_a], sample[mask_b], rbins,
+                period=1, weights1=weights[mask_a], weights2=weights[mask_b],
+                jtags1=jtags[mask_a], jtags2=jtags[mask_b], N_samples=N_samples)
+            if a == b:
+                # remove the pairs formed by each point with itself
+                wsq, j = weights[mask_a]**2, jtags[mask_a]
+                self_pairs = [wsq.sum()] + [wsq[j != s].sum() for s in range(1, N_samples+1)]
+                correct_result -= np.array(self_pairs)[:, np.newaxis]
+            assert np.allclose(result[a, b], correct_result)
+
+
+def test_npairs_labeled_3d_bad_labels():
+    samples, sample, labels = _labeled_samples()
+    rbins = np.array((0.01, 0.05, 0.1, 0.2))
+
+    with pytest.raises(ValueError) as err:
+        __ = npairs_labeled_3d(sample, labels[1:], rbins, period=1)
+    substr = "Input ``labels`` must be a 1D array of non-negative integers"
+    assert substr in err.value.args[0]
+
+    with pytest.raises(ValueError) as err:
+        __ = npairs_labeled_3d(sample, labels - 1, rbins, period=1)
+    assert substr in err.value.args[0]
@@ -6,6 +6,7 @@ import numpy as np
 
 from astropy.utils.misc import NumpyRNGContext
 import pytest
+from scipy.sparse import coo_matrix
 
 from .pure_python_distance_matrix import pure_python_distance_matrix_3d, pure_python_distance_matrix_xy_z
 
@@ -309,3 +310,88 @@ def test_args3():
 
     sparse_matrix = pairwise_distance_3d(sample1, sample2, r_max, approx_cell1_size=1, approx_cell2_size=1)
 
+
+
+def test_csr_coo_consistency():
+    Npts1, Npts2 = int(200), int(150)
+
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((Npts1, 3))
+        sample2 = np.random.random((Npts2, 3))
+
+    r_max = 0.2
+
+    coo = pairwise_distance_3d(sample1, sample2, r_max, period=1)
+    csr = pairwise_distance_3d(sample1, sample2, r_max, period=1, output_format='csr')
+    assert csr.format == 'csr'
+    assert csr.nnz == coo.nnz
+    assert np.allclose(csr.toarray(), coo.toarray())
+
+    # Each row of the csr matrix holds the neighbors of one point of sample1
+    pure_python_dense_matrix = pure_python_distance_matrix_3d(sample1, sample2, r_max, Lbox=1)
+    assert np.all(np.diff(csr.indptr) == np.sum(pure_python_dense_matrix > 0, axis=1))
+
+    single = pairwise_distance_3d(sample1, sample2, r_max, period=1, distance_dtype='f4')
+    assert single.dtype == np.float32
+    assert np.allclose(single.toarray(), coo.toarray(), rtol=1e-5)
+
+    perp, para = pairwise_distance_xy_z(sample1, sample2, 0.1, 0.2, period=1)
+    perp_csr, para_csr = pairwise_distance_xy_z(sample1, sample2, 0.1, 0.2, period=1,
+        output_format='csr', distance_dtype='f4')
+    assert np.allclose(perp_csr.toarray(), perp.toarray(), rtol=1e-5)
+    assert np.allclose(para_csr.toarray(), para.toarray(), rtol=1e-5)
+
+
+@pytest.mark.parametrize('max_pairs_per_block', (1, 50, int(1e7)))
+def test_pair_block_callback(max_pairs_per_block):
+    """ The pairs streamed in blocks are the pairs of the sparse matrix.
+    """
+    Npts1, Npts2 = int(200), int(150)
+
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((Npts1, 3))
+        sample2 = np.random.random((Npts2, 3))
+
+    blocks = []
+
+    def store_block(*block):
+        blocks.append(block)
+
+    result = pairwise_distance_3d(sample1, sample2, 0.2, period=1,
+        pair_block_callback=store_block, max_pairs_per_block=max_pairs_per_block,
+        approx_cell1_size=0.2)
+    assert result is None
+    i, j, d = (np.concatenate(arrays) for arrays in zip(*blocks))
+
+    coo = pairwise_distance_3d(sample1, sample2, 0.2, period=1)
+    assert np.all(coo.toarray() == coo_matrix((d, (i, j)), shape=coo.shape).toarray())
+    if max_pairs_per_block > 1:
+        assert all(len(block[0]) <= max_pairs_per_block for block in blocks[:-1])
+
+    blocks = []
+    pairwise_distance_xy_z(sample1, sample2, 0.1, 0.2, period=1,
+        pair_block_callback=store_block, max_pairs_per_block=max_pairs_per_block)
+    i, j, d_perp, d_para = (np.concatenate(arrays) for arrays in zip(*blocks))
+    perp, para = pairwise_distance_xy_z(sample1, sample2, 0.1, 0.2, period=1)
+    assert np.all(perp.toarray() == coo_matrix((d_perp, (i, j)), shape=perp.shape).toarray())
+    assert np.all(para.toarray() == coo_matrix((d_para, (i, j)), shape=para.shape).toarray())
+
+
+def test_pair_list_output_args():
+    sample1 = np.random.random((50, 3))
+
+    with pytest.raises(ValueError) as err:
+        __ = pairwise_distance_3d(sample1, sample1, 0.1, period=1, output_format='dok')
+    substr = "Input ``output_format`` must be either 'coo' or 'csr'"
+    assert substr in err.value.args[0]
+
+    with pytest.raises(ValueError) as err:
+        __ = pairwise_distance_3d(sample1, sample1, 0.1, period=1, distance_dtype='i4')
+    substr = "Input ``distance_dtype`` must be either 'f4' or 'f8'"
+    assert substr in err.value.args[0]
+
+    with pytest.raises(ValueError) as err:
+        __ = pairwise_distance_3d(sample1, sample1, 0.1, period=1,
+            pair_block_callback=print, max_pairs_per_block=0)
+    substr = "Input ``max_pairs_per_block`` must be a positive integer"
+    assert substr in err.value.args[0]
@@ -7,11 +7,12 @@ import numpy as np
 import pytest
 from astropy.utils.misc import NumpyRNGContext
 
-from ..rectangular_mesh import RectangularDoubleMesh, sample1_cell_size
+from ..rectangular_mesh import RectangularDoubleMesh, sample1_cell_size, clear_mesh_cache
+from ..npairs_3d import npairs_3d
 
 from ...tests.cf_helpers import generate_locus_of_3d_points
 
-__all__ = ('test_mesh_variations', )
+__all__ = ('test_mesh_variations', 'test_mesh_cache1')
 
 fixed_seed = 43
 
@@ -163,3 +164,57 @@ def test_search_length_enforcement():
             xperiod, yperiod, zperiod, PBCs=PBCs)
     substr = "The maximum length over which you search for pairs of points"
     assert substr in err.value.args[0]
+
+
+def test_mesh_cache1():
+    """ Verify that identical points on identical cells re-use the same mesh,
+    and that modifying the points in-place triggers a rebuild.
+    """
+    clear_mesh_cache()
+    with NumpyRNGContext(fixed_seed):
+        points1 = np.random.random((100, 3))
+        points2 = np.random.random((200, 3))
+    args = (0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.2, 0.2, 0.2, 1, 1, 1)
+
+    double_mesh1 = RectangularDoubleMesh(
+        points1[:, 0], points1[:, 1], points1[:, 2],
+        points2[:, 0], points2[:, 1], points2[:, 2], *args)
+    double_mesh2 = RectangularDoubleMesh(
+        np.copy(points1[:, 0]), np.copy(points1[:, 1]), np.copy(points1[:, 2]),
+        points2[:, 0], points2[:, 1], points2[:, 2], *args)
+    assert double_mesh1.mesh1 is double_mesh2.mesh1
+    assert double_mesh1.mesh2 is double_mesh2.mesh2
+
+    points1[0, 0] = 0.99
+    double_mesh3 = RectangularDoubleMesh(
+        points1[:, 0], points1[:, 1], points1[:, 2],
+        points2[:, 0], points2[:, 1], points2[:, 2], *args)
+    assert double_mesh3.mesh1 is not double_mesh1.mesh1
+    assert double_mesh3.mesh2 is double_mesh1.mesh2
+
+    double_mesh4 = RectangularDoubleMesh(
+        points1[:, 0], points1[:, 1], points1[:, 2],
+        points2[:, 0], points2[:, 1], points2[:, 2], *args, use_cache=False)
+    assert double_mesh4.mesh1 is not double_mesh3.mesh1
+    assert np.all(double_mesh4.mesh1.idx_sorted == double_mesh3.mesh1.idx_sorted)
+    clear_mesh_cache()
+
+
+def test_mesh_cache2():
+    """ Verify that pair counts are unaffected by re-using a cached mesh.
+    """
+    clear_mesh_cache()
+    with NumpyRNGContext(fixed_seed):
+        points1 = np.random.random((300, 3))
+        points2 = np.random.random((300, 3))
+    rbins = np.linspace(0.01, 0.2, 5)
+
+    counts1 = npairs_3d(points1, points2, rbins, period=1)
+    counts2 = npairs_3d(points1, points2, rbins, period=1)
+    assert np.all(counts1 == counts2)
+
+    points2[:, 0] = np.mod(points2[:, 0] + 0.05, 1)
+    counts3 = npairs_3d(points1, points2, rbins, period=1)
+    clear_mesh_cache()
+    counts4 = npairs_3d(points1, points2, rbins, period=1)
+    assert np.all(counts3 == counts4)
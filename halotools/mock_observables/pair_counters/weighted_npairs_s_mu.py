@@ -3,11 +3,10 @@ used to count pairs as a function of separation.
 """
 from __future__ import (absolute_import, division, print_function, unicode_literals)
 import numpy as np
-import multiprocessing
-from functools import partial
 
 from .rectangular_mesh import RectangularDoubleMesh
-from .mesh_helpers import _set_approximate_cell_sizes, _cell1_parallelization_indices
+from .mesh_helpers import (_set_approximate_cell_sizes, _verify_autocorr_inputs,
+    _record_worker_busy_times)
 from .cpairs import weighted_npairs_s_mu_engine
 from .npairs_3d import _npairs_3d_process_args
 from ...utils.array_utils import array_is_monotonic
@@ -18,7 +17,8 @@ __all__ = ('weighted_npairs_s_mu', )
 
 
 def weighted_npairs_s_mu(sample1, sample2, weights1, weights2, s_bins, mu_bins, period=None,
-        verbose=False, num_threads=1, approx_cell1_size=None, approx_cell2_size=None):
+        verbose=False, num_threads=1, approx_cell1_size=None, approx_cell2_size=None,
+        autocorr=False):
     r"""
     Function performs a *weighted* count of the number of pairs of points separated by less than
     radial separation, :math:`s`, given by ``s_bins`` and
@@ -79,10 +79,10 @@ def weighted_npairs_s_mu(sample1, sample2, weights1, weights2, s_bins, mu_bins,
 
     num_threads : int, optional
         Number of threads to use in calculation, where parallelization is performed
-        using the python ``multiprocessing`` module. Default is 1 for a purely serial
-        calculation, in which case a multiprocessing Pool object will
-        never be instantiated. A string 'max' may be used to indicate that
+        with OpenMP threads that share the input arrays in memory. Default is 1
+        for a purely serial calculation. A string 'max' may be used to indicate that
         the pair counters should use all available cores on the machine.
+        If Halotools was built without OpenMP support the calculation is serial.
 
     approx_cell1_size : array_like, optional
         Length-3 array serving as a guess for the optimal manner by how points
@@ -93,11 +93,19 @@ def weighted_npairs_s_mu(sample1, sample2, weights1, weights2, s_bins, mu_bins,
         Performance can vary sensitively with this parameter, so it is highly
         recommended that you experiment with this parameter when carrying out
         performance-critical calculations.
+        Set to the string 'auto' to choose the cell sizes by timing a few candidates;
+        the choice is remembered for similar samples on the same machine.
 
     approx_cell2_size : array_like, optional
         Analogous to ``approx_cell1_size``, but for sample2.  See comments for
         ``approx_cell1_size`` for details.
 
+    autocorr : bool, optional
+        If True, ``sample2`` must be identical to ``sample1`` and ``weights2`` to
+        ``weights1``, and each pair of points is counted only once rather than twice,
+        halving the work of the calculation. Pairs formed by a point with itself are not
+        counted. Default is False.
+
     Returns
     -------
     num_pairs : array of shape (num_s_bin_edges, num_mu_bin_edges) storing the
@@ -198,6 +206,8 @@ def weighted_npairs_s_mu(sample1, sample2, weights1, weights2, s_bins, mu_bins,
 
     search_xlength, search_ylength, search_zlength = rmax, rmax, rmax
 
+    _verify_autocorr_inputs(autocorr, (sample1, sample2), (weights1, weights2))
+
     # Compute the estimates for the cell sizes
     approx_cell1_size, approx_cell2_size = (
         _set_approximate_cell_sizes(approx_cell1_size, approx_cell2_size, period)
@@ -209,28 +219,16 @@ def weighted_npairs_s_mu(sample1, sample2, weights1, weights2, s_bins, mu_bins,
     double_mesh = RectangularDoubleMesh(x1in, y1in, z1in, x2in, y2in, z2in,
         approx_x1cell_size, approx_y1cell_size, approx_z1cell_size,
         approx_x2cell_size, approx_y2cell_size, approx_z2cell_size,
-        search_xlength, search_ylength, search_zlength, xperiod, yperiod, zperiod, PBCs)
-
-    # Create a function object that has a single argument, for parallelization purposes
-    engine = partial(weighted_npairs_s_mu_engine,
-        double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, weights1, weights2, s_bins, mu_bins_prime)
-
-    # Calculate the cell1 indices that will be looped over by the engine
-    num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
-
-    if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = pool.map(engine, cell1_tuples)
-        result = np.array(result)
-        counts = result[:,0]
-        weighted_counts = result[:,1]
-        counts = np.sum(np.array(counts), axis=0)
-        weighted_counts = np.sum(np.array(weighted_counts), axis=0)
-        pool.close()
-    else:
-        result = engine(cell1_tuples[0])
-        counts = result[0]
-        weighted_counts = result[1]
+        search_xlength, search_ylength, search_zlength, xperiod, yperiod, zperiod, PBCs,
+        autocorr=autocorr)
+
+    # The engine loops over every cell of mesh1 in a single call, sharing the cells
+    # between ``num_threads`` OpenMP threads that all read the same input arrays
+    cell1_tuple = (0, double_mesh.mesh1.ncells)
+    busy_time = np.zeros(num_threads)
+    counts, weighted_counts = weighted_npairs_s_mu_engine(double_mesh,
+        x1in, y1in, z1in, x2in, y2in, z2in, weights1, weights2, s_bins,
+        mu_bins_prime, cell1_tuple, num_threads, busy_time)
+    _record_worker_busy_times(busy_time)
 
     return np.array(counts), np.array(weighted_counts)
@@ -3,7 +3,6 @@ import os
 
 PATH_TO_PKG = os.path.relpath(os.path.dirname(__file__))
 SOURCES = ("velocity_marked_npairs_3d_engine.pyx",
-    "velocity_marking_functions.pyx",
     "velocity_marked_npairs_xy_z_engine.pyx",
     "mean_radial_velocity_vs_r_engine.pyx",
     "radial_pvd_vs_r_engine.pyx")
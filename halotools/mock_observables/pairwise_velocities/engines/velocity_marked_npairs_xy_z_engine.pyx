@@ -12,8 +12,6 @@ from .velocity_marking_functions cimport *
 __author__ = ('Andrew Hearin', 'Duncan Campbell')
 __all__ = ('velocity_marked_npairs_xy_z_engine', )
 
-ctypedef void (*f_type)(cnp.float64_t* w1, cnp.float64_t* w2, cnp.float64_t* shift, cnp.float64_t* result1, cnp.float64_t* result2, cnp.float64_t* result3)
-
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.nonecheck(False)
@@ -57,8 +55,33 @@ def velocity_marked_npairs_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in
         separated by a distance less than the corresponding entry of ``rp_bins``. 
 
     """
-    cdef f_type wfunc
-    wfunc = return_velocity_weighting_function(weight_func_id)
+    engine_args = (double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, weights1in,
+        weights2in, weight_func_id, rp_bins, pi_bins, cell1_tuple)
+    if weight_func_id == 1:
+        return _velocity_marked_npairs_xy_z_kernel(
+            <relative_radial_velocity_weights_tag*> NULL, engine_args)
+    elif weight_func_id == 2:
+        return _velocity_marked_npairs_xy_z_kernel(
+            <radial_velocity_variance_counter_weights_tag*> NULL, engine_args)
+    elif weight_func_id == 3:
+        return _velocity_marked_npairs_xy_z_kernel(
+            <relative_los_velocity_weights_tag*> NULL, engine_args)
+    elif weight_func_id == 4:
+        return _velocity_marked_npairs_xy_z_kernel(
+            <los_velocity_variance_counter_weights_tag*> NULL, engine_args)
+    else:
+        raise ValueError('weighting function does not exist')
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.nonecheck(False)
+cdef _velocity_marked_npairs_xy_z_kernel(velocity_weighting_tag* tag, tuple engine_args):
+    """ Loop of `velocity_marked_npairs_xy_z_engine` specialized to the weighting
+    function selected by the type of ``tag``.
+    """
+    (double_mesh, x1in, y1in, z1in, x2in, y2in, z2in, weights1in, weights2in,
+        weight_func_id, rp_bins, pi_bins, cell1_tuple) = engine_args
 
     cdef cnp.float64_t[:] rp_bins_squared = rp_bins*rp_bins
     cdef cnp.float64_t[:] pi_bins_squared = pi_bins*pi_bins
@@ -218,7 +241,8 @@ def velocity_marked_npairs_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in
                                     dxy_sq = dx*dx + dy*dy
                                     dz_sq = dz*dz
 
-                                    wfunc(&w_icell1[i,0], &w_icell2[j,0], &shift[0], &holder1, &holder2, &holder3)
+                                    velocity_weighting_function(tag, &w_icell1[i,0], &w_icell2[j,0], &shift[0],
+                                        &holder1, &holder2, &holder3)
 
                                     k = num_rp_bins-1
                                     while dxy_sq<=rp_bins_squared[k]:
@@ -234,19 +258,3 @@ def velocity_marked_npairs_xy_z_engine(double_mesh, x1in, y1in, z1in, x2in, y2in
                                         
     return np.array(counts1), np.array(counts2), np.array(counts3)
     
-
-cdef f_type return_velocity_weighting_function(weight_func_id):
-    """
-    returns a pointer to the user-specified pairwise velocity weighting function.
-    """
-
-    if weight_func_id==1:
-        return relative_radial_velocity_weights
-    if weight_func_id==2:
-        return radial_velocity_variance_counter_weights
-    if weight_func_id==3:
-        return relative_los_velocity_weights
-    if weight_func_id==4:
-        return los_velocity_variance_counter_weights
-    else:
-        raise ValueError('weighting function does not exist')
@@ -7,7 +7,6 @@ as a function of 3d distance between the pairs.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import numpy as np
-import multiprocessing
 
 from .engines import mean_radial_velocity_vs_r_engine
 
@@ -15,9 +14,11 @@ from ..radial_profiles.radial_profiles_helpers import get_normalized_rbins
 
 from functools import partial
 
-from ..pair_counters.mesh_helpers import _set_approximate_cell_sizes, _cell1_parallelization_indices
+from ..pair_counters.mesh_helpers import (_set_approximate_cell_sizes,
+    _cell1_parallelization_indices, _parallel_engine_map)
 from ..pair_counters.mesh_helpers import _enclose_in_box
 from ..pair_counters.rectangular_mesh import RectangularDoubleMesh
+from ..pair_counters.cell_size_autotuner import _is_auto
 from ..mock_observables_helpers import (enforce_sample_has_correct_shape,
     get_period, get_num_threads)
 
@@ -208,15 +209,13 @@ def mean_radial_velocity_vs_r(sample1, velocities1,
 
     # Calculate the cell1 indices that will be looped over by the engine
     num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
+        double_mesh.mesh1.ncells, num_threads, double_mesh=double_mesh)
 
     if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = np.array(pool.map(engine, cell1_tuples))
+        result = np.array(_parallel_engine_map(engine, cell1_tuples, num_threads))
         counts, vrad_sum = result[:, 0], result[:, 1]
         counts = np.sum(counts, axis=0)
         vrad_sum = np.sum(vrad_sum, axis=0)
-        pool.close()
     else:
         counts, vrad_sum = np.array(engine(cell1_tuples[0]))
 
@@ -300,7 +299,7 @@ def _process_args(sample1, velocities1, sample2, velocities2,
     elif len(np.atleast_1d(approx_cell1_size)) == 1:
         approx_cell1_size = [approx_cell1_size, approx_cell1_size, approx_cell1_size]
     if approx_cell2_size is None:
-        approx_cell2_size = [max_rbins_absolute, max_rbins_absolute, max_rbins_absolute]
+        approx_cell2_size = 'auto' if _is_auto(approx_cell1_size) else [max_rbins_absolute, max_rbins_absolute, max_rbins_absolute]
     elif len(np.atleast_1d(approx_cell2_size)) == 1:
         approx_cell2_size = [approx_cell2_size, approx_cell2_size, approx_cell2_size]
 
@@ -8,13 +8,13 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 import numpy as np
 from functools import partial
 
-import multiprocessing
 
 from .engines import radial_pvd_vs_r_engine
 
 from .mean_radial_velocity_vs_r import _process_args
 
-from ..pair_counters.mesh_helpers import _set_approximate_cell_sizes, _cell1_parallelization_indices
+from ..pair_counters.mesh_helpers import (_set_approximate_cell_sizes,
+    _cell1_parallelization_indices, _parallel_engine_map)
 from ..pair_counters.rectangular_mesh import RectangularDoubleMesh
 
 
@@ -206,16 +206,14 @@ def radial_pvd_vs_r(sample1, velocities1,
 
     # Calculate the cell1 indices that will be looped over by the engine
     num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
+        double_mesh.mesh1.ncells, num_threads, double_mesh=double_mesh)
 
     if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = np.array(pool.map(engine, cell1_tuples))
+        result = np.array(_parallel_engine_map(engine, cell1_tuples, num_threads))
         counts, vrad_sum, vradsq_sum = result[:, 0], result[:, 1], result[:, 2]
         counts = np.sum(counts, axis=0)
         vrad_sum = np.sum(vrad_sum, axis=0)
         vradsq_sum = np.sum(vradsq_sum, axis=0)
-        pool.close()
     else:
         counts, vrad_sum, vradsq_sum = np.array(engine(cell1_tuples[0]))
 
@@ -1,10 +1,10 @@
 from __future__ import (absolute_import, division, print_function, unicode_literals)
 import numpy as np
-import multiprocessing
 from functools import partial
 
 from ..pair_counters.npairs_3d import _npairs_3d_process_args
-from ..pair_counters.mesh_helpers import _set_approximate_cell_sizes, _cell1_parallelization_indices
+from ..pair_counters.mesh_helpers import (_set_approximate_cell_sizes,
+    _cell1_parallelization_indices, _parallel_engine_map)
 from ..pair_counters.rectangular_mesh import RectangularDoubleMesh
 
 from .engines import velocity_marked_npairs_3d_engine
@@ -173,16 +173,14 @@ def velocity_marked_npairs_3d(sample1, sample2, rbins, period=None,
 
     # Calculate the cell1 indices that will be looped over by the engine
     num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
+        double_mesh.mesh1.ncells, num_threads, double_mesh=double_mesh)
 
     if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = np.array(pool.map(engine, cell1_tuples))
+        result = np.array(_parallel_engine_map(engine, cell1_tuples, num_threads))
         counts1, counts2, counts3 = result[:, 0], result[:, 1], result[:, 2]
         counts1 = np.sum(counts1, axis=0)
         counts2 = np.sum(counts2, axis=0)
         counts3 = np.sum(counts3, axis=0)
-        pool.close()
     else:
         counts1, counts2, counts3 = np.array(engine(cell1_tuples[0]))
 
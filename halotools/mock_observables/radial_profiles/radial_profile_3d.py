@@ -4,7 +4,6 @@ used to calculate radial profiles as a function of 3d separation.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import numpy as np
-import multiprocessing
 from functools import partial
 
 from .radial_profiles_helpers import (bounds_check_sample2_quantity,
@@ -13,7 +12,7 @@ from .engines import radial_profile_3d_engine
 
 from ..mock_observables_helpers import get_num_threads, get_period, enforce_sample_respects_pbcs
 from ..pair_counters.mesh_helpers import (_set_approximate_cell_sizes,
-    _cell1_parallelization_indices, _enclose_in_box)
+    _cell1_parallelization_indices, _parallel_engine_map, _enclose_in_box)
 from ..pair_counters.rectangular_mesh import RectangularDoubleMesh
 
 np.seterr(divide='ignore', invalid='ignore')  # ignore divide by zero in e.g. marked_counts/counts
@@ -244,18 +243,16 @@ def radial_profile_3d(sample1, sample2, sample2_quantity,
 
     # Calculate the cell1 indices that will be looped over by the engine
     num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
+        double_mesh.mesh1.ncells, num_threads, double_mesh=double_mesh)
 
     # print(rbins_normalized)
     # print(set(normalize_rbins_by))
 
     if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = np.array(pool.map(engine, cell1_tuples))
+        result = np.array(_parallel_engine_map(engine, cell1_tuples, num_threads))
         marked_counts, counts = result[:, 0, :], result[:, 1, :]
         marked_counts = np.sum(np.array(marked_counts), axis=0)
         counts = np.sum(np.array(counts), axis=0)
-        pool.close()
     else:
         marked_counts, counts = engine(cell1_tuples[0])
 
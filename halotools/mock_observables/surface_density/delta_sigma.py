@@ -9,7 +9,8 @@ import numpy as np
 from .surface_density_helpers import annular_area_weighted_midpoints
 from .surface_density_helpers import log_interpolation_with_inner_zero_masking as log_interp
 from .surface_density_helpers import rho_matter_comoving_in_halotools_units as rho_m_comoving
-from .mass_in_cylinders import total_mass_enclosed_in_stack_of_cylinders
+from .mass_in_cylinders import (total_mass_enclosed_in_stack_of_cylinders,
+    _particles_are_chunked)
 
 from ..mock_observables_helpers import (get_num_threads, get_separation_bins_array,
     get_period, enforce_sample_respects_pbcs, enforce_sample_has_correct_shape)
@@ -22,7 +23,7 @@ __author__ = ('Andrew Hearin', )
 
 def delta_sigma(galaxies, particles, particle_masses, downsampling_factor,
         rp_bins, period, cosmology=default_cosmology, num_threads=1,
-        approx_cell1_size=None, approx_cell2_size=None):
+        approx_cell1_size=None, approx_cell2_size=None, particle_chunk_size=None):
     r"""
     Calculate :math:`\Delta\Sigma(r_p)`, the galaxy-galaxy lensing signal
     as a function of projected distance.
@@ -53,6 +54,9 @@ def delta_sigma(galaxies, particles, particle_masses, downsampling_factor,
 
     particles : array_like
         Numpy array of shape (num_ptcl, 3) containing 3-d positions of particles.
+        The array may be a `numpy.memmap` of a file on disk, or ``particles``
+        may be an iterator yielding arrays of shape (num_chunk, 3).
+        See the ``particle_chunk_size`` argument.
 
         Length units are comoving and assumed to be in Mpc/h, here and throughout Halotools.
 
@@ -65,6 +69,9 @@ def delta_sigma(galaxies, particles, particle_masses, downsampling_factor,
         If passing in a single float, it will be assumed that every particle
         has the same mass (as is the case in a typical DM-only simulation).
 
+        If ``particles`` is an iterator, ``particle_masses`` may also be an iterator
+        yielding the masses of each chunk of particles.
+
     downsampling_factor : float
         Factor by which the particles have been randomly downsampled.
         Should be unity if all simulation particles have been chosen.
@@ -106,6 +113,14 @@ def delta_sigma(galaxies, particles, particle_masses, downsampling_factor,
         Analogous to ``approx_cell1_size``, but for sample2.  See comments for
         ``approx_cell1_size`` for details.
 
+    particle_chunk_size : int, optional
+        If set, particles are read and counted in chunks of at most
+        ``particle_chunk_size`` points, so that peak memory does not scale with
+        the total number of particles.
+        See `~halotools.mock_observables.total_mass_enclosed_per_cylinder` for details.
+        Default is None, in which case all particles are counted at once,
+        unless ``particles`` is an iterator.
+
     Returns
     -------
     rp_mids : array_like
@@ -205,7 +220,7 @@ def delta_sigma(galaxies, particles, particle_masses, downsampling_factor,
 
     #  Perform bounds-checking and error-handling in private helper functions
     args = (galaxies, particles, particle_masses, downsampling_factor,
-        rp_bins, period, num_threads)
+        rp_bins, period, num_threads, particle_chunk_size)
     result = _delta_sigma_process_args(*args)
     galaxies, particles, particle_masses, downsampling_factor, \
         rp_bins, period, num_threads, PBCs = result
@@ -213,7 +228,7 @@ def delta_sigma(galaxies, particles, particle_masses, downsampling_factor,
     total_mass_in_stack_of_cylinders = total_mass_enclosed_in_stack_of_cylinders(
         galaxies, particles, particle_masses, downsampling_factor, rp_bins, period,
         num_threads=num_threads, approx_cell1_size=approx_cell1_size,
-        approx_cell2_size=approx_cell2_size)
+        approx_cell2_size=approx_cell2_size, particle_chunk_size=particle_chunk_size)
     total_mass_in_stack_of_annuli = np.diff(total_mass_in_stack_of_cylinders)
 
     mean_rho_comoving = rho_m_comoving(cosmology)
@@ -431,24 +446,28 @@ def _delta_sigma_precomputed_process_args(galaxies, mass_enclosed_per_galaxy, rp
 
 
 def _delta_sigma_process_args(galaxies, particles, masses, downsampling_factor,
-        rp_bins, period, num_threads):
+        rp_bins, period, num_threads, particle_chunk_size=None):
     period, PBCs = get_period(period)
 
     galaxies = enforce_sample_has_correct_shape(galaxies)
-    particles = enforce_sample_has_correct_shape(particles)
 
-    masses = np.atleast_1d(masses)
-    if len(masses) == 1:
-        masses = np.zeros(particles.shape[0]) + masses[0]
-    else:
-        msg = "Must have same number of ``particle_masses`` as particles"
-        assert masses.shape[0] == particles.shape[0], msg
+    # Chunked particles are only checked one chunk at a time while they are counted
+    if not _particles_are_chunked(particles, particle_chunk_size):
+        particles = enforce_sample_has_correct_shape(particles)
+
+        masses = np.atleast_1d(masses)
+        if len(masses) == 1:
+            masses = np.zeros(particles.shape[0]) + masses[0]
+        else:
+            msg = "Must have same number of ``particle_masses`` as particles"
+            assert masses.shape[0] == particles.shape[0], msg
+
+        enforce_sample_respects_pbcs(particles[:, 0], particles[:, 1], particles[:, 2], period)
 
     msg = "downsampling_factor = {0} < 1, which is impossible".format(downsampling_factor)
     assert downsampling_factor >= 1, msg
 
     enforce_sample_respects_pbcs(galaxies[:, 0], galaxies[:, 1], galaxies[:, 2], period)
-    enforce_sample_respects_pbcs(particles[:, 0], particles[:, 1], particles[:, 2], period)
 
     rp_bins = get_separation_bins_array(rp_bins)
 
@@ -17,10 +17,13 @@ from ..mock_observables_helpers import (get_num_threads, get_separation_bins_arr
 __all__ = ('total_mass_enclosed_in_stack_of_cylinders', 'total_mass_enclosed_per_cylinder')
 __author__ = ('Andrew Hearin', )
 
+_max_num_particle_slabs = 10
+
 
 def total_mass_enclosed_in_stack_of_cylinders(centers, particles,
         particle_masses, downsampling_factor, rp_bins, period,
-        num_threads=1, approx_cell1_size=None, approx_cell2_size=None):
+        num_threads=1, approx_cell1_size=None, approx_cell2_size=None,
+        particle_chunk_size=None):
     r""" Calculate the total mass enclosed by a stack of cylinders of infinite length.
 
     Parameters
@@ -36,6 +39,9 @@ def total_mass_enclosed_in_stack_of_cylinders(centers, particles,
 
     particles : array_like
         Numpy array of shape (num_ptcl, 3) containing 3-d positions of particles.
+        The array may be a `numpy.memmap` of a file on disk, or ``particles``
+        may be an iterator, e.g., a generator, yielding arrays of shape (num_chunk, 3).
+        See the ``particle_chunk_size`` argument.
 
         Length units are comoving and assumed to be in Mpc/h, here and throughout Halotools.
 
@@ -43,6 +49,8 @@ def total_mass_enclosed_in_stack_of_cylinders(centers, particles,
         Float or array of shape (num_ptcl, ) storing the mass of each particle
         in units of Msun with h=1 units. If every particle has the same mass
         (i.e., if your simulation is DM-only), you can pass in a single float.
+        If ``particles`` is an iterator, ``particle_masses`` may also be an iterator
+        yielding the masses of each chunk of particles.
 
     downsampling_factor : float
         Factor by which the particles have been randomly downsampled.
@@ -81,6 +89,17 @@ def total_mass_enclosed_in_stack_of_cylinders(centers, particles,
         Analogous to ``approx_cell1_size``, but for sample2.  See comments for
         ``approx_cell1_size`` for details.
 
+    particle_chunk_size : int, optional
+        If set, particles are read and counted in chunks of at most
+        ``particle_chunk_size`` points, so that peak memory no longer scales with
+        the total number of particles. This is useful when ``particles`` is a
+        `numpy.memmap` of a snapshot that does not fit in RAM.
+        Each chunk is split into slabs along the x-axis, and the particles of a slab
+        are only paired with the centers within max(rp_bins) of the slab.
+        Default is None, in which case all particles are counted at once,
+        unless ``particles`` is an iterator, in which case each chunk it yields
+        is counted separately.
+
     Returns
     -------
     total_mass_enclosed : array_like
@@ -100,6 +119,11 @@ def total_mass_enclosed_in_stack_of_cylinders(centers, particles,
     >>> mass_encl = total_mass_enclosed_in_stack_of_cylinders(centers, particles, masses, downsampling_factor, rp_bins, period)
     """
 
+    if _particles_are_chunked(particles, particle_chunk_size):
+        return _total_mass_enclosed_by_particle_chunks(weighted_npairs_xy,
+            centers, particles, particle_masses, downsampling_factor, rp_bins, period,
+            particle_chunk_size, num_threads, approx_cell1_size, approx_cell2_size)
+
     #  Perform bounds-checking and error-handling in private helper functions
     args = (centers, particles, particle_masses, downsampling_factor,
         rp_bins, period, num_threads)
@@ -125,7 +149,8 @@ def total_mass_enclosed_in_stack_of_cylinders(centers, particles,
 
 def total_mass_enclosed_per_cylinder(centers, particles,
         particle_masses, downsampling_factor, rp_bins, period,
-        num_threads=1, approx_cell1_size=None, approx_cell2_size=None):
+        num_threads=1, approx_cell1_size=None, approx_cell2_size=None,
+        particle_chunk_size=None):
     r""" Calculate the total mass enclosed in a set of cylinders of infinite length.
 
     Parameters
@@ -141,6 +166,9 @@ def total_mass_enclosed_per_cylinder(centers, particles,
 
     particles : array_like
         Numpy array of shape (num_ptcl, 3) containing 3-d positions of particles.
+        The array may be a `numpy.memmap` of a file on disk, or ``particles``
+        may be an iterator, e.g., a generator, yielding arrays of shape (num_chunk, 3).
+        See the ``particle_chunk_size`` argument.
 
         Length units are comoving and assumed to be in Mpc/h, here and throughout Halotools.
 
@@ -148,6 +176,8 @@ def total_mass_enclosed_per_cylinder(centers, particles,
         Float or array of shape (num_ptcl, ) storing the mass of each particle
         in units of Msun with h=1 units. If every particle has the same mass
         (i.e., if your simulation is DM-only), you can pass in a single float.
+        If ``particles`` is an iterator, ``particle_masses`` may also be an iterator
+        yielding the masses of each chunk of particles.
 
     downsampling_factor : float
         Factor by which the particles have been randomly downsampled.
@@ -186,6 +216,17 @@ def total_mass_enclosed_per_cylinder(centers, particles,
         Analogous to ``approx_cell1_size``, but for sample2.  See comments for
         ``approx_cell1_size`` for details.
 
+    particle_chunk_size : int, optional
+        If set, particles are read and counted in chunks of at most
+        ``particle_chunk_size`` points, so that peak memory no longer scales with
+        the total number of particles. This is useful when ``particles`` is a
+        `numpy.memmap` of a snapshot that does not fit in RAM.
+        Each chunk is split into slabs along the x-axis, and the particles of a slab
+        are only paired with the centers within max(rp_bins) of the slab.
+        Default is None, in which case all particles are counted at once,
+        unless ``particles`` is an iterator, in which case each chunk it yields
+        is counted separately.
+
     Returns
     -------
     total_mass_enclosed : array_like
@@ -208,6 +249,11 @@ def total_mass_enclosed_per_cylinder(centers, particles,
     >>> ith_cylinder_jth_radius_mass = mass_encl[i, j]  # doctest: +SKIP
     """
 
+    if _particles_are_chunked(particles, particle_chunk_size):
+        return _total_mass_enclosed_by_particle_chunks(weighted_npairs_per_object_xy,
+            centers, particles, particle_masses, downsampling_factor, rp_bins, period,
+            particle_chunk_size, num_threads, approx_cell1_size, approx_cell2_size)
+
     #  Perform bounds-checking and error-handling in private helper functions
     args = (centers, particles, particle_masses, downsampling_factor,
         rp_bins, period, num_threads)
@@ -256,3 +302,168 @@ def _enclosed_mass_process_args(centers, particles, masses,
     num_threads = get_num_threads(num_threads, enforce_max_cores=False)
 
     return centers, particles, masses, downsampling_factor, rp_bins, period, num_threads, PBCs
+
+
+def _is_chunk_stream(x):
+    """ Determine whether ``x`` is an iterator or generator yielding chunks,
+    as opposed to an array-like such as an ndarray, a list, a `numpy.memmap`
+    or an h5py dataset.
+    """
+    if hasattr(x, '__next__') or hasattr(x, 'next'):
+        return True
+    try:
+        return iter(x) is x
+    except TypeError:
+        return False
+
+
+def _particles_are_chunked(particles, particle_chunk_size):
+    """ Determine whether the particles should be counted chunk by chunk,
+    which is the case if a chunk size is requested or if the particles are
+    provided by an iterator rather than an array.
+    """
+    if particle_chunk_size is not None:
+        return True
+    return _is_chunk_stream(particles)
+
+
+def _particle_chunks(particles, particle_masses, particle_chunk_size):
+    """ Generator yielding the positions and masses of chunks of at most
+    ``particle_chunk_size`` particles. Slicing a `numpy.memmap` only reads the
+    chunk from disk, so that only one chunk is ever held in memory.
+    The same holds for other array-likes that read slices on demand, such as h5py datasets.
+    """
+    if _is_chunk_stream(particles):
+        chunks = particles
+    else:
+        chunks = iter((particles, ))
+
+    # Masses are either a single float, an array storing the mass of every particle,
+    # or an iterator yielding the masses of each chunk
+    masses_are_chunked = _is_chunk_stream(particle_masses)
+    if masses_are_chunked:
+        particle_masses = iter(particle_masses)
+    elif np.ndim(particle_masses) > 0:
+        if isinstance(particle_masses, (list, tuple)):
+            particle_masses = np.atleast_1d(particle_masses)
+        if np.shape(particle_masses)[0] == 1:
+            particle_masses = particle_masses[0]
+
+    msg = "Must have same number of ``particle_masses`` as particles"
+    offset = 0
+    for chunk in chunks:
+        if isinstance(chunk, (list, tuple)):
+            chunk = np.atleast_1d(chunk)
+        num_ptcl = np.shape(chunk)[0]
+
+        if masses_are_chunked:
+            try:
+                chunk_masses = next(particle_masses)
+            except StopIteration:
+                raise ValueError(msg)
+        elif np.ndim(particle_masses) > 0:
+            chunk_masses = particle_masses[offset:offset+num_ptcl]
+        else:
+            chunk_masses = particle_masses
+        offset += num_ptcl
+
+        if np.ndim(chunk_masses) > 0:
+            if np.shape(chunk_masses)[0] != num_ptcl:
+                raise ValueError(msg)
+
+        chunk_size = num_ptcl if particle_chunk_size is None else int(particle_chunk_size)
+        for first in range(0, num_ptcl, max(chunk_size, 1)):
+            last = min(first + chunk_size, num_ptcl)
+            positions = enforce_sample_has_correct_shape(
+                np.asarray(chunk[first:last], dtype=float))
+            if np.ndim(chunk_masses) > 0:
+                masses = np.asarray(chunk_masses[first:last], dtype=float)
+            else:
+                masses = np.zeros(last - first) + chunk_masses
+            yield positions, masses
+
+
+def _padded_slab_indices(x, Lbox, search_length, num_slabs):
+    """ Partition the interval [0, Lbox) into ``num_slabs`` slabs, and return
+    the indices of the points whose x-coordinate lies within ``search_length``
+    of each slab, accounting for periodic boundary conditions.
+    """
+    slab_width = Lbox/float(num_slabs)
+    half_padded_width = slab_width/2. + search_length
+    slab_indices = []
+    for islab in range(num_slabs):
+        dx = np.abs(x - (islab + 0.5)*slab_width)
+        dx = np.minimum(dx, Lbox - dx)
+        slab_indices.append(np.flatnonzero(dx <= half_padded_width))
+    return slab_indices
+
+
+def _total_mass_enclosed_by_particle_chunks(counter, centers, particles,
+        particle_masses, downsampling_factor, rp_bins, period, particle_chunk_size,
+        num_threads, approx_cell1_size, approx_cell2_size):
+    """ Accumulate the mass enclosed in cylinders around ``centers`` by counting
+    one chunk of particles, and one x-slab of each chunk, at a time.
+    The function ``counter`` is either `weighted_npairs_xy` or
+    `weighted_npairs_per_object_xy`, both of which are linear in the particle masses,
+    so that the counts of each slab of particles can simply be summed.
+    """
+    period, PBCs = get_period(period)
+    if PBCs is False:
+        msg = "Counting the particles in chunks requires the ``period`` argument"
+        raise ValueError(msg)
+
+    centers = enforce_sample_has_correct_shape(centers)
+    enforce_sample_respects_pbcs(centers[:, 0], centers[:, 1], centers[:, 2], period)
+
+    msg = "downsampling_factor = {0} < 1, which is impossible".format(downsampling_factor)
+    assert downsampling_factor >= 1, msg
+
+    rp_bins = get_separation_bins_array(rp_bins)
+    rp_max = np.max(rp_bins)
+    num_threads = get_num_threads(num_threads, enforce_max_cores=False)
+
+    # Slabs at least a few search lengths wide keep the padding a small
+    # fraction of the centers counted in each slab
+    num_slabs = int(max(1, min(_max_num_particle_slabs, period[0] // (4*rp_max))))
+    slab_width = period[0]/float(num_slabs)
+    slab_centers = _padded_slab_indices(centers[:, 0], period[0], rp_max, num_slabs)
+
+    if counter is weighted_npairs_per_object_xy:
+        total_mass = np.zeros((centers.shape[0], rp_bins.shape[0]))
+    else:
+        total_mass = np.zeros(rp_bins.shape[0])
+
+    for positions, masses in _particle_chunks(particles, particle_masses, particle_chunk_size):
+        enforce_sample_respects_pbcs(positions[:, 0], positions[:, 1], positions[:, 2], period)
+
+        # Sort the chunk by slab
+        slab_index = np.minimum((positions[:, 0]/slab_width).astype(int), num_slabs-1)
+        idx_sorted = np.argsort(slab_index, kind='mergesort')
+        slab_edges = np.searchsorted(slab_index[idx_sorted], np.arange(num_slabs+1))
+
+        for islab, center_indices in enumerate(slab_centers):
+            idx_slab = idx_sorted[slab_edges[islab]:slab_edges[islab+1]]
+            if (len(idx_slab) == 0) | (len(center_indices) == 0):
+                continue
+
+            slab_masses = masses[idx_slab]
+            mean_particle_mass = np.mean(slab_masses)
+            if mean_particle_mass == 0:
+                continue
+
+            # Calculate M_tot(< Rp) normalized with internal code units
+            slab_mass = counter(centers[center_indices, :2], positions[idx_slab, :2],
+                slab_masses/mean_particle_mass, rp_bins,
+                period=period[:2], num_threads=num_threads,
+                approx_cell1_size=approx_cell1_size,
+                approx_cell2_size=approx_cell2_size)
+
+            if counter is weighted_npairs_per_object_xy:
+                total_mass[center_indices] += slab_mass*mean_particle_mass
+            else:
+                total_mass += slab_mass*mean_particle_mass
+
+    # Account for downsampling
+    total_mass *= downsampling_factor
+
+    return total_mass
@@ -17,6 +17,12 @@ from ....empirical_models import PrebuiltSubhaloModelFactory
 from ....sim_manager import CachedHaloCatalog
 from ....mock_observables import return_xyz_formatted_array
 
+try:
+    import h5py
+    HAS_H5PY = True
+except ImportError:
+    HAS_H5PY = False
+
 __all__ = ('test_delta_sigma_consistency', )
 
 fixed_seed = 43
@@ -98,6 +104,42 @@ def test_delta_sigma_consistency():
     assert np.allclose(implied_delta_sigma, ds, rtol=0.001)
 
 
+def test_delta_sigma_particle_chunks():
+    num_centers, num_ptcl = 100, 1500
+    with NumpyRNGContext(fixed_seed):
+        centers = np.random.random((num_centers, 3))
+        particles = np.random.random((num_ptcl, 3))
+
+    rp_bins = np.linspace(0.01, 0.05, 5)
+    Lbox = 1.
+
+    rp_mids, ds = delta_sigma(centers, particles, 2., 1, rp_bins, Lbox)
+    rp_mids2, ds2 = delta_sigma(centers, particles, 2., 1, rp_bins, Lbox,
+        particle_chunk_size=400)
+    assert np.allclose(ds, ds2)
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_delta_sigma_h5py_particles(tmpdir):
+    num_centers, num_ptcl = 100, 1500
+    with NumpyRNGContext(fixed_seed):
+        centers = np.random.random((num_centers, 3))
+        particles = np.random.random((num_ptcl, 3))
+
+    rp_bins = np.linspace(0.01, 0.05, 5)
+    Lbox = 1.
+
+    rp_mids, ds = delta_sigma(centers, particles, 2., 1, rp_bins, Lbox)
+    fname = str(tmpdir.join('particles.hdf5'))
+    with h5py.File(fname, 'w', driver='core', backing_store=False) as f:
+        particles_dataset = f.create_dataset('particles', data=particles)
+        rp_mids2, ds2 = delta_sigma(centers, particles_dataset, 2., 1, rp_bins, Lbox)
+        assert np.allclose(ds, ds2)
+        rp_mids3, ds3 = delta_sigma(centers, particles_dataset, 2., 1, rp_bins, Lbox,
+            particle_chunk_size=400)
+        assert np.allclose(ds, ds3)
+
+
 def test_delta_sigma_raises_exceptions1():
     num_centers, num_ptcl = 100, 500
     with NumpyRNGContext(fixed_seed):
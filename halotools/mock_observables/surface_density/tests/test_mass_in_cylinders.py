@@ -3,8 +3,15 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import numpy as np
+import pytest
 from astropy.utils.misc import NumpyRNGContext
 
+try:
+    import h5py
+    HAS_H5PY = True
+except ImportError:
+    HAS_H5PY = False
+
 from .pure_python_weighted_npairs_xy import pure_python_weighted_npairs_xy
 
 from ..mass_in_cylinders import total_mass_enclosed_in_stack_of_cylinders as mass_in_cylinder_stack
@@ -131,3 +138,68 @@ def test_mass_per_cylinder():
         downsampling_factor, rp_bins, Lbox)
     assert np.allclose(np.sum(mass_encl_per_cylinder, axis=0), mass_encl_stack)
 
+
+
+def test_mass_in_cylinders_particle_chunks(tmpdir):
+    """ Counting a memory-mapped array of particles in chunks should give the
+    same result as counting all particles at once.
+    """
+    Lbox = 1
+    num_cyl, num_ptcl = 121, 2031
+
+    with NumpyRNGContext(fixed_seed):
+        centers = np.random.random((num_cyl, 3))
+        particles = np.random.random((num_ptcl, 3))
+        masses = np.random.rand(num_ptcl)
+
+    fname = str(tmpdir.join('particles.npy'))
+    np.save(fname, particles)
+    particles_memmap = np.load(fname, mmap_mode='r')
+
+    downsampling_factor = 2.
+    rp_bins = np.linspace(0.01, 0.1, 5)
+
+    for counter in (mass_in_cylinder_stack, mass_in_each_cylinder):
+        mass_encl = counter(centers, particles, masses,
+            downsampling_factor, rp_bins, Lbox)
+        mass_encl_chunks = counter(centers, particles_memmap, masses,
+            downsampling_factor, rp_bins, Lbox, particle_chunk_size=500)
+        assert np.allclose(mass_encl, mass_encl_chunks)
+
+        chunk_generator = (particles[i:i+300] for i in range(0, num_ptcl, 300))
+        mass_generator = (masses[i:i+300] for i in range(0, num_ptcl, 300))
+        mass_encl_generator = counter(centers, chunk_generator, mass_generator,
+            downsampling_factor, rp_bins, Lbox)
+        assert np.allclose(mass_encl, mass_encl_generator)
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_mass_in_cylinders_h5py_particles(tmpdir):
+    """ Array-likes other than ndarrays, such as h5py datasets, are counted
+    as arrays, with or without chunking.
+    """
+    Lbox = 1
+    num_cyl, num_ptcl = 121, 2031
+
+    with NumpyRNGContext(fixed_seed):
+        centers = np.random.random((num_cyl, 3))
+        particles = np.random.random((num_ptcl, 3))
+        masses = np.random.rand(num_ptcl)
+
+    downsampling_factor = 2.
+    rp_bins = np.linspace(0.01, 0.1, 5)
+
+    fname = str(tmpdir.join('particles.hdf5'))
+    with h5py.File(fname, 'w', driver='core', backing_store=False) as f:
+        particles_dataset = f.create_dataset('particles', data=particles)
+        masses_dataset = f.create_dataset('masses', data=masses)
+
+        for counter in (mass_in_cylinder_stack, mass_in_each_cylinder):
+            mass_encl = counter(centers, particles, masses,
+                downsampling_factor, rp_bins, Lbox)
+            mass_encl_h5py = counter(centers, particles_dataset, masses_dataset,
+                downsampling_factor, rp_bins, Lbox)
+            assert np.allclose(mass_encl, mass_encl_h5py)
+            mass_encl_chunks = counter(centers, particles_dataset, masses_dataset,
+                downsampling_factor, rp_bins, Lbox, particle_chunk_size=500)
+            assert np.allclose(mass_encl, mass_encl_chunks)
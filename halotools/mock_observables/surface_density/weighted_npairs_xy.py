@@ -10,7 +10,8 @@ from .engines import weighted_npairs_xy_engine
 
 from ..pair_counters.rectangular_mesh_2d import RectangularDoubleMesh2D
 from ..pair_counters.mesh_helpers import _set_approximate_2d_cell_sizes
-from ..pair_counters.mesh_helpers import _enclose_in_square, _cell1_parallelization_indices
+from ..pair_counters.mesh_helpers import (_enclose_in_square,
+    _cell1_parallelization_indices, _parallel_engine_map)
 
 from ...utils.array_utils import array_is_monotonic, custom_len
 
@@ -139,13 +140,11 @@ def weighted_npairs_xy(sample1, sample2, sample2_mass, rp_bins,
 
     # # Calculate the cell1 indices that will be looped over by the engine
     num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
+        double_mesh.mesh1.ncells, num_threads, double_mesh=double_mesh)
 
     if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = pool.map(counting_engine, cell1_tuples)
+        result = _parallel_engine_map(counting_engine, cell1_tuples, num_threads)
         weighted_counts = np.sum(np.array(result), axis=0)
-        pool.close()
     else:
         weighted_counts = counting_engine(cell1_tuples[0])
 
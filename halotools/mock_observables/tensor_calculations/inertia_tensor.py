@@ -3,14 +3,14 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import numpy as np
-import multiprocessing
 from functools import partial
 
 from .engines import inertia_tensor_per_object_engine
 
 from ..mock_observables_helpers import get_num_threads, get_period, enforce_sample_respects_pbcs
 from ..pair_counters.mesh_helpers import (_set_approximate_cell_sizes,
-    _cell1_parallelization_indices, _enclose_in_box, _enforce_maximum_search_length)
+    _cell1_parallelization_indices, _parallel_engine_map, _enclose_in_box,
+    _enforce_maximum_search_length)
 from ..pair_counters.rectangular_mesh import RectangularDoubleMesh
 
 
@@ -182,16 +182,14 @@ def inertia_tensor_per_object(sample1, sample2, weights2, smoothing_scale,
 
     # Calculate the cell1 indices that will be looped over by the engine
     num_threads, cell1_tuples = _cell1_parallelization_indices(
-        double_mesh.mesh1.ncells, num_threads)
+        double_mesh.mesh1.ncells, num_threads, double_mesh=double_mesh)
 
     if num_threads > 1:
-        pool = multiprocessing.Pool(num_threads)
-        result = pool.map(engine, cell1_tuples)
+        result = _parallel_engine_map(engine, cell1_tuples, num_threads)
         tensors = np.array([r[0] for r in result])
         sum_of_masses = np.array([r[1] for r in result])
         tensors = np.sum(tensors, axis=0)
         sum_of_masses = np.sum(sum_of_masses, axis=0)
-        pool.close()
     else:
         result = engine(cell1_tuples[0])
         tensors, sum_of_masses = result
@@ -17,7 +17,10 @@ from .wp_jackknife import wp_jackknife
 from .tpcf_one_two_halo_decomp import tpcf_one_two_halo_decomp
 from .tpcf import tpcf
 from .marked_tpcf import marked_tpcf
+from .rr_cache import clear_rr_cache, set_rr_cache_max_size
+from .subvolume_resampling import SubvolumePairCounts
 
 __all__ = ('angular_tpcf', 's_mu_tpcf', 'tpcf_multipole', 'wp',
            'rp_pi_tpcf', 'rp_pi_tpcf_jackknife', 'tpcf_jackknife', 'tpcf_one_two_halo_decomp', 'tpcf',
-           'marked_tpcf', 'wp_jackknife')
+           'marked_tpcf', 'wp_jackknife', 'clear_rr_cache', 'set_rr_cache_max_size',
+           'SubvolumePairCounts')
@@ -8,6 +8,7 @@ import numpy as np
 
 from .tpcf_estimators import _TP_estimator_requirements, _TP_estimator
 from .clustering_helpers import (verify_tpcf_estimator, process_optional_input_sample2)
+from .rr_cache import _lookup_rr_counts, _store_rr_counts
 
 
 from ..pair_counters import npairs_3d
@@ -165,8 +166,8 @@ def angular_tpcf(sample1, theta_bins, sample2=None, randoms=None,
         if randoms is not None:
             if do_RR is True:
                 RR = npairs_3d(randoms, randoms, chord_bins,
-                            num_threads=num_threads)
-                RR = np.diff(RR)
+                            num_threads=num_threads, autocorr=True)
+                RR = 2*np.diff(RR)
             else:
                 RR = None
             if do_DR is True:
@@ -217,8 +218,9 @@ def angular_tpcf(sample1, theta_bins, sample2=None, randoms=None,
         """
 
         if do_auto is True:
-            D1D1 = npairs_3d(sample1, sample1, chord_bins, num_threads=num_threads)
-            D1D1 = np.diff(D1D1)
+            D1D1 = npairs_3d(sample1, sample1, chord_bins, num_threads=num_threads,
+                autocorr=True)
+            D1D1 = 2*np.diff(D1D1)
         else:
             D1D1 = None
             D2D2 = None
@@ -233,8 +235,9 @@ def angular_tpcf(sample1, theta_bins, sample2=None, randoms=None,
             else:
                 D1D2 = None
             if do_auto is True:
-                D2D2 = npairs_3d(sample2, sample2, chord_bins, num_threads=num_threads)
-                D2D2 = np.diff(D2D2)
+                D2D2 = npairs_3d(sample2, sample2, chord_bins, num_threads=num_threads,
+                    autocorr=True)
+                D2D2 = 2*np.diff(D2D2)
             else:
                 D2D2 = None
 
@@ -253,12 +256,21 @@ def angular_tpcf(sample1, theta_bins, sample2=None, randoms=None,
         # this is arbitrarily set, but must remain consistent!
         NR = N1
 
+    # RR counts of the same randoms and bins may be stored in the on-disk cache
+    rr_cache_key, RR_cached = _lookup_rr_counts('angular', randoms, do_RR, chord_bins)
+    if RR_cached is not None:
+        do_RR = False
+
     # count data pairs
     D1D1, D1D2, D2D2 = pair_counts(sample1, sample2, chord_bins,
         num_threads, do_auto, do_cross, _sample1_is_sample2)
     # count random pairs
     D1R, D2R, RR = random_counts(sample1, sample2, randoms, chord_bins,
         num_threads, do_RR, do_DR, _sample1_is_sample2)
+    if RR_cached is not None:
+        RR = RR_cached
+    else:
+        _store_rr_counts(rr_cache_key, RR)
 
     # run results through the estimator and return relavent/user specified results.
     if _sample1_is_sample2:
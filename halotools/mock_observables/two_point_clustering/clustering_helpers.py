@@ -92,3 +92,89 @@ def process_optional_input_sample2(sample1, sample2, do_cross, ndim=3):
                 _sample1_is_sample2 = False
 
     return sample2, _sample1_is_sample2, do_cross
+
+
+def _single_pass_pair_counts(labeled_counter, sample1, sample2, randoms,
+        do_auto, do_cross, do_DR, do_RR, _sample1_is_sample2, jtags=None):
+    """ Function used to gather all the DD, DR and RR pair counts of a two-point
+    clustering function with a single pass of a labeled pair counter,
+    such as `~halotools.mock_observables.pair_counters.npairs_labeled_3d`,
+    over the stacked samples.
+
+    A single pass counts the pairs of every combination of the stacked samples,
+    so it is only used when all of these combinations are required,
+    e.g., for the Landy-Szalay estimator. Otherwise None is returned,
+    and the caller counts the required pairs separately.
+
+    Parameters
+    ----------
+    labeled_counter : function
+        Function called as ``labeled_counter(sample, labels)``, or as
+        ``labeled_counter(sample, labels, jtags=jtags)`` if ``jtags`` is not None,
+        returning the cumulative pair counts of every combination of the labels.
+
+    sample1 : array_like
+
+    sample2 : array_like
+
+    randoms : array_like or None
+
+    do_auto : boolean
+
+    do_cross : boolean
+
+    do_DR : boolean
+
+    do_RR : boolean
+
+    _sample1_is_sample2 : boolean
+
+    jtags : sequence, optional
+        Sequence of three arrays storing the jackknife tags of
+        ``sample1``, ``sample2`` and ``randoms``. Default is None.
+
+    Returns
+    ---------
+    counts : tuple or None
+        Tuple (D1D1, D1D2, D2D2, D1R, D2R, RR) storing the cumulative pair counts,
+        where entries that are not required are None, or None if the pairs
+        should be counted separately.
+    """
+    samples = (sample1, sample2, randoms)
+    required_pairs = []
+    if do_auto is True:
+        required_pairs.append((0, 0))
+        if not _sample1_is_sample2:
+            required_pairs.append((1, 1))
+    if (do_cross is True) & (not _sample1_is_sample2):
+        required_pairs.append((0, 1))
+    if randoms is not None:
+        if do_DR is True:
+            required_pairs.append((0, 2))
+            if not _sample1_is_sample2:
+                required_pairs.append((1, 2))
+        if do_RR is True:
+            required_pairs.append((2, 2))
+
+    indices = sorted(set(i for pair in required_pairs for i in pair))
+    for n, a in enumerate(indices):
+        for b in indices[n:]:
+            if (a, b) not in required_pairs:
+                return None
+    if len(required_pairs) < 2:
+        return None
+
+    sample = np.concatenate([samples[i] for i in indices])
+    labels = np.repeat(np.arange(len(indices)), [len(samples[i]) for i in indices])
+    if jtags is None:
+        counts = labeled_counter(sample, labels)
+    else:
+        counts = labeled_counter(sample, labels,
+            jtags=np.concatenate([jtags[i] for i in indices]))
+
+    label = dict((i, n) for n, i in enumerate(indices))
+    result = [None]*6
+    for position, (a, b) in enumerate(((0, 0), (0, 1), (1, 1), (0, 2), (1, 2), (2, 2))):
+        if (a, b) in required_pairs:
+            result[position] = counts[label[a], label[b]]
+    return tuple(result)
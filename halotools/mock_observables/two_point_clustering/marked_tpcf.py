@@ -14,7 +14,10 @@ from ..mock_observables_helpers import (enforce_sample_has_correct_shape,
     get_separation_bins_array, get_period, get_num_threads)
 from ..pair_counters.mesh_helpers import _enforce_maximum_search_length
 
-from ..pair_counters import npairs_3d, marked_npairs_3d
+from ..pair_counters import npairs_3d, marked_npairs_3d, pairwise_distance_3d
+from ..pair_counters.marked_cpairs import marked_pair_list_engine
+from ..pair_counters.marking_function_registry import _marking_function_address
+from ..pair_counters.marked_npairs_3d import _marked_npairs_process_weights
 
 from ...custom_exceptions import HalotoolsError
 
@@ -28,7 +31,8 @@ np.seterr(divide='ignore', invalid='ignore')  # ignore divide by zero in e.g. DD
 def marked_tpcf(sample1, rbins, sample2=None,
         marks1=None, marks2=None, period=None, do_auto=True, do_cross=True,
         num_threads=1, weight_func_id=1,
-        normalize_by='random_marks', iterations=1, randomize_marks=None, seed=None):
+        normalize_by='random_marks', iterations=1, randomize_marks=None, seed=None,
+        reuse_pairs=False):
     r"""
     Calculate the real space marked two-point correlation function, :math:`\mathcal{M}(r)`.
 
@@ -115,6 +119,15 @@ def marked_tpcf(sample1, rbins, sample2=None,
         and to randomly downsample data, if applicable.
         Default is None, in which case downsampling and shuffling will be stochastic.
 
+    reuse_pairs : bool, optional
+        If True, the pairs separated by less than the largest entry of ``rbins``
+        are found once and stored, and the weighted pair counts of the data marks
+        and of every permutation of the marks are evaluated from the stored pairs.
+        Each of the ``iterations`` then costs a small fraction of a pair count,
+        at the price of memory proportional to the number of pairs.
+        Default is False, in which case the pairs are counted again
+        for each set of marks.
+
     Returns
     -------
     marked_correlation_function(s) : numpy.array
@@ -145,7 +158,9 @@ def marked_tpcf(sample1, rbins, sample2=None,
     Notes
     -----
     Pairs are counted using
-    `~halotools.mock_observables.pair_counters.marked_npairs_3d`.
+    `~halotools.mock_observables.pair_counters.marked_npairs_3d`,
+    or found once with `~halotools.mock_observables.pair_counters.pairwise_distance_3d`
+    if ``reuse_pairs`` is True.
 
     If the ``period`` argument is passed in, the ith coordinate of all points
     must be between 0 and period[i].
@@ -276,6 +291,9 @@ def marked_tpcf(sample1, rbins, sample2=None,
                 \end{array}
                 \right.
 
+    A marking function compiled outside of Halotools can be used by passing the
+    ``weight_func_id`` returned by `~halotools.mock_observables.register_marking_function`.
+
     Examples
     --------
     For demonstration purposes we create a randomly distributed set of points within a
@@ -311,46 +329,60 @@ def marked_tpcf(sample1, rbins, sample2=None,
     # process parameters
     function_args = (sample1, rbins, sample2, marks1, marks2,
         period, do_auto, do_cross, num_threads,
-        weight_func_id, normalize_by, iterations, randomize_marks, seed)
+        weight_func_id, normalize_by, iterations, randomize_marks, seed, reuse_pairs)
     sample1, rbins, sample2, marks1, marks2, period, do_auto, do_cross, num_threads,\
         weight_func_id, normalize_by, _sample1_is_sample2, PBCs,\
-        randomize_marks = _marked_tpcf_process_args(*function_args)
+        randomize_marks, reuse_pairs = _marked_tpcf_process_args(*function_args)
 
     # calculate marked pairs
-    W1W1, W1W2, W2W2 = marked_pair_counts(sample1, sample2, rbins, period,
-        num_threads, do_auto, do_cross, marks1, marks2, weight_func_id, _sample1_is_sample2)
+    if reuse_pairs:
+        # The stored pairs bypass the pair counters, which check the number of marks
+        if _sample1_is_sample2:
+            _marked_npairs_process_weights(sample1, sample1, marks1, marks1, weight_func_id)
+        else:
+            _marked_npairs_process_weights(sample1, sample2, marks1, marks2, weight_func_id)
+        pair_lists = binned_pair_lists(sample1, sample2, rbins, period,
+            num_threads, do_auto, do_cross, _sample1_is_sample2)
+        W1W1, W1W2, W2W2 = pair_list_marked_counts(pair_lists,
+            marks1, marks2, weight_func_id, num_threads)
+    else:
+        W1W1, W1W2, W2W2 = marked_pair_counts(sample1, sample2, rbins, period,
+            num_threads, do_auto, do_cross, marks1, marks2, weight_func_id, _sample1_is_sample2)
 
     if normalize_by == 'number_counts':
-        R1R1, R1R2, R2R2 = pair_counts(sample1, sample2, rbins, period,
-            num_threads, do_auto, do_cross, _sample1_is_sample2, None, None)
+        if reuse_pairs:
+            R1R1, R1R2, R2R2 = (None if pairs is None else np.diff(pairs[2])
+                for pairs in pair_lists)
+        else:
+            R1R1, R1R2, R2R2 = pair_counts(sample1, sample2, rbins, period,
+                num_threads, do_auto, do_cross, _sample1_is_sample2, None, None)
     # calculate randomized marked pairs
     elif normalize_by == 'random_marks':
-        if iterations > 1:
-            # create storage arrays of the right shape
-            R1R1 = np.zeros((iterations, len(rbins)-1))
-            R1R2 = np.zeros((iterations, len(rbins)-1))
-            R2R2 = np.zeros((iterations, len(rbins)-1))
+        # create storage arrays of the right shape
+        R1R1 = np.zeros((iterations, len(rbins)-1))
+        R1R2 = np.zeros((iterations, len(rbins)-1))
+        R2R2 = np.zeros((iterations, len(rbins)-1))
+        # draw the permutations of all iterations from the same random sequence
+        with NumpyRNGContext(seed):
             for i in range(iterations):
                 # get arrays to randomize marks
-                with NumpyRNGContext(seed):
-                    permutate1 = np.random.permutation(np.arange(0, len(sample1)))
-                    permutate2 = np.random.permutation(np.arange(0, len(sample2)))
-                R1R1[i, :], R1R2[i, :], R2R2[i, :] = random_counts(
-                    sample1, sample2, rbins, period, num_threads,
-                    do_auto, do_cross, marks1, marks2, weight_func_id,
-                    _sample1_is_sample2, permutate1, permutate2, randomize_marks)
-
-            R1R1 = np.median(R1R1, axis=0)
-            R1R2 = np.median(R1R2, axis=0)
-            R2R2 = np.median(R2R2, axis=0)
-        else:
-            # get arrays to randomize marks
-            with NumpyRNGContext(seed):
                 permutate1 = np.random.permutation(np.arange(0, len(sample1)))
                 permutate2 = np.random.permutation(np.arange(0, len(sample2)))
-            R1R1, R1R2, R2R2 = random_counts(sample1, sample2, rbins, period,
-                num_threads, do_auto, do_cross, marks1, marks2, weight_func_id,
-                _sample1_is_sample2, permutate1, permutate2, randomize_marks)
+                permuted_marks1 = permute_marks(marks1, permutate1, randomize_marks)
+                permuted_marks2 = permute_marks(marks2, permutate2, randomize_marks)
+                if reuse_pairs:
+                    R1R1[i, :], R1R2[i, :], R2R2[i, :] = pair_list_marked_counts(
+                        pair_lists, permuted_marks1, permuted_marks2,
+                        weight_func_id, num_threads)
+                else:
+                    R1R1[i, :], R1R2[i, :], R2R2[i, :] = random_counts(
+                        sample1, sample2, rbins, period, num_threads,
+                        do_auto, do_cross, permuted_marks1, permuted_marks2,
+                        weight_func_id, _sample1_is_sample2)
+
+        R1R1 = np.median(R1R1, axis=0)
+        R1R2 = np.median(R1R2, axis=0)
+        R2R2 = np.median(R2R2, axis=0)
 
     # return results
     if _sample1_is_sample2:
@@ -380,8 +412,9 @@ def marked_pair_counts(sample1, sample2, rbins, period, num_threads,
     if do_auto is True:
         D1D1 = marked_npairs_3d(sample1, sample1, rbins,
             weights1=marks1, weights2=marks1,
-            weight_func_id=weight_func_id, period=period, num_threads=num_threads)
-        D1D1 = np.diff(D1D1)
+            weight_func_id=weight_func_id, period=period, num_threads=num_threads,
+            autocorr=True)
+        D1D1 = 2*np.diff(D1D1)
     else:
         D1D1 = None
         D2D2 = None
@@ -400,33 +433,36 @@ def marked_pair_counts(sample1, sample2, rbins, period, num_threads,
         if do_auto is True:
             D2D2 = marked_npairs_3d(sample2, sample2, rbins,
                 weights1=marks2, weights2=marks2, weight_func_id=weight_func_id,
-                period=period, num_threads=num_threads)
-            D2D2 = np.diff(D2D2)
+                period=period, num_threads=num_threads, autocorr=True)
+            D2D2 = 2*np.diff(D2D2)
         else:
             D2D2 = None
 
     return D1D1, D1D2, D2D2
 
 
+def permute_marks(marks, permutate, randomize_marks):
+    """
+    Return a copy of the marks in which the columns selected by ``randomize_marks``
+    are shuffled among points according to the permutation ``permutate``.
+    """
+    permuted_marks = np.copy(marks)
+    for i in range(marks.shape[1]):
+        if randomize_marks[i]:
+            permuted_marks[:, i] = marks[permutate, i]
+    return permuted_marks
+
+
 def random_counts(sample1, sample2, rbins, period, num_threads,
-        do_auto, do_cross, marks1, marks2, weight_func_id,
-        _sample1_is_sample2, permutate1, permutate2, randomize_marks):
+        do_auto, do_cross, permuted_marks1, permuted_marks2, weight_func_id,
+        _sample1_is_sample2):
     """
     Count random weighted data pairs.
     """
 
-    permuted_marks1 = marks1
-    permuted_marks2 = marks2
-    for i in range(marks1.shape[1]):
-        if randomize_marks[i]:
-            permuted_marks1[:, i] = marks1[permutate1, i]
-    for i in range(marks2.shape[1]):
-        if randomize_marks[i]:
-            permuted_marks2[:, i] = marks2[permutate2, i]
-
     if do_auto is True:
         R1R1 = marked_npairs_3d(sample1, sample1, rbins,
-            weights1=marks1, weights2=permuted_marks1,
+            weights1=permuted_marks1, weights2=permuted_marks1,
             weight_func_id=weight_func_id, period=period, num_threads=num_threads)
         R1R1 = np.diff(R1R1)
     else:
@@ -447,7 +483,7 @@ def random_counts(sample1, sample2, rbins, period, num_threads,
             R1R2 = None
         if do_auto is True:
             R2R2 = marked_npairs_3d(sample2, sample2, rbins,
-                weights1=marks2, weights2=permuted_marks2,
+                weights1=permuted_marks2, weights2=permuted_marks2,
                 weight_func_id=weight_func_id, period=period, num_threads=num_threads)
             R2R2 = np.diff(R2R2)
         else:
@@ -456,6 +492,71 @@ def random_counts(sample1, sample2, rbins, period, num_threads,
     return R1R1, R1R2, R2R2
 
 
+def binned_pair_lists(sample1, sample2, rbins, period, num_threads,
+        do_auto, do_cross, _sample1_is_sample2):
+    """
+    Find the data pairs once, each pair list being a tuple (i, j, bin_offsets)
+    of the indices of the points of the pairs sorted by separation bin,
+    and of the first pair of each bin.
+    """
+
+    def binned_pairs(sample_a, sample_b):
+        pairs = pairwise_distance_3d(sample_a, sample_b, np.max(rbins),
+            period=period, num_threads=num_threads)
+        # pairs with rbins[k] < r <= rbins[k+1] are in bin k, as in marked_npairs_3d
+        bin_index = np.searchsorted(rbins, pairs.data, side='left') - 1
+        keep = bin_index >= 0
+        order = np.argsort(bin_index[keep], kind='stable')
+        bin_offsets = np.searchsorted(bin_index[keep][order], np.arange(len(rbins)))
+        return pairs.row[keep][order], pairs.col[keep][order], bin_offsets
+
+    if do_auto is True:
+        pairs11 = binned_pairs(sample1, sample1)
+    else:
+        pairs11 = None
+        pairs22 = None
+
+    if _sample1_is_sample2:
+        pairs12 = pairs11
+        pairs22 = pairs11
+    else:
+        if do_cross is True:
+            pairs12 = binned_pairs(sample1, sample2)
+        else:
+            pairs12 = None
+        if do_auto is True:
+            pairs22 = binned_pairs(sample2, sample2)
+
+    return pairs11, pairs12, pairs22
+
+
+def pair_list_marked_counts(pair_lists, marks1, marks2, weight_func_id, num_threads):
+    """
+    Sum the weights of the stored data pairs.
+    """
+    pairs11, pairs12, pairs22 = pair_lists
+    W1W1, W1W2, W2W2 = None, None, None
+    registered_func_address = _marking_function_address(weight_func_id)
+
+    if pairs11 is not None:
+        W1W1 = marked_pair_list_engine(pairs11[0], pairs11[1], pairs11[2],
+            marks1, marks1, weight_func_id, num_threads,
+            registered_func_address)
+    if pairs12 is pairs11:
+        return W1W1, W1W1, W1W1
+
+    if pairs12 is not None:
+        W1W2 = marked_pair_list_engine(pairs12[0], pairs12[1], pairs12[2],
+            marks1, marks2, weight_func_id, num_threads,
+            registered_func_address)
+    if pairs22 is not None:
+        W2W2 = marked_pair_list_engine(pairs22[0], pairs22[1], pairs22[2],
+            marks2, marks2, weight_func_id, num_threads,
+            registered_func_address)
+
+    return W1W1, W1W2, W2W2
+
+
 def pair_counts(sample1, sample2, rbins, period, num_threads, do_auto, do_cross,
         _sample1_is_sample2, approx_cell1_size, approx_cell2_size):
     """
@@ -464,8 +565,8 @@ def pair_counts(sample1, sample2, rbins, period, num_threads, do_auto, do_cross,
     if do_auto is True:
         D1D1 = npairs_3d(sample1, sample1, rbins, period=period, num_threads=num_threads,
                       approx_cell1_size=approx_cell1_size,
-                      approx_cell2_size=approx_cell1_size)
-        D1D1 = np.diff(D1D1)
+                      approx_cell2_size=approx_cell1_size, autocorr=True)
+        D1D1 = 2*np.diff(D1D1)
     else:
         D1D1 = None
         D2D2 = None
@@ -486,8 +587,8 @@ def pair_counts(sample1, sample2, rbins, period, num_threads, do_auto, do_cross,
             D2D2 = npairs_3d(sample2, sample2, rbins, period=period,
                           num_threads=num_threads,
                           approx_cell1_size=approx_cell2_size,
-                          approx_cell2_size=approx_cell2_size)
-            D2D2 = np.diff(D2D2)
+                          approx_cell2_size=approx_cell2_size, autocorr=True)
+            D2D2 = 2*np.diff(D2D2)
         else:
             D2D2 = None
 
@@ -496,7 +597,7 @@ def pair_counts(sample1, sample2, rbins, period, num_threads, do_auto, do_cross,
 
 def _marked_tpcf_process_args(sample1, rbins, sample2, marks1, marks2,
         period, do_auto, do_cross, num_threads,
-        wfunc, normalize_by, iterations, randomize_marks, seed):
+        wfunc, normalize_by, iterations, randomize_marks, seed, reuse_pairs):
     """
     Private method to do bounds-checking on the arguments passed to
     `~halotools.mock_observables.marked_tpcf`.
@@ -593,5 +694,12 @@ def _marked_tpcf_process_args(sample1, rbins, sample2, marks1, marks2,
 
     num_threads = get_num_threads(num_threads)
 
+    try:
+        assert reuse_pairs == bool(reuse_pairs)
+    except:
+        msg = "`reuse_pairs` keyword must be boolean-valued."
+        raise ValueError(msg)
+
     return sample1, rbins, sample2, marks1, marks2, period, do_auto, do_cross,\
-        num_threads, wfunc, normalize_by, _sample1_is_sample2, PBCs, randomize_marks
+        num_threads, wfunc, normalize_by, _sample1_is_sample2, PBCs, randomize_marks,\
+        bool(reuse_pairs)
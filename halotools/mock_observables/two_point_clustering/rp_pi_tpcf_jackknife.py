@@ -13,6 +13,7 @@ from .rp_pi_tpcf import _rp_pi_tpcf_process_args
 from .tpcf_jackknife import get_subvolume_numbers, _enclose_in_box
 
 from .clustering_helpers import (process_optional_input_sample2, verify_tpcf_estimator)
+from .rr_cache import _lookup_rr_counts, _store_rr_counts
 from ..mock_observables_helpers import (enforce_sample_has_correct_shape,
     get_separation_bins_array, get_line_of_sight_bins_array, get_period, get_num_threads)
 from ..pair_counters.mesh_helpers import _enforce_maximum_search_length
@@ -280,9 +281,18 @@ def rp_pi_tpcf_jackknife(sample1, randoms, rp_bins, pi_bins, Nsub=[5, 5, 5],
         D1D2_full = D1D2[0, :, :]
         D1D2_sub = D1D2[1:, :, :]
 
+    # RR counts of the same randoms, bins and subvolumes may be stored in the on-disk cache
+    rr_cache_key, RR_cached = _lookup_rr_counts('jackknife_xy_z', randoms, do_RR,
+        rp_bins, pi_bins, period, j_index_random, N_sub_vol)
+    count_RR = (do_RR is True) & (RR_cached is None)
+
     # do random counts
     D1R, RR = jrandom_counts(sample1, randoms, j_index_1, j_index_random, N_sub_vol,
-        rp_bins, pi_bins, period, num_threads, do_DR, do_RR)
+        rp_bins, pi_bins, period, num_threads, do_DR, count_RR)
+    if RR_cached is not None:
+        RR = RR_cached
+    else:
+        _store_rr_counts(rr_cache_key, RR)
 
     if _sample1_is_sample2:
         D2R = D1R
@@ -357,8 +367,8 @@ def jnpair_counts(sample1, sample2, j_index_1, j_index_2, N_sub_vol, rp_bins, pi
     if do_auto is True:
         D1D1 = npairs_jackknife_xy_z(sample1, sample1, rp_bins, pi_bins, period=period,
             jtags1=j_index_1, jtags2=j_index_1,  N_samples=N_sub_vol,
-            num_threads=num_threads)
-        D1D1 = np.diff(np.diff(D1D1, axis=1), axis=2)
+            num_threads=num_threads, autocorr=True)
+        D1D1 = 2*np.diff(np.diff(D1D1, axis=1), axis=2)
     else:
         D1D1 = None
         D2D2 = None
@@ -377,8 +387,8 @@ def jnpair_counts(sample1, sample2, j_index_1, j_index_2, N_sub_vol, rp_bins, pi
         if do_auto is True:
             D2D2 = npairs_jackknife_xy_z(sample2, sample2, rp_bins, pi_bins, period=period,
                 jtags1=j_index_2, jtags2=j_index_2,
-                N_samples=N_sub_vol, num_threads=num_threads)
-            D2D2 = np.diff(np.diff(D2D2, axis=1), axis=2)
+                N_samples=N_sub_vol, num_threads=num_threads, autocorr=True)
+            D2D2 = 2*np.diff(np.diff(D2D2, axis=1), axis=2)
 
     return D1D1, D1D2, D2D2
 
@@ -399,8 +409,8 @@ def jrandom_counts(sample, randoms, j_index, j_index_randoms, N_sub_vol, rp_bins
     if do_RR is True:
         RR = npairs_jackknife_xy_z(randoms, randoms, rp_bins, pi_bins, period=period,
             jtags1=j_index_randoms, jtags2=j_index_randoms,
-            N_samples=N_sub_vol, num_threads=num_threads)
-        RR = np.diff(np.diff(RR, axis=1), axis=2)
+            N_samples=N_sub_vol, num_threads=num_threads, autocorr=True)
+        RR = 2*np.diff(np.diff(RR, axis=1), axis=2)
     else:
         RR = None
 
@@ -0,0 +1,200 @@
+"""
+Module providing a persistent on-disk cache of the random-random pair counts
+used by the two-point clustering functions of the
+`~halotools.mock_observables.two_point_clustering` sub-package.
+
+Counting the pairs of a large set of randoms is usually the most expensive part
+of a clustering calculation, yet the result only depends on the randoms, the bins,
+the period and the geometry of the counts. Each RR array is therefore stored in
+``$HOME/.astropy/cache/halotools/rr_counts``, next to the halo table cache,
+in a file named by a hash of everything it depends on. Repeated calls with the same
+randoms, e.g., while fitting a model to data, read RR from disk instead of counting it.
+When the cache exceeds its maximum size, the least recently used files are deleted.
+The ``HALOTOOLS_RR_CACHE_DIR`` environment variable, if set, overrides the location
+of the cache; the Halotools test suite uses it to keep the cache of each test session
+in a temporary directory.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+from hashlib import sha1
+import numpy as np
+
+from ...sim_manager import halotools_cache_dirname
+
+__all__ = ('clear_rr_cache', 'set_rr_cache_max_size')
+__author__ = ('Andrew Hearin', )
+
+_rr_cache_version = 1
+
+default_rr_cache_max_size = int(1e8)
+rr_cache_dirname = os.environ.get('HALOTOOLS_RR_CACHE_DIR',
+    os.path.join(halotools_cache_dirname, 'rr_counts'))
+rr_cache_max_size = default_rr_cache_max_size
+
+
+def set_rr_cache_max_size(max_size=default_rr_cache_max_size):
+    """ Set the maximum total size in bytes of the files stored in the cache of
+    random-random pair counts. Setting ``max_size`` to zero disables the cache.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        Maximum size of the cache in bytes. Default is 1e8.
+
+    Examples
+    --------
+    >>> set_rr_cache_max_size(int(1e9))
+    >>> set_rr_cache_max_size()
+    """
+    global rr_cache_max_size
+    rr_cache_max_size = int(max_size)
+
+
+def clear_rr_cache():
+    """ Delete every file stored in the cache of random-random pair counts.
+
+    Examples
+    --------
+    >>> clear_rr_cache()
+    """
+    for fname in _cached_rr_fnames():
+        try:
+            os.remove(fname)
+        except OSError:
+            pass
+
+
+def _cached_rr_fnames():
+    """ Return the list of files stored in the cache.
+    """
+    try:
+        basenames = os.listdir(rr_cache_dirname)
+    except OSError:
+        return []
+    return [os.path.join(rr_cache_dirname, basename) for basename in basenames
+        if basename.endswith('.npy')]
+
+
+def _rr_cache_key(geometry, randoms, *params):
+    """ Return a string that uniquely identifies the RR counts of the input randoms.
+
+    Parameters
+    ----------
+    geometry : string
+        Name of the kind of pair count, e.g., 'xy_z' or 'jackknife_3d',
+        since the same randoms and bins give different counts in each geometry.
+
+    randoms : array_like
+        Positions of the randoms.
+
+    params : sequence
+        Every other input the counts depend on, e.g., the bins, the period,
+        and the jackknife labels of the randoms. Entries may be arrays, scalars or None.
+    """
+    h = sha1()
+    h.update(str((_rr_cache_version, geometry)).encode('ascii'))
+    for arr in (randoms, ) + params:
+        if arr is None:
+            h.update(b'None')
+        else:
+            arr = np.ascontiguousarray(arr)
+            h.update(str((arr.dtype.str, arr.shape)).encode('ascii'))
+            h.update(arr.view(np.uint8))
+    return h.hexdigest()
+
+
+def _lookup_rr_counts(geometry, randoms, do_RR, *params):
+    """ Look up the RR counts of the input randoms in the cache.
+
+    Parameters
+    ----------
+    geometry : string
+
+    randoms : array_like or None
+
+    do_RR : boolean
+        Whether the calling function requires RR counts.
+
+    params : sequence
+        See `_rr_cache_key`.
+
+    Returns
+    -------
+    key : string or None
+        Key of the RR counts, which is None when no RR counts are required
+        or the cache is disabled.
+
+    RR : ndarray or None
+        The cached RR counts, or None if they are not in the cache.
+    """
+    if (randoms is None) | (do_RR is not True) | (rr_cache_max_size <= 0):
+        return None, None
+
+    key = _rr_cache_key(geometry, randoms, *params)
+    fname = os.path.join(rr_cache_dirname, key + '.npy')
+    try:
+        RR = np.load(fname)
+    except (IOError, OSError, ValueError):
+        return key, None
+
+    # Mark the file as recently used
+    try:
+        os.utime(fname, None)
+    except OSError:
+        pass
+    return key, RR
+
+
+def _store_rr_counts(key, RR):
+    """ Store the RR counts in the cache under the input key, and delete the least
+    recently used files if the cache now exceeds its maximum size.
+    Nothing is stored if ``key`` is None. Failing to write to the cache directory,
+    e.g., on a read-only file system, is harmless and only means the RR counts
+    will be calculated again.
+    """
+    if (key is None) | (RR is None):
+        return
+
+    fname = os.path.join(rr_cache_dirname, key + '.npy')
+    tmp_fname = os.path.join(rr_cache_dirname, key + '.{0}.tmp'.format(os.getpid()))
+    try:
+        try:
+            os.makedirs(rr_cache_dirname)
+        except OSError:
+            pass
+        with open(tmp_fname, 'wb') as f:
+            np.save(f, np.asarray(RR))
+        os.rename(tmp_fname, fname)
+    except (IOError, OSError):
+        try:
+            os.remove(tmp_fname)
+        except OSError:
+            pass
+        return
+
+    _evict_least_recently_used_rr_counts()
+
+
+def _evict_least_recently_used_rr_counts():
+    """ Delete the least recently used files until the total size of the
+    cache no longer exceeds ``rr_cache_max_size``.
+    """
+    entries = []
+    for fname in _cached_rr_fnames():
+        try:
+            stat = os.stat(fname)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, fname))
+    entries.sort()
+
+    total_size = sum(size for __, size, __ in entries)
+    for __, size, fname in entries:
+        if total_size <= rr_cache_max_size:
+            break
+        try:
+            os.remove(fname)
+        except OSError:
+            pass
+        total_size -= size
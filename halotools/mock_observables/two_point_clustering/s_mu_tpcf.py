@@ -5,15 +5,18 @@ calculate the redshift-space two-point correlation function , :math:`\xi(s, \mu)
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import numpy as np
+from functools import partial
 
 from .clustering_helpers import (process_optional_input_sample2,
-    verify_tpcf_estimator, tpcf_estimator_dd_dr_rr_requirements)
+    verify_tpcf_estimator, tpcf_estimator_dd_dr_rr_requirements,
+    _single_pass_pair_counts)
+from .rr_cache import _lookup_rr_counts, _store_rr_counts
 from ..mock_observables_helpers import (enforce_sample_has_correct_shape,
     get_separation_bins_array, get_line_of_sight_bins_array, get_period, get_num_threads)
 from ..pair_counters.mesh_helpers import _enforce_maximum_search_length
 
 from .tpcf_estimators import _TP_estimator_requirements, _TP_estimator
-from ..pair_counters import npairs_s_mu
+from ..pair_counters import npairs_s_mu, npairs_labeled_s_mu
 
 __all__ = ['s_mu_tpcf']
 __author__ = ['Duncan Campbell']
@@ -220,13 +223,42 @@ def s_mu_tpcf(sample1, s_bins, mu_bins, sample2=None, randoms=None,
         # this is arbitrarily set, but must remain consistent!
         NR = N1
 
-    D1D1, D1D2, D2D2 = pair_counts(sample1, sample2, s_bins, mu_bins, period,
-        num_threads, do_auto, do_cross, _sample1_is_sample2,
-        approx_cell1_size, approx_cell2_size)
-
-    D1R, D2R, RR = random_counts(sample1, sample2, randoms, s_bins, mu_bins,
-        period, PBCs, num_threads, do_RR, do_DR, _sample1_is_sample2,
-        approx_cell1_size, approx_cell2_size, approx_cellran_size)
+    # RR counts of the same randoms and bins may be stored in the on-disk cache
+    rr_cache_key, RR_cached = _lookup_rr_counts('s_mu', randoms, do_RR,
+        s_bins, mu_bins, period)
+    if RR_cached is not None:
+        do_RR = False
+
+    # When every combination of the samples is required,
+    # count all pairs with a single pass over the stacked samples
+    labeled_counter = partial(npairs_labeled_s_mu, s_bins=s_bins, mu_bins=mu_bins,
+        period=period, num_threads=num_threads, approx_cell_size=approx_cell1_size)
+    counts = _single_pass_pair_counts(labeled_counter, sample1, sample2, randoms,
+        do_auto, do_cross, do_DR, do_RR, _sample1_is_sample2)
+
+    if counts is None:
+        D1D1, D1D2, D2D2 = pair_counts(sample1, sample2, s_bins, mu_bins, period,
+            num_threads, do_auto, do_cross, _sample1_is_sample2,
+            approx_cell1_size, approx_cell2_size)
+
+        D1R, D2R, RR = random_counts(sample1, sample2, randoms, s_bins, mu_bins,
+            period, PBCs, num_threads, do_RR, do_DR, _sample1_is_sample2,
+            approx_cell1_size, approx_cell2_size, approx_cellran_size)
+    else:
+        D1D1, D1D2, D2D2, D1R, D2R, RR = (
+            None if c is None else np.diff(np.diff(c, axis=0), axis=1) for c in counts)
+        if _sample1_is_sample2:
+            D1D2 = D1D1
+            D2D2 = D1D1
+        if randoms is None:
+            D1R, D2R, RR = random_counts(sample1, sample2, randoms, s_bins, mu_bins,
+                period, PBCs, num_threads, do_RR, do_DR, _sample1_is_sample2,
+                approx_cell1_size, approx_cell2_size, approx_cellran_size)
+
+    if RR_cached is not None:
+        RR = RR_cached
+    else:
+        _store_rr_counts(rr_cache_key, RR)
 
     # return results.  remember to reverse the final result since
     # the pair counts are done in order of increasing theta_LOS (i.e. decreasing mu)
@@ -284,8 +316,8 @@ def random_counts(sample1, sample2, randoms, s_bins, mu_bins,
             RR = npairs_s_mu(randoms, randoms, s_bins, mu_bins, period=period,
                              num_threads=num_threads,
                              approx_cell1_size=approx_cellran_size,
-                             approx_cell2_size=approx_cellran_size)
-            RR = np.diff(np.diff(RR, axis=0), axis=1)
+                             approx_cell2_size=approx_cellran_size, autocorr=True)
+            RR = 2*np.diff(np.diff(RR, axis=0), axis=1)
         else:
             RR = None
         if do_DR is True:
@@ -350,8 +382,8 @@ def pair_counts(sample1, sample2, s_bins, mu_bins, period,
         D1D1 = npairs_s_mu(sample1, sample1, s_bins, mu_bins, period=period,
             num_threads=num_threads,
             approx_cell1_size=approx_cell1_size,
-            approx_cell2_size=approx_cell1_size)
-        D1D1 = np.diff(np.diff(D1D1, axis=0), axis=1)
+            approx_cell2_size=approx_cell1_size, autocorr=True)
+        D1D1 = 2*np.diff(np.diff(D1D1, axis=0), axis=1)
     else:
         D1D1 = None
         D2D2 = None
@@ -372,8 +404,8 @@ def pair_counts(sample1, sample2, s_bins, mu_bins, period,
             D2D2 = npairs_s_mu(sample2, sample2, s_bins, mu_bins, period=period,
                 num_threads=num_threads,
                 approx_cell1_size=approx_cell2_size,
-                approx_cell2_size=approx_cell2_size)
-            D2D2 = np.diff(np.diff(D2D2, axis=0), axis=1)
+                approx_cell2_size=approx_cell2_size, autocorr=True)
+            D2D2 = 2*np.diff(np.diff(D2D2, axis=0), axis=1)
         else:
             D2D2 = None
 
@@ -0,0 +1,492 @@
+r"""
+Module containing the `~halotools.mock_observables.SubvolumePairCounts` class used to
+estimate the covariance matrix of two-point clustering statistics by resampling
+spatial subvolumes of the data.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import numpy as np
+from itertools import combinations
+from astropy.utils.misc import NumpyRNGContext
+
+from .tpcf_estimators import _TP_estimator
+from .clustering_helpers import verify_tpcf_estimator
+from ..pair_counters import npairs_labeled_3d, npairs_labeled_xy_z, npairs_labeled_s_mu
+from ..mock_observables_helpers import (enforce_sample_has_correct_shape,
+    get_separation_bins_array, get_line_of_sight_bins_array, get_period, get_num_threads)
+from ..pair_counters.mesh_helpers import _enforce_maximum_search_length
+from ..catalog_analysis_helpers import cuboid_subvolume_labels
+
+__all__ = ('SubvolumePairCounts', )
+__author__ = ('Andrew Hearin', )
+
+
+np.seterr(divide='ignore', invalid='ignore')  # ignore divide by zero in e.g. DD/RR
+
+_statistics = ('tpcf', 'wp', 'rp_pi_tpcf', 's_mu_tpcf')
+
+# Number of resamples whose pair counts are held in memory at once
+_resample_chunk_size = 100
+
+
+class SubvolumePairCounts(object):
+    r"""
+    Pair counts of a sample of points and its randoms between every pair of spatial
+    subvolumes, used to estimate the covariance matrix of a two-point clustering
+    statistic by bootstrap, marked bootstrap or delete-d jackknife resampling
+    of the subvolumes.
+
+    The pairs are counted once, when the instance is created. Every resample
+    is then built from the stored counts with array arithmetic, so that
+    thousands of resamples cost far less than a single pair count.
+
+    The DD, DR and RR pairs formed by points of subvolumes :math:`a` and :math:`b`
+    enter each resample with a weight that is a function of the weights
+    :math:`w_a` and :math:`w_b` that the resample assigns to the subvolumes:
+
+    * bootstrap: :math:`w_a w_b`, where :math:`w_a` is the number of times
+      subvolume :math:`a` is drawn;
+    * marked bootstrap: :math:`(w_a + w_b)/2`, i.e., each point carries half of
+      the pairs it belongs to as its mark, and the marks are resampled;
+    * delete-d jackknife: :math:`(w_a + w_b)/2`, where :math:`w_a` is 0 for the
+      :math:`d` deleted subvolumes and 1 otherwise, which gives the same weights as
+      `~halotools.mock_observables.tpcf_jackknife` when :math:`d=1`.
+
+    The numbers of data and random points of each resample are the weighted sums
+    of the numbers of points in each subvolume.
+    """
+
+    def __init__(self, sample1, randoms, statistic, bins, Nsub=[5, 5, 5],
+            period=None, estimator='Natural', subvolume_labels1=None,
+            subvolume_labels_randoms=None, num_threads=1, approx_cell_size=None):
+        r"""
+        Parameters
+        ----------
+        sample1 : array_like
+            Npts1 x 3 numpy array containing 3-D positions of points.
+            See the :ref:`mock_obs_pos_formatting` documentation page, or the
+            Examples section below, for instructions on how to transform
+            your coordinate position arrays into the
+            format accepted by the ``sample1`` and ``randoms`` arguments.
+            Length units are comoving and assumed to be in Mpc/h, here and throughout Halotools.
+
+        randoms : array_like
+            Nran x 3 numpy array containing 3-D positions of random points.
+            If no ``subvolume_labels_randoms`` are passed, the randoms
+            must fill the same volume as ``sample1``.
+
+        statistic : string
+            Two-point statistic whose covariance is estimated. Must be one of
+            'tpcf', 'wp', 'rp_pi_tpcf' or 's_mu_tpcf', in which case the statistic
+            is the same as the one computed by the function of the same name
+            in auto-correlation mode.
+
+        bins : array_like or tuple
+            Bins of the statistic. For 'tpcf', the array ``rbins``
+            of boundaries of the 3-D separation bins. For 'wp', the tuple
+            (``rp_bins``, ``pi_max``). For 'rp_pi_tpcf', the tuple (``rp_bins``, ``pi_bins``).
+            For 's_mu_tpcf', the tuple (``s_bins``, ``mu_bins``).
+            See the documentation of each function for the meaning of these arguments.
+
+        Nsub : array_like, optional
+            Length-3 numpy array of number of divisions along each dimension
+            defining the cuboid subvolumes. If single integer is given, it is assumed
+            to be equivalent for each dimension. The total number of subvolumes is
+            the product of the entries of ``Nsub``. Default is [5, 5, 5].
+            Ignored if ``subvolume_labels1`` and ``subvolume_labels_randoms`` are passed.
+
+        period : array_like, optional
+            Length-3 sequence defining the periodic boundary conditions
+            in each dimension. If you instead provide a single scalar, Lbox,
+            period is assumed to be the same in all Cartesian directions.
+            If set to None (the default option), PBCs are set to infinity, and
+            the subvolumes split the smallest box enclosing all points.
+            Length units are comoving and assumed to be in Mpc/h, here and throughout Halotools.
+
+        estimator : string, optional
+            Statistical estimator for the tpcf.
+            Options are 'Natural', 'Davis-Peebles', 'Hewett' , 'Hamilton', 'Landy-Szalay'
+            Default is ``Natural``.
+
+        subvolume_labels1 : array_like, optional
+            Integer array of shape (Npts1, ) with values in the range
+            [1, N_sub_vol] storing the subvolume of each point of ``sample1``,
+            e.g., as returned by `~halotools.mock_observables.cuboid_subvolume_labels`.
+            Subvolumes of any shape may be used this way. Must be passed
+            together with ``subvolume_labels_randoms``. Default is None, in which case
+            the cuboid subvolumes defined by ``Nsub`` are used.
+
+        subvolume_labels_randoms : array_like, optional
+            Integer array of shape (Nran, ) storing the subvolume of each random point.
+            Default is None.
+
+        num_threads : int, optional
+            Number of threads to use in calculation, where parallelization is performed
+            with OpenMP threads that share the input arrays in memory. Default is 1
+            for a purely serial calculation. A string 'max' may be used to indicate that
+            the pair counters should use all available cores on the machine.
+
+        approx_cell_size : array_like, optional
+            Length-3 array serving as a guess for the optimal manner by how points
+            will be apportioned into subvolumes of the simulation box.
+            See the ``approx_cell1_size`` argument of
+            `~halotools.mock_observables.npairs_3d` for details.
+
+        Notes
+        -----
+        The pair counts of every pair of subvolumes are stored for each of DD, DR and RR,
+        so the memory used grows as the square of the number of subvolumes times the
+        number of bins. The labeled pair counters hold one such array per thread
+        for the two samples combined, which is four times larger.
+
+        Only the auto-correlation of ``sample1`` is supported.
+
+        Examples
+        --------
+        For demonstration purposes we create randomly distributed sets of points within a
+        periodic cube of Lbox = 250 Mpc/h.
+
+        >>> Npts, Nran, Lbox = 1000, 5000, 250.
+        >>> sample1 = np.random.uniform(0, Lbox, Npts*3).reshape((Npts, 3))
+        >>> randoms = np.random.uniform(0, Lbox, Nran*3).reshape((Nran, 3))
+
+        The pairs are counted once:
+
+        >>> rbins = np.logspace(0.5, 1.5, 5)
+        >>> counts = SubvolumePairCounts(sample1, randoms, 'tpcf', rbins, Nsub=3, period=Lbox)
+        >>> xi = counts.clustering
+
+        and the covariance matrix can then be estimated with any number of resamples:
+
+        >>> bootstrap_cov = counts.bootstrap_covariance(num_resamples=1000, seed=43)
+        >>> marked_cov = counts.bootstrap_covariance(num_resamples=1000, marked=True, seed=43)
+        >>> jackknife_cov = counts.delete_d_covariance(d=3, num_resamples=1000, seed=43)
+        """
+        sample1, randoms, bins, period, num_threads, PBCs = (
+            _subvolume_pair_counts_process_args(sample1, randoms, statistic, bins,
+                period, estimator, num_threads))
+        self.statistic = statistic
+        self.bins = bins
+        self.estimator = estimator
+
+        labels1, labels_randoms, N_sub_vol = _subvolume_labels(sample1, randoms,
+            Nsub, period, subvolume_labels1, subvolume_labels_randoms)
+        self.num_subvolumes = N_sub_vol
+
+        # Number of points in each subvolume
+        self._N1 = np.bincount(labels1-1, minlength=N_sub_vol).astype(float)
+        self._NR = np.bincount(labels_randoms-1, minlength=N_sub_vol).astype(float)
+
+        # Each subvolume of each sample is its own label of a single pass
+        # of a labeled pair counter over the stacked samples
+        sample = np.concatenate((sample1, randoms))
+        labels = np.concatenate((labels1-1, labels_randoms-1+N_sub_vol))
+
+        if statistic == 'tpcf':
+            counts = npairs_labeled_3d(sample, labels, bins, period=period,
+                num_threads=num_threads, approx_cell_size=approx_cell_size)
+            counts = np.diff(counts, axis=2)
+        else:
+            if statistic == 's_mu_tpcf':
+                s_bins, mu_bins = bins
+                counts = npairs_labeled_s_mu(sample, labels, s_bins, mu_bins,
+                    period=period, num_threads=num_threads,
+                    approx_cell_size=approx_cell_size)
+            else:
+                rp_bins, pi_bins = bins
+                if statistic == 'wp':
+                    pi_bins = np.array([0.0, pi_bins])
+                counts = npairs_labeled_xy_z(sample, labels, rp_bins, pi_bins,
+                    period=period, num_threads=num_threads,
+                    approx_cell_size=approx_cell_size)
+            counts = np.diff(np.diff(counts, axis=2), axis=3)
+
+        self._DD = counts[:N_sub_vol, :N_sub_vol]
+        self._DR = counts[:N_sub_vol, N_sub_vol:]
+        self._RR = counts[N_sub_vol:, N_sub_vol:]
+
+        self.clustering = self.resample(np.ones((1, N_sub_vol)))[0]
+
+    def resample(self, subvolume_weights, pair_weighting='linear'):
+        r"""
+        Calculate the statistic of each of the input resamples of the subvolumes.
+
+        Parameters
+        ----------
+        subvolume_weights : array_like
+            Array of shape (num_resamples, N_sub_vol) storing the weight
+            of each subvolume in each resample.
+
+        pair_weighting : string, optional
+            If 'linear', the default, the pairs formed by points of subvolumes a and b
+            have weight (w_a + w_b)/2, as for the marked bootstrap and the jackknife.
+            If 'product', the pairs have weight w_a*w_b, as for the bootstrap.
+
+        Returns
+        -------
+        result : ndarray
+            Array of shape (num_resamples, ) + ``clustering.shape`` storing
+            the statistic of each resample.
+        """
+        weights = np.atleast_2d(subvolume_weights).astype(float)
+        try:
+            assert weights.ndim == 2
+            assert weights.shape[1] == self.num_subvolumes
+        except AssertionError:
+            msg = ("Input ``subvolume_weights`` must have shape (num_resamples, {0})")
+            raise ValueError(msg.format(self.num_subvolumes))
+
+        if pair_weighting == 'linear':
+            counter = _linear_resampled_counts
+        elif pair_weighting == 'product':
+            counter = _product_resampled_counts
+        else:
+            msg = "Input ``pair_weighting`` must be either 'linear' or 'product'"
+            raise ValueError(msg)
+
+        DD, DR, RR = (counter(weights, counts) for counts in (self._DD, self._DR, self._RR))
+        N1 = np.dot(weights, self._N1)
+        NR = np.dot(weights, self._NR)
+
+        # The estimator treats the first axis as the resamples
+        # and requires all bins along the second axis
+        num_resamples = weights.shape[0]
+        bins_shape = DD.shape[1:]
+        DD, DR, RR = (counts.reshape((num_resamples, -1)) for counts in (DD, DR, RR))
+        xi = _TP_estimator(DD, DR, RR, N1, N1, NR, NR, self.estimator)
+        xi = np.reshape(xi, (num_resamples, ) + bins_shape)
+
+        if self.statistic == 'tpcf':
+            return xi
+        elif self.statistic == 'wp':
+            return 2.0*xi[:, :, 0]*self.bins[1]
+        elif self.statistic == 's_mu_tpcf':
+            # reverse the mu axis, since the pairs are counted
+            # in order of increasing theta_LOS (i.e. decreasing mu)
+            return xi[:, :, ::-1]
+        else:
+            return xi
+
+    def bootstrap_covariance(self, num_resamples=1000, marked=False, seed=None):
+        r"""
+        Covariance matrix of the statistic estimated by drawing ``num_resamples``
+        bootstrap resamples of the subvolumes, each with N_sub_vol subvolumes drawn
+        with replacement.
+
+        Parameters
+        ----------
+        num_resamples : int, optional
+            Number of bootstrap resamples. Default is 1000.
+
+        marked : bool, optional
+            If False, the default, each pair is weighted by the product of the number
+            of times each of its subvolumes is drawn.
+            If True, each pair is weighted by the average of these numbers,
+            as in the marked point bootstrap.
+
+        seed : int, optional
+            Random number seed used to draw the resamples. Default is None.
+
+        Returns
+        -------
+        cov : ndarray
+            Covariance matrix of the bins of the statistic, which are flattened
+            in row-major order for the 'rp_pi_tpcf' and 's_mu_tpcf' statistics.
+        """
+        num_resamples = _process_num_resamples(num_resamples)
+        N_sub_vol = self.num_subvolumes
+        with NumpyRNGContext(seed):
+            weights = np.random.multinomial(N_sub_vol,
+                np.ones(N_sub_vol)/float(N_sub_vol), size=num_resamples)
+
+        pair_weighting = 'linear' if marked is True else 'product'
+        result = self.resample(weights, pair_weighting=pair_weighting)
+        result = result.reshape((num_resamples, -1))
+        return np.atleast_2d(np.cov(result.T))
+
+    def delete_d_covariance(self, d=1, num_resamples=1000, seed=None):
+        r"""
+        Covariance matrix of the statistic estimated with the delete-d jackknife,
+        in which each resample removes d of the subvolumes.
+
+        Parameters
+        ----------
+        d : int, optional
+            Number of subvolumes removed from each resample. Default is 1,
+            which gives the covariance of `~halotools.mock_observables.tpcf_jackknife`.
+
+        num_resamples : int, optional
+            Maximum number of resamples. If the number of ways to choose d
+            of the subvolumes does not exceed ``num_resamples``, every choice is used.
+            Otherwise ``num_resamples`` choices are drawn at random. Default is 1000.
+
+        seed : int, optional
+            Random number seed used to draw the resamples. Default is None.
+
+        Returns
+        -------
+        cov : ndarray
+            Covariance matrix of the bins of the statistic, which are flattened
+            in row-major order for the 'rp_pi_tpcf' and 's_mu_tpcf' statistics.
+        """
+        num_resamples = _process_num_resamples(num_resamples)
+        N_sub_vol = self.num_subvolumes
+        try:
+            assert int(d) == d
+            assert 1 <= d < N_sub_vol
+        except (AssertionError, TypeError, ValueError):
+            msg = "Input ``d`` must be an integer between 1 and the number of subvolumes minus 1"
+            raise ValueError(msg)
+        d = int(d)
+
+        if _num_combinations(N_sub_vol, d) <= num_resamples:
+            deleted = np.array(list(combinations(range(N_sub_vol), d)))
+        else:
+            with NumpyRNGContext(seed):
+                deleted = np.argsort(np.random.random((num_resamples, N_sub_vol)), axis=1)[:, :d]
+
+        weights = np.ones((len(deleted), N_sub_vol))
+        weights[np.arange(len(deleted))[:, np.newaxis], deleted] = 0.
+
+        result = self.resample(weights, pair_weighting='linear')
+        result = result.reshape((len(deleted), -1))
+        return np.atleast_2d(np.cov(result.T, bias=True))*(N_sub_vol-d)/float(d)
+
+
+def _linear_resampled_counts(weights, counts):
+    """ Pair counts of each resample when the pairs of subvolumes a and b
+    have weight (w_a + w_b)/2. Only the row and column sums of ``counts`` are required.
+    """
+    row_counts = np.sum(counts, axis=1)
+    column_counts = np.sum(counts, axis=0)
+    return 0.5*(np.tensordot(weights, row_counts, axes=(1, 0)) +
+        np.tensordot(weights, column_counts, axes=(1, 0)))
+
+
+def _product_resampled_counts(weights, counts):
+    """ Pair counts of each resample when the pairs of subvolumes a and b
+    have weight w_a*w_b, computed for chunks of resamples to limit memory use.
+    """
+    N_sub_vol = counts.shape[0]
+    bins_shape = counts.shape[2:]
+    flat_counts = counts.reshape((N_sub_vol, -1))
+
+    result = []
+    for first in range(0, len(weights), _resample_chunk_size):
+        w = weights[first:first+_resample_chunk_size]
+        weighted_rows = np.dot(w, flat_counts).reshape((len(w), N_sub_vol, -1))
+        result.append(np.einsum('rb,rbk->rk', w, weighted_rows))
+    return np.concatenate(result).reshape((len(weights), ) + bins_shape)
+
+
+def _num_combinations(n, k):
+    """ Number of ways to choose k of n items.
+    """
+    result = 1
+    for i in range(k):
+        result = result*(n-i)//(i+1)
+    return result
+
+
+def _process_num_resamples(num_resamples):
+    try:
+        assert int(num_resamples) == num_resamples
+        assert num_resamples > 1
+    except (AssertionError, TypeError, ValueError):
+        msg = "Input ``num_resamples`` must be an integer larger than 1"
+        raise ValueError(msg)
+    return int(num_resamples)
+
+
+def _subvolume_labels(sample1, randoms, Nsub, period,
+        subvolume_labels1, subvolume_labels_randoms):
+    """ Return the subvolume labels of the points of ``sample1`` and ``randoms``,
+    in the range [1, N_sub_vol], and the number of subvolumes.
+    """
+    if (subvolume_labels1 is None) != (subvolume_labels_randoms is None):
+        msg = ("Inputs ``subvolume_labels1`` and ``subvolume_labels_randoms`` "
+            "must either both be passed or both be None")
+        raise ValueError(msg)
+
+    if subvolume_labels1 is None:
+        if period is None:
+            # Split the smallest box enclosing all the points
+            sample = np.concatenate((sample1, randoms))
+            xyzmin = np.min(sample, axis=0)
+            Lbox = (np.max(sample, axis=0) - xyzmin)*(1 + 1e-10)
+            sample1, randoms = sample1 - xyzmin, randoms - xyzmin
+        else:
+            Lbox = period
+        labels1, N_sub_vol = cuboid_subvolume_labels(sample1, Nsub, Lbox)
+        labels_randoms, N_sub_vol = cuboid_subvolume_labels(randoms, Nsub, Lbox)
+    else:
+        labels1 = np.atleast_1d(subvolume_labels1).astype('i8')
+        labels_randoms = np.atleast_1d(subvolume_labels_randoms).astype('i8')
+        try:
+            assert labels1.shape == (len(sample1), )
+            assert labels_randoms.shape == (len(randoms), )
+            assert np.min(labels1) >= 1
+            assert np.min(labels_randoms) >= 1
+        except AssertionError:
+            msg = ("Inputs ``subvolume_labels1`` and ``subvolume_labels_randoms`` must store\n"
+                "one positive integer label for each point of ``sample1`` and ``randoms``")
+            raise ValueError(msg)
+        N_sub_vol = int(max(np.max(labels1), np.max(labels_randoms)))
+
+    if N_sub_vol < 2:
+        msg = "At least two subvolumes are required to resample the subvolumes"
+        raise ValueError(msg)
+
+    return labels1, labels_randoms, N_sub_vol
+
+
+def _subvolume_pair_counts_process_args(sample1, randoms, statistic, bins,
+        period, estimator, num_threads):
+    """
+    Private method to do bounds-checking on the arguments passed to
+    `~halotools.mock_observables.SubvolumePairCounts`.
+    """
+    sample1 = enforce_sample_has_correct_shape(sample1)
+    randoms = enforce_sample_has_correct_shape(randoms)
+    period, PBCs = get_period(period)
+
+    if statistic not in _statistics:
+        msg = "Input ``statistic`` must be one of {0}, not ``{1}``"
+        raise ValueError(msg.format(_statistics, statistic))
+
+    if statistic == 'tpcf':
+        bins = get_separation_bins_array(bins)
+        max_search_length = np.max(bins)
+    else:
+        try:
+            assert len(bins) == 2
+        except (AssertionError, TypeError):
+            msg = ("For the ``{0}`` statistic, input ``bins`` must be a two-element tuple")
+            raise ValueError(msg.format(statistic))
+
+        if statistic == 's_mu_tpcf':
+            s_bins = get_separation_bins_array(bins[0])
+            mu_bins = get_line_of_sight_bins_array(bins[1])
+            if (np.min(mu_bins) < 0.0) | (np.max(mu_bins) > 1.0):
+                msg = "`mu_bins` must be in the range [0,1]."
+                raise ValueError(msg)
+            bins = (s_bins, mu_bins)
+            max_search_length = np.max(s_bins)
+        else:
+            rp_bins = get_separation_bins_array(bins[0])
+            if statistic == 'wp':
+                pi_max = float(bins[1])
+                bins = (rp_bins, pi_max)
+            else:
+                pi_bins = get_line_of_sight_bins_array(bins[1])
+                bins = (rp_bins, pi_bins)
+                pi_max = np.max(pi_bins)
+            max_search_length = np.array([np.max(rp_bins), np.max(rp_bins), pi_max])
+
+    _enforce_maximum_search_length(max_search_length, period)
+
+    verify_tpcf_estimator(estimator)
+    num_threads = get_num_threads(num_threads)
+
+    return sample1, randoms, bins, period, num_threads, PBCs
@@ -7,6 +7,7 @@ import numpy as np
 
 from ..clustering_helpers import verify_tpcf_estimator
 from ..clustering_helpers import process_optional_input_sample2
+from ..clustering_helpers import _single_pass_pair_counts
 
 __all__ = ('test_verify_tpcf_estimator', )
 
@@ -67,3 +68,35 @@ def test_process_optional_input_sample2_case3():
     assert np.all(sample2_in == sample2_out)
     assert _sample1_is_sample2 is True
     assert do_cross is False
+
+
+def test_single_pass_pair_counts():
+    """ The single pass is only used when every combination of the stacked samples
+    is required, and the counts of each combination are returned in place.
+    """
+    sample1, sample2, randoms = np.zeros((5, 3)), np.zeros((7, 3)), np.zeros((11, 3))
+
+    def labeled_counter(sample, labels):
+        num_labels = np.max(labels) + 1
+        sizes = np.bincount(labels)
+        return np.outer(sizes, sizes).reshape((num_labels, num_labels))
+
+    # Landy-Szalay cross-correlation requires every combination
+    D1D1, D1D2, D2D2, D1R, D2R, RR = _single_pass_pair_counts(labeled_counter,
+        sample1, sample2, randoms, True, True, True, True, False)
+    assert (D1D1, D1D2, D2D2, D1R, D2R, RR) == (25, 35, 49, 55, 77, 121)
+
+    # Only the auto-correlation of sample1 with randoms
+    D1D1, D1D2, D2D2, D1R, D2R, RR = _single_pass_pair_counts(labeled_counter,
+        sample1, sample1, randoms, True, False, True, True, True)
+    assert (D1D1, D1D2, D2D2, D1R, D2R, RR) == (25, None, None, 55, None, 121)
+
+    # The Natural estimator does not require DR pairs
+    result = _single_pass_pair_counts(labeled_counter,
+        sample1, sample2, randoms, True, True, False, True, False)
+    assert result is None
+
+    # A single required combination is counted separately
+    result = _single_pass_pair_counts(labeled_counter,
+        sample1, sample1, None, True, False, False, False, True)
+    assert result is None
@@ -307,3 +307,55 @@ def test_exception_handling8():
             period=period, num_threads=1, weight_func_id=weight_func_id, do_auto='yes')
     substr = "`do_auto` and `do_cross` keywords must be boolean-valued."
     assert substr in err.value.args[0]
+
+
+@pytest.mark.parametrize('normalize_by', ('random_marks', 'number_counts'))
+@pytest.mark.parametrize('weight_func_id', (1, 3))
+def test_reuse_pairs_consistency(normalize_by, weight_func_id):
+    """ Evaluating the marks on the stored pairs gives the same result
+    as counting the pairs again for each permutation of the marks.
+    """
+    Npts1, Npts2 = 100, 90
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((Npts1, 3))
+        sample2 = np.random.random((Npts2, 3))
+        weights1 = np.random.random((Npts1, 2))
+        weights2 = np.random.random((Npts2, 2))
+    weights1[:, 0] = np.round(weights1[:, 0]*3)
+    weights2[:, 0] = np.round(weights2[:, 0]*3)
+    if weight_func_id == 1:
+        weights1, weights2 = weights1[:, 1], weights2[:, 1]
+
+    rbins = np.linspace(0.001, 0.25, 5)
+    period = 1
+
+    for iterations in (1, 5):
+        result1 = marked_tpcf(sample1, rbins, sample2=sample2,
+            marks1=weights1, marks2=weights2, period=period, num_threads=1,
+            weight_func_id=weight_func_id, normalize_by=normalize_by,
+            iterations=iterations, seed=fixed_seed)
+        result2 = marked_tpcf(sample1, rbins, sample2=sample2,
+            marks1=weights1, marks2=weights2, period=period, num_threads=1,
+            weight_func_id=weight_func_id, normalize_by=normalize_by,
+            iterations=iterations, seed=fixed_seed, reuse_pairs=True)
+        assert np.allclose(result1, result2)
+
+    result1 = marked_tpcf(sample1, rbins, marks1=weights1, num_threads=1,
+        weight_func_id=weight_func_id, normalize_by=normalize_by,
+        iterations=3, seed=fixed_seed)
+    result2 = marked_tpcf(sample1, rbins, marks1=weights1, num_threads=1,
+        weight_func_id=weight_func_id, normalize_by=normalize_by,
+        iterations=3, seed=fixed_seed, reuse_pairs=True)
+    assert np.allclose(result1, result2)
+
+
+def test_exception_handling9():
+    Npts = 100
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((Npts, 3))
+    rbins = np.linspace(0.001, 0.25, 5)
+
+    with pytest.raises(ValueError) as err:
+        result = marked_tpcf(sample1, rbins, period=1, reuse_pairs='yes')
+    substr = "`reuse_pairs` keyword must be boolean-valued."
+    assert substr in err.value.args[0]
@@ -0,0 +1,155 @@
+"""
+test module for the on-disk cache of random-random pair counts
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import numpy as np
+from astropy.utils.misc import NumpyRNGContext
+
+from ..tpcf import tpcf
+from ..tpcf_jackknife import tpcf_jackknife
+from ..rp_pi_tpcf import rp_pi_tpcf
+from ..rr_cache import (clear_rr_cache, set_rr_cache_max_size,
+    _lookup_rr_counts, _store_rr_counts, _cached_rr_fnames)
+
+__all__ = ('test_tpcf_rr_cache_hit', )
+
+fixed_seed = 43
+
+try:
+    from importlib import reload
+except ImportError:
+    pass
+
+rr_cache_module = sys.modules['halotools.mock_observables.two_point_clustering.rr_cache']
+
+
+def test_tpcf_rr_cache_hit(tmpdir, monkeypatch):
+    rr_cache_dirname = str(tmpdir.join('rr_counts'))
+    monkeypatch.setattr(rr_cache_module, 'rr_cache_dirname', rr_cache_dirname)
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((100, 3))
+        randoms = np.random.random((300, 3))
+    rbins = np.linspace(0.05, 0.3, 5)
+
+    xi = tpcf(sample1, rbins, randoms=randoms, period=1, estimator='Landy-Szalay')
+    assert len(_cached_rr_fnames()) == 1
+
+    xi_cached = tpcf(sample1, rbins, randoms=randoms, period=1, estimator='Landy-Szalay')
+    assert np.allclose(xi, xi_cached)
+    assert len(_cached_rr_fnames()) == 1
+
+    # Changing the bins changes the key
+    __ = tpcf(sample1, rbins[1:], randoms=randoms, period=1, estimator='Landy-Szalay')
+    assert len(_cached_rr_fnames()) == 2
+
+
+def test_tpcf_reads_rr_from_cache(tmpdir, monkeypatch):
+    """ Overwrite the cached RR counts and verify tpcf uses them instead of counting pairs.
+    """
+    rr_cache_dirname = str(tmpdir.join('rr_counts'))
+    monkeypatch.setattr(rr_cache_module, 'rr_cache_dirname', rr_cache_dirname)
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((100, 3))
+        randoms = np.random.random((300, 3))
+    rbins = np.linspace(0.05, 0.3, 5)
+
+    xi = tpcf(sample1, rbins, randoms=randoms, period=1, estimator='Natural')
+    fname = _cached_rr_fnames()[0]
+    RR = np.load(fname)
+    np.save(fname, 2*RR)
+
+    xi_modified = tpcf(sample1, rbins, randoms=randoms, period=1, estimator='Natural')
+    assert np.allclose(1 + xi_modified, (1 + xi)/2.)
+
+
+def test_tpcf_jackknife_rr_cache_hit(tmpdir, monkeypatch):
+    rr_cache_dirname = str(tmpdir.join('rr_counts'))
+    monkeypatch.setattr(rr_cache_module, 'rr_cache_dirname', rr_cache_dirname)
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((100, 3))
+        randoms = np.random.random((300, 3))
+    rbins = np.linspace(0.05, 0.3, 5)
+
+    xi, cov = tpcf_jackknife(sample1, randoms, rbins, Nsub=3, period=1)
+    xi_cached, cov_cached = tpcf_jackknife(sample1, randoms, rbins, Nsub=3, period=1)
+    assert len(_cached_rr_fnames()) == 1
+    assert np.allclose(xi, xi_cached)
+    assert np.allclose(cov, cov_cached)
+
+    # Changing the subvolumes changes the key
+    __ = tpcf_jackknife(sample1, randoms, rbins, Nsub=2, period=1)
+    assert len(_cached_rr_fnames()) == 2
+
+
+def test_rp_pi_tpcf_rr_cache_hit(tmpdir, monkeypatch):
+    rr_cache_dirname = str(tmpdir.join('rr_counts'))
+    monkeypatch.setattr(rr_cache_module, 'rr_cache_dirname', rr_cache_dirname)
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((100, 3))
+        randoms = np.random.random((300, 3))
+    rp_bins = np.linspace(0.05, 0.2, 4)
+    pi_bins = np.linspace(0.05, 0.2, 3)
+
+    xi = rp_pi_tpcf(sample1, rp_bins, pi_bins, randoms=randoms, period=1)
+    xi_cached = rp_pi_tpcf(sample1, rp_bins, pi_bins, randoms=randoms, period=1)
+    assert len(_cached_rr_fnames()) == 1
+    assert np.allclose(xi, xi_cached)
+
+
+def test_rr_cache_lru_eviction(tmpdir, monkeypatch):
+    rr_cache_dirname = str(tmpdir.join('rr_counts'))
+    monkeypatch.setattr(rr_cache_module, 'rr_cache_dirname', rr_cache_dirname)
+    monkeypatch.setattr(rr_cache_module, 'rr_cache_max_size',
+        rr_cache_module.default_rr_cache_max_size)
+    RR = np.ones(100)
+    keys = [_lookup_rr_counts('3d', np.full((10, 3), i), True, None)[0] for i in range(3)]
+
+    _store_rr_counts(keys[0], RR)
+    _store_rr_counts(keys[1], RR)
+    nbytes = os.path.getsize(_cached_rr_fnames()[0])
+    set_rr_cache_max_size(2*nbytes)
+
+    # Make the first entry the most recently used one
+    fname0, fname1 = [os.path.join(rr_cache_dirname, key + '.npy') for key in keys[:2]]
+    os.utime(fname0, (0, 0))
+    os.utime(fname1, (1, 1))
+    __, RR0 = _lookup_rr_counts('3d', np.full((10, 3), 0), True, None)
+    assert np.all(RR0 == RR)
+
+    _store_rr_counts(keys[2], RR)
+    remaining = set(os.path.basename(fname)[:-4] for fname in _cached_rr_fnames())
+    assert remaining == set((keys[0], keys[2]))
+
+
+def test_rr_cache_disabled(monkeypatch):
+    monkeypatch.setattr(rr_cache_module, 'rr_cache_max_size',
+        rr_cache_module.default_rr_cache_max_size)
+    set_rr_cache_max_size(0)
+    key, RR = _lookup_rr_counts('3d', np.zeros((10, 3)), True, None)
+    assert key is None
+    assert RR is None
+
+
+def test_clear_rr_cache(tmpdir, monkeypatch):
+    rr_cache_dirname = str(tmpdir.join('rr_counts'))
+    monkeypatch.setattr(rr_cache_module, 'rr_cache_dirname', rr_cache_dirname)
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((100, 3))
+        randoms = np.random.random((300, 3))
+    __ = tpcf(sample1, np.linspace(0.05, 0.3, 5), randoms=randoms, period=1)
+    assert len(_cached_rr_fnames()) == 1
+    clear_rr_cache()
+    assert len(_cached_rr_fnames()) == 0
+
+
+def test_rr_cache_dirname_environment_variable(tmpdir, monkeypatch):
+    monkeypatch.setenv('HALOTOOLS_RR_CACHE_DIR', str(tmpdir))
+    try:
+        reload(rr_cache_module)
+        assert rr_cache_module.rr_cache_dirname == str(tmpdir)
+    finally:
+        monkeypatch.undo()
+        reload(rr_cache_module)
@@ -0,0 +1,141 @@
+""" Module providing unit-testing for the `~halotools.mock_observables.SubvolumePairCounts` class.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import numpy as np
+import pytest
+from astropy.utils.misc import NumpyRNGContext
+
+from ..subvolume_resampling import (SubvolumePairCounts,
+    _product_resampled_counts, _linear_resampled_counts)
+from ..tpcf_jackknife import tpcf_jackknife
+from ..tpcf import tpcf
+from ..wp import wp
+from ..rp_pi_tpcf import rp_pi_tpcf
+from ..s_mu_tpcf import s_mu_tpcf
+
+__all__ = ('test_subvolume_pair_counts_tpcf', )
+
+period = 1.0
+fixed_seed = 43
+
+
+def test_subvolume_pair_counts_tpcf():
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((200, 3))
+        randoms = np.random.random((1000, 3))
+    rbins = np.linspace(0.05, 0.25, 5)
+
+    counts = SubvolumePairCounts(sample1, randoms, 'tpcf', rbins, Nsub=3, period=period,
+        estimator='Landy-Szalay')
+    xi = tpcf(sample1, rbins, randoms=randoms, period=period, estimator='Landy-Szalay')
+    assert np.allclose(counts.clustering, xi)
+
+
+def test_subvolume_pair_counts_delete_one_jackknife():
+    """ The delete-1 covariance over all subvolumes is identical to tpcf_jackknife.
+    """
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((200, 3))
+        randoms = np.random.random((1000, 3))
+    rbins = np.linspace(0.05, 0.25, 5)
+
+    counts = SubvolumePairCounts(sample1, randoms, 'tpcf', rbins, Nsub=3, period=period)
+    xi, cov = tpcf_jackknife(sample1, randoms, rbins, Nsub=3, period=period)
+
+    assert np.allclose(counts.clustering, xi)
+    assert np.allclose(counts.delete_d_covariance(d=1), cov)
+
+
+def test_subvolume_pair_counts_other_statistics():
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((200, 3))
+        randoms = np.random.random((1000, 3))
+    rp_bins = np.linspace(0.05, 0.2, 4)
+    pi_bins = np.linspace(0.05, 0.2, 3)
+
+    counts = SubvolumePairCounts(sample1, randoms, 'wp', (rp_bins, 0.2), Nsub=2, period=period)
+    assert np.allclose(counts.clustering, wp(sample1, rp_bins, 0.2, randoms=randoms, period=period))
+
+    counts = SubvolumePairCounts(sample1, randoms, 'rp_pi_tpcf', (rp_bins, pi_bins),
+        Nsub=2, period=period)
+    assert np.allclose(counts.clustering,
+        rp_pi_tpcf(sample1, rp_bins, pi_bins, randoms=randoms, period=period))
+    cov = counts.bootstrap_covariance(num_resamples=20, seed=fixed_seed)
+    assert cov.shape == (6, 6)
+
+    s_bins = np.linspace(0.05, 0.2, 4)
+    mu_bins = np.linspace(0, 1, 5)
+    counts = SubvolumePairCounts(sample1, randoms, 's_mu_tpcf', (s_bins, mu_bins),
+        Nsub=2, period=period)
+    assert np.allclose(counts.clustering,
+        s_mu_tpcf(sample1, s_bins, mu_bins, randoms=randoms, period=period))
+
+
+def test_subvolume_pair_counts_resample_weights():
+    """ Verify the weights of the pairs of each pair of subvolumes
+    in the bootstrap and the marked bootstrap.
+    """
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((100, 3))
+        randoms = np.random.random((300, 3))
+    rbins = np.linspace(0.05, 0.25, 5)
+    labels1 = np.where(sample1[:, 0] < 0.5, 1, 2)
+    labels_randoms = np.where(randoms[:, 0] < 0.5, 1, 2)
+
+    counts = SubvolumePairCounts(sample1, randoms, 'tpcf', rbins, period=period,
+        subvolume_labels1=labels1, subvolume_labels_randoms=labels_randoms)
+
+    # Drawing subvolume 1 once and subvolume 2 twice doubles the pairs between
+    # the two subvolumes and quadruples the pairs within subvolume 2,
+    # while the marks of the points of subvolume 2 are counted twice
+    DD = counts._DD
+    weights = np.array([[1, 2]])
+    expected_DD = DD[0, 0] + 2*(DD[0, 1] + DD[1, 0]) + 4*DD[1, 1]
+    assert np.allclose(_product_resampled_counts(weights, DD)[0], expected_DD)
+
+    expected_DD = DD[0, 0] + 1.5*(DD[0, 1] + DD[1, 0]) + 2*DD[1, 1]
+    assert np.allclose(_linear_resampled_counts(weights, DD)[0], expected_DD)
+
+
+def test_subvolume_pair_counts_covariances():
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((200, 3))
+        randoms = np.random.random((1000, 3))
+    rbins = np.linspace(0.05, 0.25, 5)
+    counts = SubvolumePairCounts(sample1, randoms, 'tpcf', rbins, Nsub=3, period=period)
+
+    for cov in (counts.bootstrap_covariance(num_resamples=200, seed=fixed_seed),
+            counts.bootstrap_covariance(num_resamples=200, marked=True, seed=fixed_seed),
+            counts.delete_d_covariance(d=3, num_resamples=200, seed=fixed_seed)):
+        assert cov.shape == (4, 4)
+        assert np.allclose(cov, cov.T)
+        assert np.all(np.diag(cov) > 0)
+
+    # Resamples are reproducible with a fixed seed
+    cov1 = counts.bootstrap_covariance(num_resamples=50, seed=fixed_seed)
+    cov2 = counts.bootstrap_covariance(num_resamples=50, seed=fixed_seed)
+    assert np.all(cov1 == cov2)
+
+
+def test_subvolume_pair_counts_bad_inputs():
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((50, 3))
+        randoms = np.random.random((100, 3))
+    rbins = np.linspace(0.05, 0.25, 5)
+
+    with pytest.raises(ValueError) as err:
+        counts = SubvolumePairCounts(sample1, randoms, 'xi_of_r', rbins, period=period)
+    substr = "Input ``statistic`` must be one of"
+    assert substr in err.value.args[0]
+
+    counts = SubvolumePairCounts(sample1, randoms, 'tpcf', rbins, Nsub=2, period=period)
+    with pytest.raises(ValueError) as err:
+        counts.delete_d_covariance(d=8)
+    substr = "Input ``d`` must be an integer between 1 and the number of subvolumes minus 1"
+    assert substr in err.value.args[0]
+
+    with pytest.raises(ValueError) as err:
+        counts.resample(np.ones((3, 5)))
+    substr = "Input ``subvolume_weights`` must have shape (num_resamples, 8)"
+    assert substr in err.value.args[0]
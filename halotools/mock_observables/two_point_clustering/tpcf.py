@@ -5,17 +5,20 @@ calculate the two-point correlation function in 3d (aka galaxy clustering).
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import numpy as np
+from functools import partial
 from math import gamma
 from warnings import warn
 
 from .clustering_helpers import (process_optional_input_sample2,
-    verify_tpcf_estimator, tpcf_estimator_dd_dr_rr_requirements)
+    verify_tpcf_estimator, tpcf_estimator_dd_dr_rr_requirements,
+    _single_pass_pair_counts)
+from .rr_cache import _lookup_rr_counts, _store_rr_counts
 from .tpcf_estimators import _TP_estimator
 
 from ..mock_observables_helpers import (enforce_sample_has_correct_shape,
     get_separation_bins_array, get_period, get_num_threads)
 from ..pair_counters.mesh_helpers import _enforce_maximum_search_length
-from ..pair_counters import npairs_3d
+from ..pair_counters import npairs_3d, npairs_labeled_3d
 
 from ...custom_exceptions import HalotoolsError
 ##########################################################################################
@@ -54,8 +57,8 @@ def _random_counts(sample1, sample2, randoms, rbins, period, PBCs, num_threads,
             RR = npairs_3d(randoms, randoms, rbins, period=period,
                         num_threads=num_threads,
                         approx_cell1_size=approx_cellran_size,
-                        approx_cell2_size=approx_cellran_size)
-            RR = np.diff(RR)
+                        approx_cell2_size=approx_cellran_size, autocorr=True)
+            RR = 2*np.diff(RR)
         else:
             RR = None
         if do_DR is True:
@@ -119,8 +122,8 @@ def _pair_counts(sample1, sample2, rbins,
         D1D1 = npairs_3d(sample1, sample1, rbins, period=period,
             num_threads=num_threads,
             approx_cell1_size=approx_cell1_size,
-            approx_cell2_size=approx_cell1_size)
-        D1D1 = np.diff(D1D1)
+            approx_cell2_size=approx_cell1_size, autocorr=True)
+        D1D1 = 2*np.diff(D1D1)
     else:
         D1D1 = None
         D2D2 = None
@@ -141,8 +144,8 @@ def _pair_counts(sample1, sample2, rbins,
             D2D2 = npairs_3d(sample2, sample2, rbins, period=period,
                 num_threads=num_threads,
                 approx_cell1_size=approx_cell2_size,
-                approx_cell2_size=approx_cell2_size)
-            D2D2 = np.diff(D2D2)
+                approx_cell2_size=approx_cell2_size, autocorr=True)
+            D2D2 = 2*np.diff(D2D2)
         else:
             D2D2 = None
 
@@ -229,6 +232,8 @@ def tpcf(sample1, rbins, sample2=None, randoms=None, period=None,
         Performance can vary sensitively with this parameter, so it is highly
         recommended that you experiment with this parameter when carrying out
         performance-critical calculations.
+        Set to the string 'auto' to choose the cell sizes by timing a few candidates;
+        the choice is remembered for similar samples on the same machine.
 
     approx_cell2_size : array_like, optional
         Analogous to ``approx_cell1_size``, but for sample2.  See comments for
@@ -337,6 +342,11 @@ def tpcf(sample1, rbins, sample2=None, randoms=None, period=None,
         # overwrite do_RR as necessary
         do_RR = False
 
+    # RR counts of the same randoms and bins may be stored in the on-disk cache
+    rr_cache_key, RR_cached = _lookup_rr_counts('3d', randoms, do_RR, rbins, period)
+    if RR_cached is not None:
+        do_RR = False
+
     # How many points are there (for normalization purposes)?
     N1 = len(sample1)
     N2 = len(sample2)
@@ -350,17 +360,39 @@ def tpcf(sample1, rbins, sample2=None, randoms=None, period=None,
         else:
             NR = N1
 
-    # count data pairs
-    D1D1, D1D2, D2D2 = _pair_counts(sample1, sample2, rbins, period,
-        num_threads, do_auto, do_cross, _sample1_is_sample2,
-        approx_cell1_size, approx_cell2_size)
-
-    # count random pairs
-    D1R, D2R, RR = _random_counts(sample1, sample2, randoms, rbins,
-        period, PBCs, num_threads, do_RR, do_DR, _sample1_is_sample2,
-        approx_cell1_size, approx_cell2_size, approx_cellran_size)
+    # When every combination of the samples is required,
+    # count all pairs with a single pass over the stacked samples
+    labeled_counter = partial(npairs_labeled_3d, rbins=rbins, period=period,
+        num_threads=num_threads, approx_cell_size=approx_cell1_size)
+    counts = _single_pass_pair_counts(labeled_counter, sample1, sample2, randoms,
+        do_auto, do_cross, do_DR, do_RR, _sample1_is_sample2)
+
+    if counts is None:
+        # count data pairs
+        D1D1, D1D2, D2D2 = _pair_counts(sample1, sample2, rbins, period,
+            num_threads, do_auto, do_cross, _sample1_is_sample2,
+            approx_cell1_size, approx_cell2_size)
+
+        # count random pairs
+        D1R, D2R, RR = _random_counts(sample1, sample2, randoms, rbins,
+            period, PBCs, num_threads, do_RR, do_DR, _sample1_is_sample2,
+            approx_cell1_size, approx_cell2_size, approx_cellran_size)
+    else:
+        D1D1, D1D2, D2D2, D1R, D2R, RR = (
+            None if c is None else np.diff(c) for c in counts)
+        if _sample1_is_sample2:
+            D1D2 = D1D1
+            D2D2 = D1D1
+        if randoms is None:
+            D1R, D2R, RR = _random_counts(sample1, sample2, randoms, rbins,
+                period, PBCs, num_threads, do_RR, do_DR, _sample1_is_sample2,
+                approx_cell1_size, approx_cell2_size, approx_cellran_size)
     if RR_precomputed is not None:
         RR = RR_precomputed
+    elif RR_cached is not None:
+        RR = RR_cached
+    else:
+        _store_rr_counts(rr_cache_key, RR)
 
     # run results through the estimator and return relavent/user specified results.
     if _sample1_is_sample2:
@@ -6,12 +6,15 @@ calculate the two point correlation function and covariance matrix.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 import numpy as np
+from functools import partial
 from astropy.utils.misc import NumpyRNGContext
 
 from .tpcf_estimators import _TP_estimator, _TP_estimator_requirements
-from ..pair_counters import npairs_jackknife_3d
+from ..pair_counters import npairs_jackknife_3d, npairs_labeled_jackknife_3d
 
-from .clustering_helpers import (process_optional_input_sample2, verify_tpcf_estimator)
+from .clustering_helpers import (process_optional_input_sample2, verify_tpcf_estimator,
+    _single_pass_pair_counts)
+from .rr_cache import _lookup_rr_counts, _store_rr_counts
 from ..mock_observables_helpers import (enforce_sample_has_correct_shape,
     get_separation_bins_array, get_period, get_num_threads)
 from ..pair_counters.mesh_helpers import _enforce_maximum_search_length
@@ -235,10 +238,49 @@ def tpcf_jackknife(sample1, randoms, rbins, Nsub=[5, 5, 5],
     N2_subs = N2 - N2_subs
     NR_subs = NR - NR_subs
 
-    # calculate all the pair counts
-    D1D1, D1D2, D2D2 = jnpair_counts(
-        sample1, sample2, j_index_1, j_index_2, N_sub_vol,
-        rbins, period, num_threads, do_auto, do_cross, _sample1_is_sample2)
+    # RR counts of the same randoms, bins and subvolumes may be stored in the on-disk cache
+    rr_cache_key, RR_cached = _lookup_rr_counts('jackknife_3d', randoms, do_RR,
+        rbins, period, j_index_random, N_sub_vol)
+    count_RR = (do_RR is True) & (RR_cached is None)
+
+    # When every combination of the samples is required,
+    # count all pairs with a single pass over the stacked samples
+    labeled_counter = partial(npairs_labeled_jackknife_3d, rbins=rbins, period=period,
+        N_samples=N_sub_vol, num_threads=num_threads)
+    counts = _single_pass_pair_counts(labeled_counter, sample1, sample2, randoms,
+        do_auto, do_cross, do_DR, count_RR, _sample1_is_sample2,
+        jtags=(j_index_1, j_index_2, j_index_random))
+
+    if counts is None:
+        # calculate all the pair counts
+        D1D1, D1D2, D2D2 = jnpair_counts(
+            sample1, sample2, j_index_1, j_index_2, N_sub_vol,
+            rbins, period, num_threads, do_auto, do_cross, _sample1_is_sample2)
+
+        # do random counts
+        D1R, RR = jrandom_counts(sample1, randoms, j_index_1, j_index_random, N_sub_vol,
+            rbins, period, num_threads, do_DR, count_RR)
+
+        if _sample1_is_sample2:
+            D2R = D1R
+        else:
+            if do_DR is True:
+                D2R, RR_dummy = jrandom_counts(sample2, randoms, j_index_2, j_index_random,
+                    N_sub_vol, rbins, period, num_threads, do_DR, do_RR=False)
+            else:
+                D2R = None
+    else:
+        D1D1, D1D2, D2D2, D1R, D2R, RR = (
+            None if c is None else np.diff(c, axis=1) for c in counts)
+        if _sample1_is_sample2:
+            D1D2 = D1D1
+            D2D2 = D1D1
+            D2R = D1R
+
+    if RR_cached is not None:
+        RR = RR_cached
+    else:
+        _store_rr_counts(rr_cache_key, RR)
 
     # pull out the full and sub sample results
     D1D1_full = D1D1[0, :]
@@ -248,19 +290,6 @@ def tpcf_jackknife(sample1, randoms, rbins, Nsub=[5, 5, 5],
     D2D2_full = D2D2[0, :]
     D2D2_sub = D2D2[1:, :]
 
-    # do random counts
-    D1R, RR = jrandom_counts(sample1, randoms, j_index_1, j_index_random, N_sub_vol,
-        rbins, period, num_threads, do_DR, do_RR)
-
-    if _sample1_is_sample2:
-        D2R = D1R
-    else:
-        if do_DR is True:
-            D2R, RR_dummy = jrandom_counts(sample2, randoms, j_index_2, j_index_random,
-                N_sub_vol, rbins, period, num_threads, do_DR, do_RR=False)
-        else:
-            D2R = None
-
     if do_DR is True:
         D1R_full = D1R[0, :]
         D1R_sub = D1R[1:, :]
@@ -366,8 +395,8 @@ def jnpair_counts(sample1, sample2, j_index_1, j_index_2, N_sub_vol, rbins,
     if do_auto is True:
         D1D1 = npairs_jackknife_3d(sample1, sample1, rbins, period=period,
             jtags1=j_index_1, jtags2=j_index_1,  N_samples=N_sub_vol,
-            num_threads=num_threads)
-        D1D1 = np.diff(D1D1, axis=1)
+            num_threads=num_threads, autocorr=True)
+        D1D1 = 2*np.diff(D1D1, axis=1)
     else:
         D1D1 = None
         D2D2 = None
@@ -386,8 +415,8 @@ def jnpair_counts(sample1, sample2, j_index_1, j_index_2, N_sub_vol, rbins,
         if do_auto is True:
             D2D2 = npairs_jackknife_3d(sample2, sample2, rbins, period=period,
                 jtags1=j_index_2, jtags2=j_index_2,
-                N_samples=N_sub_vol, num_threads=num_threads)
-            D2D2 = np.diff(D2D2, axis=1)
+                N_samples=N_sub_vol, num_threads=num_threads, autocorr=True)
+            D2D2 = 2*np.diff(D2D2, axis=1)
 
     return D1D1, D1D2, D2D2
 
@@ -408,8 +437,8 @@ def jrandom_counts(sample, randoms, j_index, j_index_randoms, N_sub_vol, rbins,
     if do_RR is True:
         RR = npairs_jackknife_3d(randoms, randoms, rbins, period=period,
             jtags1=j_index_randoms, jtags2=j_index_randoms,
-            N_samples=N_sub_vol, num_threads=num_threads)
-        RR = np.diff(RR, axis=1)
+            N_samples=N_sub_vol, num_threads=num_threads, autocorr=True)
+        RR = 2*np.diff(RR, axis=1)
     else:
         RR = None
 
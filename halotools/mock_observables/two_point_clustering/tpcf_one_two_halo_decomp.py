@@ -10,6 +10,7 @@ import numpy as np
 from math import gamma
 
 from .clustering_helpers import (process_optional_input_sample2, verify_tpcf_estimator)
+from .rr_cache import _lookup_rr_counts, _store_rr_counts
 
 from ..mock_observables_helpers import (enforce_sample_has_correct_shape,
     get_separation_bins_array, get_period, get_num_threads)
@@ -222,10 +223,19 @@ def tpcf_one_two_halo_decomp(sample1, sample1_host_halo_id, rbins,
             do_auto, do_cross, sample1_host_halo_id,
             sample2_host_halo_id, weight_func_id, _sample1_is_sample2)
 
+    # RR counts of the same randoms and bins may be stored in the on-disk cache
+    rr_cache_key, RR_cached = _lookup_rr_counts('3d', randoms, do_RR, rbins, period)
+    if RR_cached is not None:
+        do_RR = False
+
     # count random pairs
     D1R, D2R, RR = random_counts(sample1, sample2, randoms, rbins, period,
                                  PBCs, num_threads, do_RR, do_DR, _sample1_is_sample2,
                                  approx_cell1_size, approx_cell2_size, approx_cellran_size)
+    if RR_cached is not None:
+        RR = RR_cached
+    else:
+        _store_rr_counts(rr_cache_key, RR)
 
     # run results through the estimator and return relavent/user specified results.
     if _sample1_is_sample2:
@@ -282,8 +292,8 @@ def random_counts(sample1, sample2, randoms, rbins, period, PBCs, num_threads,
             RR = npairs_3d(randoms, randoms, rbins, period=period,
                         num_threads=num_threads,
                         approx_cell1_size=approx_cellran_size,
-                        approx_cell2_size=approx_cellran_size)
-            RR = np.diff(RR)
+                        approx_cell2_size=approx_cellran_size, autocorr=True)
+            RR = 2*np.diff(RR)
         else:
             RR = None
         if do_DR is True:
@@ -348,8 +358,9 @@ def marked_pair_counts(sample1, sample2, rbins, period, num_threads,
     if do_auto is True:
         D1D1 = marked_npairs_3d(sample1, sample1, rbins,
             weights1=marks1, weights2=marks1,
-            weight_func_id=weight_func_id, period=period, num_threads=num_threads)
-        D1D1 = np.diff(D1D1)
+            weight_func_id=weight_func_id, period=period, num_threads=num_threads,
+            autocorr=True)
+        D1D1 = 2*np.diff(D1D1)
     else:
         D1D1 = None
         D2D2 = None
@@ -368,8 +379,9 @@ def marked_pair_counts(sample1, sample2, rbins, period, num_threads,
         if do_auto is True:
             D2D2 = marked_npairs_3d(sample2, sample2, rbins,
                 weights1=marks2, weights2=marks2,
-                weight_func_id=weight_func_id, period=period, num_threads=num_threads)
-            D2D2 = np.diff(D2D2)
+                weight_func_id=weight_func_id, period=period, num_threads=num_threads,
+                autocorr=True)
+            D2D2 = 2*np.diff(D2D2)
         else:
             D2D2 = None
 
@@ -9,6 +9,7 @@ from astropy.utils.misc import NumpyRNGContext
 
 from ..underdensity_prob_func import underdensity_prob_func
 from ..void_prob_func import void_prob_func
+from ...pair_counters import npairs_per_object_3d
 
 from ...tests.cf_helpers import generate_locus_of_3d_points
 from ....custom_exceptions import HalotoolsError
@@ -104,6 +105,26 @@ def test_upf4():
     vpf = void_prob_func(sample1, rbins, n_ran=n_ran, period=Lbox)
 
 
+
+@pytest.mark.parametrize('u', (0.2, 1., 3.))
+def test_upf_underdense_sphere_counts(u):
+    """ Verify that the UPF is the fraction of spheres with at most
+    u times the mean number of points.
+    """
+    Npts = 500
+    period = 1
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((Npts, 3))
+        random_sphere_centers = np.random.random((300, 3))
+
+    rbins = np.linspace(0.05, 0.2, 8)
+    upf = underdensity_prob_func(sample1, rbins, random_sphere_centers=random_sphere_centers,
+        period=period, u=u)
+    counts = npairs_per_object_3d(random_sphere_centers, sample1, rbins, period=period)
+    N_max = u*Npts*(4.0/3.0)*np.pi*rbins**3
+    assert np.all(upf == np.mean(counts <= N_max, axis=0))
+
+
 def test_underdensity_prob_func_process_args1():
     Npts = 1000
     Lbox = 1
@@ -7,6 +7,7 @@ import pytest
 from astropy.utils.misc import NumpyRNGContext
 
 from ..void_prob_func import void_prob_func
+from ...pair_counters import npairs_per_object_3d
 
 from ...tests.cf_helpers import generate_locus_of_3d_points
 
@@ -75,6 +76,27 @@ def test_vpf3():
     assert np.allclose(vpf, vpf2, rtol=0.01)
 
 
+
+def test_vpf_empty_sphere_counts():
+    """ Verify that the VPF is the fraction of spheres without any pairs.
+    """
+    Npts = 500
+    period = 1
+    with NumpyRNGContext(fixed_seed):
+        sample1 = np.random.random((Npts, 3))
+        random_sphere_centers = np.random.random((300, 3))
+
+    rbins = np.linspace(0.02, 0.15, 8)
+    vpf = void_prob_func(sample1, rbins, random_sphere_centers=random_sphere_centers,
+        period=period)
+    counts = npairs_per_object_3d(random_sphere_centers, sample1, rbins, period=period)
+    assert np.all(vpf == np.mean(counts == 0, axis=0))
+
+    vpf = void_prob_func(sample1, rbins, random_sphere_centers=random_sphere_centers)
+    counts = npairs_per_object_3d(random_sphere_centers, sample1, rbins)
+    assert np.all(vpf == np.mean(counts == 0, axis=0))
+
+
 def test_vpf_process_args1():
     Npts = 1000
     Lbox = 1
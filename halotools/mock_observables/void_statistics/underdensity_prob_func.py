@@ -11,6 +11,7 @@ from astropy.extern.six.moves import xrange as range
 from astropy.utils.misc import NumpyRNGContext
 
 from ..pair_counters import npairs_per_object_3d
+from ..pair_counters.knn_3d import _kth_neighbor_distances_3d
 
 from ...utils.array_utils import array_is_monotonic
 from ...custom_exceptions import HalotoolsError
@@ -22,12 +23,16 @@ __author__ = ['Duncan Campbell', 'Andrew Hearin']
 
 np.seterr(divide='ignore', invalid='ignore')  # ignore divide by zero in e.g. DD/RR
 
+# The nearest neighbor search keeps a sorted buffer of the k nearest points found
+# around each sphere, so it only outperforms counting the points per sphere for small k
+max_nearest_neighbor_rank = 32
+
 
 def underdensity_prob_func(sample1, rbins, n_ran=None,
         random_sphere_centers=None, period=None,
         sample_volume=None, u=0.2, num_threads=1,
         approx_cell1_size=None, approx_cellran_size=None, seed=None):
-    """
+    r"""
     Calculate the underdensity probability function (UPF), :math:`P_U(r)`.
 
     :math:`P_U(r)` is defined as the probability that a randomly placed sphere of size
@@ -111,9 +116,14 @@ def underdensity_prob_func(sample1, rbins, n_ran=None,
 
     Notes
     -----
-    This function requires the calculation of the number of pairs per randomly placed
-    sphere, and thus storage of an array of shape(n_ran,len(rbins)).  This can be a
-    memory intensive process as this array becomes large.
+    A sphere of radius :math:`r` holds at most :math:`N_{\rm max}(r)` points if the
+    :math:`(\lfloor N_{\rm max}(r) \rfloor + 1)`-th nearest neighbor of its center
+    is farther than :math:`r`. When :math:`\lfloor N_{m max}(r) floor + 1` is at most 32
+    for all ``rbins``, the distances to these neighbors are found in a single
+    search around each random sphere center, which stops as soon as the neighbors
+    are known, and only these distances are stored. Otherwise the cost of keeping track
+    of that many neighbors exceeds the cost of counting the points in each sphere,
+    which requires storage of an array of shape (n_ran, len(rbins)).
 
     Examples
     --------
@@ -149,11 +159,6 @@ def underdensity_prob_func(sample1, rbins, n_ran=None,
             period, sample_volume, u,
             num_threads, approx_cell1_size, approx_cellran_size, seed))
 
-    result = npairs_per_object_3d(random_sphere_centers, sample1, rbins,
-        period=period, num_threads=num_threads,
-        approx_cell1_size=approx_cell1_size,
-        approx_cell2_size=approx_cellran_size)
-
     # calculate the number of galaxies as a
     # function of r that corresponds to the
     # specified under-density
@@ -161,8 +166,25 @@ def underdensity_prob_func(sample1, rbins, n_ran=None,
     vol = (4.0/3.0) * np.pi * rbins**3
     N_max = mean_rho*vol*u
 
-    num_underdense_spheres = np.array(
-        [sum(result[:, i] <= N_max[i]) for i in range(len(N_max))])
+    # A sphere of radius r holds at most N_max points
+    # if its (floor(N_max)+1)-th nearest neighbor is farther than r
+    k_ranks, rank_index = np.unique(np.floor(N_max).astype(int) + 1, return_inverse=True)
+    if np.max(k_ranks) <= max_nearest_neighbor_rank:
+        kth_nn_distances, __ = _kth_neighbor_distances_3d(random_sphere_centers, sample1,
+            k_ranks, np.max(rbins), period=period, num_threads=num_threads,
+            approx_cell1_size=approx_cell1_size,
+            approx_cell2_size=approx_cellran_size)
+
+        num_underdense_spheres = np.array(
+            [np.sum(kth_nn_distances[:, rank_index[i]] > rbins[i]) for i in range(len(N_max))])
+    else:
+        result = npairs_per_object_3d(random_sphere_centers, sample1, rbins,
+            period=period, num_threads=num_threads,
+            approx_cell1_size=approx_cell1_size,
+            approx_cell2_size=approx_cellran_size)
+
+        num_underdense_spheres = np.array(
+            [np.sum(result[:, i] <= N_max[i]) for i in range(len(N_max))])
     return num_underdense_spheres/n_ran
 
 
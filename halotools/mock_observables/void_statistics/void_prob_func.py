@@ -7,10 +7,9 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import numpy as np
 
-from astropy.extern.six.moves import xrange as range
 from astropy.utils.misc import NumpyRNGContext
 
-from ..pair_counters import npairs_per_object_3d
+from ..pair_counters.knn_3d import _kth_neighbor_distances_3d
 
 from ...utils.array_utils import array_is_monotonic
 from ...custom_exceptions import HalotoolsError
@@ -103,9 +102,12 @@ def void_prob_func(sample1, rbins, n_ran=None, random_sphere_centers=None,
 
     Notes
     -----
-    This function requires the calculation of the number of pairs per randomly placed
-    sphere, and thus storage of an array of shape(n_ran,len(rbins)).  This can be a
-    memory intensive process as this array becomes large.
+    A sphere of radius :math:`r` is empty if the nearest neighbor of its center
+    is farther than :math:`r`, so the VPF at all radii is the complementary
+    cumulative distribution of the distances between the random sphere centers
+    and their nearest neighbors in ``sample1``. Only these distances are stored,
+    and the neighbor search of each sphere stops as soon as its nearest neighbor
+    is found, so that very large values of ``n_ran`` can be used.
 
     Examples
     --------
@@ -140,13 +142,14 @@ def void_prob_func(sample1, rbins, n_ran=None, random_sphere_centers=None,
         _void_prob_func_process_args(sample1, rbins, n_ran, random_sphere_centers,
             period, num_threads, approx_cell1_size, approx_cellran_size, seed))
 
-    result = npairs_per_object_3d(random_sphere_centers, sample1, rbins,
-        period=period, num_threads=num_threads,
+    nn_distances, __ = _kth_neighbor_distances_3d(random_sphere_centers, sample1,
+        1, np.max(rbins), period=period, num_threads=num_threads,
         approx_cell1_size=approx_cell1_size,
         approx_cell2_size=approx_cellran_size)
 
-    num_empty_spheres = np.array(
-        [sum(result[:, i] == 0) for i in range(result.shape[1])])
+    # A sphere of radius r is empty if its nearest neighbor is farther than r
+    num_nonempty_spheres = np.searchsorted(np.sort(nn_distances[:, 0]), rbins, side='right')
+    num_empty_spheres = len(nn_distances) - num_nonempty_spheres
     return num_empty_spheres/n_ran
 
 
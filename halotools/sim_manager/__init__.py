@@ -21,6 +21,11 @@ from .fake_sim import FakeSim
 from .download_manager import DownloadManager
 
 from .cached_halo_catalog import CachedHaloCatalog
+from .lazy_halo_table import LazyHaloTable
+from .halo_table_io import (read_halo_table, write_halo_table, halo_table_format_version,
+    halo_table_fingerprint)
+from .derived_halo_columns import (register_derived_halo_column,
+    unregister_derived_halo_column, registered_derived_halo_columns)
 from .user_supplied_halo_catalog import UserSuppliedHaloCatalog
 from .user_supplied_ptcl_catalog import UserSuppliedPtclCatalog
 
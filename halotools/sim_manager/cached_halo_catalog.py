@@ -21,11 +21,13 @@ except ImportError:
 
 from ..sim_manager import sim_defaults, supported_sims
 
-from ..utils import broadcast_host_halo_property, add_halo_hostid
 
 from .halo_table_cache import HaloTableCache
 from .ptcl_table_cache import PtclTableCache
 from .halo_table_cache_log_entry import get_redshift_string
+from .lazy_halo_table import LazyHaloTable
+from .derived_halo_columns import add_derived_halo_columns
+from .halo_table_io import read_halo_table, _region_bounds
 
 from ..custom_exceptions import HalotoolsError, InvalidCacheLogEntry
 
@@ -58,7 +60,7 @@ class CachedHaloCatalog(object):
     """
     acceptable_kwargs = ('ptcl_version_name', 'fname', 'simname',
         'halo_finder', 'redshift', 'version_name', 'dz_tol', 'update_cached_fname',
-        'preload_halo_table')
+        'preload_halo_table', 'revalidate', 'columns', 'region', 'region_buffer')
 
     def __init__(self, *args, **kwargs):
         """
@@ -119,6 +121,37 @@ class CachedHaloCatalog(object):
             Halo catalogs in cache with a redshift that differs by greater
             than ``dz_tol`` will be ignored. Default is 0.05.
 
+        columns : list of strings, optional
+            Names of the columns of the ``halo_table``. Only these columns are read from disk,
+            which saves time and memory for catalogs with many columns.
+            Default is None, in which case all columns are read.
+            The ``lazy_halo_table`` attribute gives read-on-demand access to the halos,
+            see `~halotools.sim_manager.LazyHaloTable`.
+
+        region : array_like, optional
+            Bounds ``[[xmin, xmax], [ymin, ymax], [zmin, zmax]]`` of a subvolume of the box.
+            If passed, the ``halo_table`` only stores the halos inside the subvolume,
+            and mock galaxies are only populated into these halos, so that
+            independent workers can each process a subvolume of the catalog.
+            Halo positions keep the coordinates of the full box.
+            If the catalog was stored with a spatial index, for example with the
+            ``spatial_index`` argument of `~halotools.sim_manager.RockstarHlistReader`,
+            only the halos in the cells overlapping the subvolume are read from disk.
+            Default is None, in which case all halos are loaded.
+
+        region_buffer : float, optional
+            Width of the buffer of halos added to each side of the ``region``,
+            accounting for the periodic boundary conditions of the box.
+            Default is 0.
+
+        revalidate : bool, optional
+            If True, loading the ``halo_table`` performs all of the checks of
+            `~halotools.sim_manager.HaloTableCacheLogEntry.safe_for_cache`,
+            even if the cache log records a successful validation of the unmodified file.
+            Default is False, in which case the checks requiring a full read
+            of the halo table are only performed the first time the catalog is loaded
+            and whenever the file changes.
+
         Examples
         ---------
         If you followed the instructions in the
@@ -187,6 +220,32 @@ class CachedHaloCatalog(object):
             update_cached_fname = False
         self._update_cached_fname = update_cached_fname
 
+        try:
+            revalidate = kwargs['revalidate']
+        except KeyError:
+            revalidate = False
+        self._revalidate = revalidate
+
+        try:
+            columns = list(kwargs['columns'])
+        except KeyError:
+            columns = None
+        self._columns = columns
+
+        try:
+            region = kwargs['region']
+        except KeyError:
+            region = None
+        self._region = region
+
+        try:
+            region_buffer = kwargs['region_buffer']
+        except KeyError:
+            region_buffer = 0.
+        self._region_buffer = region_buffer
+        if region is not None:
+            _region_bounds(region, region_buffer)
+
         self.halo_table_cache = HaloTableCache()
 
         self._disallow_catalogs_with_known_bugs(**kwargs)
@@ -350,6 +409,12 @@ class CachedHaloCatalog(object):
                     "constructor again and setting the ``update_cached_fname`` variable to True.\n")
                 raise HalotoolsError(msg)
 
+        # Use the cached entry, which stores the fingerprint of the last validation
+        try:
+            log_entry = self.halo_table_cache.log[self.halo_table_cache.log.index(log_entry)]
+        except ValueError:
+            pass
+
         return log_entry
 
     def _retrieve_matching_ptcl_cache_log_entry(self):
@@ -538,23 +603,73 @@ class CachedHaloCatalog(object):
         To see what halo properties are available in the catalog:
 
         >>> print(halocat.halo_table.keys()) # doctest: +SKIP
+
+        If the ``columns`` argument was passed to the constructor,
+        only these columns are read from disk. If the ``region`` argument was passed,
+        only the halos inside the subvolume are returned.
         """
         try:
             return self._halo_table
         except AttributeError:
-            if self.log_entry.safe_for_cache is True:
-                self._halo_table = Table.read(_passively_decode_string(self.fname), path='data')
-                self._add_new_derived_columns(self._halo_table)
-                return self._halo_table
+            halo_table = self._validate_halo_table()
+            if (self._columns is None) & (self._region is None):
+                # The table is only read by the validation when the fingerprint changed
+                if halo_table is None:
+                    halo_table = read_halo_table(self.fname)
+                self._add_new_derived_columns(halo_table)
             else:
-                raise InvalidCacheLogEntry(self.log_entry._cache_safety_message)
+                halo_table = self.lazy_halo_table.to_table()
+            self._halo_table = halo_table
+            return self._halo_table
 
-    def _add_new_derived_columns(self, t):
-        if 'halo_hostid' not in list(t.keys()):
-            add_halo_hostid(t)
+    @property
+    def halo_table_is_loaded(self):
+        """ True if the ``halo_table`` has already been read into memory, False otherwise.
+        Functions that only need a few columns of a catalog whose ``halo_table``
+        is not yet loaded can use the ``lazy_halo_table`` instead.
+        """
+        return hasattr(self, '_halo_table')
 
-        if 'halo_mvir_host_halo' not in list(t.keys()):
-            broadcast_host_halo_property(t, 'halo_mvir')
+    @property
+    def lazy_halo_table(self):
+        """
+        `~halotools.sim_manager.LazyHaloTable` proxy of the halo catalog,
+        reading each column from disk the first time it is accessed.
+        Each request returns a new proxy, so that the columns read by one calculation
+        are freed from memory when it no longer needs them.
+
+        >>> halocat = CachedHaloCatalog() # doctest: +SKIP
+        >>> halos = halocat.lazy_halo_table # doctest: +SKIP
+        >>> mass_array = halos['halo_mvir'] # doctest: +SKIP
+        """
+        self._validate_halo_table()
+        return LazyHaloTable(self.fname, columns=self._columns,
+            region=self._region, region_buffer=self._region_buffer)
+
+    def _validate_halo_table(self):
+        """ Verify the halo catalog is safe_for_cache the first time its halos are requested,
+        recording the fingerprint of a successful validation in the cache log.
+        Return the halo table read during the validation, or None if no read was necessary.
+        """
+        if getattr(self, '_halo_table_is_validated', False) is True:
+            return None
+
+        previous_fingerprint = self.log_entry.fingerprint
+        is_safe, halo_table = self.log_entry._validate(revalidate=self._revalidate)
+        if is_safe is False:
+            raise InvalidCacheLogEntry(self.log_entry._cache_safety_message)
+
+        if self.log_entry.fingerprint != previous_fingerprint:
+            self.halo_table_cache.update_log_entry_fingerprint(self.log_entry)
+        self._halo_table_is_validated = True
+        return halo_table
+
+    def _add_new_derived_columns(self, t):
+        """ Add the registered derived columns, such as ``halo_hostid`` and ``halo_mvir_host_halo``,
+        reusing the values persisted the first time they were computed for this catalog.
+        See `~halotools.sim_manager.register_derived_halo_column`.
+        """
+        add_derived_halo_columns(t, fname=self.fname)
 
     def _bind_additional_metadata(self):
         """ Create convenience bindings of all metadata to the `CachedHaloCatalog` instance.
@@ -564,7 +679,7 @@ class CachedHaloCatalog(object):
                 self.log_entry.fname + "\n\n")
             raise InvalidCacheLogEntry(msg)
 
-        f = h5py.File(self.log_entry.fname)
+        f = h5py.File(self.log_entry.fname, 'r')
         for attr_key in list(f.attrs.keys()):
             if attr_key == 'redshift':
                 setattr(self, attr_key, float(get_redshift_string(f.attrs[attr_key])))
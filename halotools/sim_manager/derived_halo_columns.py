@@ -0,0 +1,284 @@
+""" Module storing the registry of the derived columns that
+`~halotools.sim_manager.CachedHaloCatalog` adds to the halo tables it loads,
+together with the functions persisting the values of these columns on disk.
+
+Derived columns are computed from the columns stored in the cached hdf5 file.
+The first time a derived column is computed for the full catalog, its values are written
+to a sidecar hdf5 file next to the catalog, see `derived_columns_fname`.
+Each persisted column is tagged with the ``provenance`` string of its registration,
+and the sidecar file with the `~halotools.sim_manager.halo_table_fingerprint`
+of the catalog it was computed from. Later loads reuse the persisted values
+so long as both tags match, and recompute the column otherwise.
+
+The ``halo_hostid`` and ``halo_mvir_host_halo`` columns are registered by default.
+Additional columns are registered with `register_derived_halo_column`.
+"""
+from collections import OrderedDict
+from warnings import warn
+import os
+import numpy as np
+
+from astropy.table import Table
+
+try:
+    import h5py
+    _HAS_H5PY = True
+except ImportError:
+    _HAS_H5PY = False
+    warn("Most of the functionality of the "
+        "sim_manager sub-package requires h5py to be installed,\n"
+        "which can be accomplished either with pip or conda. ")
+
+from .halo_table_io import halo_table_fingerprint, _read_column
+from ..custom_exceptions import HalotoolsError
+from ..utils import broadcast_host_halo_property, add_halo_hostid
+from ..utils.python_string_comparisons import _passively_decode_string
+
+__all__ = ('register_derived_halo_column', 'unregister_derived_halo_column',
+    'registered_derived_halo_columns', 'add_derived_halo_columns', 'derived_columns_fname')
+
+# Registered derived columns, in the order they are computed,
+# each bound to a (requirements, function, provenance) tuple
+_derived_halo_columns = OrderedDict()
+
+
+def register_derived_halo_column(colname, function, requirements, provenance):
+    """ Register a derived column that `~halotools.sim_manager.CachedHaloCatalog`
+    adds to the halo tables of all cached catalogs storing its required columns.
+
+    Parameters
+    -----------
+    colname : string
+        Name of the derived column. Must begin with ``halo_``.
+
+    function : callable
+        Function computing the derived column. The function is called with a single argument,
+        an Astropy `~astropy.table.Table` storing the ``requirements`` columns of the full catalog,
+        and returns an array of the same length as the table.
+
+    requirements : sequence of strings
+        Names of the columns needed by ``function``. These may include
+        derived columns registered earlier.
+
+    provenance : string
+        Description of the calculation performed by ``function``,
+        stored together with the persisted values of the column.
+        Persisted values with a different provenance are recomputed,
+        so the provenance should be changed whenever ``function`` changes.
+
+    Examples
+    ---------
+    >>> def halo_vmax_host_halo(t):
+    ...     broadcast_host_halo_property(t, 'halo_vmax')
+    ...     return t['halo_vmax_host_halo']
+    >>> register_derived_halo_column('halo_vmax_host_halo', halo_vmax_host_halo,
+    ...     ('halo_id', 'halo_hostid', 'halo_vmax'), 'broadcast_host_halo_property(halo_vmax)')
+    >>> unregister_derived_halo_column('halo_vmax_host_halo')
+    """
+    colname = _passively_decode_string(colname)
+    if colname[0:5] != 'halo_':
+        msg = ("\nThe name of a derived halo column must begin with ``halo_``.\n"
+            "The input ``colname`` = {0} does not.\n")
+        raise HalotoolsError(msg.format(colname))
+    if not callable(function):
+        msg = ("\nThe input ``function`` of the derived halo column ``{0}`` must be callable.\n")
+        raise HalotoolsError(msg.format(colname))
+
+    requirements = tuple(_passively_decode_string(key) for key in requirements)
+    _derived_halo_columns[colname] = (requirements, function, str(provenance))
+
+
+def unregister_derived_halo_column(colname):
+    """ Remove a derived column registered with `register_derived_halo_column`.
+
+    Parameters
+    -----------
+    colname : string
+        Name of the derived column.
+    """
+    try:
+        del _derived_halo_columns[_passively_decode_string(colname)]
+    except KeyError:
+        msg = ("\nThere is no registered derived halo column ``{0}``.\n")
+        raise HalotoolsError(msg.format(colname))
+
+
+def registered_derived_halo_columns():
+    """ Return the names of the registered derived columns, in the order they are computed.
+    """
+    return list(_derived_halo_columns.keys())
+
+
+def derived_columns_fname(fname):
+    """ Return the name of the sidecar hdf5 file storing the persisted derived columns
+    of the halo catalog stored in ``fname``.
+
+    >>> derived_columns_fname('/path/to/halos.hdf5')
+    '/path/to/halos.derived_columns.hdf5'
+    """
+    root, ext = os.path.splitext(_passively_decode_string(fname))
+    return root + '.derived_columns' + ext
+
+
+def add_derived_halo_columns(halo_table, fname=None):
+    """ Add each registered derived column missing from ``halo_table`` whose required columns
+    are available, in place.
+
+    If ``fname`` is passed, ``halo_table`` must store all the halos of the catalog
+    in ``fname``, in the order they are stored on disk. Persisted values of the derived columns
+    are then reused when valid, and newly computed columns are persisted.
+
+    Parameters
+    -----------
+    halo_table : `~astropy.table.Table`
+        Table storing the halos.
+
+    fname : string, optional
+        Name of the hdf5 file storing the halo catalog. Default is None,
+        in which case the derived columns are computed without being persisted.
+    """
+    colnames = _available_derived_colnames(halo_table.keys())
+    if len(colnames) == 0:
+        return
+
+    if fname is None:
+        persisted_columns = {}
+    else:
+        persisted_columns = read_derived_columns(fname, colnames)
+
+    new_columns = {}
+    for key in colnames:
+        try:
+            halo_table[key] = persisted_columns[key]
+        except KeyError:
+            halo_table[key] = compute_derived_halo_column(halo_table, key)
+            new_columns[key] = halo_table[key].data
+
+    if (fname is not None) & (len(new_columns) > 0):
+        write_derived_columns(fname, new_columns)
+
+
+def compute_derived_halo_column(halo_table, colname):
+    """ Return the values of the registered derived column ``colname``,
+    computed from the columns of ``halo_table``.
+    """
+    requirements, function, __ = _derived_halo_columns[colname]
+    table = Table()
+    for key in requirements:
+        table[key] = halo_table[key]
+    return np.asarray(function(table))
+
+
+def read_derived_columns(fname, columns, row_ranges=None):
+    """ Read the valid persisted values of the derived ``columns`` of the halo catalog in ``fname``.
+
+    Parameters
+    -----------
+    fname : string
+        Name of the hdf5 file storing the halo catalog.
+
+    columns : list of strings
+        Names of the registered derived columns to read.
+
+    row_ranges : list, optional
+        List of the ``(start, stop)`` ranges of the rows to read. Default is None,
+        in which case all rows are read.
+
+    Returns
+    --------
+    derived_columns : dict
+        Dictionary storing the persisted columns whose provenance matches their registration,
+        or an empty dictionary if there is no sidecar file or if it was computed
+        from a different version of the catalog.
+    """
+    sidecar_fname = derived_columns_fname(fname)
+    if (not _HAS_H5PY) or (not os.path.isfile(sidecar_fname)):
+        return {}
+
+    derived_columns = {}
+    try:
+        with h5py.File(sidecar_fname, 'r') as f:
+            source_fingerprint = _passively_decode_string(f.attrs['source_fingerprint'])
+            if source_fingerprint != halo_table_fingerprint(fname):
+                return {}
+            for key in columns:
+                try:
+                    provenance = _passively_decode_string(f['data'][key].attrs['provenance'])
+                except KeyError:
+                    continue
+                if provenance == _derived_halo_columns[key][2]:
+                    derived_columns[key] = _read_column(f, key, row_ranges)
+    except (IOError, OSError, KeyError):
+        return {}
+    return derived_columns
+
+
+def write_derived_columns(fname, derived_columns):
+    """ Persist the values of derived columns of the halo catalog in ``fname``
+    in its sidecar file, tagged with their provenance and with the fingerprint of the catalog.
+    Persisted columns computed from a different version of the catalog are discarded.
+    Failures to write the sidecar file, for example in a read-only directory, are ignored.
+
+    Parameters
+    -----------
+    fname : string
+        Name of the hdf5 file storing the halo catalog.
+
+    derived_columns : dict
+        Dictionary storing the values of the registered derived columns for all the halos
+        of the catalog, in the order they are stored on disk.
+    """
+    if not _HAS_H5PY:
+        return
+    fingerprint = halo_table_fingerprint(fname)
+    if fingerprint is None:
+        return
+    sidecar_fname = derived_columns_fname(fname)
+
+    try:
+        with h5py.File(sidecar_fname, 'a') as f:
+            try:
+                source_fingerprint = _passively_decode_string(f.attrs['source_fingerprint'])
+            except KeyError:
+                source_fingerprint = None
+            if (source_fingerprint != fingerprint) & ('data' in f):
+                del f['data']
+            f.attrs['source_fingerprint'] = np.string_(fingerprint)
+
+            data = f.require_group('data')
+            for key, values in derived_columns.items():
+                if key in data:
+                    del data[key]
+                dataset = data.create_dataset(key, data=np.asarray(values))
+                dataset.attrs.create('provenance', np.string_(_derived_halo_columns[key][2]))
+    except (IOError, OSError):
+        pass
+
+
+def _available_derived_colnames(colnames):
+    """ Return the names of the registered derived columns missing from ``colnames``
+    whose required columns are available, in the order they are computed.
+    """
+    available_colnames = list(colnames)
+    derived_colnames = []
+    for key, (requirements, __, __) in _derived_halo_columns.items():
+        if (key not in available_colnames) & set(requirements).issubset(available_colnames):
+            available_colnames.append(key)
+            derived_colnames.append(key)
+    return derived_colnames
+
+
+def _halo_hostid(table):
+    add_halo_hostid(table)
+    return table['halo_hostid']
+
+
+def _halo_mvir_host_halo(table):
+    broadcast_host_halo_property(table, 'halo_mvir')
+    return table['halo_mvir_host_halo']
+
+
+register_derived_halo_column('halo_hostid', _halo_hostid,
+    ('halo_id', 'halo_upid'), 'add_halo_hostid')
+register_derived_halo_column('halo_mvir_host_halo', _halo_mvir_host_halo,
+    ('halo_id', 'halo_hostid', 'halo_mvir'), 'broadcast_host_halo_property(halo_mvir)')
@@ -20,6 +20,9 @@ from ..utils.python_string_comparisons import _passively_decode_string
 
 __all__ = ('HaloTableCache', )
 
+# Columns of the log recording the last successful validation of each halo catalog
+optional_log_columns = ('fingerprint', 'format_version')
+
 
 class HaloTableCache(object):
     """ Object providing a collection of halo catalogs for use with Halotools.
@@ -88,7 +91,8 @@ class HaloTableCache(object):
         if self._cache_log_fname_exists:
             try:
                 log_table = Table.read(_passively_decode_string(self.cache_log_fname), format='ascii')
-                assert set(log_table.keys()) == set(
+                # Logs written by earlier versions of Halotools lack the optional columns
+                assert set(log_table.keys()) - set(optional_log_columns) == set(
                     HaloTableCacheLogEntry.log_attributes)
                 self._cache_log_fname_is_kosher = True
             except:
@@ -104,6 +108,11 @@ class HaloTableCache(object):
         for entry in log_table:
             constructor_kwargs = (
                 {key: entry[key] for key in HaloTableCacheLogEntry.log_attributes})
+            for key in optional_log_columns:
+                if key in log_table.keys():
+                    value = _passively_decode_string(entry[key])
+                    if str(value) != 'None':
+                        constructor_kwargs[key] = value
             result.append(HaloTableCacheLogEntry(**constructor_kwargs))
         return result
 
@@ -112,6 +121,8 @@ class HaloTableCache(object):
         for ii, entry in enumerate(log):
             for attr in HaloTableCacheLogEntry.log_attributes:
                 log_table[attr][ii] = getattr(entry, attr)
+            for key in optional_log_columns:
+                log_table[key][ii] = str(getattr(entry, key))
         return log_table
 
     def _get_empty_log_table(self, num_entries=0):
@@ -119,14 +130,16 @@ class HaloTableCache(object):
             return Table(
                 {'simname': [], 'halo_finder': [],
                 'redshift': [], 'version_name': [],
-                'fname': []}
+                'fname': [], 'fingerprint': [], 'format_version': []}
                 )
         else:
             return Table({'simname': np.zeros(num_entries, dtype=object),
                 'halo_finder': np.zeros(num_entries, dtype=object),
                 'redshift': np.zeros(num_entries, dtype=float),
                 'version_name': np.zeros(num_entries, dtype=object),
-                'fname': np.zeros(num_entries, dtype=object)})
+                'fname': np.zeros(num_entries, dtype=object),
+                'fingerprint': np.zeros(num_entries, dtype=object),
+                'format_version': np.zeros(num_entries, dtype=object)})
 
     def matching_log_entry_generator(self, dz_tol=0.0, **kwargs):
         """
@@ -172,14 +185,45 @@ class HaloTableCache(object):
         if log_entry.safe_for_cache is False:
             raise InvalidCacheLogEntry(log_entry._cache_safety_message)
 
-        self.log.append(log_entry)
-        if len(set(self.log)) < len(self.log):
+        if log_entry in self.log:
             warn("The cache log already contains the entry")
+            # Keep the fingerprint of the validation just performed
+            self.log.remove(log_entry)
+        self.log.append(log_entry)
         self.log = list(set(self.log))
         self.log.sort()
         if update_ascii is True:
             self._overwrite_log_ascii(self.log)
 
+    def update_log_entry_fingerprint(self, log_entry, update_ascii=True):
+        """ Record the ``fingerprint`` and ``format_version`` bound to the input log entry
+        by its last validation,
+        so that later loads of the halo catalog skip the checks requiring a full read
+        of the halo table, see `~halotools.sim_manager.HaloTableCacheLogEntry.safe_for_cache`.
+        Nothing is done if the log has no matching entry. Failing to write the log,
+        e.g., on a read-only file system, is harmless and only means the halo catalog
+        will be validated again the next time it is loaded.
+
+        Parameters
+        -----------
+        log_entry : `~halotools.sim_manager.HaloTableCacheLogEntry` instance
+        """
+        if update_ascii is True:
+            self.update_log_from_current_ascii()
+
+        try:
+            cached_entry = self.log[self.log.index(log_entry)]
+        except ValueError:
+            return
+        cached_entry.fingerprint = log_entry.fingerprint
+        cached_entry.format_version = log_entry.format_version
+
+        if update_ascii is True:
+            try:
+                self._overwrite_log_ascii(self.log)
+            except (IOError, OSError):
+                pass
+
     def remove_entry_from_cache_log(self, simname, halo_finder,
             version_name, redshift, fname,
             raise_non_existence_exception=True,
@@ -318,7 +362,7 @@ class HaloTableCache(object):
             return str(msg)
 
         try:
-            f = h5py.File(fname)
+            f = h5py.File(fname, 'r')
             required_set = set(HaloTableCacheLogEntry.required_metadata)
             actual_set = set(f.attrs.keys())
             assert required_set.issubset(actual_set)
@@ -335,7 +379,12 @@ class HaloTableCache(object):
             except:
                 pass
 
-        f = h5py.File(fname)
+        # Only open the file for writing when the metadata is overwritten,
+        # so that the fingerprint of the file is otherwise unchanged
+        if overwrite_fname_metadata is True:
+            f = h5py.File(fname, 'a')
+        else:
+            f = h5py.File(fname, 'r')
         constructor_kwargs = {}
 
         # We need to get rid of the byte attributes here to avoid failures
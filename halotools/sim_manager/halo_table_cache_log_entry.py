@@ -5,6 +5,7 @@ from astropy.table import Table
 import numpy as np
 from warnings import warn
 from ..utils.python_string_comparisons import _passively_decode_string, compare_strings_py23_safe
+from .halo_table_io import read_halo_table, halo_table_format_version, halo_table_fingerprint
 
 try:
     import h5py
@@ -31,7 +32,8 @@ class HaloTableCacheLogEntry(object):
     required_metadata = ['Lbox', 'particle_mass']
     required_metadata.extend(log_attributes)
 
-    def __init__(self, simname, halo_finder, version_name, redshift, fname):
+    def __init__(self, simname, halo_finder, version_name, redshift, fname,
+            fingerprint=None, format_version=None):
         """
         Parameters
         -----------
@@ -53,10 +55,21 @@ class HaloTableCacheLogEntry(object):
         fname : string
             Name of the hdf5 file storing the table of halos.
 
+        fingerprint : string, optional
+            Fingerprint of the hdf5 file recorded by the last successful validation
+            of the halo catalog, see `safe_for_cache`. Default is None,
+            in which case the next validation performs all of the checks.
+
+        format_version : int, optional
+            Version of the on-disk format of the halo table,
+            see `~halotools.sim_manager.halo_table_io`. Default is None,
+            in which case the version is determined by the next successful validation.
+
         Notes
         ------
         This class overrides the python built-in comparison functions __eq__, __lt__, etc.
-        Equality holds only if all of the five constructor inputs are equal.
+        Equality holds only if all of the five constructor inputs are equal;
+        the ``fingerprint`` and ``format_version`` play no role in the comparisons.
         Two class instances are compared by using a dictionary order
         defined by the same sequence as the constructor input positional arguments.
 
@@ -69,6 +82,12 @@ class HaloTableCacheLogEntry(object):
         self.version_name = _passively_decode_string(version_name)
         self.redshift = _passively_decode_string(get_redshift_string(redshift))
         self.fname = _passively_decode_string(fname)
+        if fingerprint is not None:
+            fingerprint = _passively_decode_string(fingerprint)
+        self.fingerprint = fingerprint
+        if format_version is not None:
+            format_version = int(format_version)
+        self.format_version = format_version
 
     def __eq__(self, other):
         if type(other) is type(self):
@@ -125,7 +144,7 @@ class HaloTableCacheLogEntry(object):
         `~halotools.sim_manager.HaloTableCacheLogEntry` instance stores a valid
         halo catalog that can safely be added to the cache for future use.
         `safe_for_cache` is implemented as a property method, so that each request
-        performs all the checks from scratch. A log entry is considered valid
+        performs the checks anew. A log entry is considered valid
         if it passes the following tests:
 
         1. The file exists.
@@ -136,7 +155,7 @@ class HaloTableCacheLogEntry(object):
 
         4. Each value in the above metadata is consistent with the corresponding value bound to the `~halotools.sim_manager.HaloTableCacheLogEntry` instance.
 
-        5. The halo table data can be read in using the `~astropy.table.Table.read` method of the `~astropy.table.Table` class.
+        5. The halo table data can be read in using `~halotools.sim_manager.read_halo_table`.
 
         6. The halo table has the following columns ``halo_id``, ``halo_x``, ``halo_y``, ``halo_z``, plus at least one additional column storing a mass-like variable.
 
@@ -146,10 +165,45 @@ class HaloTableCacheLogEntry(object):
 
         9. The ``halo_id`` column stores a set of unique integers.
 
+        Tests 5-9 require reading the entire halo table. After these tests succeed,
+        the ``fingerprint`` of the file and the ``format_version`` of the halo table
+        are bound to the log entry and recorded in the cache log.
+        The fingerprint combines the size and modification time of the file
+        with a hash of the hdf5 metadata attributes, including a ``checksum`` attribute
+        if the file provides one, and of the shape and data type of the halo table.
+        So long as the fingerprint of the file is unchanged, later requests only perform tests 1-4.
+        Use the `validate` method with ``revalidate`` set to True to perform all of the tests
+        regardless of the fingerprint.
+
         Note in particular that `safe_for_cache` performs no checks whatsoever concerning
         the log other entries that may or may not be stored in the cache. Such checks are
         the responsibility of the `~halotools.sim_manager.HaloTableCache` class.
 
+        """
+        return self.validate()
+
+    def validate(self, revalidate=False):
+        """ Determine whether the log entry stores a valid halo catalog.
+
+        Parameters
+        -----------
+        revalidate : bool, optional
+            If True, all of the tests listed in the docstring of `safe_for_cache`
+            are performed even if the ``fingerprint`` of the file matches the one
+            recorded by the last successful validation. Default is False.
+
+        Returns
+        --------
+        is_safe : bool
+            Same as `safe_for_cache`.
+        """
+        is_safe, __ = self._validate(revalidate=revalidate)
+        return is_safe
+
+    def _validate(self, revalidate=False):
+        """ Private method performing the tests of `safe_for_cache`.
+        Returns the boolean result together with the halo table read by tests 5-9,
+        or None if these tests were skipped because the fingerprint of the file is unchanged.
         """
         msg = ("\nCannot determine whether an hdf5 file "
             "is safe_for_cache without h5py installed.\n")
@@ -164,7 +218,7 @@ class HaloTableCacheLogEntry(object):
         if num_failures > 0:
             self._cache_safety_message = message_preamble + msg
             self._num_failures = num_failures
-            return False
+            return False, None
         else:
 
             tmp_msg, num_failures = self._verify_h5py_extension(num_failures)
@@ -173,6 +227,15 @@ class HaloTableCacheLogEntry(object):
             msg += tmp_msg
             tmp_msg, num_failures = self._verify_metadata_consistency(num_failures)
             msg += tmp_msg
+
+            fingerprint = self._file_fingerprint()
+            if ((num_failures == 0) & (revalidate is False) &
+                    (fingerprint is not None) & (fingerprint == self.fingerprint)):
+                self._num_failures = 0
+                if self.format_version is None:
+                    self.format_version = halo_table_format_version(self.fname)
+                return True, None
+
             tmp_msg, num_failures, halo_table = self._verify_table_read(num_failures)
             msg += tmp_msg
             tmp_msg, num_failures = self._verify_has_required_data_columns(halo_table, num_failures)
@@ -186,11 +249,21 @@ class HaloTableCacheLogEntry(object):
             tmp_msg, num_failures = self._verify_halo_rvir_mpc_units(halo_table, num_failures)
             msg += tmp_msg
 
+            self._num_failures = num_failures
             if num_failures > 0:
                 self._cache_safety_message = message_preamble + msg
+                self.fingerprint = None
+                return False, None
+            else:
+                self.fingerprint = fingerprint
+                self.format_version = halo_table_format_version(self.fname)
+                return True, halo_table
 
-            self._num_failures = num_failures
-            return num_failures == 0
+    def _file_fingerprint(self):
+        """ Return a string that changes whenever the hdf5 file is modified,
+        computed without reading the halo table, or None if the file cannot be inspected.
+        """
+        return halo_table_fingerprint(self.fname)
 
     def _verify_table_read(self, num_failures):
         """ Enforce that the data can be read using the usual Astropy syntax
@@ -198,12 +271,13 @@ class HaloTableCacheLogEntry(object):
         msg = ''
 
         try:
-            halo_table = Table.read(_passively_decode_string(self.fname), path='data')
+            halo_table = read_halo_table(self.fname)
         except:
             num_failures += 1
             msg = (str(num_failures)+". The hdf5 file must be readable with "
-                "Astropy \nusing the following syntax:\n\n"
-                ">>> halo_data = Table.read(fname, path='data')\n\n")
+                "Halotools \nusing the following syntax:\n\n"
+                ">>> from halotools.sim_manager import read_halo_table\n"
+                ">>> halo_data = read_halo_table(fname)\n\n")
             halo_table = Table()
         return msg, num_failures, halo_table
 
@@ -218,7 +292,7 @@ class HaloTableCacheLogEntry(object):
 
         try:
             import h5py
-            f = h5py.File(self.fname)
+            f = h5py.File(self.fname, 'r')
 
             for key in HaloTableCacheLogEntry.log_attributes:
                 try:
@@ -304,7 +378,7 @@ class HaloTableCacheLogEntry(object):
         msg = ''
 
         try:
-            f = h5py.File(self.fname)
+            f = h5py.File(self.fname, 'r')
             Lbox = f.attrs['Lbox']
             f.close()
             try:
@@ -401,7 +475,7 @@ class HaloTableCacheLogEntry(object):
         msg = ''
 
         try:
-            f = h5py.File(self.fname)
+            f = h5py.File(self.fname, 'r')
             required_set = set(HaloTableCacheLogEntry.required_metadata)
             actual_set = set(f.attrs.keys())
 
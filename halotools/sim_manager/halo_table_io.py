@@ -0,0 +1,502 @@
+""" Module storing the functions reading and writing the hdf5 files
+that store the halo catalogs of the Halotools cache.
+
+Two on-disk formats are supported, identified by the ``halo_table_format_version``
+attribute of the hdf5 file:
+
+1. The format written by ``Table.write(fname, path='data')``, a single ``data`` dataset with a compound data type storing one field per column. Reading any one column touches the full record of every halo. Files without the ``halo_table_format_version`` attribute are in this format.
+
+2. A ``data`` group storing one chunked and compressed dataset per column, so that reading a column only touches the chunks of that column. The names of the columns are stored in the ``colnames`` attribute of the group and the number of halos in its ``num_halos`` attribute.
+
+Files in either format can be read with `read_halo_table`. New catalogs are written
+by `write_halo_table` in the latest format unless an older version is requested.
+
+Files in either format may additionally carry a spatial index.
+The box is divided into a regular grid of cells, the halos are stored sorted
+by the index of the cell containing them, and the ``cell_offsets`` dataset
+of the ``spatial_index`` group stores the first row of each cell, so that the halos
+of any subvolume of the box can be read without reading the rest of the catalog.
+"""
+from warnings import warn
+import os
+import hashlib
+import numpy as np
+
+from astropy.table import Table
+
+try:
+    import h5py
+    _HAS_H5PY = True
+except ImportError:
+    _HAS_H5PY = False
+    warn("Most of the functionality of the "
+        "sim_manager sub-package requires h5py to be installed,\n"
+        "which can be accomplished either with pip or conda. ")
+
+from ..custom_exceptions import HalotoolsError
+from ..utils.python_string_comparisons import _passively_decode_string
+
+__all__ = ('read_halo_table', 'write_halo_table', 'halo_table_format_version',
+    'halo_table_fingerprint')
+
+position_keys = ('halo_x', 'halo_y', 'halo_z')
+
+latest_halo_table_format_version = 2
+available_halo_table_format_versions = (1, 2)
+available_compressions = ('auto', 'blosc', 'gzip', 'lzf', None)
+
+# Number of halos per chunk of the column datasets of format version 2
+num_halos_per_chunk = 2**16
+
+# Number of cells per dimension of the spatial index written by the halo catalog readers
+default_num_cells_per_dimension = 16
+
+uninstalled_h5py_msg = ("\nMust have h5py package installed \n"
+    "to read or write the hdf5 files storing halo catalogs.\n")
+
+
+def halo_table_format_version(fname):
+    """ Return the version of the on-disk format of the halo table stored in ``fname``.
+
+    Parameters
+    -----------
+    fname : string
+        Name of the hdf5 file storing the halo catalog.
+
+    Returns
+    --------
+    format_version : int
+    """
+    if not _HAS_H5PY:
+        raise HalotoolsError(uninstalled_h5py_msg)
+
+    with h5py.File(_passively_decode_string(fname), 'r') as f:
+        return _format_version(f)
+
+
+def halo_table_fingerprint(fname):
+    """ Return a string that changes whenever the hdf5 file storing a halo catalog is modified.
+    The fingerprint combines the size and modification time of the file with a hash
+    of its metadata and of the shapes of its datasets, and is computed without reading the halo table.
+    Opening the file in any mode other than ``'r'`` updates its modification time,
+    so code that only reads a cached catalog must open it with ``h5py.File(fname, 'r')``.
+
+    Parameters
+    -----------
+    fname : string
+        Name of the hdf5 file storing the halo catalog.
+
+    Returns
+    --------
+    fingerprint : string
+        Fingerprint of the file, or None if the file cannot be inspected.
+    """
+    if not _HAS_H5PY:
+        raise HalotoolsError(uninstalled_h5py_msg)
+    fname = _passively_decode_string(fname)
+
+    try:
+        file_stats = os.stat(fname)
+        metadata_hash = hashlib.sha1()
+        with h5py.File(fname, 'r') as f:
+            for key in sorted(f.attrs.keys()):
+                metadata_hash.update(repr((key, f.attrs[key])).encode('utf-8'))
+            data = f['data']
+            if isinstance(data, h5py.Dataset):
+                metadata_hash.update(repr((data.shape, data.dtype.descr)).encode('utf-8'))
+            else:
+                for key in sorted(data.keys()):
+                    metadata_hash.update(repr((key, data[key].shape)).encode('utf-8'))
+    except (IOError, OSError, KeyError, AttributeError):
+        return None
+
+    return '{0}-{1}-{2}'.format(file_stats.st_size,
+        int(file_stats.st_mtime*1e6), metadata_hash.hexdigest())
+
+
+def read_halo_table(fname, columns=None, region=None, region_buffer=0.):
+    """ Read the halo table stored in ``fname`` in any of the supported on-disk formats.
+
+    Parameters
+    -----------
+    fname : string
+        Name of the hdf5 file storing the halo catalog.
+
+    columns : list of strings, optional
+        Names of the columns to read. Default is None, in which case all columns are read.
+
+    region : array_like, optional
+        Bounds ``[[xmin, xmax], [ymin, ymax], [zmin, zmax]]`` of the subvolume of the box
+        to read. Only the halos inside the subvolume are returned.
+        If the file has a spatial index, only the cells overlapping the subvolume are read
+        from disk; otherwise the full columns are read and then masked.
+        Default is None, in which case all halos are read.
+
+    region_buffer : float, optional
+        Width of the buffer added to each side of the ``region``, accounting for
+        the periodic boundary conditions of the box. Default is 0.
+
+    Returns
+    --------
+    halo_table : `~astropy.table.Table`
+    """
+    if not _HAS_H5PY:
+        raise HalotoolsError(uninstalled_h5py_msg)
+    fname = _passively_decode_string(fname)
+
+    with h5py.File(fname, 'r') as f:
+        format_version = _format_version(f)
+        if (format_version == 1) & (columns is None) & (region is None):
+            halo_table = None
+        else:
+            if columns is None:
+                columns = _colnames(f)
+            if region is None:
+                row_ranges, mask = None, None
+            else:
+                row_ranges, mask, __ = _region_rows(f, region, region_buffer)
+            halo_table = Table()
+            for key in columns:
+                column = _read_column(f, key, row_ranges)
+                halo_table[key] = column if mask is None else column[mask]
+                unit = _column_unit(f, key)
+                if unit is not None:
+                    halo_table[key].unit = unit
+
+    if halo_table is None:
+        halo_table = Table.read(fname, path='data')
+    return halo_table
+
+
+def write_halo_table(halo_table, fname, overwrite=False,
+        format_version=latest_halo_table_format_version, compression='auto',
+        Lbox=None, num_cells_per_dimension=None):
+    """ Write the input halo table to ``fname`` in the requested on-disk format.
+    Metadata such as ``Lbox`` and ``particle_mass`` are added to the file
+    separately by the calling function.
+
+    Parameters
+    -----------
+    halo_table : `~astropy.table.Table`
+        Table storing the halo catalog.
+
+    fname : string
+        Name of the hdf5 file.
+
+    overwrite : bool, optional
+        If False, an exception is raised if ``fname`` already exists. Default is False.
+
+    format_version : int, optional
+        Version of the on-disk format, see `~halotools.sim_manager.halo_table_io`.
+        Default is the latest version, 2, storing one chunked dataset per column.
+
+    compression : string, optional
+        Compression of the column datasets of format version 2.
+        The default option 'auto' uses the fast LZ4 compressor of Blosc
+        if the hdf5plugin package is installed, and gzip otherwise.
+        Other options are 'blosc', 'gzip', 'lzf' and None for no compression.
+        Ignored by format version 1.
+
+    Lbox : array_like, optional
+        Length-3 sequence, or scalar, storing the size of the box.
+        Only used, and then required, when writing a spatial index.
+
+    num_cells_per_dimension : int or array_like, optional
+        Number of cells per dimension of the spatial index.
+        If not None, the halos are written sorted by the index of the cell containing them,
+        and the first row of each cell is stored in the ``spatial_index`` group of the file,
+        so that the halos of a subvolume can be read with the ``region`` argument
+        of `read_halo_table`. Default is None, in which case the halos are written
+        in the input order and no spatial index is stored.
+    """
+    if not _HAS_H5PY:
+        raise HalotoolsError(uninstalled_h5py_msg)
+    fname = _passively_decode_string(fname)
+
+    if format_version not in available_halo_table_format_versions:
+        msg = ("\nInput ``format_version`` = {0} must be one of the following: {1}\n")
+        raise HalotoolsError(msg.format(format_version, available_halo_table_format_versions))
+    if compression not in available_compressions:
+        msg = ("\nInput ``compression`` = {0} must be one of the following: {1}\n")
+        raise HalotoolsError(msg.format(compression, available_compressions))
+
+    if num_cells_per_dimension is not None:
+        halo_table, Lbox, num_cells_per_dimension, cell_offsets = _sort_by_cell(
+            halo_table, Lbox, num_cells_per_dimension)
+
+    if format_version == 1:
+        halo_table.write(fname, path='data', overwrite=overwrite)
+    else:
+        _write_columns(halo_table, fname, overwrite, format_version, compression)
+
+    if num_cells_per_dimension is not None:
+        with h5py.File(fname, 'a') as f:
+            spatial_index = f.create_group('spatial_index')
+            spatial_index.attrs.create('Lbox', Lbox)
+            spatial_index.attrs.create('num_cells_per_dimension', num_cells_per_dimension)
+            spatial_index.create_dataset('cell_offsets', data=cell_offsets)
+
+
+def _write_columns(halo_table, fname, overwrite, format_version, compression):
+    """ Write the halo table to ``fname`` in format version 2.
+    """
+
+    if os.path.isfile(fname) & (overwrite is False):
+        msg = ("\nThe file {0} already exists. Set ``overwrite`` to True to replace it.\n")
+        raise HalotoolsError(msg.format(fname))
+
+    compression_kwargs = _compression_kwargs(compression)
+    num_halos = len(halo_table)
+
+    with h5py.File(fname, 'w') as f:
+        f.attrs.create('halo_table_format_version', format_version)
+        data = f.create_group('data')
+        data.attrs.create('num_halos', num_halos)
+        data.attrs.create('colnames', np.array(
+            [np.string_(key) for key in halo_table.keys()]))
+
+        for key in halo_table.keys():
+            column = np.asarray(halo_table[key])
+            if column.dtype.kind == 'U':
+                column = np.char.encode(column, 'utf-8')
+            if num_halos > 0:
+                chunks = (min(num_halos, num_halos_per_chunk), ) + column.shape[1:]
+                dataset = data.create_dataset(key, data=column,
+                    chunks=chunks, **compression_kwargs)
+            else:
+                dataset = data.create_dataset(key, data=column)
+            if halo_table[key].unit is not None:
+                dataset.attrs.create('unit', np.string_(str(halo_table[key].unit)))
+
+
+def _format_version(f):
+    """ Return the version of the on-disk format of the halo table in the open hdf5 file.
+    """
+    try:
+        return int(f.attrs['halo_table_format_version'])
+    except KeyError:
+        if isinstance(f['data'], h5py.Group):
+            return 2
+        else:
+            return 1
+
+
+def _colnames(f):
+    """ Return the list of names of the columns of the halo table in the open hdf5 file.
+    """
+    data = f['data']
+    if isinstance(data, h5py.Group):
+        try:
+            return [_passively_decode_string(key) for key in data.attrs['colnames']]
+        except KeyError:
+            return list(data.keys())
+    else:
+        return list(data.dtype.names)
+
+
+def _num_halos(f):
+    """ Return the number of halos stored in the open hdf5 file.
+    """
+    data = f['data']
+    if isinstance(data, h5py.Group):
+        try:
+            return int(data.attrs['num_halos'])
+        except KeyError:
+            return data[list(data.keys())[0]].shape[0]
+    else:
+        return data.shape[0]
+
+
+def _read_column(f, key, row_ranges=None):
+    """ Read the column ``key`` of the halo table in the open hdf5 file.
+    For format version 1, only the requested field of the compound data type
+    is copied into memory.
+
+    If ``row_ranges`` is not None, only the rows in the listed ``(start, stop)`` ranges
+    are read, and returned concatenated in order.
+    """
+    data = f['data']
+    if row_ranges is None:
+        if isinstance(data, h5py.Group):
+            return data[key][...]
+        else:
+            return data[key]
+
+    if len(row_ranges) == 0:
+        row_ranges = [(0, 0)]
+    if isinstance(data, h5py.Group):
+        chunks = [data[key][start:stop] for start, stop in row_ranges]
+    else:
+        chunks = [data[key, start:stop] for start, stop in row_ranges]
+    return np.concatenate(chunks)
+
+
+def _column_unit(f, key):
+    """ Return the unit string of the column ``key`` of a format version 2 file, if any.
+    """
+    data = f['data']
+    if isinstance(data, h5py.Group):
+        try:
+            return _passively_decode_string(data[key].attrs['unit'])
+        except KeyError:
+            return None
+    else:
+        return None
+
+
+def _cell_ids(x, y, z, Lbox, num_cells_per_dimension):
+    """ Return the row-major index of the cell of the spatial index containing each halo.
+    Positions are wrapped into the box, so that a halo at the upper edge of the box
+    belongs to the first cell.
+    """
+    cell_ids = np.zeros(len(x), dtype='i8')
+    for pos, L, num_cells in zip((x, y, z), Lbox, num_cells_per_dimension):
+        idx = np.floor(np.mod(pos, L)*num_cells/L).astype('i8')
+        cell_ids = cell_ids*num_cells + np.clip(idx, 0, num_cells-1)
+    return cell_ids
+
+
+def _sort_by_cell(halo_table, Lbox, num_cells_per_dimension):
+    """ Sort the halos by the index of the cell of the spatial index containing them.
+
+    Returns
+    --------
+    sorted_halo_table : `~astropy.table.Table`
+
+    Lbox : ndarray
+        Length-3 array storing the size of the box
+
+    num_cells_per_dimension : ndarray
+        Length-3 array storing the number of cells per dimension
+
+    cell_offsets : ndarray
+        Array of length num_cells + 1 such that the halos of the cell with index ``i``
+        are stored in rows ``cell_offsets[i]`` to ``cell_offsets[i+1]``.
+    """
+    if Lbox is None:
+        msg = ("\nWriting a spatial index requires the ``Lbox`` argument.\n")
+        raise HalotoolsError(msg)
+    Lbox = np.zeros(3) + np.asarray(Lbox, dtype='f8')
+    num_cells_per_dimension = np.zeros(3, dtype='i8') + np.asarray(num_cells_per_dimension)
+    if np.any(num_cells_per_dimension < 1) | np.any(Lbox <= 0):
+        msg = ("\nThe ``Lbox`` and ``num_cells_per_dimension`` of a spatial index "
+            "must be strictly positive.\n")
+        raise HalotoolsError(msg)
+
+    missing_keys = [key for key in position_keys if key not in halo_table.keys()]
+    if len(missing_keys) > 0:
+        msg = ("\nWriting a spatial index requires the halo table "
+            "to have the ``halo_x``, ``halo_y`` and ``halo_z`` columns.\n")
+        raise HalotoolsError(msg)
+
+    cell_ids = _cell_ids(*[np.asarray(halo_table[key]) for key in position_keys],
+        Lbox=Lbox, num_cells_per_dimension=num_cells_per_dimension)
+    idx_sorted = np.argsort(cell_ids, kind='mergesort')
+    num_cells = int(np.prod(num_cells_per_dimension))
+    cell_offsets = np.searchsorted(cell_ids[idx_sorted], np.arange(num_cells+1))
+    return halo_table[idx_sorted], Lbox, num_cells_per_dimension, cell_offsets
+
+
+def _region_bounds(region, region_buffer):
+    """ Return the lower and upper bounds of the buffered ``region`` in each dimension.
+    """
+    try:
+        region = np.asarray(region, dtype='f8')
+        assert region.shape == (3, 2)
+        assert np.all(region[:, 0] <= region[:, 1])
+    except (AssertionError, TypeError, ValueError):
+        msg = ("\nThe input ``region`` must be of the form "
+            "[[xmin, xmax], [ymin, ymax], [zmin, zmax]] with xmin <= xmax, etc.\n")
+        raise HalotoolsError(msg)
+    if region_buffer < 0:
+        msg = ("\nThe input ``region_buffer`` must be non-negative.\n")
+        raise HalotoolsError(msg)
+    return region[:, 0] - region_buffer, region[:, 1] + region_buffer
+
+
+def _region_rows(f, region, region_buffer):
+    """ Determine the rows of the halo table in the open hdf5 file
+    storing the halos inside the buffered ``region``, accounting for periodic boundary conditions.
+
+    Returns
+    --------
+    row_ranges : list or None
+        List of the ``(start, stop)`` row ranges of the cells of the spatial index
+        overlapping the buffered region, or None if the file has no spatial index.
+
+    mask : ndarray
+        Boolean mask selecting the halos inside the buffered region
+        among the rows of ``row_ranges``.
+
+    positions : dict
+        Dictionary storing the ``halo_x``, ``halo_y`` and ``halo_z`` columns
+        of the rows of ``row_ranges``.
+    """
+    lower, upper = _region_bounds(region, region_buffer)
+
+    if 'spatial_index' in f:
+        spatial_index = f['spatial_index']
+        Lbox = np.asarray(spatial_index.attrs['Lbox'], dtype='f8')
+        num_cells_per_dimension = np.asarray(spatial_index.attrs['num_cells_per_dimension'])
+
+        cell_indices = []
+        for low, high, L, num_cells in zip(lower, upper, Lbox, num_cells_per_dimension):
+            if high - low >= L:
+                cell_indices.append(np.arange(num_cells))
+            else:
+                idx_min = int(np.floor(low*num_cells/L))
+                idx_max = int(np.floor(high*num_cells/L))
+                cell_indices.append(np.unique(np.mod(np.arange(idx_min, idx_max+1), num_cells)))
+        ix, iy, iz = cell_indices
+        ny, nz = num_cells_per_dimension[1:]
+        cell_ids = np.sort((ix[:, None, None]*ny*nz + iy[None, :, None]*nz +
+            iz[None, None, :]).flatten())
+
+        cell_offsets = spatial_index['cell_offsets'][...]
+        row_ranges = []
+        for start, stop in zip(cell_offsets[cell_ids], cell_offsets[cell_ids+1]):
+            if start == stop:
+                continue
+            elif (len(row_ranges) > 0) and (row_ranges[-1][1] == start):
+                row_ranges[-1] = (row_ranges[-1][0], stop)
+            else:
+                row_ranges.append((start, stop))
+    else:
+        try:
+            Lbox = np.zeros(3) + np.asarray(f.attrs['Lbox'], dtype='f8')
+        except KeyError:
+            msg = ("\nReading a ``region`` of a halo table without a spatial index\n"
+                "requires the hdf5 file to have the ``Lbox`` metadata attribute.\n")
+            raise HalotoolsError(msg)
+        row_ranges = None
+
+    positions = {key: _read_column(f, key, row_ranges) for key in position_keys}
+    mask = np.ones(len(positions['halo_x']), dtype=bool)
+    for key, low, high, L in zip(position_keys, lower, upper, Lbox):
+        if high - low < L:
+            mask &= np.mod(positions[key] - low, L) <= high - low
+    return row_ranges, mask, positions
+
+
+def _compression_kwargs(compression):
+    """ Return the keyword arguments passed to ``h5py.Group.create_dataset``
+    for the requested compression.
+    """
+    if compression in ('auto', 'blosc'):
+        try:
+            import hdf5plugin
+            blosc_filter = hdf5plugin.Blosc(cname='lz4', clevel=5, shuffle=hdf5plugin.Blosc.SHUFFLE)
+            return dict(blosc_filter)
+        except ImportError:
+            if compression == 'blosc':
+                msg = ("\nThe 'blosc' compression requires the hdf5plugin package,\n"
+                    "which can be installed with pip or conda.\n")
+                raise HalotoolsError(msg)
+            compression = 'gzip'
+
+    if compression == 'gzip':
+        return {'compression': 'gzip', 'compression_opts': 1, 'shuffle': True}
+    elif compression == 'lzf':
+        return {'compression': 'lzf', 'shuffle': True}
+    else:
+        return {}
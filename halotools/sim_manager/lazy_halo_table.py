@@ -0,0 +1,259 @@
+""" Module storing the `~halotools.sim_manager.LazyHaloTable` class,
+a read-on-demand proxy of the halo table stored in the hdf5 file of a cached halo catalog.
+"""
+from copy import copy
+from warnings import warn
+import numpy as np
+
+from astropy.table import Table, Column
+
+try:
+    import h5py
+    _HAS_H5PY = True
+except ImportError:
+    _HAS_H5PY = False
+    warn("Most of the functionality of the "
+        "sim_manager sub-package requires h5py to be installed,\n"
+        "which can be accomplished either with pip or conda. ")
+
+from .halo_table_io import _colnames, _num_halos, _read_column, _region_rows
+from .derived_halo_columns import (_derived_halo_columns, _available_derived_colnames,
+    compute_derived_halo_column, read_derived_columns, write_derived_columns)
+from ..utils.python_string_comparisons import _passively_decode_string
+
+
+__all__ = ('LazyHaloTable', )
+
+
+class LazyHaloTable(object):
+    """ Proxy of the halo table stored in an hdf5 file that reads each column
+    from disk the first time it is accessed, so that only the columns
+    actually used by a calculation are held in memory.
+
+    Columns are accessed with the same syntax as an Astropy `~astropy.table.Table`.
+    Indexing a `LazyHaloTable` with a boolean mask, a slice or an array of indices
+    returns another `LazyHaloTable` restricted to the selected rows,
+    which shares the columns already read from disk with the original proxy.
+    Use the `to_table` method to build an Astropy `~astropy.table.Table`
+    storing some or all of the columns.
+
+    Examples
+    ---------
+    >>> halos = LazyHaloTable(fname) # doctest: +SKIP
+    >>> host_halos = halos[halos['halo_upid'] == -1] # doctest: +SKIP
+    >>> host_masses = host_halos['halo_mvir'] # doctest: +SKIP
+
+    Only the ``halo_upid`` and ``halo_mvir`` columns have been read from disk.
+
+    With the ``region`` argument, the proxy only exposes the halos inside a subvolume
+    of the box, and only reads the rows of these halos if the file has a spatial index:
+
+    >>> halos = LazyHaloTable(fname, region=[[0, 50], [0, 50], [0, 50]], region_buffer=5) # doctest: +SKIP
+    """
+
+    def __init__(self, fname, columns=None, region=None, region_buffer=0.):
+        """
+        Parameters
+        -----------
+        fname : string
+            Name of the hdf5 file storing the halo table
+            in any of the formats read by `~halotools.sim_manager.read_halo_table`.
+
+        columns : list of strings, optional
+            Names of the columns exposed by the proxy. Default is None,
+            in which case all columns stored in the file are exposed, together with
+            the registered derived columns the file does not store, such as
+            ``halo_hostid`` and ``halo_mvir_host_halo``,
+            see `~halotools.sim_manager.register_derived_halo_column`.
+
+        region : array_like, optional
+            Bounds ``[[xmin, xmax], [ymin, ymax], [zmin, zmax]]`` of the subvolume of the box
+            whose halos are exposed by the proxy. Default is None, in which case all halos are exposed.
+            Derived columns persisted for the full catalog are read for the subvolume only.
+            Derived columns computed for the subvolume are not persisted, and
+            ``halo_mvir_host_halo`` values are then zero for subhalos whose host halo
+            lies outside the subvolume.
+
+        region_buffer : float, optional
+            Width of the buffer added to each side of the ``region``, accounting for
+            the periodic boundary conditions of the box. Default is 0.
+        """
+        msg = ("\nMust have h5py package installed to use LazyHaloTable objects.\n")
+        assert _HAS_H5PY, msg
+
+        self._fname = _passively_decode_string(fname)
+        # Columns spanning all the halos in the file or region, shared by all row selections
+        self._column_cache = {}
+        with h5py.File(self._fname, 'r') as f:
+            self._stored_colnames = _colnames(f)
+            if region is None:
+                self._row_ranges, self._region_mask = None, None
+                self._num_halos = _num_halos(f)
+            else:
+                self._row_ranges, self._region_mask, positions = _region_rows(
+                    f, region, region_buffer)
+                self._num_halos = np.count_nonzero(self._region_mask)
+                for key, data in positions.items():
+                    self._column_cache[key] = data[self._region_mask]
+
+        available_colnames = (copy(self._stored_colnames) +
+            _available_derived_colnames(self._stored_colnames))
+
+        if columns is None:
+            self._colnames = available_colnames
+        else:
+            columns = [_passively_decode_string(key) for key in np.atleast_1d(columns)]
+            missing_colnames = [key for key in columns if key not in available_colnames]
+            if len(missing_colnames) > 0:
+                msg = ("\nThe following requested columns are not stored in the halo table:\n")
+                for key in missing_colnames:
+                    msg += "``" + key + "``\n"
+                msg += "\nThe available columns are listed below:\n\n"
+                for key in available_colnames:
+                    msg += "``" + key + "``\n"
+                raise KeyError(msg)
+            self._colnames = columns
+
+        self._rows = None
+        self._new_columns = {}
+
+    @property
+    def colnames(self):
+        """ List of the names of the columns of the proxy.
+        """
+        return self._colnames + [key for key in self._new_columns if key not in self._colnames]
+
+    def keys(self):
+        return self.colnames
+
+    def __contains__(self, key):
+        return key in self.colnames
+
+    def __len__(self):
+        if self._rows is None:
+            return self._num_halos
+        else:
+            return len(self._rows)
+
+    def __getitem__(self, item):
+        if isinstance(item, (str, bytes)):
+            return self._get_column(_passively_decode_string(item))
+        elif (isinstance(item, (list, tuple)) and (len(item) > 0) and
+                all(isinstance(key, (str, bytes)) for key in item)):
+            return self.to_table(columns=item)
+        elif np.ndim(item) == 0 and not isinstance(item, slice):
+            msg = ("\nLazyHaloTable does not support access to individual rows.\n"
+                "Use the to_table method to build an Astropy Table first.\n")
+            raise TypeError(msg)
+        else:
+            return self._select_rows(item)
+
+    def __setitem__(self, key, value):
+        key = _passively_decode_string(key)
+        value = np.asarray(value)
+        if value.ndim == 0:
+            value = np.repeat(value, len(self))
+        elif len(value) != len(self):
+            msg = ("\nThe new column ``{0}`` has length {1}, "
+                "but the LazyHaloTable has length {2}.\n")
+            raise ValueError(msg.format(key, len(value), len(self)))
+        self._new_columns[key] = value
+
+    def __delitem__(self, key):
+        key = _passively_decode_string(key)
+        if key in self._new_columns:
+            del self._new_columns[key]
+        elif key in self._colnames:
+            self._colnames = [name for name in self._colnames if name != key]
+        else:
+            raise KeyError(key)
+
+    def to_table(self, columns=None):
+        """ Build an Astropy `~astropy.table.Table` storing
+        the rows of the proxy.
+
+        Parameters
+        -----------
+        columns : list of strings, optional
+            Names of the columns of the returned table.
+            Default is None, in which case all columns of the proxy are included.
+
+        Returns
+        --------
+        table : `~astropy.table.Table`
+        """
+        if columns is None:
+            columns = self.colnames
+        table = Table()
+        for key in columns:
+            table[key] = self[key]
+        return table
+
+    def _get_column(self, key):
+        """ Return the column ``key`` restricted to the selected rows,
+        reading the column from disk if necessary.
+        """
+        if key in self._new_columns:
+            return Column(self._new_columns[key], name=key, copy=False)
+        elif key not in self._colnames:
+            msg = ("\nThe LazyHaloTable has no column ``{0}``.\n")
+            raise KeyError(msg.format(key))
+
+        data = self._full_column(key)
+        if self._rows is not None:
+            data = data[self._rows]
+        return Column(data, name=key, copy=False)
+
+    def _full_column(self, key):
+        """ Return the column ``key`` for all the halos in the file or region.
+        """
+        try:
+            return self._column_cache[key]
+        except KeyError:
+            pass
+
+        if key in self._stored_colnames:
+            with h5py.File(self._fname, 'r') as f:
+                data = _read_column(f, key, self._row_ranges)
+            if self._region_mask is not None:
+                data = data[self._region_mask]
+        else:
+            data = self._derived_column(key)
+
+        self._column_cache[key] = data
+        return data
+
+    def _derived_column(self, key):
+        """ Return the registered derived column ``key`` for all the halos in the file or region,
+        reading its persisted values if they are valid, and computing it otherwise.
+        Columns computed for all the halos in the file are persisted for later use.
+        """
+        persisted_columns = read_derived_columns(self._fname, [key], self._row_ranges)
+        try:
+            data = persisted_columns[key]
+        except KeyError:
+            requirements = _derived_halo_columns[key][0]
+            data = compute_derived_halo_column(
+                {required_key: self._full_column(required_key) for required_key in requirements}, key)
+            if self._region_mask is None:
+                write_derived_columns(self._fname, {key: data})
+            return data
+
+        if self._region_mask is not None:
+            data = data[self._region_mask]
+        return data
+
+    def _select_rows(self, item):
+        """ Return a new proxy restricted to the rows selected by ``item``,
+        sharing the columns already read from disk.
+        """
+        if self._rows is None:
+            rows = np.arange(self._num_halos)[item]
+        else:
+            rows = self._rows[item]
+
+        selection = copy(self)
+        selection._rows = rows
+        selection._colnames = copy(self._colnames)
+        selection._new_columns = {key: value[item] for key, value in self._new_columns.items()}
+        return selection
@@ -23,6 +23,8 @@ except ImportError:
 from .tabular_ascii_reader import TabularAsciiReader
 from .halo_table_cache import HaloTableCache
 from .halo_table_cache_log_entry import HaloTableCacheLogEntry, get_redshift_string
+from .halo_table_io import (write_halo_table, latest_halo_table_format_version,
+    default_num_cells_per_dimension)
 
 from ..sim_manager import halotools_cache_dirname
 from ..custom_exceptions import HalotoolsError
@@ -94,12 +96,17 @@ class RockstarHlistReader(TabularAsciiReader):
             row_cut_min_dict={}, row_cut_max_dict={},
             row_cut_eq_dict={}, row_cut_neq_dict={},
             overwrite=False, ignore_nearby_redshifts=False, dz_tol=0.05,
-            processing_notes=' ', **kwargs):
+            processing_notes=' ', format_version=latest_halo_table_format_version,
+            compression='auto', spatial_index=False, **kwargs):
         r"""
         Parameters
         -----------
-        input_fname : string
+        input_fname : string or list of strings
             Absolute path of the file to be processed.
+            For a snapshot written as several per-box hlists,
+            a list of the paths of all the files may be passed instead.
+            In this case the first file is used for the default ``output_fname``
+            and the ``orig_ascii_fname`` metadata.
 
         columns_to_keep_dict : dict
             Dictionary used to define which columns
@@ -258,6 +265,22 @@ class RockstarHlistReader(TabularAsciiReader):
             String used to provide supplementary notes that will be attached to
             the hdf5 file storing your halo catalog.
 
+        format_version : int, optional
+            Version of the on-disk format of the hdf5 file,
+            see `~halotools.sim_manager.halo_table_io`. Default is the latest version,
+            storing each column in its own chunked and compressed dataset.
+
+        compression : string, optional
+            Compression of the columns of the hdf5 file,
+            see `~halotools.sim_manager.write_halo_table`. Default is 'auto'.
+
+        spatial_index : bool, optional
+            If True, the halos are stored on disk sorted by their cell in a regular grid
+            dividing the box, together with an index of the first row of each cell,
+            so that the ``region`` argument of `~halotools.sim_manager.CachedHaloCatalog`
+            only reads the halos of the requested subvolume.
+            Default is False.
+
         Notes
         ------
         When the ``row_cut_min_dict``, ``row_cut_max_dict``,
@@ -370,6 +393,9 @@ class RockstarHlistReader(TabularAsciiReader):
         self.overwrite = overwrite
         self.ignore_nearby_redshifts = ignore_nearby_redshifts
         self.processing_notes = _passively_decode_string(processing_notes)
+        self.format_version = format_version
+        self.compression = compression
+        self.spatial_index = spatial_index
 
         self.output_fname = _passively_decode_string(
             self._retrieve_output_fname(output_fname, self.overwrite, **kwargs)
@@ -593,6 +619,16 @@ class RockstarHlistReader(TabularAsciiReader):
             choosing larger values typically improves performance.
             Default is 500 Mb.
 
+        engine : string, optional
+            Parsing engine used to convert the ASCII data, either 'python' (the default)
+            or 'numpy', which is about twice as fast. See
+            `~halotools.sim_manager.TabularAsciiReader.read_ascii` for details.
+
+        num_processes : int, optional
+            Number of processes used to read the ASCII data. Default is 1.
+            A string 'max' may be used to indicate that all available cores should be used.
+            See `~halotools.sim_manager.TabularAsciiReader.read_ascii` for details.
+
         Notes
         -----
         Regarding the ``columns_to_convert_from_kpc_to_mpc`` argument,
@@ -666,6 +702,16 @@ class RockstarHlistReader(TabularAsciiReader):
             choosing larger values typically improves performance.
             Default is 500 Mb.
 
+        engine : string, optional
+            Parsing engine used to convert the ASCII data, either 'python' (the default)
+            or 'numpy', which is about twice as fast. See
+            `~halotools.sim_manager.TabularAsciiReader.read_ascii` for details.
+
+        num_processes : int, optional
+            Number of processes used to read the ASCII data. Default is 1.
+            A string 'max' may be used to indicate that all available cores should be used.
+            See `~halotools.sim_manager.TabularAsciiReader.read_ascii` for details.
+
         Returns
         --------
         full_array : array_like
@@ -696,8 +742,13 @@ class RockstarHlistReader(TabularAsciiReader):
         if not _HAS_H5PY:
             raise HalotoolsError(uninstalled_h5py_msg)
 
-        self.halo_table.write(
-            _passively_decode_string(self.output_fname), path='data', overwrite=self.overwrite)
+        if self.spatial_index is True:
+            num_cells_per_dimension = default_num_cells_per_dimension
+        else:
+            num_cells_per_dimension = None
+        write_halo_table(self.halo_table, self.output_fname, overwrite=self.overwrite,
+            format_version=self.format_version, compression=self.compression,
+            Lbox=self.Lbox, num_cells_per_dimension=num_cells_per_dimension)
         self._write_metadata()
 
     def _write_metadata(self):
@@ -707,7 +758,7 @@ class RockstarHlistReader(TabularAsciiReader):
             raise HalotoolsError(uninstalled_h5py_msg)
 
         # Now add the metadata
-        f = h5py.File(self.output_fname)
+        f = h5py.File(self.output_fname, 'a')
         f.attrs.create('simname', np.string_(self.simname))
         f.attrs.create('halo_finder', np.string_(self.halo_finder))
         redshift_string = np.string_(get_redshift_string(self.redshift))
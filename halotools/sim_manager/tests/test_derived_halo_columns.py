@@ -0,0 +1,201 @@
+"""
+"""
+from __future__ import absolute_import, division, print_function
+
+import os
+import pytest
+import numpy as np
+
+from astropy.table import Table
+
+from ..fake_sim import FakeSim
+from ..halo_table_io import read_halo_table, write_halo_table
+from ..lazy_halo_table import LazyHaloTable
+from ..halo_table_cache import HaloTableCache
+from .. import halo_table_cache
+from ..halo_table_cache_log_entry import HaloTableCacheLogEntry, get_redshift_string
+from ..cached_halo_catalog import CachedHaloCatalog
+from ..derived_halo_columns import (register_derived_halo_column,
+    unregister_derived_halo_column, registered_derived_halo_columns,
+    add_derived_halo_columns, derived_columns_fname)
+
+from ...custom_exceptions import HalotoolsError
+
+try:
+    import h5py
+    HAS_H5PY = True
+except ImportError:
+    HAS_H5PY = False
+
+__all__ = ('test_derived_columns_are_persisted', )
+
+
+class CountingFunction(object):
+    """ Derived column function recording the number of times it is called.
+    """
+
+    def __init__(self):
+        self.num_calls = 0
+
+    def __call__(self, table):
+        self.num_calls += 1
+        return 2*table['halo_mvir']
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_derived_columns_are_persisted(tmpdir):
+    halo_table = FakeSim().halo_table
+    del halo_table['halo_hostid']
+    del halo_table['halo_mvir_host_halo']
+    halo_fname = str(tmpdir.join('halos.hdf5'))
+    write_halo_table(halo_table, halo_fname, Lbox=250., num_cells_per_dimension=5)
+    assert not os.path.isfile(derived_columns_fname(halo_fname))
+    halo_table = read_halo_table(halo_fname)
+    add_derived_halo_columns(halo_table, fname=halo_fname)
+    fake_sim = FakeSim()
+    idx_sorted = np.argsort(fake_sim.halo_table['halo_id'])
+    idx_sorted2 = np.argsort(halo_table['halo_id'])
+    assert np.all(halo_table['halo_mvir_host_halo'][idx_sorted2] ==
+        fake_sim.halo_table['halo_mvir_host_halo'][idx_sorted])
+
+    with h5py.File(derived_columns_fname(halo_fname), 'r') as f:
+        assert set(f['data'].keys()) == set(('halo_hostid', 'halo_mvir_host_halo'))
+        provenance = f['data']['halo_hostid'].attrs['provenance']
+        assert provenance.decode('ascii') == 'add_halo_hostid'
+
+    halos = LazyHaloTable(halo_fname)
+    assert np.all(halos['halo_mvir_host_halo'] == halo_table['halo_mvir_host_halo'])
+    assert 'halo_hostid' not in halos._column_cache
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_persisted_columns_serve_regions(tmpdir):
+    halo_table = FakeSim().halo_table
+    del halo_table['halo_hostid']
+    del halo_table['halo_mvir_host_halo']
+    halo_fname = str(tmpdir.join('halos.hdf5'))
+    write_halo_table(halo_table, halo_fname, Lbox=250., num_cells_per_dimension=5)
+    halo_table = read_halo_table(halo_fname)
+    add_derived_halo_columns(halo_table, fname=halo_fname)
+
+    region = [[0, 50], [0, 250], [0, 250]]
+    subvolume = read_halo_table(halo_fname, region=region)
+    halos = LazyHaloTable(halo_fname, region=region)
+    mask = np.in1d(halo_table['halo_id'], subvolume['halo_id'])
+    assert np.all(halos['halo_mvir_host_halo'] == halo_table['halo_mvir_host_halo'][mask])
+    assert np.all(halos['halo_mvir_host_halo'] > 0)
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_register_derived_column(tmpdir):
+    halo_table = FakeSim().halo_table
+    del halo_table['halo_hostid']
+    del halo_table['halo_mvir_host_halo']
+    halo_fname = str(tmpdir.join('halos.hdf5'))
+    write_halo_table(halo_table, halo_fname, Lbox=250., num_cells_per_dimension=5)
+    function = CountingFunction()
+    register_derived_halo_column('halo_mvir2', function, ('halo_mvir', ), 'double mass v1')
+    try:
+        assert registered_derived_halo_columns()[-1] == 'halo_mvir2'
+        halos = LazyHaloTable(halo_fname)
+        assert 'halo_mvir2' in halos.keys()
+        assert np.all(halos['halo_mvir2'] == 2*halos['halo_mvir'])
+        assert function.num_calls == 1
+
+        halos = LazyHaloTable(halo_fname)
+        __ = halos['halo_mvir2']
+        assert function.num_calls == 1
+
+        register_derived_halo_column('halo_mvir2', function, ('halo_mvir', ), 'double mass v2')
+        halos = LazyHaloTable(halo_fname)
+        __ = halos['halo_mvir2']
+        assert function.num_calls == 2
+    finally:
+        unregister_derived_halo_column('halo_mvir2')
+    assert 'halo_mvir2' not in LazyHaloTable(halo_fname).keys()
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_modified_catalog_invalidates_persisted_columns(tmpdir):
+    halo_table = FakeSim().halo_table
+    del halo_table['halo_hostid']
+    del halo_table['halo_mvir_host_halo']
+    halo_fname = str(tmpdir.join('halos.hdf5'))
+    write_halo_table(halo_table, halo_fname, Lbox=250., num_cells_per_dimension=5)
+    function = CountingFunction()
+    register_derived_halo_column('halo_mvir2', function, ('halo_mvir', ), 'double mass v1')
+    try:
+        halo_table = read_halo_table(halo_fname)
+        add_derived_halo_columns(halo_table, fname=halo_fname)
+        assert function.num_calls == 1
+
+        halo_table = read_halo_table(halo_fname)
+        add_derived_halo_columns(halo_table, fname=halo_fname)
+        assert function.num_calls == 1
+
+        halo_table = halo_table[1:]
+        halo_table['halo_mvir'] *= 3
+        del halo_table['halo_hostid']
+        del halo_table['halo_mvir_host_halo']
+        del halo_table['halo_mvir2']
+        write_halo_table(halo_table, halo_fname, overwrite=True)
+        halos = LazyHaloTable(halo_fname)
+        assert np.all(halos['halo_mvir2'] == 2*halo_table['halo_mvir'])
+        assert function.num_calls == 2
+    finally:
+        unregister_derived_halo_column('halo_mvir2')
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_persisted_columns_reused_across_cached_halo_catalog_loads(tmpdir, monkeypatch):
+    halo_fname = str(tmpdir.join('halos.hdf5'))
+    log_entry = HaloTableCacheLogEntry('fake', 'fake', 'v0', get_redshift_string(0.0), halo_fname)
+    write_halo_table(FakeSim().halo_table, halo_fname, Lbox=250., num_cells_per_dimension=5)
+    with h5py.File(halo_fname, 'a') as f:
+        for attr_name in log_entry.log_attributes:
+            f.attrs.create(attr_name, getattr(log_entry, attr_name).encode('ascii'))
+        f.attrs.create('Lbox', 250.)
+        f.attrs.create('particle_mass', 1e8)
+
+    # Keep the cache log out of the user's cache directory
+    monkeypatch.setattr(halo_table_cache, 'halotools_cache_dirname', str(tmpdir))
+    HaloTableCache().add_entry_to_cache_log(log_entry)
+
+    # h5py 2.x opens files in append mode by default, which updates their modification time
+    class LegacyModeFile(h5py.File):
+        def __init__(self, name, mode='a', **kwargs):
+            super(LegacyModeFile, self).__init__(name, mode, **kwargs)
+    monkeypatch.setattr(h5py, 'File', LegacyModeFile)
+
+    function = CountingFunction()
+    register_derived_halo_column('halo_mvir2', function, ('halo_mvir', ), 'double mass v1')
+    try:
+        for __ in range(3):
+            halocat = CachedHaloCatalog(fname=halo_fname)
+            assert np.all(halocat.halo_table['halo_mvir2'] == 2*halocat.halo_table['halo_mvir'])
+        assert function.num_calls == 1
+    finally:
+        unregister_derived_halo_column('halo_mvir2')
+
+
+def test_bad_registrations():
+    with pytest.raises(HalotoolsError) as err:
+        register_derived_halo_column('mvir2', CountingFunction(), ('halo_mvir', ), 'v1')
+    substr = "The name of a derived halo column must begin with ``halo_``."
+    assert substr in err.value.args[0]
+
+    with pytest.raises(HalotoolsError):
+        register_derived_halo_column('halo_mvir2', None, ('halo_mvir', ), 'v1')
+
+    with pytest.raises(HalotoolsError):
+        unregister_derived_halo_column('halo_nonsense')
+
+
+def test_derived_columns_without_fname():
+    halo_table = Table()
+    halo_table['halo_id'] = np.arange(4)
+    halo_table['halo_upid'] = [-1, 0, 0, -1]
+    halo_table['halo_mvir'] = [1e12, 1e11, 1e10, 1e13]
+    add_derived_halo_columns(halo_table)
+    assert np.all(halo_table['halo_hostid'] == [0, 0, 0, 3])
+    assert np.all(halo_table['halo_mvir_host_halo'] == [1e12, 1e12, 1e12, 1e13])
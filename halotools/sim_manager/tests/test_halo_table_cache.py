@@ -23,6 +23,10 @@ from . import helper_functions
 
 from ..halo_table_cache_log_entry import HaloTableCacheLogEntry, get_redshift_string
 from ..halo_table_cache import HaloTableCache
+from .. import halo_table_cache
+from ..halo_table_io import write_halo_table
+from ..fake_sim import FakeSim
+from ..cached_halo_catalog import CachedHaloCatalog
 
 from ...custom_exceptions import InvalidCacheLogEntry, HalotoolsError
 
@@ -230,3 +234,139 @@ def test_matching_log_entry_generator():
     assert substr in err.value.args[0]
 
 
+
+
+def _write_good_halo_catalog(fname, log_entry, halo_x=[1, 2, 3]):
+    good_table = Table(
+        {'halo_id': [1, 2, 3],
+         'halo_x': halo_x,
+         'halo_y': [1, 2, 3],
+         'halo_z': [1, 2, 3],
+         'halo_mass': [1, 2, 3],
+         })
+    good_table.write(fname, path='data', overwrite=True)
+
+    f = h5py.File(fname, 'a')
+    for attr_name in log_entry.log_attributes:
+        f.attrs.create(attr_name, getattr(log_entry, attr_name).encode('ascii'))
+    f.attrs.create('Lbox', 100.)
+    f.attrs.create('particle_mass', 1e8)
+    f.close()
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_fingerprint_skips_table_read(tmpdir):
+    fname = str(tmpdir.join('good_table.hdf5'))
+    log_entry = HaloTableCacheLogEntry('good_simname', 'good_halo_finder',
+        'good_version_name', get_redshift_string(0.0), fname)
+    _write_good_halo_catalog(fname, log_entry)
+
+    assert log_entry.fingerprint is None
+    assert log_entry.safe_for_cache is True
+    assert log_entry.fingerprint is not None
+
+    num_table_reads = []
+
+    def _verify_table_read(num_failures):
+        num_table_reads.append(1)
+        return '', num_failures, Table.read(fname, path='data')
+    log_entry._verify_table_read = _verify_table_read
+
+    assert log_entry.safe_for_cache is True
+    assert len(num_table_reads) == 0
+    assert log_entry.validate(revalidate=True) is True
+    assert len(num_table_reads) == 1
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_fingerprint_survives_cached_halo_catalog_loads(tmpdir, monkeypatch):
+    """ Loading a cached catalog must not modify its file, or the next load
+    would re-read the full halo table to validate it.
+    """
+    fname = str(tmpdir.join('halos.hdf5'))
+    log_entry = HaloTableCacheLogEntry('fake', 'fake', 'v0', get_redshift_string(0.0), fname)
+    write_halo_table(FakeSim().halo_table, fname)
+    with h5py.File(fname, 'a') as f:
+        for attr_name in log_entry.log_attributes:
+            f.attrs.create(attr_name, getattr(log_entry, attr_name).encode('ascii'))
+        f.attrs.create('Lbox', 250.)
+        f.attrs.create('particle_mass', 1e8)
+
+    # Keep the cache log out of the user's cache directory
+    monkeypatch.setattr(halo_table_cache, 'halotools_cache_dirname', str(tmpdir))
+    HaloTableCache().add_entry_to_cache_log(log_entry)
+
+    # h5py 2.x opens files in append mode by default, which updates their modification time
+    class LegacyModeFile(h5py.File):
+        def __init__(self, name, mode='a', **kwargs):
+            super(LegacyModeFile, self).__init__(name, mode, **kwargs)
+    monkeypatch.setattr(h5py, 'File', LegacyModeFile)
+
+    num_table_reads = []
+    _verify_table_read = HaloTableCacheLogEntry._verify_table_read
+
+    def counting_verify_table_read(self, num_failures):
+        num_table_reads.append(1)
+        return _verify_table_read(self, num_failures)
+    monkeypatch.setattr(HaloTableCacheLogEntry, '_verify_table_read', counting_verify_table_read)
+
+    for __ in range(2):
+        halocat = CachedHaloCatalog(fname=fname)
+        assert len(halocat.halo_table) == len(FakeSim().halo_table)
+    assert len(num_table_reads) == 0
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_fingerprint_detects_modified_file(tmpdir):
+    fname = str(tmpdir.join('good_table.hdf5'))
+    log_entry = HaloTableCacheLogEntry('good_simname', 'good_halo_finder',
+        'good_version_name', get_redshift_string(0.0), fname)
+    _write_good_halo_catalog(fname, log_entry)
+    assert log_entry.safe_for_cache is True
+
+    _write_good_halo_catalog(fname, log_entry, halo_x=[1, 2, 300])
+    assert log_entry.safe_for_cache is False
+    assert "must be bounded by [0, Lbox]" in log_entry._cache_safety_message
+    assert log_entry.fingerprint is None
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_fingerprint_recorded_in_cache_log(tmpdir):
+    fname = str(tmpdir.join('good_table.hdf5'))
+    cache_log_fname = str(tmpdir.join('halo_table_cache_log.txt'))
+    log_entry = HaloTableCacheLogEntry('good_simname', 'good_halo_finder',
+        'good_version_name', get_redshift_string(0.0), fname)
+    _write_good_halo_catalog(fname, log_entry)
+
+    cache = HaloTableCache(cache_log_fname=cache_log_fname)
+    cache.add_entry_to_cache_log(log_entry)
+
+    cache2 = HaloTableCache(cache_log_fname=cache_log_fname)
+    assert cache2.log == [log_entry]
+    assert cache2.log[0].fingerprint == log_entry.fingerprint
+
+    cache2.log[0].fingerprint = None
+    cache2.update_log_entry_fingerprint(cache2.log[0], update_ascii=False)
+    cache2._overwrite_log_ascii(cache2.log)
+    cache3 = HaloTableCache(cache_log_fname=cache_log_fname)
+    assert cache3.log[0].fingerprint is None
+
+    cache3.update_log_entry_fingerprint(log_entry)
+    cache4 = HaloTableCache(cache_log_fname=cache_log_fname)
+    assert cache4.log[0].fingerprint == log_entry.fingerprint
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_cache_log_without_fingerprints(tmpdir):
+    """ Cache logs written before the fingerprints were recorded remain readable.
+    """
+    fname = str(tmpdir.join('good_table.hdf5'))
+    cache_log_fname = str(tmpdir.join('halo_table_cache_log.txt'))
+    log_table = Table({'simname': ['good_simname'], 'halo_finder': ['good_halo_finder'],
+        'redshift': [0.0], 'version_name': ['good_version_name'], 'fname': [fname]})
+    log_table.write(cache_log_fname, format='ascii')
+
+    cache = HaloTableCache(cache_log_fname=cache_log_fname)
+    assert cache._cache_log_fname_is_kosher is True
+    assert len(cache.log) == 1
+    assert cache.log[0].fingerprint is None
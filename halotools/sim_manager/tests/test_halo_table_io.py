@@ -0,0 +1,208 @@
+"""
+"""
+from __future__ import absolute_import, division, print_function
+
+import pytest
+import numpy as np
+
+from ..fake_sim import FakeSim
+from ..halo_table_io import (read_halo_table, write_halo_table,
+    halo_table_format_version, num_halos_per_chunk)
+from ..lazy_halo_table import LazyHaloTable
+from ..halo_table_cache import HaloTableCache
+from ..halo_table_cache_log_entry import HaloTableCacheLogEntry, get_redshift_string
+
+from ...custom_exceptions import HalotoolsError
+
+try:
+    import h5py
+    HAS_H5PY = True
+except ImportError:
+    HAS_H5PY = False
+
+__all__ = ('test_columnar_round_trip', )
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_columnar_round_trip(tmpdir):
+    halo_table = FakeSim().halo_table
+    halo_table['halo_x'].unit = 'Mpc'
+    fname = str(tmpdir.join('halos.hdf5'))
+    write_halo_table(halo_table, fname)
+    assert halo_table_format_version(fname) == 2
+
+    halo_table2 = read_halo_table(fname)
+    assert halo_table2.keys() == halo_table.keys()
+    for key in halo_table.keys():
+        assert np.all(halo_table2[key] == halo_table[key])
+        assert halo_table2[key].dtype == halo_table[key].dtype
+    assert halo_table2['halo_x'].unit == 'Mpc'
+
+    with h5py.File(fname, 'r') as f:
+        dataset = f['data']['halo_mvir']
+        assert dataset.chunks == (min(len(halo_table), num_halos_per_chunk), )
+        assert dataset.compression is not None
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_compound_dataset_remains_readable(tmpdir):
+    halo_table = FakeSim().halo_table
+    fname = str(tmpdir.join('halos.hdf5'))
+    halo_table.write(fname, path='data')
+    assert halo_table_format_version(fname) == 1
+
+    halo_table2 = read_halo_table(fname)
+    assert halo_table2.keys() == halo_table.keys()
+    assert np.all(halo_table2['halo_id'] == halo_table['halo_id'])
+
+    fname2 = str(tmpdir.join('halos2.hdf5'))
+    write_halo_table(halo_table, fname2, format_version=1)
+    assert halo_table_format_version(fname2) == 1
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_selective_read(tmpdir):
+    halo_table = FakeSim().halo_table
+    for format_version in (1, 2):
+        fname = str(tmpdir.join('halos{0}.hdf5'.format(format_version)))
+        write_halo_table(halo_table, fname, format_version=format_version)
+
+        halo_table2 = read_halo_table(fname, columns=['halo_mvir', 'halo_id'])
+        assert halo_table2.keys() == ['halo_mvir', 'halo_id']
+        assert np.all(halo_table2['halo_mvir'] == halo_table['halo_mvir'])
+
+        halos = LazyHaloTable(fname)
+        assert len(halos) == len(halo_table)
+        assert np.all(halos['halo_y'] == halo_table['halo_y'])
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_compression_options(tmpdir):
+    halo_table = FakeSim().halo_table
+    for compression in ('gzip', 'lzf', None):
+        fname = str(tmpdir.join('halos_{0}.hdf5'.format(compression)))
+        write_halo_table(halo_table, fname, compression=compression)
+        with h5py.File(fname, 'r') as f:
+            assert f['data']['halo_mvir'].compression == compression
+        assert np.all(read_halo_table(fname)['halo_mvir'] == halo_table['halo_mvir'])
+
+    fname = str(tmpdir.join('halos.hdf5'))
+    with pytest.raises(HalotoolsError) as err:
+        write_halo_table(halo_table, fname, compression='zip')
+    substr = "Input ``compression`` = zip must be one of the following"
+    assert substr in err.value.args[0]
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_empty_table(tmpdir):
+    halo_table = FakeSim().halo_table[0:0]
+    fname = str(tmpdir.join('halos.hdf5'))
+    write_halo_table(halo_table, fname)
+    halo_table2 = read_halo_table(fname)
+    assert len(halo_table2) == 0
+    assert halo_table2.keys() == halo_table.keys()
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_overwrite(tmpdir):
+    halo_table = FakeSim().halo_table
+    fname = str(tmpdir.join('halos.hdf5'))
+    write_halo_table(halo_table, fname)
+    with pytest.raises(HalotoolsError):
+        write_halo_table(halo_table, fname)
+    write_halo_table(halo_table[0:10], fname, overwrite=True)
+    assert len(read_halo_table(fname)) == 10
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_cache_log_records_format_version(tmpdir):
+    fname = str(tmpdir.join('halos.hdf5'))
+    cache_log_fname = str(tmpdir.join('halo_table_cache_log.txt'))
+    log_entry = HaloTableCacheLogEntry('fake', 'fake', 'v0', get_redshift_string(0.0), fname)
+
+    write_halo_table(FakeSim().halo_table, fname)
+    with h5py.File(fname, 'a') as f:
+        for attr_name in log_entry.log_attributes:
+            f.attrs.create(attr_name, getattr(log_entry, attr_name).encode('ascii'))
+        f.attrs.create('Lbox', 250.)
+        f.attrs.create('particle_mass', 1e8)
+
+    cache = HaloTableCache(cache_log_fname=cache_log_fname)
+    cache.add_entry_to_cache_log(log_entry)
+    assert log_entry.format_version == 2
+
+    cache2 = HaloTableCache(cache_log_fname=cache_log_fname)
+    assert cache2.log[0].format_version == 2
+
+
+def _brute_force_region_mask(halo_table, lower, upper, Lbox):
+    mask = np.ones(len(halo_table), dtype=bool)
+    for key, low, high in zip(('halo_x', 'halo_y', 'halo_z'), lower, upper):
+        pos = halo_table[key].data
+        mask &= (((pos >= low) & (pos <= high)) |
+            ((pos + Lbox >= low) & (pos + Lbox <= high)) |
+            ((pos - Lbox >= low) & (pos - Lbox <= high)))
+    return mask
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_spatial_index(tmpdir):
+    halo_table = FakeSim().halo_table
+    Lbox = 250.
+    region = [[10, 60], [100, 175], [0, 250]]
+    for format_version in (1, 2):
+        fname = str(tmpdir.join('halos{0}.hdf5'.format(format_version)))
+        write_halo_table(halo_table, fname, format_version=format_version,
+            Lbox=Lbox, num_cells_per_dimension=5)
+
+        with h5py.File(fname, 'r') as f:
+            cell_offsets = f['spatial_index']['cell_offsets'][...]
+        assert len(cell_offsets) == 5**3 + 1
+        assert cell_offsets[-1] == len(halo_table)
+
+        halo_table2 = read_halo_table(fname)
+        assert set(halo_table2['halo_id']) == set(halo_table['halo_id'])
+
+        subvolume = read_halo_table(fname, region=region)
+        mask = _brute_force_region_mask(halo_table, [10, 100, 0], [60, 175, 250], Lbox)
+        assert len(subvolume) == np.count_nonzero(mask)
+        assert set(subvolume['halo_id']) == set(halo_table['halo_id'][mask])
+
+        halos = LazyHaloTable(fname, region=region)
+        assert len(halos) == len(subvolume)
+        assert np.all(halos['halo_mvir'] == subvolume['halo_mvir'])
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_region_buffer_is_periodic(tmpdir):
+    halo_table = FakeSim().halo_table
+    Lbox = 250.
+    fname = str(tmpdir.join('halos.hdf5'))
+    fname2 = str(tmpdir.join('halos_without_index.hdf5'))
+    write_halo_table(halo_table, fname, Lbox=Lbox, num_cells_per_dimension=(4, 5, 6))
+    write_halo_table(halo_table, fname2)
+    with h5py.File(fname2, 'a') as f:
+        f.attrs.create('Lbox', Lbox)
+
+    region = [[0, 50], [200, 250], [100, 150]]
+    mask = _brute_force_region_mask(halo_table, [-20, 180, 80], [70, 270, 170], Lbox)
+    for filename in (fname, fname2):
+        subvolume = read_halo_table(filename, columns=['halo_id'],
+            region=region, region_buffer=20)
+        assert set(subvolume['halo_id']) == set(halo_table['halo_id'][mask])
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_spatial_index_bad_inputs(tmpdir):
+    halo_table = FakeSim().halo_table
+    fname = str(tmpdir.join('halos.hdf5'))
+    with pytest.raises(HalotoolsError) as err:
+        write_halo_table(halo_table, fname, num_cells_per_dimension=5)
+    substr = "Writing a spatial index requires the ``Lbox`` argument."
+    assert substr in err.value.args[0]
+
+    write_halo_table(halo_table, fname, Lbox=250., num_cells_per_dimension=5)
+    with pytest.raises(HalotoolsError) as err:
+        read_halo_table(fname, region=[[10, 0], [0, 10], [0, 10]])
+    substr = "The input ``region`` must be of the form"
+    assert substr in err.value.args[0]
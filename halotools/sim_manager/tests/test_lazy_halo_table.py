@@ -0,0 +1,126 @@
+"""
+"""
+from __future__ import absolute_import, division, print_function
+
+import pytest
+import numpy as np
+
+from ..fake_sim import FakeSim
+from ..lazy_halo_table import LazyHaloTable
+
+try:
+    import h5py
+    HAS_H5PY = True
+except ImportError:
+    HAS_H5PY = False
+
+__all__ = ('test_column_access', )
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_column_access(tmpdir):
+    halo_table = FakeSim().halo_table
+    del halo_table['halo_hostid']
+    del halo_table['halo_mvir_host_halo']
+    halo_fname = str(tmpdir.join('halos.hdf5'))
+    halo_table.write(halo_fname, path='data')
+    halos = LazyHaloTable(halo_fname)
+    assert len(halos) == len(halo_table)
+    assert set(halo_table.keys()) < set(halos.keys())
+    assert len(halos._column_cache) == 0
+
+    assert np.all(halos['halo_mvir'] == halo_table['halo_mvir'])
+    assert list(halos._column_cache.keys()) == ['halo_mvir']
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_row_selection(tmpdir):
+    halo_table = FakeSim().halo_table
+    del halo_table['halo_hostid']
+    del halo_table['halo_mvir_host_halo']
+    halo_fname = str(tmpdir.join('halos.hdf5'))
+    halo_table.write(halo_fname, path='data')
+    halos = LazyHaloTable(halo_fname)
+
+    mask = halos['halo_upid'] == -1
+    host_halos = halos[mask]
+    assert len(host_halos) == np.count_nonzero(mask)
+    assert np.all(host_halos['halo_x'] == halo_table['halo_x'][mask])
+
+    mass_cut = host_halos['halo_mvir'] > 1e12
+    massive_host_halos = host_halos[mass_cut]
+    assert np.all(massive_host_halos['halo_id'] == halo_table['halo_id'][mask][mass_cut])
+    assert np.all(halos[10:20]['halo_id'] == halo_table['halo_id'][10:20])
+
+    assert 'halo_x' in halos._column_cache
+    assert 'halo_vmax' not in halos._column_cache
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_derived_columns(tmpdir):
+    halo_table = FakeSim().halo_table
+    del halo_table['halo_hostid']
+    del halo_table['halo_mvir_host_halo']
+    halo_fname = str(tmpdir.join('halos.hdf5'))
+    halo_table.write(halo_fname, path='data')
+    fake_sim = FakeSim()
+    halos = LazyHaloTable(halo_fname)
+    host_halos = halos[halos['halo_upid'] == -1]
+    assert np.all(halos['halo_hostid'] == fake_sim.halo_table['halo_hostid'])
+    assert np.all(halos['halo_mvir_host_halo'] == fake_sim.halo_table['halo_mvir_host_halo'])
+    assert np.all(host_halos['halo_hostid'] == host_halos['halo_id'])
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_new_columns(tmpdir):
+    halo_table = FakeSim().halo_table
+    del halo_table['halo_hostid']
+    del halo_table['halo_mvir_host_halo']
+    halo_fname = str(tmpdir.join('halos.hdf5'))
+    halo_table.write(halo_fname, path='data')
+    halos = LazyHaloTable(halo_fname)
+    host_halos = halos[halos['halo_upid'] == -1]
+    host_halos['halo_mvir2'] = 2*host_halos['halo_mvir']
+    host_halos['halo_num_centrals'] = 0
+    assert 'halo_mvir2' in host_halos.keys()
+    assert 'halo_mvir2' not in halos.keys()
+
+    subsample = host_halos[::2]
+    assert np.all(subsample['halo_mvir2'] == 2*subsample['halo_mvir'])
+    assert np.all(subsample['halo_num_centrals'] == 0)
+
+    with pytest.raises(ValueError):
+        host_halos['halo_mvir3'] = np.ones(len(host_halos) + 1)
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_columns_argument(tmpdir):
+    halo_table = FakeSim().halo_table
+    del halo_table['halo_hostid']
+    del halo_table['halo_mvir_host_halo']
+    halo_fname = str(tmpdir.join('halos.hdf5'))
+    halo_table.write(halo_fname, path='data')
+    halos = LazyHaloTable(halo_fname, columns=['halo_x', 'halo_hostid'])
+    assert halos.keys() == ['halo_x', 'halo_hostid']
+    table = halos.to_table()
+    assert table.keys() == ['halo_x', 'halo_hostid']
+
+    with pytest.raises(KeyError):
+        __ = halos['halo_y']
+
+    with pytest.raises(KeyError) as err:
+        __ = LazyHaloTable(halo_fname, columns=['halo_x', 'halo_nonsense'])
+    substr = "The following requested columns are not stored in the halo table"
+    assert substr in err.value.args[0]
+
+
+@pytest.mark.skipif('not HAS_H5PY')
+def test_row_access_is_disallowed(tmpdir):
+    halo_table = FakeSim().halo_table
+    del halo_table['halo_hostid']
+    del halo_table['halo_mvir_host_halo']
+    halo_fname = str(tmpdir.join('halos.hdf5'))
+    halo_table.write(halo_fname, path='data')
+    halos = LazyHaloTable(halo_fname)
+    with pytest.raises(TypeError):
+        __ = halos[0]
@@ -240,6 +240,82 @@ class TestTabularAsciiReader(TestCase):
         substr = "Must choose non-zero size for input ``chunk_memory_size``"
         assert substr in err.value.args[0]
 
+    def test_numpy_engine(self):
+        """ Verify that the numpy and python parsing engines return identical arrays,
+        including for a chunk size forcing many chunks.
+        """
+        write_tabular_data(self.dummy_fname)
+
+        columns_to_keep_dict = {'vmax': (1, 'f4'), 'id': (0, 'i8'), 'upid': (3, 'i8')}
+
+        reader = TabularAsciiReader(self.dummy_fname, columns_to_keep_dict,
+            row_cut_min_dict={'vmax': 101}, row_cut_neq_dict={'id': 103})
+        for chunk_memory_size in (500, 0.00005):
+            arr = reader.read_ascii(chunk_memory_size=chunk_memory_size)
+            arr2 = reader.read_ascii(chunk_memory_size=chunk_memory_size, engine='numpy')
+            assert arr.dtype == arr2.dtype
+            assert len(arr) == 2
+            assert np.all(arr == arr2)
+
+    def test_bad_engine(self):
+        write_tabular_data(self.dummy_fname)
+        columns_to_keep_dict = {'vmax': (1, 'f4'), 'id': (0, 'i8')}
+        reader = TabularAsciiReader(self.dummy_fname, columns_to_keep_dict)
+
+        with pytest.raises(ValueError) as err:
+            arr = reader.read_ascii(engine='pandas')
+        substr = "Input ``engine`` must be either 'python' or 'numpy'"
+        assert substr in err.value.args[0]
+
+    def test_parallel_read(self):
+        """ Verify that reading byte ranges in parallel returns the same array
+        as the serial read, including for a chunk size forcing many byte ranges.
+        """
+        write_tabular_data(self.dummy_fname)
+
+        columns_to_keep_dict = {'vmax': (1, 'f4'), 'id': (0, 'i8'), 'upid': (3, 'i8')}
+        reader = TabularAsciiReader(self.dummy_fname, columns_to_keep_dict,
+            row_cut_min_dict={'vmax': 101})
+        arr = reader.read_ascii()
+        for engine in ('python', 'numpy'):
+            for chunk_memory_size in (500, 0.00001):
+                arr2 = reader.read_ascii(chunk_memory_size=chunk_memory_size,
+                    engine=engine, num_processes=2)
+                assert arr.dtype == arr2.dtype
+                assert len(arr2) == 3
+                assert np.all(arr == arr2)
+
+    def test_read_multiple_files(self):
+        write_tabular_data(self.dummy_fname)
+        fname2 = os.path.join(self.tmpdir, 'abc2.txt')
+        with open(fname2, 'w') as f:
+            f.write('# id  vmax  mvir  upid\n')
+            f.write('104  500.  1e13  -1\n')
+            f.write('105  600.  1e14  -1\n')
+
+        columns_to_keep_dict = {'vmax': (1, 'f4'), 'id': (0, 'i8')}
+        reader = TabularAsciiReader([self.dummy_fname, fname2], columns_to_keep_dict,
+            row_cut_min_dict={'vmax': 101})
+        for num_processes in (1, 2):
+            arr = reader.read_ascii(num_processes=num_processes)
+            assert np.all(arr['id'] == [101, 102, 103, 104, 105])
+
+        with pytest.raises(ValueError) as err:
+            reader = TabularAsciiReader([], columns_to_keep_dict)
+        substr = "must be a filename or a non-empty list of filenames"
+        assert substr in err.value.args[0]
+
+    def test_bad_num_processes(self):
+        write_tabular_data(self.dummy_fname)
+        columns_to_keep_dict = {'vmax': (1, 'f4'), 'id': (0, 'i8')}
+        reader = TabularAsciiReader(self.dummy_fname, columns_to_keep_dict)
+
+        for num_processes in (0, 1.5, 'all'):
+            with pytest.raises(ValueError) as err:
+                arr = reader.read_ascii(num_processes=num_processes)
+            substr = "Input ``num_processes`` must be a positive integer or the string 'max'"
+            assert substr in err.value.args[0]
+
     def tearDown(self):
         try:
             shutil.rmtree(self.tmpdir)
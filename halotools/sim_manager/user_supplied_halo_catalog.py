@@ -11,6 +11,8 @@ from astropy.table import Table, Column
 
 from .halo_table_cache import HaloTableCache
 from .halo_table_cache_log_entry import HaloTableCacheLogEntry, get_redshift_string
+from .halo_table_io import (write_halo_table, latest_halo_table_format_version,
+    default_num_cells_per_dimension)
 from .user_supplied_ptcl_catalog import UserSuppliedPtclCatalog
 
 from ..utils.array_utils import custom_len
@@ -318,7 +320,8 @@ class UserSuppliedHaloCatalog(object):
 
     def add_halocat_to_cache(self,
             fname, simname, halo_finder, version_name, processing_notes,
-            overwrite=False, **additional_metadata):
+            overwrite=False, format_version=latest_halo_table_format_version,
+            compression='auto', spatial_index=False, **additional_metadata):
         """
         Parameters
         ------------
@@ -350,6 +353,22 @@ class UserSuppliedHaloCatalog(object):
             If the chosen ``fname`` already exists, then you must set ``overwrite``
             to True in order to write the file to disk. Default is False.
 
+        format_version : int, optional
+            Version of the on-disk format of the hdf5 file,
+            see `~halotools.sim_manager.halo_table_io`. Default is the latest version,
+            storing each column in its own chunked and compressed dataset.
+
+        compression : string, optional
+            Compression of the columns of the hdf5 file,
+            see `~halotools.sim_manager.write_halo_table`. Default is 'auto'.
+
+        spatial_index : bool, optional
+            If True, the halos are stored on disk sorted by their cell in a regular grid
+            dividing the box, together with an index of the first row of each cell,
+            so that the ``region`` argument of `~halotools.sim_manager.CachedHaloCatalog`
+            only reads the halos of the requested subvolume.
+            Default is False.
+
         **additional_metadata : sequence of strings, optional
             Each keyword of ``additional_metadata`` defines the name
             of a piece of metadata stored in the hdf5 file. The
@@ -411,9 +430,15 @@ class UserSuppliedHaloCatalog(object):
         ############################################################
         # Now write the file to disk and add the appropriate metadata
 
-        self.halo_table.write(fname, path='data', overwrite=overwrite)
+        if spatial_index is True:
+            num_cells_per_dimension = default_num_cells_per_dimension
+        else:
+            num_cells_per_dimension = None
+        write_halo_table(self.halo_table, fname, overwrite=overwrite,
+            format_version=format_version, compression=compression,
+            Lbox=self.Lbox, num_cells_per_dimension=num_cells_per_dimension)
 
-        f = h5py.File(fname)
+        f = h5py.File(fname, 'a')
 
         redshift_string = get_redshift_string(self.redshift)
 
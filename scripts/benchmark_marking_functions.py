@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""Command-line script to benchmark the marked pair counter
+for each of its built-in marking functions.
+
+For each requested ``weight_func_id``, the script times
+`~halotools.mock_observables.marked_npairs_3d` on uniform randoms in a periodic box,
+and prints the best-of-N wall-clock time, the throughput in millions of pairs
+per second, and the time relative to the unmarked
+`~halotools.mock_observables.npairs_3d` on the same points.
+
+The timings can be written to a file with ``-save`` and compared with ``-compare``,
+so that running the script before and after a change to the marked engines
+prints the speedup for each marking function:
+
+$ python scripts/benchmark_marking_functions.py -save before.txt
+$ python scripts/benchmark_marking_functions.py -compare before.txt
+
+"""
+from time import time
+import numpy as np
+from astropy.utils.misc import NumpyRNGContext
+
+from halotools.mock_observables import npairs_3d, marked_npairs_3d
+from halotools.mock_observables.pair_counters import clear_mesh_cache
+
+import argparse
+parser = argparse.ArgumentParser()
+parser.add_argument("-npts", type=int, default=int(1e5),
+    help="Number of points in each sample. Default is 1e5.")
+parser.add_argument("-lbox", type=float, default=250.,
+    help="Size of the periodic box. Default is 250.")
+parser.add_argument("-rmax", type=float, default=20.,
+    help="Largest bin edge. Default is 20.")
+parser.add_argument("-nbins", type=int, default=15,
+    help="Number of logarithmically spaced bins. Default is 15.")
+parser.add_argument("-weight_func_ids", type=int, nargs='+', default=list(range(1, 12)),
+    help="Integer IDs of the marking functions to benchmark. Default is 1 through 11.")
+parser.add_argument("-num_threads", type=int, default=1,
+    help="Number of threads of the pair counters. Default is 1.")
+parser.add_argument("-repeat", type=int, default=3,
+    help="Number of repetitions of each timing. Default is 3.")
+parser.add_argument("-seed", type=int, default=43,
+    help="Random number seed. Default is 43.")
+parser.add_argument("-save", type=str, default=None,
+    help="Name of a file in which to write the timing of each weight_func_id.")
+parser.add_argument("-compare", type=str, default=None,
+    help="Name of a file written by an earlier run with -save. "
+    "The speedup relative to those timings is printed for each weight_func_id.")
+args = parser.parse_args()
+
+
+def best_time(func, *func_args, **func_kwargs):
+    timings = []
+    for __ in range(args.repeat):
+        clear_mesh_cache()
+        start = time()
+        func(*func_args, **func_kwargs)
+        timings.append(time() - start)
+    return min(timings)
+
+
+with NumpyRNGContext(args.seed):
+    sample1 = np.random.uniform(0, args.lbox, args.npts*3).reshape((args.npts, 3))
+    sample2 = np.random.uniform(0, args.lbox, args.npts*3).reshape((args.npts, 3))
+    # The first mark takes a few discrete values so that the equality
+    # marking functions are true for a fraction of the pairs
+    weights1 = np.vstack((np.random.randint(0, 5, args.npts), np.random.rand(args.npts))).T
+    weights2 = np.vstack((np.random.randint(0, 5, args.npts), np.random.rand(args.npts))).T
+
+rbins = np.logspace(np.log10(args.rmax) - 2, np.log10(args.rmax), args.nbins)
+num_pairs = npairs_3d(sample1, sample2, rbins, period=args.lbox)[-1]
+t_unmarked = best_time(npairs_3d, sample1, sample2, rbins, period=args.lbox,
+    num_threads=args.num_threads)
+
+previous_timings = {}
+if args.compare is not None:
+    for weight_func_id, t in np.loadtxt(args.compare, ndmin=2):
+        previous_timings[int(weight_func_id)] = t
+
+print("{0} pairs within rmax = {1}, npairs_3d time = {2:.3f}s".format(
+    num_pairs, args.rmax, t_unmarked))
+print("{0:>14} {1:>10} {2:>14} {3:>12} {4:>10}".format(
+    "weight_func_id", "time (s)", "Mpairs/s", "/ npairs_3d", "speedup"))
+
+timings = []
+for weight_func_id in args.weight_func_ids:
+    n_weights = 1 if weight_func_id in (1, 2) else 2
+    t = best_time(marked_npairs_3d, sample1, sample2, rbins, period=args.lbox,
+        weights1=weights1[:, :n_weights], weights2=weights2[:, :n_weights],
+        weight_func_id=weight_func_id, num_threads=args.num_threads)
+    timings.append((weight_func_id, t))
+
+    if weight_func_id in previous_timings:
+        speedup = "{0:>10.2f}".format(previous_timings[weight_func_id]/t)
+    else:
+        speedup = "{0:>10}".format('-')
+    print("{0:>14} {1:>10.3f} {2:>14.1f} {3:>12.2f} {4}".format(
+        weight_func_id, t, num_pairs/t/1e6, t/t_unmarked, speedup))
+
+if args.save is not None:
+    np.savetxt(args.save, np.array(timings), fmt='%i %.6f',
+        header='weight_func_id time')
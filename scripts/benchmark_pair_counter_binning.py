@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""Command-line script to benchmark the pair-counting engines
+as a function of the number of separation bins.
+
+For each requested number of logarithmically spaced bins, the script times
+`~halotools.mock_observables.npairs_3d`, `~halotools.mock_observables.npairs_xy_z`
+and `~halotools.mock_observables.marked_npairs_3d` on uniform randoms in a periodic box
+and prints the best-of-N wall-clock time of each function.
+
+The engines locate the bin of each pair by bisection and accumulate a
+differential histogram, so the cost per pair scales as log(Nbins).
+Running this script before and after a change to the engines
+provides a direct measurement of the speedup:
+
+$ python scripts/benchmark_pair_counter_binning.py -npts 100000 -nbins 5 15 30 50 100
+
+"""
+from time import time
+import numpy as np
+from astropy.utils.misc import NumpyRNGContext
+
+from halotools.mock_observables import npairs_3d, npairs_xy_z, marked_npairs_3d
+from halotools.mock_observables.pair_counters import clear_mesh_cache
+
+import argparse
+parser = argparse.ArgumentParser()
+parser.add_argument("-npts", type=int, default=int(1e5),
+    help="Number of points in each sample. Default is 1e5.")
+parser.add_argument("-lbox", type=float, default=250.,
+    help="Size of the periodic box. Default is 250.")
+parser.add_argument("-rmin", type=float, default=0.1,
+    help="Smallest bin edge. Default is 0.1.")
+parser.add_argument("-rmax", type=float, default=20.,
+    help="Largest bin edge. Default is 20.")
+parser.add_argument("-nbins", type=int, nargs='+', default=[5, 10, 20, 30, 50, 100],
+    help="Numbers of bins to benchmark.")
+parser.add_argument("-repeat", type=int, default=3,
+    help="Number of repetitions of each timing. Default is 3.")
+parser.add_argument("-seed", type=int, default=43,
+    help="Random number seed. Default is 43.")
+args = parser.parse_args()
+
+
+def best_time(func, *func_args, **func_kwargs):
+    timings = []
+    for __ in range(args.repeat):
+        clear_mesh_cache()
+        start = time()
+        func(*func_args, **func_kwargs)
+        timings.append(time() - start)
+    return min(timings)
+
+
+with NumpyRNGContext(args.seed):
+    sample1 = np.random.uniform(0, args.lbox, args.npts*3).reshape((args.npts, 3))
+    sample2 = np.random.uniform(0, args.lbox, args.npts*3).reshape((args.npts, 3))
+    weights1 = np.random.rand(args.npts)
+    weights2 = np.random.rand(args.npts)
+
+print("{0:>6} {1:>14} {2:>14} {3:>18}".format(
+    "Nbins", "npairs_3d", "npairs_xy_z", "marked_npairs_3d"))
+
+for nbins in args.nbins:
+    rbins = np.logspace(np.log10(args.rmin), np.log10(args.rmax), nbins)
+    pi_bins = np.linspace(0, args.rmax, nbins)
+
+    t_3d = best_time(npairs_3d, sample1, sample2, rbins, period=args.lbox)
+    t_xy_z = best_time(npairs_xy_z, sample1, sample2, rbins, pi_bins, period=args.lbox)
+    t_marked = best_time(marked_npairs_3d, sample1, sample2, rbins, period=args.lbox,
+        weights1=weights1, weights2=weights2, weight_func_id=1)
+
+    print("{0:>6} {1:>13.3f}s {2:>13.3f}s {3:>17.3f}s".format(nbins, t_3d, t_xy_z, t_marked))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""Command-line script to benchmark the parsing engines of
+`~halotools.sim_manager.TabularAsciiReader`.
+
+The script writes a synthetic ASCII file in the format of a Rockstar hlist,
+with a header followed by rows of whitespace-separated columns,
+and prints the best-of-N wall-clock time of
+`~halotools.sim_manager.TabularAsciiReader.read_ascii` with the default 'python'
+engine, which splits each row in Python, and with the 'numpy' engine,
+which reads each chunk as a block and tokenizes it in C.
+The 'numpy' engine is also timed with ``num_processes`` processes, each parsing
+a different byte range of the file.
+The script also verifies that every read returns identical arrays:
+
+$ python scripts/benchmark_tabular_ascii_reader.py -nrows 1000000 -ncols 60 -num_processes 4
+
+"""
+import os
+import sys
+import shutil
+import tempfile
+from time import time
+import numpy as np
+from astropy.utils.misc import NumpyRNGContext
+
+from halotools.sim_manager import TabularAsciiReader
+
+import argparse
+parser = argparse.ArgumentParser()
+parser.add_argument("-nrows", type=int, default=int(1e5),
+    help="Number of rows of data in the file. Default is 1e5.")
+parser.add_argument("-ncols", type=int, default=60,
+    help="Number of columns of data in the file. Default is 60.")
+parser.add_argument("-chunk_memory_size", type=float, default=500,
+    help="Size in Mb of the chunks passed to read_ascii. Default is 500.")
+parser.add_argument("-num_processes", type=int, default=4,
+    help="Number of processes of the parallel read. Default is 4.")
+parser.add_argument("-repeat", type=int, default=3,
+    help="Number of repetitions of each timing. Default is 3.")
+parser.add_argument("-seed", type=int, default=43,
+    help="Random number seed. Default is 43.")
+args = parser.parse_args()
+
+
+def best_time(func, *func_args, **func_kwargs):
+    timings = []
+    for __ in range(args.repeat):
+        start = time()
+        result = func(*func_args, **func_kwargs)
+        timings.append(time() - start)
+    return min(timings), result
+
+
+tmpdir = tempfile.mkdtemp()
+try:
+    fname = os.path.join(tmpdir, 'hlist_benchmark.list')
+
+    # Alternate integer and float columns, as in an hlist
+    with NumpyRNGContext(args.seed):
+        data = np.random.uniform(0, 1e3, (args.nrows, args.ncols))
+    fmt = ' '.join('%i' if i % 2 == 0 else '%.5e' for i in range(args.ncols))
+    header = ' '.join('col{0}'.format(i) for i in range(args.ncols))
+    np.savetxt(fname, data, fmt=fmt, header=header, comments='#')
+
+    # Keep a handful of columns and cut on one of them
+    columns_to_keep_dict = {'halo_id': (0, 'i8'), 'halo_mvir': (1, 'f4'),
+        'halo_x': (args.ncols-5, 'f4'), 'halo_y': (args.ncols-3, 'f4'),
+        'halo_z': (args.ncols-1, 'f4'), 'halo_upid': (args.ncols-2, 'i8')}
+    reader = TabularAsciiReader(fname, columns_to_keep_dict,
+        row_cut_min_dict={'halo_mvir': 100.})
+
+    # Silence the progress messages of read_ascii
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        python_time, python_result = best_time(reader.read_ascii,
+            chunk_memory_size=args.chunk_memory_size, engine='python')
+        numpy_time, numpy_result = best_time(reader.read_ascii,
+            chunk_memory_size=args.chunk_memory_size, engine='numpy')
+        parallel_time, parallel_result = best_time(reader.read_ascii,
+            chunk_memory_size=args.chunk_memory_size, engine='numpy',
+            num_processes=args.num_processes)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    assert np.all(python_result == numpy_result)
+    assert np.all(python_result == parallel_result)
+
+    file_size = os.path.getsize(fname)/1e6
+    print("File size = {0:.1f} Mb, {1} rows, {2} columns".format(
+        file_size, args.nrows, args.ncols))
+    print("{0:>10} {1:>12} {2:>12}".format('engine', 'time (s)', 'Mb/s'))
+    print("{0:>10} {1:>12.3f} {2:>12.1f}".format('python', python_time, file_size/python_time))
+    print("{0:>10} {1:>12.3f} {2:>12.1f}".format('numpy', numpy_time, file_size/numpy_time))
+    print("{0:>10} {1:>12.3f} {2:>12.1f}".format(
+        'numpy x{0}'.format(args.num_processes), parallel_time, file_size/parallel_time))
+    print("Speedup of numpy engine = {0:.1f}".format(python_time/numpy_time))
+    print("Speedup of parallel numpy engine = {0:.1f}".format(python_time/parallel_time))
+finally:
+    shutil.rmtree(tmpdir)